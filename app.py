@@ -8,6 +8,9 @@ import dash
 from dash_iconify import DashIconify
 from dash_mantine_components import MantineProvider, NavLink, Stack, Container, Paper
 from utils.logging_utils import setup_logger, create_error_handler
+from utils.job_service import get_background_callback_manager
+from utils.scheduler_service import start_report_scheduler
+from utils.figure_service import configure_json_engine, register_response_compression
 import os
 import tempfile
 
@@ -45,8 +48,14 @@ app = Dash(
     use_pages=True,  # Enable Dash Pages
     suppress_callback_exceptions=True,
     on_error=create_error_handler(logger),  # Add global error handler
+    # Disk-backed job queue so background=True callbacks run outside the web worker
+    background_callback_manager=get_background_callback_manager(),
 )
 
+# Fast JSON encoding for callback responses and gzip for large ones
+configure_json_engine()
+register_response_compression(app.server)
+
 # Import pages AFTER app instantiation
 # This is important because dash.register_page must be called after app is created
 import pages.home
@@ -56,6 +65,10 @@ import pages.visualizations
 import pages.reports
 import pages.chat  # Added import for chat page
 
+# Pre-render common reports after each data refresh
+if os.environ.get('FINGEN_REPORT_SCHEDULER', 'True').lower() == 'true':
+    start_report_scheduler()
+
 # Define the main layout
 app.layout = MantineProvider(
     theme={
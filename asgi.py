@@ -0,0 +1,75 @@
+"""
+ASGI entry point for the FinGen application.
+Serves the Dash app together with native async routes, with one event
+loop per worker process:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8050 --workers 4
+
+`/streaming-chat` is served natively on the event loop, so concurrent
+streaming sessions cost an open socket each rather than a thread. All
+other paths go to the Dash (Flask) app through a WSGI bridge; sync code
+there, including Dash callbacks, runs its LLM, embedding and vector I/O
+on the same loop through utils.async_service.
+"""
+
+import os
+import asyncio
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+from app import app as dash_app, logger
+from pages.chat import parse_chat_request, rejection_body
+from utils.admission_service import AdmissionRejected, aadmitted_stream, get_admission_controller
+from utils.agent_service import handle_agent_message
+from utils.async_service import set_event_loop
+from utils.llm_service import OLLAMA_BASE_URL, astream_llm_response
+from utils.stream_service import SSE_HEADERS, asse_stream
+
+# Threads serving the WSGI app (Dash callbacks, assets, layout) per worker
+WSGI_THREADS = int(os.environ.get("FINGEN_ASGI_WSGI_THREADS", "32"))
+
+
+async def streaming_chat(request: Request):
+    """Async /streaming-chat: the same protocol as the WSGI route, without a thread per stream."""
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    user_prompt, mode, session_id, error = parse_chat_request(data)
+    if error:
+        return JSONResponse({"error": error}, status_code=400)
+
+    controller = get_admission_controller()
+    try:
+        # Without a session ID only the global and backend limits apply
+        ticket = controller.enqueue(session_id, OLLAMA_BASE_URL)
+    except AdmissionRejected as e:
+        body, headers = rejection_body(e)
+        return JSONResponse(body, status_code=429, headers=headers)
+
+    logger.info(f"Streaming chat - Mode: {mode}, Session: {session_id}")
+    source = handle_agent_message(session_id, user_prompt) if mode == "agent" else astream_llm_response(user_prompt)
+    return StreamingResponse(asse_stream(aadmitted_stream(ticket, source)), media_type="text/event-stream",
+                             headers=SSE_HEADERS, background=BackgroundTask(controller.release, ticket))
+
+
+@asynccontextmanager
+async def lifespan(_app: Starlette):
+    # Share the server's loop with sync code in this worker instead of a separate loop thread
+    set_event_loop(asyncio.get_running_loop())
+    yield
+
+
+app = Starlette(
+    routes=[
+        Route("/streaming-chat", streaming_chat, methods=["POST"]),
+        Mount("/", app=WSGIMiddleware(dash_app.server, workers=WSGI_THREADS)),
+    ],
+    lifespan=lifespan,
+)
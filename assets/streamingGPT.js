@@ -1,3 +1,119 @@
+// Incremental markdown renderer: finished blocks are parsed once and appended,
+// only the trailing (still growing) block is re-rendered as tokens arrive.
+function createStreamRenderer(container) {
+    const status = document.createElement('div');
+    const committed = document.createElement('div');
+    const tail = document.createElement('div');
+    status.style.color = '#868e96';
+    container.appendChild(status);
+    container.appendChild(committed);
+    container.appendChild(tail);
+
+    let pending = ""; // Text of the trailing block, not yet committed
+    let frameRequested = false;
+
+    function toHtml(text) {
+        if (typeof marked !== 'undefined') {
+            try {
+                return marked.parse(text);
+            } catch (parseError) {
+                console.error("Markdown parsing error:", parseError);
+            }
+        }
+        const escaped = document.createElement('div');
+        escaped.innerText = text;
+        return escaped.innerHTML;
+    }
+
+    // Index just after the last blank line outside a code fence; text before it
+    // can no longer change how it renders, so it is safe to commit
+    function stableBoundary(text) {
+        let inFence = false;
+        let boundary = 0;
+        let lineStart = 0;
+        while (lineStart < text.length) {
+            let lineEnd = text.indexOf('\n', lineStart);
+            if (lineEnd === -1) break; // The last line is still incomplete
+            const line = text.slice(lineStart, lineEnd);
+            if (/^\s*(```|~~~)/.test(line)) {
+                inFence = !inFence;
+            } else if (!inFence && line.trim() === '') {
+                boundary = lineEnd + 1;
+            }
+            lineStart = lineEnd + 1;
+        }
+        return boundary;
+    }
+
+    function render() {
+        frameRequested = false;
+        const boundary = stableBoundary(pending);
+        if (boundary > 0) {
+            const block = document.createElement('div');
+            block.innerHTML = toHtml(pending.slice(0, boundary));
+            committed.appendChild(block);
+            pending = pending.slice(boundary);
+        }
+        tail.innerHTML = toHtml(pending);
+        container.scrollTop = container.scrollHeight;
+    }
+
+    return {
+        append(text) {
+            status.innerText = '';
+            pending += text;
+            // Batch all tokens that arrive within one animation frame into one render
+            if (!frameRequested) {
+                frameRequested = true;
+                requestAnimationFrame(render);
+            }
+        },
+        finish() {
+            status.innerText = '';
+            render();
+        },
+        status(message) {
+            status.innerText = message;
+        },
+        error(message) {
+            const p = document.createElement('p');
+            p.style.color = 'red';
+            p.innerText = `[${message}]`;
+            container.appendChild(p);
+            container.scrollTop = container.scrollHeight;
+        }
+    };
+}
+
+// Parse Server-Sent Event frames out of a fetch stream, calling onEvent(event, data) per frame
+async function readEventStream(response, onEvent) {
+    const decoder = new TextDecoder();
+    const reader = response.body.getReader();
+    let buffer = "";
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let separator;
+        while ((separator = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, separator);
+            buffer = buffer.slice(separator + 2);
+            let event = 'message';
+            const dataLines = [];
+            for (const line of frame.split('\n')) {
+                if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    dataLines.push(line.slice(5).trimStart());
+                }
+            }
+            if (dataLines.length) {
+                onEvent(event, JSON.parse(dataLines.join('\n')));
+            }
+        }
+    }
+}
+
 window.dash_clientside = Object.assign({}, window.dash_clientside, {
     clientside: {
         // Renamed function for clarity
@@ -6,7 +122,7 @@ window.dash_clientside = Object.assign({}, window.dash_clientside, {
             const prompt = states[0];
             const chatMode = states[1];
             const sessionId = states[2];
-            
+
             // Skip processing if no clicks, no prompt, or (in agent mode) no session ID
             if (!n_clicks || !prompt || (chatMode === 'agent' && !sessionId)) {
                 // Check if it's just missing session ID temporarily during load
@@ -17,7 +133,7 @@ window.dash_clientside = Object.assign({}, window.dash_clientside, {
                 }
                 return false; // Enable the button if no click or prompt
             }
-            
+
             const responseWindow = document.querySelector("#chat-response-window");
             if (!responseWindow) {
                 console.error("Response window element (#chat-response-window) not found.");
@@ -25,8 +141,8 @@ window.dash_clientside = Object.assign({}, window.dash_clientside, {
             }
 
             // Clear only *before* starting a new stream
-            responseWindow.innerHTML = ''; 
-            
+            responseWindow.innerHTML = '';
+
             // Configure marked.js (ensure it's loaded via external_scripts in chat.py)
             if (typeof marked !== 'undefined') {
                  marked.setOptions({
@@ -34,67 +150,63 @@ window.dash_clientside = Object.assign({}, window.dash_clientside, {
                         if (typeof hljs !== 'undefined') {
                             return hljs.highlightAuto(code).value;
                         }
-                        return code; 
+                        return code;
                     }
                  });
             } else {
                  console.warn("marked.js not loaded. Markdown rendering will be basic.");
             }
 
+            const renderer = createStreamRenderer(responseWindow);
             try {
                 // Send request to the backend endpoint
                 const response = await fetch("/streaming-chat", {
                     method: "POST",
                     headers: {
                         "Content-Type": "application/json",
+                        "Accept": "text/event-stream",
                     },
                     // Send prompt, mode, and session ID
-                    body: JSON.stringify({ 
-                        prompt: prompt, 
-                        mode: chatMode, 
-                        session_id: sessionId 
+                    body: JSON.stringify({
+                        prompt: prompt,
+                        mode: chatMode,
+                        session_id: sessionId
                     }),
                 });
 
+                if (response.status === 429) {
+                     // Rejected by admission control: the server says when to try again
+                     const errorData = await response.json().catch(() => ({}));
+                     const retryAfter = errorData.retry_after || response.headers.get('Retry-After');
+                     renderer.error(errorData.error || `The assistant is busy. Please retry in ${retryAfter}s.`);
+                     return false;
+                }
                 if (!response.ok) {
                      const errorData = await response.json().catch(() => ({ error: `HTTP error ${response.status}` }));
                      console.error("Server error:", errorData);
-                     responseWindow.innerHTML = `<p style="color: red;">Error: ${errorData.error || `Failed to fetch stream (${response.status})`}</p>`;
+                     renderer.error(`Error: ${errorData.error || `Failed to fetch stream (${response.status})`}`);
                      return false; // Re-enable button on error
                 }
 
-                const decoder = new TextDecoder();
-                const reader = response.body.getReader();
-                let accumulatedChunks = ""; // Accumulate chunks for parsing
-                
-                while (true) {
-                    const { done, value } = await reader.read();
-                    if (done) break;
-                    accumulatedChunks += decoder.decode(value, { stream: true });
-
-                    // Render accumulated markdown
-                    try {
-                        if (typeof marked !== 'undefined') {
-                            responseWindow.innerHTML = marked.parse(accumulatedChunks);
-                        } else {
-                            // Basic rendering if marked is unavailable
-                            responseWindow.innerText = accumulatedChunks;
-                        }
-                        responseWindow.scrollTop = responseWindow.scrollHeight;
-                    } catch (parseError) {
-                        console.error("Markdown parsing error:", parseError);
-                        // Display raw text if parsing fails
-                        responseWindow.innerText = accumulatedChunks;
+                await readEventStream(response, (event, data) => {
+                    if (event === 'token') {
+                        renderer.append(data.text);
+                    } else if (event === 'queued') {
+                        renderer.status(data.position > 0 ? `Waiting for a free slot (position ${data.position} in queue)...` : '');
+                    } else if (event === 'error') {
+                        renderer.error(data.message);
                     }
-                }
+                    // 'heartbeat' only keeps the connection alive; 'done' ends the stream
+                });
+                renderer.finish();
             } catch (error) {
                 console.error("Streaming error:", error);
-                responseWindow.innerHTML += `<p style="color: red;">\n\n[Error during streaming: ${error}]</p>`;
-                responseWindow.scrollTop = responseWindow.scrollHeight;
+                renderer.finish();
+                renderer.error(`Error during streaming: ${error}`);
             }
-            
+
             // Return false to re-enable the submit button
             return false;
           }
     }
-});
\ No newline at end of file
+});
@@ -0,0 +1,6 @@
+"""
+Benchmark suite for the FinGen application.
+Each module is a runnable script (`python -m benchmarks.<name> --help`)
+that prints its results as JSON, so runs with different settings can be
+stored and compared with `--compare previous.json`.
+"""
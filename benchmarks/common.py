@@ -0,0 +1,110 @@
+"""
+Shared helpers for the benchmark scripts: latency percentiles, process
+memory, run metadata and JSON result files that can be compared.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+
+def percentiles(samples_ms: Iterable[float]) -> Dict[str, float]:
+    """p50/p95/p99, mean and max of latency samples in milliseconds."""
+    samples = np.asarray(list(samples_ms), dtype=float)
+    if not len(samples):
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {"count": int(len(samples)), "mean_ms": round(float(samples.mean()), 3), "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3), "max_ms": round(float(samples.max()), 3)}
+
+
+def rss_mb() -> float:
+    """Resident memory of this process in MB."""
+    import psutil
+    return round(psutil.Process().memory_info().rss / 2 ** 20, 1)
+
+
+def directory_mb(path: str) -> float:
+    """Total size of the files under a directory in MB."""
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return round(total / 2 ** 20, 3)
+
+
+def run_metadata(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """What a result was measured on, so results from different runs can be compared fairly."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": commit, "python": platform.python_version(),
+            "platform": platform.platform(), "cpus": os.cpu_count(), "settings": settings}
+
+
+def _flatten(data: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = float(value)
+    return flat
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Metric-by-metric change of `results` against `baseline` (both as written by `emit`)."""
+    current, previous = _flatten(results.get("results", {})), _flatten(baseline.get("results", {}))
+    rows = []
+    for name in sorted(current.keys() & previous.keys()):
+        before, after = previous[name], current[name]
+        rows.append({"metric": name, "baseline": before, "current": after,
+                     "ratio": round(after / before, 3) if before else None})
+    return rows
+
+
+def regressions(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 1.5,
+                size_tolerance: float = 1.1, min_delta_ms: float = 2.0) -> List[Dict[str, Any]]:
+    """
+    Metrics that got worse than `baseline` by more than the allowed ratio:
+    `tolerance` for timings (names ending in `_ms`, ignoring changes below
+    `min_delta_ms`) and `size_tolerance` for sizes (names ending in `_kb`).
+    Tail latencies (p99, max) are too noisy over a few runs to gate on.
+    """
+    failed = []
+    for row in compare(results, baseline):
+        if row["metric"].endswith(("p99_ms", "max_ms")):
+            continue
+        if row["metric"].endswith("_ms"):
+            limit, worse = tolerance, row["current"] - row["baseline"] > min_delta_ms
+        elif row["metric"].endswith("_kb"):
+            limit, worse = size_tolerance, True
+        else:
+            continue
+        if worse and row["ratio"] is not None and row["ratio"] > limit:
+            failed.append({**row, "limit": limit})
+    return failed
+
+
+def emit(results: Dict[str, Any], output: Optional[str] = None, baseline_path: Optional[str] = None) -> None:
+    """Print results as JSON (and write them to `output`), with a comparison table when a baseline is given."""
+    text = json.dumps(results, indent=2, default=str)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            rows = compare(results, json.load(f))
+        print(f"\n{'metric':<60} {'baseline':>14} {'current':>14} {'ratio':>8}", file=sys.stderr)
+        for row in rows:
+            ratio = "" if row["ratio"] is None else f"{row['ratio']:.3f}"
+            print(f"{row['metric']:<60} {row['baseline']:>14.3f} {row['current']:>14.3f} {ratio:>8}", file=sys.stderr)
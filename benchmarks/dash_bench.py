@@ -0,0 +1,181 @@
+"""
+Dash page and callback benchmark.
+Times page layout construction and serialization (home, analysis,
+visualizations, reports), the callbacks `update_charts`, `refresh_charts`
+and `update_report_preview` called as Dash would call them, and the build
+time, serialization time and JSON size of the page figures for ledgers of
+1k to 10M rows. Everything runs against sample data in a temporary
+directory.
+
+    python -m benchmarks.dash_bench --output dash.json
+    python -m benchmarks.dash_bench --check dash.json
+
+With `--check` the run fails (exit code 1) when a timing is slower than
+the baseline by more than `--tolerance` or a figure grew by more than
+`--size-tolerance`, so a regression cannot go unnoticed. Figure sizes
+whose build and serialization exceed `--budget-s` are the scaling limit:
+larger sizes are recorded as skipped rather than run.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from .common import emit, percentiles, regressions, rss_mb, run_metadata
+
+DEFAULT_ROWS = "1000,10000,100000,1000000,10000000"
+
+
+def _time(func: Callable, repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def ledger(rows: int, seed: int) -> pd.DataFrame:
+    """A ledger of `rows` rows; minute-frequency so 10M rows stay within the datetime range."""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2005-01-01", periods=rows, freq="min")
+    revenue = rng.normal(1000, 100, rows)
+    expenses = rng.normal(800, 80, rows)
+    return pd.DataFrame({"revenue": revenue, "expenses": expenses, "profit": revenue - expenses,
+                         "market_index": rng.normal(100, 10, rows)}, index=index)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per layout and callback measurement")
+    parser.add_argument("--rows", default=DEFAULT_ROWS, help="Comma-separated ledger sizes for the figure scaling runs")
+    parser.add_argument("--budget-s", type=float, default=120, help="Skip larger sizes once a figure takes longer")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Also write the JSON results here")
+    parser.add_argument("--compare", help="Previous results to compare against")
+    parser.add_argument("--check", help="Baseline results; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="Allowed slowdown ratio for timings")
+    parser.add_argument("--size-tolerance", type=float, default=1.1, help="Allowed growth ratio for JSON sizes")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="Ignore timing changes smaller than this")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="fingen-dash-bench-")
+    # The app and its services read their configuration at import time
+    os.environ.update({
+        "FINGEN_DATA_DIR": os.path.join(workdir, "data"),
+        "FINGEN_JOB_CACHE_DIR": os.path.join(workdir, "cache"),
+        "FINGEN_REPORT_SCHEDULER": "False",
+        "FINGEN_SAMPLE_DATA": "True",
+    })
+    logging.basicConfig(level=logging.WARNING)
+
+    try:
+        started = time.perf_counter()
+        import app  # noqa: F401  (creates the Dash app and registers the pages and callbacks)
+        import_ms = (time.perf_counter() - started) * 1000
+        from dash._utils import to_json
+        from plotly.io.json import to_json_plotly
+        import pages.home as home
+        import pages.analysis as analysis
+        import pages.reports as reports
+        import pages.visualizations as visualizations
+        from utils.analysis_service import get_analysis_engine
+
+        results: Dict[str, Any] = {"app": {"import_ms": round(import_ms, 3)}}
+
+        # Layouts: what serving a page costs (function layouts are built per request),
+        # plus the figure builders that module-level layouts run at import
+        results["layouts"] = {}
+        builders = {
+            "home": [home.create_revenue_chart, home.create_profit_chart],
+            "analysis": [],
+            "visualizations": [visualizations.create_time_series_chart, visualizations.create_comparative_chart,
+                               visualizations.create_risk_heatmap, visualizations.create_relationship_graph,
+                               visualizations.create_fan_chart],
+            "reports": [],
+        }
+        for name, page in [("home", home), ("analysis", analysis), ("visualizations", visualizations),
+                           ("reports", reports)]:
+            render = lambda: to_json(page.layout() if callable(page.layout) else page.layout)
+            entry = {"render": percentiles(_time(render, args.repeat)), "json_kb": round(len(render()) / 1024, 1)}
+            if builders[name]:
+                entry["builders"] = {func.__name__: percentiles(_time(func, args.repeat)) for func in builders[name]}
+            results["layouts"][name] = entry
+
+        # Callbacks, including serializing their outputs as the response would
+        callbacks: Dict[str, Any] = {}
+        callbacks["update_charts"] = percentiles(_time(
+            lambda: to_json(visualizations.update_charts(1, "12m", "line")), args.repeat))
+
+        def refresh():
+            # Steady state: the client holds the previous version and receives one appended feed
+            return to_json(analysis.refresh_charts(lambda progress: None, 1, get_analysis_engine().version))
+        callbacks["refresh_charts"] = percentiles(_time(refresh, args.repeat))
+
+        template, sections = "quarterly_report", ["financial_metrics", "risk_assessment", "forecast"]
+        full = lambda: reports.update_report_preview(template, sections, None, True, True, None)
+        callbacks["update_report_preview"] = {"full": percentiles(_time(lambda: to_json(full()), args.repeat))}
+        _, keys = full()
+        toggled = lambda: reports.update_report_preview(template, sections[:-1], None, True, True, keys)
+        callbacks["update_report_preview"]["patch"] = percentiles(_time(lambda: to_json(toggled()), args.repeat))
+        results["callbacks"] = callbacks
+
+        # Figure scaling: build and serialize the page figures for ever larger ledgers
+        figures: Dict[str, Any] = {}
+        original_load = visualizations.load_dataset
+        over_budget = False
+        for rows in sorted(int(value) for value in args.rows.split(",")):
+            if over_budget:
+                figures[f"rows_{rows}"] = {"skipped": f"a smaller size exceeded the {args.budget_s:g}s budget"}
+                continue
+            frame = ledger(rows, args.seed)
+            visualizations.load_dataset = lambda *a, **kw: frame
+            entry = {}
+            for name, build in [("time_series", lambda: visualizations.create_time_series_chart("all")),
+                                ("revenue", lambda: analysis.create_revenue_chart(frame)),
+                                ("profit_margin", lambda: analysis.create_profit_margin_chart(frame))]:
+                started = time.perf_counter()
+                figure = build()
+                built = time.perf_counter()
+                payload = to_json_plotly(figure)
+                serialized = time.perf_counter()
+                entry[name] = {"build_ms": round((built - started) * 1000, 3),
+                               "serialize_ms": round((serialized - built) * 1000, 3),
+                               "json_kb": round(len(payload) / 1024, 1)}
+                del figure, payload
+                over_budget = over_budget or serialized - started > args.budget_s
+            entry["rss_mb"] = rss_mb()
+            figures[f"rows_{rows}"] = entry
+            del frame
+        visualizations.load_dataset = original_load
+        results["figures"] = figures
+
+        settings = {key: value for key, value in vars(args).items() if key not in ("output", "compare", "check")}
+        report = {"benchmark": "dash", "meta": run_metadata(settings), "results": results}
+        emit(report, args.output, args.compare)
+
+        if args.check:
+            with open(args.check, encoding="utf-8") as f:
+                failed = regressions(report, json.load(f), args.tolerance, args.size_tolerance, args.min_delta_ms)
+            if failed:
+                print(f"\n{len(failed)} regression(s) against {args.check}:", file=sys.stderr)
+                for row in failed:
+                    print(f"  {row['metric']}: {row['baseline']:.3f} -> {row['current']:.3f} "
+                          f"({row['ratio']:.2f}x, limit {row['limit']:.2f}x)", file=sys.stderr)
+                sys.exit(1)
+            print(f"\nNo regressions against {args.check}", file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
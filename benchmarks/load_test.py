@@ -0,0 +1,258 @@
+"""
+End-to-end load test for /streaming-chat.
+Drives concurrent chat sessions, each sending requests one after another
+as a user would, reads the SSE stream of every response and reports
+throughput, time to first token, inter-token latency, request duration
+and error rates. With `--start` it launches the mock Ollama server and
+the ASGI app itself, so the numbers are repeatable without a GPU:
+
+    python -m benchmarks.load_test --start --sessions 50 --duration 60 --mode direct --output direct.json
+    python -m benchmarks.load_test --start --sessions 50 --duration 60 --mode agent --compare direct.json
+    python -m benchmarks.load_test --url http://localhost:8050 --sessions 10 --requests 5
+
+Inter-token latency is measured between SSE `token` events, which the
+server coalesces, so it is the gap the browser sees rather than the
+model's per-token gap.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import subprocess
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from .common import emit, percentiles, run_metadata
+
+PROMPTS = [
+    "Summarize the liquidity position and the main drivers of cash flow this quarter.",
+    "What are the largest risks to next year's revenue forecast?",
+    "Explain the change in operating margin compared with last year.",
+    "How exposed is the company to interest rate increases?",
+    "Give an overview of inventory levels and any write-downs.",
+    "What did management say about capital expenditure plans?",
+]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class RequestResult:
+    """Timings and outcome of one /streaming-chat request."""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.status: Optional[int] = None
+        self.ttft_ms: Optional[float] = None
+        self.gaps_ms: List[float] = []
+        self.duration_ms = 0.0
+        self.chars = 0
+        self.events = 0
+        self.queued = False
+        self.error: Optional[str] = None
+
+
+async def _read_events(response: httpx.Response):
+    """Yield (event, data) pairs from an SSE response."""
+    event, data = "message", []
+    async for line in response.aiter_lines():
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].strip())
+
+
+async def chat_request(client: httpx.AsyncClient, url: str, prompt: str, mode: str, session_id: str) -> RequestResult:
+    """Send one chat request and time its stream until the `done` or `error` event."""
+    result = RequestResult(mode)
+    started = last_token = time.perf_counter()
+    try:
+        async with client.stream("POST", f"{url}/streaming-chat",
+                                 json={"prompt": prompt, "mode": mode, "session_id": session_id}) as response:
+            result.status = response.status_code
+            if response.status_code != 200:
+                await response.aread()
+                result.error = f"http_{response.status_code}"
+                return result
+            finished = False
+            async for event, data in _read_events(response):
+                now = time.perf_counter()
+                if event == "token":
+                    if result.ttft_ms is None:
+                        result.ttft_ms = (now - started) * 1000
+                    else:
+                        result.gaps_ms.append((now - last_token) * 1000)
+                    last_token = now
+                    result.events += 1
+                    result.chars += len(data.get("text", ""))
+                    # The LLM and agent services report upstream failures in-band as text
+                    if "[Error" in data.get("text", ""):
+                        result.error = "upstream_error"
+                elif event == "queued":
+                    result.queued = True
+                elif event == "error":
+                    result.error = "stream_error"
+                    finished = True
+                elif event == "done":
+                    finished = True
+            if not finished and result.error is None:
+                result.error = "truncated"
+    except httpx.HTTPError as e:
+        result.error = type(e).__name__
+    finally:
+        result.duration_ms = (time.perf_counter() - started) * 1000
+    return result
+
+
+async def run_session(client: httpx.AsyncClient, url: str, number: int, args, deadline: Optional[float],
+                      results: List[RequestResult]) -> None:
+    """One simulated user: sequential requests with think time, until the request count or deadline is reached."""
+    rng = random.Random(args.seed + number)
+    session_id = f"load-{uuid.uuid4()}"
+    sent = 0
+    while (deadline is None and sent < args.requests) or (deadline is not None and time.perf_counter() < deadline):
+        mode = rng.choice(["direct", "agent"]) if args.mode == "mixed" else args.mode
+        prompt = rng.choice(PROMPTS)
+        # Identical in-flight prompts are coalesced server-side, so sessions ask distinct questions by default
+        if not args.shared_prompts:
+            prompt = f"{prompt} (session {number}, request {sent})"
+        results.append(await chat_request(client, url, prompt, mode, session_id))
+        sent += 1
+        if args.think_ms:
+            await asyncio.sleep(rng.uniform(0.5, 1.5) * args.think_ms / 1000)
+
+
+async def run_load(url: str, args) -> Dict[str, Any]:
+    """Run all sessions against `url` and summarize the results."""
+    results: List[RequestResult] = []
+    limits = httpx.Limits(max_connections=args.sessions + 10, max_keepalive_connections=args.sessions + 10)
+    timeout = httpx.Timeout(args.timeout, connect=10)
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        started = time.perf_counter()
+        deadline = started + args.duration if args.duration else None
+        # Stagger session starts over the ramp-up so the first requests do not arrive as one burst
+        async def staggered(number: int):
+            await asyncio.sleep(args.ramp_up * number / max(args.sessions, 1))
+            await run_session(client, url, number, args, deadline, results)
+        await asyncio.gather(*(staggered(number) for number in range(args.sessions)))
+        elapsed = time.perf_counter() - started
+
+    completed = [r for r in results if r.error is None]
+    errors = Counter(r.error for r in results if r.error is not None)
+    summary: Dict[str, Any] = {
+        "requests": {"total": len(results), "ok": len(completed), "errors": dict(errors),
+                     "error_rate": round(len(results) and (len(results) - len(completed)) / len(results), 4),
+                     "rejected_429": errors.get("http_429", 0), "queued": sum(r.queued for r in results)},
+        "throughput": {"seconds": round(elapsed, 3), "requests_per_s": round(len(completed) / elapsed, 3),
+                       "chars_per_s": round(sum(r.chars for r in results) / elapsed, 1),
+                       "token_events_per_s": round(sum(r.events for r in results) / elapsed, 1)},
+    }
+    for mode in sorted({r.mode for r in results}):
+        ok = [r for r in completed if r.mode == mode]
+        summary[mode] = {
+            "time_to_first_token": percentiles(r.ttft_ms for r in ok if r.ttft_ms is not None),
+            "inter_token": percentiles(gap for r in ok for gap in r.gaps_ms),
+            "duration": percentiles(r.duration_ms for r in ok),
+        }
+    return summary
+
+
+def _wait_for(url: str, process: subprocess.Popen, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"{' '.join(process.args)} exited with code {process.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise SystemExit(f"Timed out waiting for {url}")
+
+
+def start_servers(args) -> List[subprocess.Popen]:
+    """Launch the mock Ollama server and the ASGI app pointed at it; their output goes to stderr."""
+    mock = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.mock_ollama", "--port", str(args.mock_port),
+        "--ttft-ms", str(args.ttft_ms), "--tokens-per-s", str(args.tokens_per_s), "--tokens", str(args.tokens),
+        "--error-rate", str(args.error_rate), "--drop-rate", str(args.drop_rate), "--seed", str(args.seed),
+    ], cwd=ROOT, stdout=sys.stderr)
+    processes = [mock]
+    try:
+        _wait_for(f"http://127.0.0.1:{args.mock_port}/api/version", mock, 30)
+        env = {**os.environ, "OLLAMA_BASE_URL": f"http://127.0.0.1:{args.mock_port}"}
+        server = subprocess.Popen([
+            sys.executable, "-m", "uvicorn", "asgi:app", "--host", "127.0.0.1", "--port", str(args.port),
+            "--workers", str(args.workers), "--log-level", "warning",
+        ], cwd=ROOT, env=env, stdout=sys.stderr)
+        processes.append(server)
+        _wait_for(f"http://127.0.0.1:{args.port}/", server, 120)
+    except BaseException:
+        stop_servers(processes)
+        raise
+    return processes
+
+
+def stop_servers(processes: List[subprocess.Popen]) -> None:
+    for process in reversed(processes):
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8050", help="Server to test (ignored with --start)")
+    parser.add_argument("--start", action="store_true", help="Launch the mock Ollama server and the ASGI app")
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent chat sessions")
+    parser.add_argument("--requests", type=int, default=5, help="Requests per session (without --duration)")
+    parser.add_argument("--duration", type=float, default=0, help="Run for this many seconds instead")
+    parser.add_argument("--mode", choices=["direct", "agent", "mixed"], default="direct")
+    parser.add_argument("--think-ms", type=float, default=500, help="Mean pause between a session's requests")
+    parser.add_argument("--ramp-up", type=float, default=2, help="Seconds over which sessions start")
+    parser.add_argument("--shared-prompts", action="store_true", help="Let sessions send identical prompts")
+    parser.add_argument("--timeout", type=float, default=300, help="Per-request read timeout in seconds")
+    parser.add_argument("--port", type=int, default=8050, help="ASGI app port with --start")
+    parser.add_argument("--workers", type=int, default=1, help="ASGI workers with --start")
+    parser.add_argument("--mock-port", type=int, default=11500, help="Mock Ollama port with --start")
+    parser.add_argument("--ttft-ms", type=float, default=200, help="Mock time to first token")
+    parser.add_argument("--tokens-per-s", type=float, default=50, help="Mock token rate per stream")
+    parser.add_argument("--tokens", type=int, default=150, help="Mock tokens per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Mock fraction of HTTP 500 responses")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Mock fraction of streams cut off mid-response")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the JSON results here")
+    parser.add_argument("--compare", help="Previous results to compare against")
+    args = parser.parse_args()
+
+    processes = start_servers(args) if args.start else []
+    try:
+        url = f"http://127.0.0.1:{args.port}" if args.start else args.url.rstrip("/")
+        results = asyncio.run(run_load(url, args))
+    finally:
+        stop_servers(processes)
+
+    settings = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    if args.start:
+        settings.pop("url")
+    else:
+        # The mock settings only describe the run when this script launched the mock
+        for key in ("port", "workers", "mock_port", "ttft_ms", "tokens_per_s", "tokens", "error_rate", "drop_rate"):
+            settings.pop(key)
+    emit({"benchmark": "load", "meta": run_metadata(settings), "results": results}, args.output, args.compare)
+
+
+if __name__ == "__main__":
+    main()
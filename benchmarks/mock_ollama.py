@@ -0,0 +1,162 @@
+"""
+Mock Ollama server for load tests.
+Speaks the parts of the Ollama API that FinGen uses (streaming /api/chat
+and /api/generate, /api/embeddings and /api/embed, /api/tags) with a
+configurable time to first token, token rate and error injection, so
+capacity can be measured repeatably without a GPU:
+
+    python -m benchmarks.mock_ollama --port 11500 --ttft-ms 300 --tokens-per-s 40 --error-rate 0.02
+    OLLAMA_BASE_URL=http://127.0.0.1:11500 uvicorn asgi:app --port 8050
+
+Embeddings come from the benchmark stub embedder, so they are deterministic.
+Structured-output requests (a JSON `format`) receive an empty JSON object.
+"""
+
+import json
+import time
+import random
+import asyncio
+import argparse
+import datetime
+from typing import Any, AsyncIterator, Dict
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from .rag_bench import StubEmbeddings
+
+WORDS = ("revenue margin quarter growth liquidity exposure forecast variance cash flow guidance segment "
+         "operating costs demand pricing outlook risk capital expenditure inventory debt ratio").split()
+
+
+class MockSettings:
+    """Behaviour of the mock, shared by all requests."""
+
+    def __init__(self, ttft_ms: float = 200, tokens_per_s: float = 50, tokens: int = 150, jitter: float = 0.2,
+                 error_rate: float = 0.0, drop_rate: float = 0.0, embed_ms: float = 5, dim: int = 768, seed: int = 0):
+        self.ttft_ms = ttft_ms
+        self.tokens_per_s = tokens_per_s
+        self.tokens = tokens
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.embed_ms = embed_ms
+        self.embeddings = StubEmbeddings(dim)
+        self.random = random.Random(seed)
+        self.active = 0
+        self.served = 0
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+def create_app(settings: MockSettings) -> Starlette:
+    """Build the mock server app for the given settings."""
+
+    def jittered(value: float) -> float:
+        return max(value * (1 + settings.random.uniform(-settings.jitter, settings.jitter)), 0)
+
+    async def generate(model: str, chat: bool, structured: bool) -> AsyncIterator[bytes]:
+        settings.active += 1
+        try:
+            started = time.perf_counter()
+            await asyncio.sleep(jittered(settings.ttft_ms) / 1000)
+            count = max(int(jittered(settings.tokens)), 1)
+            drop_at = settings.random.randrange(count) if settings.random.random() < settings.drop_rate else None
+            pieces = ["{}"] if structured else [settings.random.choice(WORDS) + " " for _ in range(count)]
+            for index, piece in enumerate(pieces):
+                if index == drop_at:
+                    raise ConnectionResetError("Injected mid-stream failure")
+                if index:
+                    await asyncio.sleep(jittered(1 / settings.tokens_per_s))
+                body = {"message": {"role": "assistant", "content": piece}} if chat else {"response": piece}
+                yield json.dumps({"model": model, "created_at": _now(), **body, "done": False}).encode() + b"\n"
+            final = {"message": {"role": "assistant", "content": ""}} if chat else {"response": ""}
+            elapsed_ns = int((time.perf_counter() - started) * 1e9)
+            yield json.dumps({"model": model, "created_at": _now(), **final, "done": True, "done_reason": "stop",
+                              "total_duration": elapsed_ns, "eval_count": len(pieces), "eval_duration": elapsed_ns,
+                              "prompt_eval_count": 0}).encode() + b"\n"
+            settings.served += 1
+        finally:
+            settings.active -= 1
+
+    async def completion(request: Request, chat: bool):
+        payload: Dict[str, Any] = await request.json()
+        if settings.random.random() < settings.error_rate:
+            return JSONResponse({"error": "Injected server error"}, status_code=500)
+        model = payload.get("model", "mock")
+        stream = generate(model, chat, structured=bool(payload.get("format")))
+        if payload.get("stream", True):
+            return StreamingResponse(stream, media_type="application/x-ndjson")
+        # Non-streaming requests get the concatenated stream as one response
+        parts = [json.loads(line) async for line in stream]
+        key = "message" if chat else "response"
+        content = "".join(p["message"]["content"] if chat else p["response"] for p in parts)
+        final = parts[-1]
+        final[key] = {"role": "assistant", "content": content} if chat else content
+        return JSONResponse(final)
+
+    async def chat(request: Request):
+        return await completion(request, chat=True)
+
+    async def generate_route(request: Request):
+        return await completion(request, chat=False)
+
+    async def embeddings(request: Request):
+        payload = await request.json()
+        await asyncio.sleep(settings.embed_ms / 1000)
+        return JSONResponse({"embedding": settings.embeddings.embed_query(payload.get("prompt", ""))})
+
+    async def embed(request: Request):
+        payload = await request.json()
+        texts = payload.get("input", "")
+        texts = [texts] if isinstance(texts, str) else texts
+        await asyncio.sleep(settings.embed_ms / 1000)
+        return JSONResponse({"model": payload.get("model", "mock"), "embeddings": settings.embeddings.embed_documents(texts)})
+
+    async def tags(request: Request):
+        return JSONResponse({"models": [{"name": "mock:latest", "model": "mock:latest", "modified_at": _now(), "size": 0}]})
+
+    async def version(request: Request):
+        return JSONResponse({"version": "0.0.0-mock"})
+
+    async def stats(request: Request):
+        return JSONResponse({"active": settings.active, "served": settings.served})
+
+    return Starlette(routes=[
+        Route("/api/chat", chat, methods=["POST"]),
+        Route("/api/generate", generate_route, methods=["POST"]),
+        Route("/api/embeddings", embeddings, methods=["POST"]),
+        Route("/api/embed", embed, methods=["POST"]),
+        Route("/api/tags", tags, methods=["GET"]),
+        Route("/api/version", version, methods=["GET"]),
+        Route("/mock/stats", stats, methods=["GET"]),
+    ])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--ttft-ms", type=float, default=200, help="Time to first token")
+    parser.add_argument("--tokens-per-s", type=float, default=50, help="Token rate per stream after the first token")
+    parser.add_argument("--tokens", type=int, default=150, help="Tokens per response")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Relative random variation of the timings and length")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Fraction of streams cut off mid-response")
+    parser.add_argument("--embed-ms", type=float, default=5, help="Latency of an embedding request")
+    parser.add_argument("--dim", type=int, default=768, help="Embedding dimension")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import uvicorn
+    settings = MockSettings(args.ttft_ms, args.tokens_per_s, args.tokens, args.jitter, args.error_rate,
+                            args.drop_rate, args.embed_ms, args.dim, args.seed)
+    uvicorn.run(create_app(settings), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
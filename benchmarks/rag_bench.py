@@ -0,0 +1,249 @@
+"""
+Retrieval benchmark for rag_service.
+Builds a synthetic corpus of filings (or copies a sample docs directory),
+embeds it with a deterministic local stub embedder (no Ollama needed), and
+measures ingest throughput, query latency percentiles and memory. Recall
+against brute-force search is measured for `get_vector_store` (all chunks)
+and `retrieve_context` (the session's memories); `stream_rag_response` is
+still a placeholder that does not return its documents, so only its
+latency is recorded. Everything runs in a temporary directory.
+
+    python -m benchmarks.rag_bench --backend quantized --docs 500 --output quantized.json
+    python -m benchmarks.rag_bench --backend chroma --docs 500 --compare quantized.json
+"""
+
+import os
+import re
+import time
+import random
+import shutil
+import hashlib
+import logging
+import argparse
+import tempfile
+from typing import Dict, List, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from .common import directory_mb, emit, percentiles, rss_mb, run_metadata
+
+COMPANIES = ["Acme Industries", "Globex Corporation", "Initech Systems", "Umbrella Holdings", "Stark Manufacturing",
+             "Wayne Logistics", "Cyberdyne Robotics", "Tyrell Biotech", "Soylent Foods", "Hooli Networks"]
+
+TOPICS = {
+    "liquidity": ["liquidity", "cash", "revolving", "credit facility", "working capital", "covenants"],
+    "interest rate risk": ["interest", "rates", "floating", "hedges", "swaps", "basis points"],
+    "revenue recognition": ["revenue", "performance obligations", "contracts", "deferred", "ASC 606", "backlog"],
+    "inventory": ["inventory", "obsolescence", "write-downs", "warehouses", "LIFO", "reserves"],
+    "goodwill impairment": ["goodwill", "impairment", "reporting unit", "fair value", "intangibles", "acquisition"],
+    "cybersecurity": ["cybersecurity", "breach", "ransomware", "data", "systems", "incident response"],
+    "supply chain": ["suppliers", "supply chain", "shortages", "logistics", "tariffs", "lead times"],
+    "litigation": ["litigation", "lawsuits", "settlement", "claims", "regulators", "contingencies"],
+    "income taxes": ["tax", "effective rate", "deferred tax assets", "valuation allowance", "jurisdictions", "audits"],
+    "pension obligations": ["pension", "benefit obligations", "discount rate", "plan assets", "funding", "actuarial"],
+}
+
+DISCLAIMER = ("This report contains forward-looking statements within the meaning of the Private Securities "
+              "Litigation Reform Act of 1995. Actual results may differ materially from those projected. "
+              "Readers should not place undue reliance on these statements, which speak only as of their date.")
+
+
+class StubEmbeddings(Embeddings):
+    """
+    Deterministic embedder for benchmarks: signed feature hashing of words
+    and word pairs, log-scaled and normalized. Texts sharing vocabulary get
+    similar vectors, so retrieval behaves plausibly without a model.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        words = re.findall(r"\w+", text.lower())
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[digest % self.dim] += 1.0 if digest >> 63 else -1.0
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def synthetic_corpus(directory: str, documents: int, seed: int) -> Tuple[int, List[str]]:
+    """Write `documents` synthetic filings; returns (bytes written, benchmark queries)."""
+    rng = random.Random(seed)
+    written = 0
+    for number in range(documents):
+        company = rng.choice(COMPANIES)
+        year = rng.randint(2015, 2024)
+        sections = [f"ANNUAL REPORT {year}\n\n{DISCLAIMER}"]
+        for topic in rng.sample(sorted(TOPICS), 5):
+            words = TOPICS[topic]
+            sentences = [f"{company} {rng.choice(['reported', 'disclosed', 'monitors', 'expects', 'reviewed'])} "
+                         f"{rng.choice(words)} and {rng.choice(words)} of ${rng.randint(1, 900)} million in {year}."
+                         for _ in range(rng.randint(4, 12))]
+            sections.append(f"{topic.upper()}\n\n" + " ".join(sentences))
+        text = "\n\n".join(sections) + "\n"
+        with open(os.path.join(directory, f"filing-{number:05d}.txt"), "w", encoding="utf-8") as f:
+            f.write(text)
+        written += len(text.encode("utf-8"))
+    queries = [f"What did {rng.choice(COMPANIES)} disclose about {topic} and {rng.choice(TOPICS[topic])}?"
+               for topic in (rng.choice(sorted(TOPICS)) for _ in range(1000))]
+    return written, queries
+
+
+def sample_corpus(source: str, directory: str, seed: int) -> Tuple[int, List[str]]:
+    """Copy a docs directory; queries are sentences drawn from its text files."""
+    shutil.copytree(source, directory, dirs_exist_ok=True)
+    rng = random.Random(seed)
+    written, sentences = 0, []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            written += os.path.getsize(path)
+            if name.endswith((".txt", ".md")):
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    sentences.extend(s.strip() for s in re.split(r"(?<=[.!?])\s+", f.read()) if len(s.split()) >= 6)
+    return written, [rng.choice(sentences) for _ in range(1000)] if sentences else []
+
+
+def _timed(func, *args) -> Tuple[float, object]:
+    started = time.perf_counter()
+    result = func(*args)
+    return (time.perf_counter() - started) * 1000, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["chroma", "quantized"], default=os.environ.get("FINGEN_VECTOR_BACKEND", "chroma"))
+    parser.add_argument("--corpus", choices=["synthetic", "sample"], default="synthetic")
+    parser.add_argument("--docs-dir", default=os.environ.get("FINGEN_DOCS_DIR", "./docs"), help="Source for --corpus sample")
+    parser.add_argument("--docs", type=int, default=200, help="Synthetic filings to generate")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--memories", type=int, default=200, help="Session memories added for retrieve_context")
+    parser.add_argument("--dim", type=int, default=256, help="Stub embedding dimension")
+    parser.add_argument("--chunker", choices=["structured", "recursive"], default=os.environ.get("FINGEN_CHUNKER", "structured"))
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Recursive chunker characters")
+    parser.add_argument("--chunk-overlap", type=int, default=200, help="Recursive chunker overlap")
+    parser.add_argument("--max-tokens", type=int, default=512, help="Structured chunker token budget")
+    parser.add_argument("--space", choices=["cosine", "l2", "ip"], default="cosine", help="Chroma HNSW space")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Also write the JSON results here")
+    parser.add_argument("--compare", help="Previous results to compare against")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="fingen-rag-bench-")
+    docs_dir = os.path.join(workdir, "docs")
+    os.makedirs(docs_dir)
+    # rag_service and its dependencies read their configuration at import time
+    os.environ.update({
+        "FINGEN_DATA_DIR": os.path.join(workdir, "data"),
+        "FINGEN_JOB_CACHE_DIR": os.path.join(workdir, "cache"),
+        "FINGEN_DOCS_DIR": docs_dir,
+        "FINGEN_VECTOR_STORE_DIR": os.path.join(workdir, "store"),
+        "FINGEN_VECTOR_BACKEND": args.backend,
+        "FINGEN_CHUNKER": args.chunker,
+        "FINGEN_CHUNK_SIZE": str(args.chunk_size),
+        "FINGEN_CHUNK_OVERLAP": str(args.chunk_overlap),
+        "FINGEN_CHUNK_MAX_TOKENS": str(args.max_tokens),
+        "FINGEN_VECTOR_DB_SPACE": args.space,
+    })
+    logging.basicConfig(level=logging.WARNING)
+
+    from langchain_core.documents import Document
+    from langchain_core.messages import HumanMessage
+    from utils import rag_service
+    from utils.agent_service import MAX_LONG_TERM_MEMORIES_IN_STATE, EnhancedMessageState, retrieve_context
+
+    embeddings = StubEmbeddings(args.dim)
+    rag_service._embedding_function = embeddings
+
+    try:
+        if args.corpus == "synthetic":
+            corpus_bytes, queries = synthetic_corpus(docs_dir, args.docs, args.seed)
+        else:
+            corpus_bytes, queries = sample_corpus(args.docs_dir, docs_dir, args.seed)
+        if not queries:
+            raise SystemExit(f"No usable text in {args.docs_dir}")
+        queries = queries[:args.queries]
+        files = sum(len(names) for _, _, names in os.walk(docs_dir))
+        results: Dict[str, Dict] = {}
+
+        # Ingest: parse, chunk, embed, index; then a rerun with nothing changed
+        ingest_ms, ok = _timed(rag_service.initialize_documents)
+        if not ok:
+            raise SystemExit("initialize_documents failed; see the log above")
+        reingest_ms, _ = _timed(rag_service.initialize_documents)
+        rag_service._vector_store = None
+        rss_before_open = rss_mb()
+        open_ms, store = _timed(rag_service.get_vector_store)
+        contents = store.get()
+        chunks = len(contents["ids"])
+        results["ingest"] = {
+            "files": files, "corpus_mb": round(corpus_bytes / 2 ** 20, 3), "chunks": chunks,
+            "seconds": round(ingest_ms / 1000, 3), "files_per_s": round(files / (ingest_ms / 1000), 1),
+            "chunks_per_s": round(chunks / (ingest_ms / 1000), 1), "unchanged_rerun_seconds": round(reingest_ms / 1000, 3),
+        }
+
+        # Vector search: latency and recall@k against exact search over every stored chunk
+        matrix = np.asarray(embeddings.embed_documents(contents["documents"]), dtype=np.float32)
+        latencies, recalls = [], []
+        for query in queries:
+            elapsed, found = _timed(store.similarity_search, query, args.k)
+            latencies.append(elapsed)
+            exact = np.argsort(-(matrix @ np.asarray(embeddings.embed_query(query), dtype=np.float32)))[:args.k]
+            expected = {contents["documents"][i] for i in exact}
+            recalls.append(len(expected & {doc.page_content for doc in found}) / max(len(expected), 1))
+        results["get_vector_store"] = {
+            "open_ms": round(open_ms, 3), **percentiles(latencies),
+            f"recall_at_{args.k}": round(float(np.mean(recalls)), 4),
+        }
+
+        # retrieve_context: session-filtered search as the agent runs it, recall against exact
+        # search over the session's memories only
+        rng = random.Random(args.seed)
+        memories = [Document(page_content=rng.choice(contents["documents"]),
+                             metadata={"session_id": "bench-session", "timestamp": time.time()})
+                    for _ in range(args.memories)]
+        if memories:
+            store.add_documents(memories)
+        memory_texts = [memory.page_content for memory in memories]
+        memory_matrix = np.asarray(embeddings.embed_documents(memory_texts), dtype=np.float32).reshape(len(memories), -1)
+        latencies, recalls = [], []
+        for query in queries:
+            state = EnhancedMessageState(short_term=[HumanMessage(content=query)], session_id="bench-session")
+            elapsed, update = _timed(retrieve_context, state)
+            latencies.append(elapsed)
+            if memories:
+                scores = memory_matrix @ np.asarray(embeddings.embed_query(query), dtype=np.float32)
+                expected = {memory_texts[i] for i in np.argsort(-scores)[:MAX_LONG_TERM_MEMORIES_IN_STATE]}
+                recalls.append(len(expected & set(update["long_term"])) / len(expected))
+        results["retrieve_context"] = percentiles(latencies)
+        if recalls:
+            results["retrieve_context"][f"recall_at_{MAX_LONG_TERM_MEMORIES_IN_STATE}"] = round(float(np.mean(recalls)), 4)
+
+        # Latency only: the placeholder reports how many documents it retrieved, not which
+        latencies = [_timed(lambda q: list(rag_service.stream_rag_response(q)), query)[0] for query in queries]
+        results["stream_rag_response"] = percentiles(latencies)
+
+        results["memory"] = {"rss_before_open_mb": rss_before_open, "rss_after_queries_mb": rss_mb(),
+                             "store_disk_mb": directory_mb(os.path.join(workdir, "store"))}
+        if hasattr(store, "stats"):
+            results["memory"]["index"] = store.stats()
+
+        settings = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+        emit({"benchmark": "rag", "meta": run_metadata(settings), "results": results}, args.output, args.compare)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,189 +1,209 @@
 from dash import html, dcc, Input, Output, State, callback
+from dash.exceptions import PreventUpdate
 import dash_mantine_components as dmc
 from dash_iconify import DashIconify
 import plotly.graph_objects as go
 import plotly.express as px
-import pandas as pd
-import numpy as np
 import dash
 
+from utils.analysis_service import get_analysis_engine, compute_margin
+from utils.data_service import load_dataset, append_sample_rows, SAMPLE_DATA
+from utils.figure_service import compact_figure, date_values
+
+# Days of generated data a refresh appends when running on sample data
+SAMPLE_FEED_DAYS = 7
+
 # Register this module as a page with Dash Pages
 dash.register_page(__name__, path='/analysis')
 
-# Sample data for demonstration
-def create_sample_data():
-    dates = pd.date_range(start='2023-01-01', end='2023-12-31', freq='D')
-    np.random.seed(42)
-    data = {
-        'revenue': np.random.normal(1000, 100, len(dates)),
-        'expenses': np.random.normal(800, 80, len(dates)),
-        'profit': np.random.normal(200, 20, len(dates)),
-        'market_index': np.random.normal(100, 10, len(dates))
-    }
-    return pd.DataFrame(data, index=dates)
+# Create insights from the incrementally maintained analysis aggregates
+def create_sample_insights(engine=None):
+    engine = engine or get_analysis_engine()
+    return engine.insights()
 
-# Create sample insights
-def create_sample_insights():
+def create_insight_cards(insights):
     return [
-        {
-            "title": "Revenue Growth",
-            "description": "Revenue has shown consistent growth of 12% YoY",
-            "impact": "positive",
-            "confidence": "high"
-        },
-        {
-            "title": "Expense Management",
-            "description": "Operating expenses are 5% below budget",
-            "impact": "positive",
-            "confidence": "medium"
-        },
-        {
-            "title": "Market Position",
-            "description": "Market share has increased by 2% in Q4",
-            "impact": "positive",
-            "confidence": "high"
-        },
-        {
-            "title": "Risk Factors",
-            "description": "Supply chain costs are trending upward",
-            "impact": "negative",
-            "confidence": "medium"
-        }
+        dmc.GridCol([
+            dmc.Card([
+                html.H6(insight["title"], className="card-title"),
+                html.P(insight["description"], className="card-text"),
+                html.Div([
+                    html.Span(
+                        "Impact: ",
+                        className="text-muted"
+                    ),
+                    html.Span(
+                        insight["impact"].title(),
+                        className=f"text-{'success' if insight['impact'] == 'positive' else 'danger'}"
+                    ),
+                    html.Span(
+                        " | Confidence: ",
+                        className="text-muted"
+                    ),
+                    html.Span(
+                        insight["confidence"].title(),
+                        className="text-info"
+                    )
+                ], className="mt-2")
+            ], className="mb-3", p="md")
+        ], span=6) for insight in insights
     ]
 
-# Prepare data and charts for the layout
-insights = create_sample_insights()
-df = create_sample_data()
+def format_period(engine):
+    if engine.first_date is None:
+        return "No data"
+    return f"{engine.first_date:%b %Y} - {engine.last_date:%b %Y}"
 
-# Create sample charts
-revenue_chart = px.line(df, y='revenue', title='Revenue Trend')
-revenue_chart.update_layout(height=300, template='plotly_white')
+# Charts are built from the ledger when the page is loaded; refreshes extend them in place,
+# so their dates stay explicit (epoch milliseconds) rather than x0/dx spacing
+def create_revenue_chart(df):
+    fig = px.line(df, y='revenue', title='Revenue Trend')
+    fig.update_layout(height=300, template='plotly_white')
+    return compact_figure(fig, spacing=False)
 
-profit_margin_chart = go.Figure()
-profit_margin_chart.add_trace(go.Scatter(
-    x=df.index,
-    y=df['profit'] / df['revenue'] * 100,
-    name='Profit Margin %',
-    line=dict(color='#2ecc71')
-))
-profit_margin_chart.update_layout(
-    title='Profit Margin Trend',
-    yaxis_title='Margin %',
-    height=300,
-    template='plotly_white'
-)
+def create_profit_margin_chart(df):
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=df.index,
+        y=compute_margin(df),
+        name='Profit Margin %',
+        line=dict(color='#2ecc71')
+    ))
+    fig.update_layout(
+        title='Profit Margin Trend',
+        yaxis_title='Margin %',
+        height=300,
+        template='plotly_white'
+    )
+    return compact_figure(fig, spacing=False)
 
-# Define the page layout directly
-layout = dmc.Container([
-    # Header
-    dmc.Grid([
-        dmc.GridCol([
-            html.H1("Analysis Results", className="mb-4"),
-            html.P("Key insights and visualizations from your financial data", className="text-muted")
-        ], span=12)
-    ]),
+# Define the page layout, built per page load from the current dataset
+def layout(**kwargs):
+    engine = get_analysis_engine()
+    df = load_dataset(until_version=engine.version)
+    return dmc.Container([
+        # Dataset version the charts on this page were built from
+        dcc.Store(id="analysis-version", data=engine.version),
+
+        # Header
+        dmc.Grid([
+            dmc.GridCol([
+                html.H1("Analysis Results", className="mb-4"),
+                html.P("Key insights and visualizations from your financial data", className="text-muted")
+            ], span=12)
+        ]),
     
-    # Key Insights
-    dmc.Grid([
-        dmc.GridCol([
-            html.H5("Key Insights", className="mb-3"),
-            dmc.Grid([
-                dmc.GridCol([
-                    dmc.Card([
-                        html.H6(insight["title"], className="card-title"),
-                        html.P(insight["description"], className="card-text"),
-                        html.Div([
-                            html.Span(
-                                "Impact: ",
-                                className="text-muted"
-                            ),
-                            html.Span(
-                                insight["impact"].title(),
-                                className=f"text-{'success' if insight['impact'] == 'positive' else 'danger'}"
-                            ),
-                            html.Span(
-                                " | Confidence: ",
-                                className="text-muted"
-                            ),
-                            html.Span(
-                                insight["confidence"].title(),
-                                className="text-info"
-                            )
-                        ], className="mt-2")
-                    ], className="mb-3", p="md")
-                ], span=6) for insight in insights
-            ])
-        ], span=12)
-    ], className="mb-4"),
+        # Key Insights
+        dmc.Grid([
+            dmc.GridCol([
+                html.H5("Key Insights", className="mb-3"),
+                dmc.Grid(create_insight_cards(create_sample_insights(engine)), id="insights-grid")
+            ], span=12)
+        ], className="mb-4"),
     
-    # Charts
-    dmc.Grid([
-        dmc.GridCol([
-            dmc.Card([
-                html.H5("Revenue Analysis", className="card-title"),
-                dcc.Graph(figure=revenue_chart, id="revenue-chart")
-            ], p="md")
-        ], span=8),
-        dmc.GridCol([
-            dmc.Card([
-                html.H5("Profit Margins", className="card-title"),
-                dcc.Graph(figure=profit_margin_chart)
-            ], p="md")
-        ], span=4)
-    ], className="mb-4"),
+        # Charts
+        dmc.Grid([
+            dmc.GridCol([
+                dmc.Card([
+                    html.H5("Revenue Analysis", className="card-title"),
+                    dcc.Graph(figure=create_revenue_chart(df), id="revenue-chart")
+                ], p="md")
+            ], span=8),
+            dmc.GridCol([
+                dmc.Card([
+                    html.H5("Profit Margins", className="card-title"),
+                    dcc.Graph(figure=create_profit_margin_chart(df), id="profit-margin-chart")
+                ], p="md")
+            ], span=4)
+        ], className="mb-4"),
     
-    # Data Sources and Parameters
-    dmc.Grid([
-        dmc.GridCol([
-            dmc.Card([
-                html.H5("Analysis Parameters", className="card-title"),
-                html.Div([
-                    html.Div([
-                        html.Strong("Time Period: "),
-                        "Jan 2023 - Dec 2023"
-                    ], className="mb-2"),
+        # Data Sources and Parameters
+        dmc.Grid([
+            dmc.GridCol([
+                dmc.Card([
+                    html.H5("Analysis Parameters", className="card-title"),
                     html.Div([
-                        html.Strong("Data Sources: "),
-                        "Internal Financial Records, Market Data API"
-                    ], className="mb-2"),
-                    html.Div([
-                        html.Strong("Analysis Type: "),
-                        "Trend Analysis, Comparative Analysis"
+                        html.Div([
+                            html.Strong("Time Period: "),
+                            html.Span(format_period(engine), id="analysis-period")
+                        ], className="mb-2"),
+                        html.Div([
+                            html.Strong("Data Sources: "),
+                            "Internal Financial Records, Market Data API"
+                        ], className="mb-2"),
+                        html.Div([
+                            html.Strong("Analysis Type: "),
+                            "Trend Analysis, Comparative Analysis"
+                        ])
                     ])
-                ])
-            ], p="md")
-        ], span=6),
-        dmc.GridCol([
-            dmc.Card([
-                html.H5("Actions", className="card-title"),
-                dmc.ButtonGroup([
-                    dmc.Button([
-                        DashIconify(icon="radix-icons:download"),
-                        " Export Data"
-                    ], color="primary", className="me-2", id="export-button"),
-                    dmc.Button([
-                        DashIconify(icon="radix-icons:share-1"),
-                        " Share Analysis"
-                    ], color="secondary", className="me-2", id="share-button"),
-                    dmc.Button([
-                        DashIconify(icon="radix-icons:refresh"),
-                        " Refresh"
-                    ], color="info", id="refresh-button")
-                ])
-            ], p="md")
-        ], span=6)
-    ])
-], fluid=True, className="py-4")
+                ], p="md")
+            ], span=6),
+            dmc.GridCol([
+                dmc.Card([
+                    html.H5("Actions", className="card-title"),
+                    dmc.ButtonGroup([
+                        dmc.Button([
+                            DashIconify(icon="radix-icons:download"),
+                            " Export Data"
+                        ], color="primary", className="me-2", id="export-button"),
+                        dmc.Button([
+                            DashIconify(icon="radix-icons:share-1"),
+                            " Share Analysis"
+                        ], color="secondary", className="me-2", id="share-button"),
+                        dmc.Button([
+                            DashIconify(icon="radix-icons:refresh"),
+                            " Refresh"
+                        ], color="info", id="refresh-button")
+                    ]),
+                    dmc.Progress(id="refresh-progress", value=0, size="sm", mt="md")
+                ], p="md")
+            ], span=6)
+        ])
+    ], fluid=True, className="py-4")
 
 # Callback functions defined directly in the page file
+# Runs as a background callback: the job queue executes it outside the web worker,
+# reports progress to the bar and is cancelled when the user navigates away.
 @callback(
-    Output("revenue-chart", "figure"),
-    Input("refresh-button", "n_clicks")
+    [Output("revenue-chart", "extendData"),
+     Output("profit-margin-chart", "extendData"),
+     Output("insights-grid", "children"),
+     Output("analysis-period", "children"),
+     Output("analysis-version", "data")],
+    Input("refresh-button", "n_clicks"),
+    State("analysis-version", "data"),
+    background=True,
+    running=[
+        (Output("refresh-button", "loading"), True, False),
+        (Output("refresh-progress", "animated"), True, False),
+    ],
+    progress=[Output("refresh-progress", "value")],
+    cancel=[Input("url", "pathname")],
+    prevent_initial_call=True,
 )
-def refresh_charts(n_clicks):
-    if n_clicks:
-        df = create_sample_data()
-        fig = px.line(df, y='revenue', title='Revenue Trend')
-        fig.update_layout(height=300, template='plotly_white')
-        return fig
-    return revenue_chart 
\ No newline at end of file
+def refresh_charts(set_progress, n_clicks, client_version):
+    if not n_clicks:
+        raise PreventUpdate
+    set_progress(10)
+    if SAMPLE_DATA:
+        # Appends only if the ledger is still at the version this page rendered;
+        # otherwise the rows another refresh appended are sent instead
+        append_sample_rows(days=SAMPLE_FEED_DAYS, expected_version=client_version or 0)
+    set_progress(30)
+    # Only the partitions appended since this page's charts were built are read
+    engine = get_analysis_engine()
+    new_rows = load_dataset(since_version=client_version or 0, until_version=engine.version)
+    set_progress(70)
+    if new_rows.empty:
+        raise PreventUpdate
+    x = [date_values(new_rows.index).tolist()]
+    revenue_update = [dict(x=x, y=[new_rows['revenue'].tolist()]), [0]]
+    margin_update = [dict(x=x, y=[compute_margin(new_rows).tolist()]), [0]]
+    set_progress(100)
+    return (
+        revenue_update,
+        margin_update,
+        create_insight_cards(create_sample_insights(engine)),
+        format_period(engine),
+        engine.version,
+    )
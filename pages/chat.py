@@ -14,11 +14,16 @@ import dash_mantine_components as dmc
 from dash_iconify import DashIconify
 from flask import request, Response, jsonify # Added jsonify for potential async errors
 import json
-import asyncio # Needed for running async agent handler
+import logging
 
 # Import the LLM and Agent service functions
 from utils.llm_service import stream_llm_response
 from utils.agent_service import handle_agent_message, get_agent_executor # Import agent handler
+from utils.stream_service import SSE_HEADERS, sse_stream
+from utils.admission_service import AdmissionRejected, admitted_stream, get_admission_controller
+from utils.llm_service import OLLAMA_BASE_URL
+
+logger = logging.getLogger(__name__)
 
 # Register this page with Dash
 register_page(
@@ -125,38 +130,53 @@ layout = dmc.Container(
     style={"maxWidth": "900px"},
 )
 
-# --- Backend Route for Streaming (Now Async) ---
-@dash.get_app().server.route("/streaming-chat", methods=["POST"])
-async def streaming_chat(): # Make the route async
-    data = await request.get_json()
+# --- Backend Route for Streaming ---
+def parse_chat_request(data):
+    """
+    Validate a /streaming-chat request body.
+
+    Returns:
+        Tuple of (prompt, mode, session_id, error); error is None for a valid request
+    """
+    data = data if isinstance(data, dict) else {}
     user_prompt = data.get("prompt")
     mode = data.get("mode", "direct") # Default to direct chat
     session_id = data.get("session_id")
-
     if not user_prompt:
-        return Response(json.dumps({"error": "Prompt is required"}), status=400, mimetype='application/json')
+        return user_prompt, mode, session_id, "Prompt is required"
     if mode == "agent" and not session_id:
-         return Response(json.dumps({"error": "Session ID is required for agent mode"}), status=400, mimetype='application/json')
-
-    print(f"Received request - Mode: {mode}, Session: {session_id}, Prompt: {user_prompt[:50]}...")
-
-    async def response_stream_generator():
-        try:
-            if mode == "agent":
-                # Call the async agent message handler
-                async for chunk in handle_agent_message(session_id, user_prompt):
-                    yield chunk
-            else: # Default to direct chat
-                # Call the synchronous LLM response stream (needs to be run in executor or adapted)
-                # For simplicity here, we'll assume stream_llm_response can yield directly
-                # In a real async app, you might run sync generators in an executor
-                 for chunk in stream_llm_response(user_prompt):
-                    yield chunk
-        except Exception as e:
-            print(f"Error during streaming generation ({mode} mode): {e}")
-            yield f"\n\n[Error: Server error processing request in {mode} mode.]\n"
-            
-    return Response(response_stream_generator(), mimetype="text/event-stream")
+        return user_prompt, mode, session_id, "Session ID is required for agent mode"
+    return user_prompt, mode, session_id, None
+
+def rejection_body(error):
+    """JSON body and headers of a 429 response for a rejected request."""
+    return {"error": f"{error} Please retry in {error.retry_after}s.", "retry_after": error.retry_after}, {"Retry-After": str(error.retry_after)}
+
+# Served by the WSGI app; asgi.py serves the same path natively on the event loop
+@dash.get_app().server.route("/streaming-chat", methods=["POST"])
+def streaming_chat():
+    user_prompt, mode, session_id, error = parse_chat_request(request.get_json(silent=True))
+    if error:
+        return Response(json.dumps({"error": error}), status=400, mimetype='application/json')
+
+    logger.debug(f"Streaming chat - Mode: {mode}, Session: {session_id}")
+
+    # Admission is decided before the stream starts, so overload is a fast 429 rather than a slow stream
+    controller = get_admission_controller()
+    try:
+        # Without a session ID only the global and backend limits apply
+        ticket = controller.enqueue(session_id, OLLAMA_BASE_URL)
+    except AdmissionRejected as e:
+        body, headers = rejection_body(e)
+        return Response(json.dumps(body), status=429, mimetype='application/json', headers=headers)
+
+    # The async agent handler runs on the worker's shared event loop and the sync LLM stream on a
+    # producer thread; both are sent as coalesced token events with heartbeats while the model is silent
+    source = handle_agent_message(session_id, user_prompt) if mode == "agent" else stream_llm_response(user_prompt)
+    response = Response(sse_stream(admitted_stream(ticket, source)), mimetype="text/event-stream", headers=SSE_HEADERS)
+    # Also frees the slot when the client disconnects before the stream started
+    response.call_on_close(lambda: controller.release(ticket))
+    return response
 
 # --- Clientside Callbacks --- 
 
@@ -1,4 +1,4 @@
-from dash import html, dcc, callback
+from dash import html, dcc, callback, Input, Output
 import dash_mantine_components as dmc
 from dash_iconify import DashIconify
 import plotly.graph_objects as go
@@ -6,6 +6,8 @@ import dash
 import pandas as pd
 import numpy as np
 
+from utils.anomaly_service import get_alerts
+
 # Register this module as a page with Dash Pages
 dash.register_page(__name__, path='/')
 
@@ -81,6 +83,40 @@ def create_profit_chart():
     )
     return fig
 
+# Early-warning alerts from streaming anomaly detection
+ALERT_POLL_INTERVAL_MS = 30_000
+ALERTS_SHOWN = 5
+
+
+def create_alert_items(alerts):
+    if not alerts:
+        return [dmc.Text("No anomalies detected", size="sm", c="dimmed")]
+    items = []
+    for alert in alerts:
+        color = "#BF2600" if alert['severity'] == 'critical' else "#FF8800"
+        items.append(dmc.ListItem(
+            dmc.Stack([
+                dmc.Group([
+                    DashIconify(
+                        icon="carbon:arrow-up" if alert['direction'] == 'spike' else "carbon:arrow-down",
+                        width=16,
+                        color=color
+                    ),
+                    dmc.Text(
+                        f"{alert['metric'].replace('_', ' ').title()} {alert['direction']} ({alert['zscore']:+.1f}σ)",
+                        size="sm",
+                        fw=500
+                    )
+                ], gap="xs"),
+                dmc.Text(
+                    f"{alert['entity']} · {alert['date']} · {alert['value']:,.0f} vs {alert['expected']:,.0f} expected",
+                    size="xs",
+                    c="dimmed"
+                )
+            ], gap=0)
+        ))
+    return items
+
 # Define the page layout directly
 layout = dmc.Container([
     # Header with welcome and overview
@@ -236,6 +272,17 @@ layout = dmc.Container([
                             )
                         ])
                     ], gap="xs")
+                ], p="md", shadow="sm", radius="md", withBorder=True, mb="md"),
+                
+                dmc.Paper([
+                    dmc.Stack([
+                        dmc.Group([
+                            dmc.Title("Early Warnings", order=5, c="#333F48"),
+                            dmc.Badge(id="alerts-badge", color="red", variant="light", size="sm")
+                        ], justify="space-between"),
+                        dmc.List(id="alerts-list", listStyleType="none", spacing="xs"),
+                        dcc.Interval(id="alerts-interval", interval=ALERT_POLL_INTERVAL_MS)
+                    ], gap="xs")
                 ], p="md", shadow="sm", radius="md", withBorder=True)
             ], style={"gridColumn": "span 4"})
         ],
@@ -276,4 +323,16 @@ layout = dmc.Container([
             ]
         )
     ], p="md", shadow="sm", radius="md", withBorder=True)
-], fluid=True, px="md", py="lg", style={"backgroundColor": "#f8f9fa"}) 
\ No newline at end of file
+], fluid=True, px="md", py="lg", style={"backgroundColor": "#f8f9fa"}) 
+
+
+# Polls the alert log; each poll also folds any newly appended ledger rows into the detector
+@callback(
+    [Output("alerts-list", "children"),
+     Output("alerts-badge", "children")],
+    Input("alerts-interval", "n_intervals")
+)
+def update_alerts(n_intervals):
+    alerts = get_alerts(limit=ALERTS_SHOWN)
+    critical = sum(alert['severity'] == 'critical' for alert in alerts)
+    return create_alert_items(alerts), f"{critical} Critical" if critical else f"{len(alerts)} Recent"
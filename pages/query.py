@@ -2,17 +2,25 @@ from dash import html, dcc, Input, Output, State, callback
 import dash_mantine_components as dmc
 from dash_iconify import DashIconify
 import dash
+import numpy as np
+
+from utils.query_service import answer_query, format_value, METRIC_LABELS
 
 # Register this module as a page with Dash Pages
 dash.register_page(__name__, path='/query')
 
 # Sample query templates
 QUERY_TEMPLATES = [
-    {"value": "revenue_analysis", "label": "Revenue Analysis", "description": "Analyze revenue trends and patterns", "icon": "carbon:chart-line"},
-    {"value": "profit_margins", "label": "Profit Margins", "description": "Calculate and compare profit margins", "icon": "carbon:percentage"},
-    {"value": "cash_flow", "label": "Cash Flow Analysis", "description": "Review cash flow patterns and projections", "icon": "carbon:flow"},
-    {"value": "market_comparison", "label": "Market Comparison", "description": "Compare performance against market benchmarks", "icon": "carbon:comparison"},
-    {"value": "risk_assessment", "label": "Risk Assessment", "description": "Evaluate financial risks and opportunities", "icon": "carbon:warning-alt"}
+    {"value": "revenue_analysis", "label": "Revenue Analysis", "description": "Analyze revenue trends and patterns", "icon": "carbon:chart-line",
+     "question": "Total revenue by month over the last 12 months compared to the previous year"},
+    {"value": "profit_margins", "label": "Profit Margins", "description": "Calculate and compare profit margins", "icon": "carbon:percentage",
+     "question": "Profit margin by quarter over the last 4 quarters compared to the previous year"},
+    {"value": "cash_flow", "label": "Cash Flow Analysis", "description": "Review cash flow patterns and projections", "icon": "carbon:flow",
+     "question": "Total profit by month over the last 6 months"},
+    {"value": "market_comparison", "label": "Market Comparison", "description": "Compare performance against market benchmarks", "icon": "carbon:comparison",
+     "question": "Average market index by quarter over the last 4 quarters compared to the previous year"},
+    {"value": "risk_assessment", "label": "Risk Assessment", "description": "Evaluate financial risks and opportunities", "icon": "carbon:warning-alt",
+     "question": "Maximum daily expenses by month over the last 6 months"}
 ]
 
 # Recent queries - sample data
@@ -85,7 +93,7 @@ layout = dmc.Container([
             # Context Panel
             dmc.Paper([
                 dmc.Text("Active Parameters", fw=500, size="sm", c="#333F48", mb="xs"),
-                dmc.Stack([
+                dmc.Stack(id="query-parameters", children=[
                     dmc.Group([
                         dmc.Badge("Time Period: 2023", color="blue", variant="light"),
                         dmc.Badge("Division: All", color="teal", variant="light"),
@@ -96,7 +104,10 @@ layout = dmc.Container([
                     ], gap="xs")
                 ], gap="xs")
             ], p="md", withBorder=True, style={"backgroundColor": "#f8fafc", "gridColumn": "span 4"})
-        ], cols=12, spacing="lg")
+        ], cols=12, spacing="lg"),
+
+        # Query answer
+        html.Div(id="query-result")
     ], p="lg", shadow="sm", radius="md", withBorder=True, mb="lg"),
     
     # Recent Queries and Templates
@@ -146,6 +157,7 @@ layout = dmc.Container([
                             DashIconify(icon=template["icon"], width=24, color="#0A3D62"),
                             dmc.ActionIcon(
                                 DashIconify(icon="carbon:add-alt", width=16),
+                                id=f"use-template-{template['value']}",
                                 size="sm",
                                 variant="subtle",
                                 color="blue"
@@ -196,9 +208,81 @@ def update_template_description(value):
         return template["description"] if template else ""
     return ""
 
+def create_parameter_badges(plan):
+    """Badges describing an executed query plan."""
+    if plan.last_n:
+        period = f"Last {plan.last_n} {plan.last_unit or 'days'}"
+    elif plan.start or plan.end:
+        period = plan.start if plan.start == plan.end else f"{plan.start or 'start'} to {plan.end or 'latest'}"
+    else:
+        period = "All data"
+    comparison = {"none": "None", "previous_year": "YoY", "previous_period": "Prior period"}[plan.comparison]
+    return [
+        dmc.Group([
+            dmc.Badge(f"Time Period: {period}", color="blue", variant="light"),
+            dmc.Badge(f"Metric: {METRIC_LABELS[plan.metric]}", color="teal", variant="light"),
+        ], gap="xs"),
+        dmc.Group([
+            dmc.Badge(f"Grouping: {plan.group_by.title()}", color="violet", variant="light"),
+            dmc.Badge(f"Comparison: {comparison}", color="indigo", variant="light"),
+        ], gap="xs")
+    ]
+
+
+def create_result_table(plan, table):
+    """Per-period results of a grouped query."""
+    columns = ["Period", "Value"] + (["Comparison", "Change"] if "comparison" in table else [])
+    unit = " pts" if plan.metric == "margin" else "%"
+    rows = []
+    for record in table.itertuples(index=False):
+        cells = [record.period, format_value(plan.metric, record.value)]
+        if "comparison" in table:
+            change = "n/a" if np.isnan(record.change) else f"{record.change:+.1f}{unit}"
+            cells += [format_value(plan.metric, record.comparison), change]
+        rows.append(html.Tr([html.Td(cell) for cell in cells]))
+    return dmc.Table([
+        html.Thead(html.Tr([html.Th(column) for column in columns])),
+        html.Tbody(rows)
+    ], striped=True, highlightOnHover=True, mt="md")
+
+
+@callback(
+    Output("query-result", "children"),
+    Output("query-parameters", "children"),
+    Input("process-query", "n_clicks"),
+    Input("query-input", "n_submit"),
+    State("query-input", "value"),
+    running=[(Output("process-query", "loading"), True, False)],
+    prevent_initial_call=True,
+)
+def process_query(n_clicks, n_submit, question):
+    """Answer the question from its query plan; known question shapes skip the LLM."""
+    if not question or not question.strip():
+        return dash.no_update, dash.no_update
+    try:
+        result = answer_query(question)
+    except Exception as e:
+        return dmc.Alert(f"Could not answer this question: {e}", title="Query failed", color="red", mt="lg"), dash.no_update
+
+    plan = result["plan"]
+    children = [
+        dmc.Group([
+            dmc.Text(result["answer"], fw=500, size="lg", c="#0A3D62"),
+            dmc.Group([
+                dmc.Badge("Cached plan" if result["cached"] else "New plan", color="green" if result["cached"] else "gray", variant="light"),
+                dmc.Badge(f"{result['elapsed_ms']:.0f} ms", color="gray", variant="outline"),
+            ], gap="xs")
+        ], justify="space-between"),
+    ]
+    if "table" in result:
+        children.append(create_result_table(plan, result["table"]))
+    return dmc.Paper(children, p="md", mt="lg", withBorder=True, style={"backgroundColor": "#f8fafc"}), create_parameter_badges(plan)
+
+
 @callback(
     Output("query-input", "value"),
     [Input(f"use-template-{template['value']}", "n_clicks") for template in QUERY_TEMPLATES],
+    Input("clear-query", "n_clicks"),
     prevent_initial_call=True,
 )
 def use_template(*args):
@@ -211,5 +295,5 @@ def use_template(*args):
     template = next((t for t in QUERY_TEMPLATES if t["value"] == template_value), None)
     
     if template:
-        return f"Please {template['description'].lower()}"
+        return template["question"]
     return "" 
\ No newline at end of file
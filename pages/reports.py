@@ -1,9 +1,16 @@
-from dash import html, dcc, Input, Output, State, callback
+from dash import html, dcc, Input, Output, State, Patch, callback, clientside_callback
+from dash.exceptions import PreventUpdate
 import dash_mantine_components as dmc
 from dash_iconify import DashIconify
 from dash_mantine_components import Select, MultiSelect, Textarea, Switch, Paper, Stack
+from flask import request, Response
+import json
+import difflib
 import dash
 
+from utils.data_service import DEFAULT_ENTITY, list_entities, get_dataset_version
+from utils.report_service import EXPORT_FORMATS, export_document, render_section, resolve_sections, stream_document
+
 # Register this module as a page with Dash Pages
 dash.register_page(__name__, path='/reports')
 
@@ -25,146 +32,173 @@ CONTENT_SECTIONS = [
     {"value": "recommendations", "label": "Recommendations", "description": "Strategic recommendations and action items"}
 ]
 
-# Define the layout directly
-layout = dmc.Container([
-    # Header
-    dmc.Grid([
-        dmc.GridCol([
-            html.H1("Report Generation", className="mb-4"),
-            html.P("Create and customize financial reports", className="text-muted")
-        ], span=12)
-    ]),
+# Built per page load, so the entity list includes ledgers created since startup
+def layout(**kwargs):
+    return dmc.Container([
+        # Header
+        dmc.Grid([
+            dmc.GridCol([
+                html.H1("Report Generation", className="mb-4"),
+                html.P("Create and customize financial reports", className="text-muted")
+            ], span=12)
+        ]),
     
-    # Main Report Interface
-    dmc.Grid([
-        # Template Selection and Customization
-        dmc.GridCol([
-            dmc.Card([
-                html.H5("Report Template", className="card-title mb-3"),
-                Select(
-                    id='template-select',
-                    data=REPORT_TEMPLATES,
-                    placeholder="Select a template",
-                    className="mb-3"
-                ),
-                html.Div(id='template-description-reports', className="text-muted mb-3"),
-                
-                html.H5("Content Sections", className="card-title mt-4 mb-3"),
-                MultiSelect(
-                    id='content-sections',
-                    data=CONTENT_SECTIONS,
-                    placeholder="Select sections to include",
-                    className="mb-3"
-                ),
-                
-                html.H5("Report Options", className="card-title mt-4 mb-3"),
-                dmc.Stack([
-                    dmc.Checkbox(
-                        label="Include Executive Summary",
-                        value=True,
-                        id="option-exec-summary"
+        # Main Report Interface
+        dmc.Grid([
+            # Template Selection and Customization
+            dmc.GridCol([
+                dmc.Card([
+                    html.H5("Report Template", className="card-title mb-3"),
+                    Select(
+                        id='template-select',
+                        data=REPORT_TEMPLATES,
+                        placeholder="Select a template",
+                        className="mb-3"
                     ),
-                    dmc.Checkbox(
-                        label="Include Charts and Graphs",
-                        value=True,
-                        id="option-charts"
+                    html.Div(id='template-description-reports', className="text-muted mb-3"),
+                
+                    html.H5("Content Sections", className="card-title mt-4 mb-3"),
+                    MultiSelect(
+                        id='content-sections',
+                        data=CONTENT_SECTIONS,
+                        placeholder="Select sections to include",
+                        className="mb-3"
                     ),
-                    dmc.Checkbox(
-                        label="Include Detailed Analysis",
-                        value=False,
-                        id="option-detailed"
+
+                    html.H5("Entities", className="card-title mt-4 mb-3"),
+                    MultiSelect(
+                        id='report-entities',
+                        data=sorted(set(list_entities()) | {DEFAULT_ENTITY}),
+                        value=[DEFAULT_ENTITY],
+                        placeholder="Select entities to report on",
+                        searchable=True,
+                        className="mb-3"
                     ),
-                    dmc.Checkbox(
-                        label="Include Recommendations",
-                        value=False,
-                        id="option-recommendations"
-                    )
-                ], gap="xs", className="mb-3"),
                 
-                html.H5("Additional Notes", className="card-title mt-4 mb-3"),
-                Textarea(
-                    id='report-notes',
-                    placeholder="Add any specific notes or requirements for the report",
-                    minRows=3,
-                    className="mb-3"
-                ),
+                    html.H5("Report Options", className="card-title mt-4 mb-3"),
+                    dmc.Stack([
+                        dmc.Checkbox(
+                            label="Include Executive Summary",
+                            checked=True,
+                            id="option-exec-summary"
+                        ),
+                        dmc.Checkbox(
+                            label="Include Charts and Graphs",
+                            checked=True,
+                            id="option-charts"
+                        ),
+                        dmc.Checkbox(
+                            label="Include Detailed Analysis",
+                            checked=False,
+                            id="option-detailed"
+                        ),
+                        dmc.Checkbox(
+                            label="Include Recommendations",
+                            checked=False,
+                            id="option-recommendations"
+                        )
+                    ], gap="xs", className="mb-3"),
                 
-                dmc.ButtonGroup([
-                    dmc.Button([
-                        DashIconify(icon="radix-icons:eye-open"),
-                        " Preview Report"
-                    ], color="primary", id="preview-button", className="me-2"),
-                    dmc.Button([
-                        DashIconify(icon="radix-icons:download"),
-                        " Generate Report"
-                    ], color="success", id="generate-button", className="me-2"),
-                    dmc.Button([
-                        DashIconify(icon="radix-icons:reset"),
-                        " Reset"
-                    ], color="secondary", id="reset-button")
-                ])
-            ], p="md")
-        ], span=4),
-        
-        # Report Preview
-        dmc.GridCol([
-            dmc.Card([
-                html.H5("Report Preview", className="card-title mb-3"),
-                html.Div([
-                    html.Div([
-                        html.H6("Executive Summary", className="preview-section"),
-                        html.P("This section will show a preview of the executive summary...")
-                    ], className="preview-content mb-4"),
-                    
-                    html.Div([
-                        html.H6("Financial Metrics", className="preview-section"),
-                        html.P("This section will show a preview of the financial metrics...")
-                    ], className="preview-content mb-4"),
-                    
-                    html.Div([
-                        html.H6("Market Position", className="preview-section"),
-                        html.P("This section will show a preview of the market position analysis...")
-                    ], className="preview-content mb-4"),
-                    
-                    html.Div([
-                        html.H6("Risk Assessment", className="preview-section"),
-                        html.P("This section will show a preview of the risk assessment...")
-                    ], className="preview-content mb-4"),
-                    
-                    html.Div([
-                        html.H6("Recommendations", className="preview-section"),
-                        html.P("This section will show a preview of the recommendations...")
-                    ], className="preview-content")
-                ], id="report-preview")
-            ], p="md")
-        ], span=8)
-    ], className="mb-4"),
-    
-    # Export Options
-    dmc.Grid([
-        dmc.GridCol([
-            dmc.Card([
-                html.H5("Export Options", className="card-title mb-3"),
-                dmc.Grid([
-                    dmc.GridCol([
+                    html.H5("Additional Notes", className="card-title mt-4 mb-3"),
+                    Textarea(
+                        id='report-notes',
+                        placeholder="Add any specific notes or requirements for the report",
+                        minRows=3,
+                        className="mb-3"
+                    ),
+                
+                    dmc.ButtonGroup([
                         dmc.Button([
-                            DashIconify(icon="radix-icons:file-pdf"),
-                            " Export as PDF"
-                        ], color="danger", className="me-2"),
+                            DashIconify(icon="radix-icons:eye-open"),
+                            " Preview Report"
+                        ], color="primary", id="preview-button", className="me-2"),
                         dmc.Button([
-                            DashIconify(icon="radix-icons:file-excel"),
-                            " Export as Excel"
-                        ], color="success", className="me-2"),
+                            DashIconify(icon="radix-icons:download"),
+                            " Generate Report"
+                        ], color="success", id="generate-button", className="me-2"),
                         dmc.Button([
-                            DashIconify(icon="radix-icons:file-powerpoint"),
-                            " Export as PowerPoint"
-                        ], color="warning")
-                    ], span=12)
-                ])
-            ], p="md")
-        ], span=12)
-    ])
-], fluid=True, className="py-4")
+                            DashIconify(icon="radix-icons:reset"),
+                            " Reset"
+                        ], color="secondary", id="reset-button")
+                    ])
+                ], p="md")
+            ], span=4),
+        
+            # Report Preview
+            dmc.GridCol([
+                dmc.Card([
+                    html.H5("Report Preview", className="card-title mb-3"),
+                    dcc.Store(id="report-preview-state", data=[]),
+                    html.Div([
+                        # Sections are patched in place by the server as the selection changes
+                        html.Div("Select options to preview the report", id="report-preview-sections"),
+                        # Notes are rendered in the browser as they are typed
+                        html.Div([
+                            html.H6("Additional Notes", className="preview-section"),
+                            html.P(id="report-notes-text", style={"whiteSpace": "pre-wrap"})
+                        ], id="report-preview-notes", className="preview-content mb-4", style={"display": "none"})
+                    ], id="report-preview")
+                ], p="md")
+            ], span=8)
+        ], className="mb-4"),
+    
+        # Export Options
+        dmc.Grid([
+            dmc.GridCol([
+                dmc.Card([
+                    html.H5("Export Options", className="card-title mb-3"),
+                    dmc.Grid([
+                        dmc.GridCol([
+                            html.A(dmc.Button([
+                                DashIconify(icon="radix-icons:file-pdf"),
+                                " Export as PDF"
+                            ], color="danger", className="me-2"), id="export-pdf-link", href="/reports/export/pdf"),
+                            html.A(dmc.Button([
+                                DashIconify(icon="radix-icons:file-excel"),
+                                " Export as Excel"
+                            ], color="success", className="me-2"), id="export-xlsx-link", href="/reports/export/xlsx"),
+                            dmc.Button([
+                                DashIconify(icon="radix-icons:file-powerpoint"),
+                                " Export as PowerPoint"
+                            ], color="warning")
+                        ], span=12)
+                    ])
+                ], p="md")
+            ], span=12)
+        ])
+    ], fluid=True, className="py-4")
+
+# --- Backend Route for Report Export ---
+# Documents come from the report store or are rendered in parallel by the report
+# service, and are streamed back in chunks.
+@dash.get_app().server.route("/reports/export/<fmt>", methods=["GET"])
+def export_report(fmt):
+    if fmt not in EXPORT_FORMATS:
+        return Response(json.dumps({"error": f"Unsupported export format '{fmt}'"}), status=404, mimetype='application/json')
+
+    def split_arg(name):
+        return [value for value in request.args.get(name, "").split(",") if value]
+
+    try:
+        # Served straight from the report store when pre-rendered for the current data
+        document = export_document(
+            request.args.get("template") or None,
+            sections=split_arg("sections"),
+            entities=split_arg("entities"),
+            options=split_arg("options"),
+            fmt=fmt,
+        )
+    except ValueError as e:
+        return Response(json.dumps({"error": str(e)}), status=400, mimetype='application/json')
+    except RuntimeError as e:
+        return Response(json.dumps({"error": str(e)}), status=501, mimetype='application/json')
+
+    filename = f"{document['title'].lower().replace(' ', '_')}.{fmt}"
+    return Response(
+        stream_document(document["data"]),
+        mimetype=document["mimetype"],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 # Define callbacks directly in the page
 @callback(
@@ -177,44 +211,92 @@ def update_template_description(value):
         return template["description"] if template else ""
     return ""
 
+def create_preview_section(result):
+    return html.Div([
+        html.H6(result["title"], className="preview-section"),
+        *[html.P(line) for line in result["text"]]
+    ], className="preview-content mb-4")
+
+# Only the section inputs reach the server. Sections whose inputs did not change
+# are left in place; the Patch only inserts and deletes the ones that did.
 @callback(
-    Output("report-preview", "children"),
+    [Output("report-preview-sections", "children"),
+     Output("report-preview-state", "data")],
     [Input("template-select", "value"),
      Input("content-sections", "value"),
+     Input("report-entities", "value"),
+     Input("option-exec-summary", "checked"),
+     Input("option-recommendations", "checked")],
+    State("report-preview-state", "data")
+)
+def update_report_preview(template, sections, entities, exec_summary, recommendations, previous_keys):
+    options = [name for name, enabled in [("exec_summary", exec_summary), ("recommendations", recommendations)] if enabled]
+    entity = (entities or [DEFAULT_ENTITY])[0]
+    if entity != DEFAULT_ENTITY and entity not in list_entities():
+        raise PreventUpdate
+    version = get_dataset_version(entity)
+    names = resolve_sections(template, sections, options)
+    keys = [f"{entity}|{name}|{version}" for name in names]
+    previous_keys = previous_keys or []
+
+    if keys == previous_keys:
+        raise PreventUpdate
+    if not keys:
+        return "Select options to preview the report", keys
+    if not previous_keys:
+        return [create_preview_section(render_section(entity, name, version, charts=False)) for name in names], keys
+
+    preview = Patch()
+    matcher = difflib.SequenceMatcher(a=previous_keys, b=keys, autojunk=False)
+    # Apply from the end so earlier indices stay valid
+    for op, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+        if op == "equal":
+            continue
+        for index in reversed(range(i1, i2)):
+            del preview[index]
+        for offset, name in enumerate(names[j1:j2]):
+            preview.insert(i1 + offset, create_preview_section(render_section(entity, name, version, charts=False)))
+    return preview, keys
+
+clientside_callback(
+    """
+    function(notes) {
+        if (!notes) {
+            return ['', {display: 'none'}];
+        }
+        return [notes, {display: 'block'}];
+    }
+    """,
+    [Output("report-notes-text", "children"),
+     Output("report-preview-notes", "style")],
+    Input("report-notes", "value")
+)
+
+# Point the export links at the current selection without a server round trip
+clientside_callback(
+    """
+    function(template, sections, entities, execSummary, charts, detailed, recommendations) {
+        const options = [];
+        if (execSummary) { options.push('exec_summary'); }
+        if (charts) { options.push('charts'); }
+        if (detailed) { options.push('detailed'); }
+        if (recommendations) { options.push('recommendations'); }
+        const params = new URLSearchParams({
+            template: template || '',
+            sections: (sections || []).join(','),
+            entities: (entities || []).join(','),
+            options: options.join(',')
+        }).toString();
+        return ['/reports/export/pdf?' + params, '/reports/export/xlsx?' + params];
+    }
+    """,
+    [Output("export-pdf-link", "href"),
+     Output("export-xlsx-link", "href")],
+    [Input("template-select", "value"),
+     Input("content-sections", "value"),
+     Input("report-entities", "value"),
      Input("option-exec-summary", "checked"),
      Input("option-charts", "checked"),
      Input("option-detailed", "checked"),
-     Input("option-recommendations", "checked"),
-     Input("report-notes", "value")]
+     Input("option-recommendations", "checked")]
 )
-def update_report_preview(template, sections, exec_summary, charts, detailed, recommendations, notes):
-    preview_sections = []
-    
-    if exec_summary:
-        preview_sections.append(
-            html.Div([
-                html.H6("Executive Summary", className="preview-section"),
-                html.P("This section will show a preview of the executive summary...")
-            ], className="preview-content mb-4")
-        )
-    
-    if sections:
-        for section in sections:
-            section_data = next((s for s in CONTENT_SECTIONS if s["value"] == section), None)
-            if section_data:
-                preview_sections.append(
-                    html.Div([
-                        html.H6(section_data["label"], className="preview-section"),
-                        html.P(section_data["description"])
-                    ], className="preview-content mb-4")
-                )
-    
-    if notes:
-        preview_sections.append(
-            html.Div([
-                html.H6("Additional Notes", className="preview-section"),
-                html.P(notes)
-            ], className="preview-content mb-4")
-        )
-    
-    return preview_sections if preview_sections else "Select options to preview the report" 
\ No newline at end of file
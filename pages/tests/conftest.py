@@ -0,0 +1,40 @@
+"""
+Shared test setup. The services read their configuration from the
+environment at import time, so it is pointed at a temporary directory
+before any application module is imported.
+"""
+
+import os
+import shutil
+import tempfile
+
+import pytest
+
+_WORKDIR = tempfile.mkdtemp(prefix="fingen-tests-")
+os.environ.update({
+    "FINGEN_DATA_DIR": os.path.join(_WORKDIR, "data"),
+    "FINGEN_JOB_CACHE_DIR": os.path.join(_WORKDIR, "cache"),
+    "FINGEN_REPORT_CACHE_DIR": os.path.join(_WORKDIR, "reports"),
+    "FINGEN_REPORT_STORE_DIR": os.path.join(_WORKDIR, "report_store"),
+    "FINGEN_ANALYSIS_STATE_DIR": os.path.join(_WORKDIR, "analysis"),
+    "FINGEN_ANOMALY_STATE_DIR": os.path.join(_WORKDIR, "anomaly"),
+    "FINGEN_FORECAST_STATE_DIR": os.path.join(_WORKDIR, "forecast"),
+    "FINGEN_RISK_DIR": os.path.join(_WORKDIR, "risk"),
+    "FINGEN_GRAPH_DIR": os.path.join(_WORKDIR, "graph"),
+    "FINGEN_FILINGS_DIR": os.path.join(_WORKDIR, "filings"),
+    "FINGEN_VECTOR_STORE_DIR": os.path.join(_WORKDIR, "store"),
+    "FINGEN_DOCS_DIR": os.path.join(_WORKDIR, "docs"),
+    "FINGEN_REPORT_SCHEDULER": "False",
+    "FINGEN_SAMPLE_DATA": "True",
+})
+
+
+@pytest.fixture(scope="session")
+def dash_app():
+    """The Dash app with every page registered, as the server creates it."""
+    import app
+    return app.app
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_WORKDIR, ignore_errors=True)
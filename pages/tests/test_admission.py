@@ -0,0 +1,109 @@
+"""
+Admission control: slots are released however a stream ends.
+"""
+
+import asyncio
+
+import pytest
+
+from utils import admission_service
+from utils.admission_service import AdmissionController, AdmissionRejected, aadmitted_stream, admitted_stream
+from utils.stream_service import StreamEvent
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    controller = AdmissionController(max_concurrent=1, max_per_backend=1, max_per_session=1, max_queue=2)
+    monkeypatch.setattr(admission_service, "_controller", controller)
+    return controller
+
+
+def test_release_admits_the_next_ticket(controller):
+    first = controller.enqueue("a", "ollama")
+    second = controller.enqueue("b", "ollama")
+    assert first.admitted and not second.admitted
+    assert controller.position(second) == 1
+
+    controller.release(first)
+    assert second.admitted and second.wait(0)
+    controller.release(second)
+    assert controller.stats() == {"active": 0, "queued": 0, "backends": {"ollama": 0}}
+
+
+def test_limits_reject_and_release_frees_the_session(controller):
+    ticket = controller.enqueue("a", "ollama")
+    with pytest.raises(AdmissionRejected):
+        controller.enqueue("a", "ollama")
+    controller.enqueue("b", "ollama")
+    controller.enqueue("c", "ollama")
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.enqueue("d", "ollama")
+    assert rejected.value.retry_after >= 1
+
+    controller.release(ticket)
+    controller.release(ticket)  # A second release is a no-op
+    assert controller.stats()["active"] == 1
+    controller.enqueue("a", "ollama")
+
+
+def test_requests_without_a_session_share_only_the_global_limits(controller):
+    # Clients behind one proxy would otherwise count as a single session
+    first = controller.enqueue(None, "ollama")
+    second = controller.enqueue(None, "ollama")
+    assert first.admitted and not second.admitted
+    controller.release(first)
+    assert second.admitted
+    controller.release(second)
+    assert controller.stats() == {"active": 0, "queued": 0, "backends": {"ollama": 0}}
+
+
+def test_release_of_a_waiting_ticket_leaves_the_queue(controller):
+    first = controller.enqueue("a", "ollama")
+    waiting = controller.enqueue("b", "ollama")
+    controller.release(waiting)
+    assert controller.stats()["queued"] == 0
+    controller.release(first)
+    assert controller.stats()["active"] == 0
+
+
+def test_stream_releases_on_completion_error_and_close(controller):
+    assert list(admitted_stream(controller.enqueue("a", "ollama"), iter(["x", "y"]))) == ["x", "y"]
+    assert controller.stats()["active"] == 0
+
+    def failing():
+        yield "x"
+        raise RuntimeError("upstream failed")
+    with pytest.raises(RuntimeError):
+        list(admitted_stream(controller.enqueue("a", "ollama"), failing()))
+    assert controller.stats()["active"] == 0
+
+    stream = admitted_stream(controller.enqueue("a", "ollama"), iter(["x", "y"]))
+    assert next(stream) == "x"
+    stream.close()  # Client disconnected mid-stream
+    assert controller.stats()["active"] == 0
+
+
+def test_async_stream_reports_position_then_streams(controller):
+    async def scenario():
+        holder = controller.enqueue("a", "ollama")
+        waiter = controller.enqueue("b", "ollama")
+
+        async def source():
+            yield "token"
+
+        received = []
+
+        async def consume():
+            async for item in aadmitted_stream(waiter, source()):
+                received.append(item)
+
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.05)
+        assert received == [StreamEvent("queued", {"position": 1})]
+        controller.release(holder)
+        await asyncio.wait_for(task, 5)
+        return received
+
+    received = asyncio.run(scenario())
+    assert received[-1] == "token"
+    assert controller.stats()["active"] == 0
@@ -0,0 +1,115 @@
+"""
+Incremental analysis against a full recompute over the same ledger, and
+the ledger's appends and compaction underneath it.
+"""
+
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+
+from utils import analysis_service, data_service
+from utils.analysis_service import IncrementalAnalysis, compute_margin, get_analysis_engine
+from utils.data_service import append_rows, create_sample_data, get_dataset_version, load_dataset
+
+
+def full_recompute(rows: pd.DataFrame, window: int) -> pd.DataFrame:
+    rolling = rows["revenue"].rolling(window, min_periods=1)
+    return pd.DataFrame({
+        "margin": compute_margin(rows),
+        "revenue_rolling_mean": rolling.mean(),
+        "revenue_rolling_std": rolling.std(),
+    })
+
+
+def test_update_in_batches_matches_full_recompute():
+    ledger = create_sample_data("2022-01-01", "2023-06-30", entity="test-batches")
+    engine = IncrementalAnalysis("test-batches", window=30)
+    # Uneven batches, some smaller than the rolling window
+    bounds = [0, 5, 17, 200, 201, 400, len(ledger)]
+    derived = pd.concat([engine.update(ledger.iloc[a:b]) for a, b in zip(bounds, bounds[1:])])
+
+    pdt.assert_frame_equal(derived, full_recompute(ledger, 30), check_freq=False)
+    assert engine.row_count == len(ledger)
+    assert engine.last_date == ledger.index[-1]
+
+    whole = IncrementalAnalysis("test-batches", window=30)
+    whole.update(ledger)
+    pdt.assert_frame_equal(engine.quarterly_summary(), whole.quarterly_summary())
+    # Quarterly averages agree with grouping the raw rows
+    averages = ledger["revenue"].groupby(ledger.index.to_period("Q")).mean()
+    np.testing.assert_allclose(engine.quarterly_summary()["revenue"], averages)
+
+
+def test_sync_reads_only_appended_partitions():
+    entity = "test-sync"
+    append_rows(create_sample_data("2022-01-01", "2022-12-31", entity=entity), entity=entity)
+    engine = IncrementalAnalysis(entity)
+    engine.sync()
+    appended = create_sample_data("2023-01-01", "2023-01-10", entity=entity)
+    append_rows(appended, entity=entity)
+
+    derived = engine.sync()
+    assert len(derived) == len(appended)
+    assert engine.version == 2
+
+    fresh = IncrementalAnalysis(entity)
+    fresh.sync()
+    pdt.assert_frame_equal(engine.quarterly_summary(), fresh.quarterly_summary())
+    expected = full_recompute(load_dataset(entity), engine.window).iloc[-len(appended):]
+    pdt.assert_frame_equal(derived, expected, check_freq=False, check_names=False)
+    assert engine.insights() == fresh.insights()
+
+
+def _feed(entity, start, days):
+    return create_sample_data(start, str((pd.Timestamp(start) + pd.Timedelta(days=days - 1)).date()), entity=entity)
+
+
+def test_append_with_a_stale_version_leaves_the_ledger_untouched():
+    entity = "test-conflict"
+    assert append_rows(_feed(entity, "2023-01-01", 5), entity=entity, expected_version=0) == 1
+    # Another refresh appended since this one rendered version 0
+    assert append_rows(_feed(entity, "2023-01-06", 5), entity=entity, expected_version=0) == 1
+    assert len(load_dataset(entity)) == 5
+    assert append_rows(_feed(entity, "2023-01-06", 5), entity=entity, expected_version=1) == 2
+
+
+def test_compaction_keeps_every_version_readable(monkeypatch):
+    entity = "test-compact"
+    monkeypatch.setattr(data_service, "LEDGER_MAX_FILES", 4)
+    feeds = [_feed(entity, str((pd.Timestamp("2023-01-01") + pd.Timedelta(days=3 * n)).date()), 3) for n in range(10)]
+    for version, feed in enumerate(feeds, start=1):
+        assert append_rows(feed, entity=entity) == version
+
+    assert len(data_service._list_files(entity)) <= 4
+    assert get_dataset_version(entity) == 10
+    pdt.assert_frame_equal(load_dataset(entity), pd.concat(feeds), check_freq=False)
+    # Version ranges inside a merged file read only their own row groups
+    pdt.assert_frame_equal(load_dataset(entity, since_version=3, until_version=7),
+                           pd.concat(feeds[3:7]), check_freq=False)
+    assert load_dataset(entity, since_version=10).empty
+
+
+def test_stale_append_lock_is_broken(monkeypatch):
+    entity = "test-stale-lock"
+    monkeypatch.setattr(data_service, "APPEND_LOCK_TIMEOUT", 0.05)
+    fd, lock_path = data_service._acquire_lock(entity)
+    os.close(fd)  # The holder died without releasing
+    assert append_rows(_feed(entity, "2023-01-01", 2), entity=entity) == 1
+    assert not os.path.exists(lock_path)
+
+
+def test_concurrent_engines_sync_and_persist_once_per_version():
+    entity = "test-engine-threads"
+    append_rows(_feed(entity, "2023-01-01", 30), entity=entity)
+    engines = []
+    threads = [threading.Thread(target=lambda: engines.append(get_analysis_engine(entity))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(engines) == 8 and all(engine is engines[0] for engine in engines)
+    assert engines[0].row_count == 30 and engines[0].version == 1
+    assert not [name for name in os.listdir(analysis_service.ANALYSIS_STATE_DIR) if name.endswith(".tmp")]
@@ -0,0 +1,31 @@
+"""
+Anomaly monitor: alerts on appended rows, shared across concurrent callers.
+"""
+
+import os
+import threading
+
+from utils import anomaly_service
+from utils.anomaly_service import get_alerts, get_anomaly_monitor
+from utils.data_service import append_rows, create_sample_data
+
+
+def test_concurrent_syncs_alert_on_a_spike_once():
+    entity = "test-anomaly"
+    append_rows(create_sample_data("2023-01-01", "2023-03-31", entity=entity), entity=entity)
+    get_anomaly_monitor()
+    spike = create_sample_data("2023-04-01", "2023-04-01", entity=entity)
+    spike["revenue"] *= 20
+    append_rows(spike, entity=entity)
+
+    threads = [threading.Thread(target=get_anomaly_monitor) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    alerts = [alert for alert in get_alerts(limit=500)
+              if alert["entity"] == entity and alert["date"] == "2023-04-01" and alert["metric"] == "revenue"]
+    assert len(alerts) == 1
+    assert alerts[0]["direction"] == "spike" and alerts[0]["severity"] == "critical"
+    assert not [name for name in os.listdir(anomaly_service.ANOMALY_STATE_DIR) if name.endswith(".tmp")]
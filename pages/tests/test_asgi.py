@@ -0,0 +1,55 @@
+"""
+ASGI serving mode: the native streaming route and the mounted Dash app.
+"""
+
+import json
+
+import pytest
+from starlette.testclient import TestClient
+
+from utils import admission_service, async_service
+from utils.admission_service import AdmissionController
+
+
+@pytest.fixture
+def client(dash_app, monkeypatch):
+    import asgi
+
+    async def tokens(prompt):
+        for token in ["Cash ", "is ", "up."]:
+            yield token
+
+    monkeypatch.setattr(asgi, "astream_llm_response", tokens)
+    monkeypatch.setattr(admission_service, "_controller", AdmissionController(max_per_session=1))
+    # The client's lifespan hands its loop to async_service; later tests get their own again
+    monkeypatch.setattr(async_service, "_loop", None)
+    with TestClient(asgi.app) as client:
+        yield client
+
+
+def events(body):
+    return [(frame.split("\n")[0][len("event: "):], json.loads(frame.rsplit("data: ", 1)[1]))
+            for frame in body.strip().split("\n\n")]
+
+
+def test_streaming_chat_is_served_as_sse(client):
+    response = client.post("/streaming-chat", json={"prompt": "How is cash?", "session_id": "s1"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert events(response.text) == [("token", {"text": "Cash is up."}), ("done", {"events": 1, "chars": 11})]
+    # The slot is released once the response has been sent
+    assert admission_service._controller.stats()["active"] == 0
+
+
+def test_invalid_and_rejected_requests(client):
+    assert client.post("/streaming-chat", json={}).status_code == 400
+    assert client.post("/streaming-chat", json={"prompt": "x", "mode": "agent"}).status_code == 400
+
+    admission_service._controller.enqueue("busy", "any")
+    response = client.post("/streaming-chat", json={"prompt": "x", "session_id": "busy"})
+    assert response.status_code == 429 and int(response.headers["retry-after"]) >= 1
+
+
+def test_other_paths_reach_the_dash_app(client):
+    response = client.get("/_dash-layout")
+    assert response.status_code == 200 and response.json()
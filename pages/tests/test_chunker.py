@@ -0,0 +1,88 @@
+"""
+Structure-aware chunking and boilerplate deduplication.
+"""
+
+from langchain_core.documents import Document
+
+from utils.chunk_service import ShingleDeduplicator, chunk_documents, chunk_text, count_tokens, split_blocks
+
+
+FILING = """ITEM 7. MANAGEMENT'S DISCUSSION AND ANALYSIS
+
+Revenue grew 12% on higher volumes. Margins widened as input costs eased.
+
+CONSOLIDATED BALANCE SHEETS
+ASSETS
+                      2023        2022
+Cash               1,200         950
+Receivables          830         790
+Current assets:
+Inventory            410         385
+
+Note 5 Debt
+
+The company repaid $200 of term loans during the year.
+"""
+
+DISCLAIMER = ("This report contains forward-looking statements that involve risks and uncertainties. "
+              "Actual results may differ materially from those projected, and the company undertakes "
+              "no obligation to update any forward-looking statement after the date of this report.")
+
+
+def test_blocks_follow_headings_tables_and_paragraphs():
+    blocks = split_blocks(FILING)
+    assert [kind for kind, _ in blocks] == ["heading", "text", "heading", "heading", "table", "heading", "text"]
+    table = blocks[4][1]
+    # The row label stays inside the table rather than splitting it
+    assert "Current assets:" in table and table.splitlines()[-1].startswith("Inventory")
+
+
+def test_chunks_keep_sections_and_whole_tables():
+    chunks = chunk_text(FILING, max_tokens=60, min_tokens=0)
+    sections = [chunk["section"] for chunk in chunks]
+    assert sections == ["ITEM 7. MANAGEMENT'S DISCUSSION AND ANALYSIS",
+                        "CONSOLIDATED BALANCE SHEETS - ASSETS", "Note 5 Debt"]
+    table = chunks[1]
+    assert table["kind"] == "table" and table["text"].startswith("CONSOLIDATED BALANCE SHEETS - ASSETS\n\n")
+    assert "Cash" in table["text"] and "Inventory" in table["text"]
+    assert all(chunk["tokens"] == count_tokens(chunk["text"]) for chunk in chunks)
+
+
+def test_oversized_tables_split_by_rows_with_the_header_repeated():
+    header = "Segment            2023        2022"
+    rows = [f"Region {i:<10} {1000 + i:>8,} {900 + i:>10,}" for i in range(60)]
+    chunks = chunk_text("SEGMENT REVENUE\n\n" + "\n".join([header] + rows), max_tokens=80, min_tokens=0)
+    assert len(chunks) > 1
+    assert all(chunk["tokens"] <= 80 and chunk["kind"] == "table" for chunk in chunks)
+    assert all(header in chunk["text"] for chunk in chunks)
+    # Every row appears exactly once across the pieces
+    seen = [line for chunk in chunks for line in chunk["text"].splitlines() if line.startswith("Region")]
+    assert seen == rows
+
+
+def test_small_chunks_merge_with_their_neighbours():
+    text = "NOTE 1\n\nShort note.\n\nNOTE 2\n\nAnother short note."
+    assert len(chunk_text(text, max_tokens=100, min_tokens=0)) == 2
+    merged = chunk_text(text, max_tokens=100, min_tokens=20)
+    assert len(merged) == 1 and "Short note." in merged[0]["text"] and "Another short note." in merged[0]["text"]
+
+
+def test_repeated_boilerplate_is_dropped_across_documents_and_runs(tmp_path):
+    documents = [Document(page_content=f"RESULTS\n\nRevenue for {year} was {year - 1900} million.\n\n"
+                                       f"DISCLAIMER\n\n{DISCLAIMER}", metadata={"source": f"{year}.txt"})
+                 for year in (2021, 2022, 2023)]
+    deduplicator = ShingleDeduplicator()
+    chunks, stats = chunk_documents(documents, deduplicator, max_tokens=60, min_tokens=0)
+    assert stats["duplicates"] == 2 and stats["chunks"] == 4
+    assert sum(DISCLAIMER in chunk.page_content for chunk in chunks) == 1
+    assert all(chunk.metadata["section"] for chunk in chunks)
+
+    path = str(tmp_path / "signatures.npz")
+    deduplicator.save(path)
+    restored = ShingleDeduplicator.load(path)
+    # Reflowed and recased copies still match
+    reflowed = "Disclaimer " + DISCLAIMER.upper().replace(". ", ".\n")
+    assert restored.is_duplicate(reflowed, "2024.txt")
+    # Once its only source changes, the text is new again
+    restored.forget(["2021.txt"])
+    assert not restored.is_duplicate(f"DISCLAIMER\n\n{DISCLAIMER}", "2021.txt")
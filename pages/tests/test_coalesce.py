@@ -0,0 +1,140 @@
+"""
+Single-flight calls and coalesced streams.
+"""
+
+import time
+import asyncio
+import threading
+
+import pytest
+
+from utils import coalesce_service
+from utils.coalesce_service import coalesced_call, coalesced_stream, flight_key
+
+
+def test_flight_key_ignores_case_and_whitespace_only():
+    key = flight_key("chat", "What is  the margin?", "llama3")
+    assert key == flight_key("chat", "what is the MARGIN?", "llama3")
+    assert key != flight_key("chat", "What is the margin?", "mistral")
+    assert key != flight_key("chat", "What is the margin?", "llama3", context="session")
+
+
+def test_concurrent_calls_share_one_execution():
+    calls = []
+    started = threading.Event()
+
+    def slow():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return "answer"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(coalesced_call("key", slow))) for _ in range(5)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["answer"] * 5
+    assert len(calls) == 1
+    assert not coalesce_service._calls
+
+
+def _upstream(chunks, started, gate=None, error=None):
+    async def stream():
+        started.append(1)
+        for chunk in chunks:
+            if gate is not None:
+                await gate.wait()
+            yield chunk
+        if error is not None:
+            raise error
+    return stream
+
+
+async def _collect(stream):
+    return [chunk async for chunk in stream]
+
+
+def test_identical_streams_share_one_upstream():
+    async def scenario():
+        started = []
+        gate = asyncio.Event()
+        factory = _upstream(["a", "b", "c"], started, gate)
+        first = asyncio.ensure_future(_collect(coalesced_stream("k", factory)))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(_collect(coalesced_stream("k", factory)))
+        await asyncio.sleep(0)
+        gate.set()
+        return await asyncio.gather(first, second), started
+
+    (first, second), started = asyncio.run(scenario())
+    assert first == second == ["a", "b", "c"]
+    assert len(started) == 1
+    assert not coalesce_service._streams
+
+
+def test_late_joiner_replays_earlier_chunks():
+    async def scenario():
+        started = []
+        release = asyncio.Event()
+
+        async def source():
+            started.append(1)
+            yield "a"
+            await release.wait()
+            yield "b"
+
+        leader = coalesced_stream("late", source)
+        assert await leader.__anext__() == "a"
+        follower = asyncio.ensure_future(_collect(coalesced_stream("late", source)))
+        await asyncio.sleep(0)
+        release.set()
+        rest = await _collect(leader)
+        return rest, await follower, started
+
+    rest, follower, started = asyncio.run(scenario())
+    assert rest == ["b"]
+    assert follower == ["a", "b"]
+    assert len(started) == 1
+
+
+def test_errors_reach_every_subscriber():
+    async def scenario():
+        factory = _upstream(["a"], [], error=RuntimeError("upstream failed"))
+        return await asyncio.gather(_collect(coalesced_stream("err", factory)),
+                                    _collect(coalesced_stream("err", factory)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert not coalesce_service._streams
+
+
+def test_upstream_is_cancelled_when_the_last_subscriber_leaves():
+    async def scenario():
+        cancelled = asyncio.Event()
+
+        async def source():
+            try:
+                yield "a"
+                await asyncio.sleep(60)
+                yield "b"
+            finally:
+                cancelled.set()
+
+        stream = coalesced_stream("leave", source)
+        assert await stream.__anext__() == "a"
+        await stream.aclose()
+        await asyncio.wait_for(cancelled.wait(), 5)
+
+    asyncio.run(scenario())
+    assert not coalesce_service._streams
+
+
+@pytest.fixture(autouse=True)
+def no_leftover_flights():
+    yield
+    coalesce_service._calls.clear()
+    coalesce_service._streams.clear()
@@ -0,0 +1,34 @@
+"""
+Forecast models: incremental updates and the batch refresh job.
+"""
+
+from utils.data_service import append_sample_rows, ensure_sample_dataset, get_dataset_version
+from utils.forecast_service import FORECAST_METRICS, _load_model, get_forecast, refresh_forecasts
+from utils.job_service import submit_job
+
+from .test_jobs import wait_for
+
+
+def test_forecast_advances_with_the_ledger():
+    entity = "forecast-entity"
+    ensure_sample_dataset(entity)
+    forecast = get_forecast(entity, horizon=14)
+    assert len(forecast) == 14
+    for metric in FORECAST_METRICS:
+        assert (forecast[f"{metric}_lower_95"] <= forecast[f"{metric}_upper_95"]).all()
+    last_date = _load_model(entity).last_date
+
+    append_sample_rows(days=3, entity=entity)
+    advanced = get_forecast(entity, horizon=14)
+    model = _load_model(entity)
+    assert model.version == get_dataset_version(entity)
+    assert (model.last_date - last_date).days == 3
+    assert advanced.index[0] == forecast.index[0] + (model.last_date - last_date)
+
+
+def test_refresh_job_reports_failures_per_entity():
+    ensure_sample_dataset("forecast-entity")
+    status = wait_for(submit_job(refresh_forecasts, ["forecast-entity", "missing/entity"]))
+    assert status["state"] == "done"
+    assert status["result"] == {"refreshed": 1, "failed": ["missing/entity"]}
+    assert status["progress"] == [2, 2]
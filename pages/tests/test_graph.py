@@ -0,0 +1,59 @@
+"""
+Knowledge graph: publishing new versions and picking them up on access.
+"""
+
+import os
+
+from utils import graph_service
+from utils.graph_service import (GRAPH_DIR, SAMPLE_EDGES, SAMPLE_NODES, KnowledgeGraph,
+                                 get_entity_relations, get_knowledge_graph)
+
+
+def _publish(nodes, edges):
+    # As another process would: saved without touching this process's caches
+    graph = KnowledgeGraph.from_edges(nodes, edges)
+    graph.positions = graph_service.compute_layout(graph)
+    graph.save(GRAPH_DIR)
+
+
+def test_graph_saved_elsewhere_replaces_the_loaded_one():
+    _publish(SAMPLE_NODES, SAMPLE_EDGES)
+    before = get_entity_relations("How exposed is Our Company to Supplier A?", hops=1)
+    assert get_knowledge_graph().find("Lender Z") is None
+    assert not any("Lender Z" in relation for relation in before)
+
+    _publish(SAMPLE_NODES + [("Lender Z", "bank")], SAMPLE_EDGES + [("Lender Z", "Our Company", "Finances")])
+    assert get_knowledge_graph().find("Lender Z") is not None
+    after = get_entity_relations("How exposed is Our Company to Supplier A?", hops=1)
+    assert any(relation.startswith("Lender Z (bank) --[Finances]--> Our Company") for relation in after)
+    assert get_entity_relations("Who is Lender Z?", hops=1)
+
+
+def test_published_version_is_the_only_one_read():
+    _publish(SAMPLE_NODES, SAMPLE_EDGES)
+    graph = get_knowledge_graph()
+    assert get_knowledge_graph() is graph
+    _publish(SAMPLE_NODES, SAMPLE_EDGES)
+    reloaded = get_knowledge_graph()
+    assert reloaded is not graph and reloaded.num_edges == graph.num_edges
+    with open(os.path.join(GRAPH_DIR, "CURRENT"), encoding="utf-8") as f:
+        assert graph_service._knowledge_graph[1] == os.path.join(GRAPH_DIR, f.read().strip())
+
+
+def test_agent_starts_each_turn_with_graph_relations(monkeypatch):
+    from langchain_core.messages import AIMessage, HumanMessage
+    from utils import agent_service
+    _publish(SAMPLE_NODES, SAMPLE_EDGES)
+    state = agent_service.EnhancedMessageState(
+        session_id="graph", short_term=[HumanMessage(content="How exposed is Our Company to Supplier A?")])
+    update = agent_service.retrieve_graph_context(state)
+    assert update["graph_context"] and update["long_term"] == update["graph_context"]
+    assert all(relation in get_entity_relations(state.short_term[-1].content) for relation in update["graph_context"])
+
+    # Memory retrieval keeps the relations even when it has nothing to add
+    monkeypatch.setattr(agent_service, "get_vector_store", lambda: None)
+    state = state.model_copy(update=update)
+    assert agent_service.retrieve_context(state)["long_term"] == update["graph_context"]
+
+    state = state.model_copy(update={"short_term": [AIMessage(content="Supplier A")]})
+    assert agent_service.retrieve_graph_context(state) == {"long_term": [], "graph_context": []}
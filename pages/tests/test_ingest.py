@@ -0,0 +1,69 @@
+"""
+Filing ingestion: parallel parsing, parse cache reuse and table output.
+"""
+
+import os
+
+import pandas as pd
+
+from utils import ingest_service
+from utils.ingest_service import _table_paths, ingest_files, remove_tables
+
+
+XBRL = """<?xml version="1.0"?>
+<xbrli:xbrl xmlns:xbrli="http://www.xbrl.org/2003/instance" xmlns:us-gaap="http://fasb.org/us-gaap/2023">
+  <xbrli:context id="FY23">
+    <xbrli:entity><xbrli:identifier scheme="http://www.sec.gov/CIK">0000001</xbrli:identifier></xbrli:entity>
+    <xbrli:period><xbrli:startDate>2023-01-01</xbrli:startDate><xbrli:endDate>2023-12-31</xbrli:endDate></xbrli:period>
+  </xbrli:context>
+  <xbrli:unit id="USD"><xbrli:measure>iso4217:USD</xbrli:measure></xbrli:unit>
+  <us-gaap:Revenues contextRef="FY23" unitRef="USD" decimals="-3">{revenue}</us-gaap:Revenues>
+</xbrli:xbrl>
+"""
+
+
+def _write_filings(root, revenue=1000):
+    paths = []
+    for number in range(ingest_service.INGEST_MIN_PARALLEL_FILES):
+        path = root / f"note-{number}.txt"
+        path.write_text(f"Note {number}")
+        paths.append(str(path))
+    (root / "ledger.csv").write_text("date,revenue\n2023-01-01,5\n")
+    (root / "filing.xml").write_text(XBRL.format(revenue=revenue))
+    (root / "broken.xml").write_text("<not-xbrl/>")
+    return paths + [str(root / "ledger.csv"), str(root / "filing.xml"), str(root / "broken.xml")]
+
+
+def test_ingest_parses_on_the_pool_and_writes_tables(tmp_path, monkeypatch):
+    paths = _write_filings(tmp_path)
+    parsed_in = []
+    original = ingest_service.get_process_pool
+    monkeypatch.setattr(ingest_service, "get_process_pool", lambda: parsed_in.append(1) or original())
+    progress = []
+    results = ingest_files(paths, lambda done, total, message: progress.append(total))
+
+    assert parsed_in, "expected the files to be parsed on the process pool"
+    # The broken filing is skipped rather than aborting the batch
+    assert [path for path, _, _ in results] == paths[:-1]
+    assert progress and set(progress) == {len(paths)}
+    facts = pd.read_parquet(_table_paths(paths[-2])[0])
+    assert facts["value"].tolist() == [1000]
+    assert os.path.exists(_table_paths(paths[-3])[1])
+
+
+def test_reingest_reuses_parses_and_replaces_changed_tables(tmp_path, monkeypatch):
+    paths = _write_filings(tmp_path)
+    known = {path: digest for path, digest, _ in ingest_files(paths)}
+
+    (tmp_path / "filing.xml").write_text(XBRL.format(revenue=2500))
+    parsed = []
+    original = ingest_service.parse_file
+    monkeypatch.setattr(ingest_service, "parse_file", lambda path: parsed.append(path) or original(path))
+    results = ingest_files(paths, known=known)
+    # Only the changed filing and the one that never parsed are parsed again
+    assert sorted(parsed) == sorted(paths[-2:])
+    assert len(results) == len(paths) - 1
+    assert pd.read_parquet(_table_paths(paths[-2])[0])["value"].tolist() == [2500]
+
+    remove_tables(paths)
+    assert not any(os.path.exists(target) for path in paths for target in _table_paths(path))
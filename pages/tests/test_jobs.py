@@ -0,0 +1,73 @@
+"""
+Job queue: progress, results, failures, cancellation and fan-out.
+"""
+
+import os
+import time
+import threading
+
+from utils.job_service import cancel_job, get_job_status, in_pool_worker, pool_map, submit_job
+
+
+def wait_for(job_id: str, timeout: float = 60) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = get_job_status(job_id)
+        if status["state"] not in ("queued", "running"):
+            return status
+        time.sleep(0.02)
+    raise AssertionError(f"Job {job_id} did not finish: {get_job_status(job_id)}")
+
+
+def _task(value):
+    return value * 2, os.getpid(), in_pool_worker()
+
+
+def fan_out(count, progress=None):
+    results = list(pool_map(_task, list(range(count))))
+    progress(count, count, "mapped")
+    return {"values": [value for value, _, _ in results], "pids": {pid for _, pid, _ in results},
+            "in_workers": all(worker for _, _, worker in results), "job_in_worker": in_pool_worker()}
+
+
+def failing(progress=None):
+    raise ValueError("bad input")
+
+
+_release = threading.Event()
+
+
+def blocking(progress=None):
+    for step in range(1000):
+        progress(step, 1000)
+        if _release.wait(0.01):
+            return "released"
+    return "timed out"
+
+
+def test_job_fans_out_over_the_process_pool():
+    status = wait_for(submit_job(fan_out, 8))
+    assert status["state"] == "done"
+    assert status["progress"] == [8, 8] and status["message"] == "mapped"
+    result = status["result"]
+    assert result["values"] == [2 * n for n in range(8)]
+    # The job coordinates from this process; its tasks run in pool workers
+    assert not result["job_in_worker"] and result["in_workers"]
+    assert os.getpid() not in result["pids"]
+
+
+def test_failed_job_records_the_error():
+    status = wait_for(submit_job(failing))
+    assert status["state"] == "failed"
+    assert status["error"] == "bad input" and "ValueError" in status["traceback"]
+
+
+def test_running_job_stops_at_its_next_progress_report():
+    _release.clear()
+    job_id = submit_job(blocking, job_id="test-cancel")
+    while get_job_status(job_id)["state"] != "running":
+        time.sleep(0.01)
+    assert cancel_job(job_id)
+    assert wait_for(job_id)["state"] == "cancelled"
+    assert not cancel_job(job_id)
+    assert get_job_status("unknown-job") is None
@@ -0,0 +1,85 @@
+"""
+Page layouts and callbacks, called as Dash calls them.
+"""
+
+import json
+
+import pytest
+from dash import Patch
+from dash._utils import to_json
+from dash.exceptions import PreventUpdate
+
+
+@pytest.mark.parametrize("name", ["home", "analysis", "visualizations", "reports", "query", "chat"])
+def test_layout_serializes(dash_app, name):
+    import importlib
+    page = importlib.import_module(f"pages.{name}")
+    layout = page.layout() if callable(page.layout) else page.layout
+    assert json.loads(to_json(layout))
+
+
+def test_update_charts_returns_both_figures(dash_app):
+    import pages.visualizations as visualizations
+    time_series, comparative = visualizations.update_charts(1, "12m", "line")
+    assert time_series.data and comparative.data
+    # Date coordinates go out as typed arrays rather than one string per point
+    assert "bdata" in to_json(time_series)
+
+
+def test_report_preview_patches_only_changed_sections(dash_app):
+    import pages.reports as reports
+    template, sections = "quarterly_report", ["financial_metrics", "risk_assessment", "forecast"]
+    children, keys = reports.update_report_preview(template, sections, None, True, False, None)
+    assert len(children) == len(keys)
+
+    preview, fewer = reports.update_report_preview(template, sections[:-1], None, True, False, keys)
+    assert isinstance(preview, Patch)
+    assert fewer == keys[:-1]
+    operations = preview.to_plotly_json()["operations"]
+    assert [op["operation"] for op in operations] == ["Delete"]
+
+    with pytest.raises(PreventUpdate):
+        reports.update_report_preview(template, sections[:-1], None, True, False, fewer)
+
+
+def test_report_preview_rejects_unknown_entity(dash_app):
+    import pages.reports as reports
+    with pytest.raises(PreventUpdate):
+        reports.update_report_preview("quarterly_report", None, ["../../etc"], True, False, None)
+
+
+def test_refresh_charts_sends_only_new_rows(dash_app):
+    import pages.analysis as analysis
+    from utils.analysis_service import get_analysis_engine
+
+    version = get_analysis_engine().version
+    revenue, margin, _, _, new_version = analysis.refresh_charts(lambda progress: None, 1, version)
+    assert new_version == version + 1
+    # One appended feed of SAMPLE_FEED_DAYS rows, not the history
+    assert len(revenue[0]["x"][0]) == len(revenue[0]["y"][0]) == analysis.SAMPLE_FEED_DAYS
+    assert len(margin[0]["y"][0]) == analysis.SAMPLE_FEED_DAYS
+
+
+def test_chart_callbacks_skip_the_initial_call(dash_app):
+    from dash._callback import GLOBAL_CALLBACK_LIST
+    # The visualizations layout already draws these figures on each page load
+    outputs = {"..time-series-chart.figure...comparative-chart.figure..", "risk-heatmap.figure"}
+    # Registered callbacks move to the app's own list once it has served a request
+    callbacks = [callback for callback in dash_app._callback_list + GLOBAL_CALLBACK_LIST
+                 if callback["output"] in outputs]
+    assert len(callbacks) == 2 and all(callback["prevent_initial_call"] for callback in callbacks)
+
+
+def test_reports_layout_lists_entities_added_after_import(dash_app):
+    import pages.reports as reports
+    from utils.data_service import ensure_sample_dataset
+    ensure_sample_dataset("late-entity")
+    assert '"late-entity"' in to_json(reports.layout())
+
+
+def test_export_streams_the_whole_document(monkeypatch):
+    from utils import report_service
+    monkeypatch.setattr(report_service, "REPORT_STREAM_CHUNK_SIZE", 1024)
+    data = bytes(range(256)) * 20
+    chunks = list(report_service.stream_document(data))
+    assert b"".join(chunks) == data and max(map(len, chunks)) == 1024
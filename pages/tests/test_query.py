@@ -0,0 +1,59 @@
+"""
+Query plans: shape caching, slot binding and vectorized execution.
+"""
+
+import pytest
+
+from utils import query_service
+from utils.data_service import DEFAULT_ENTITY, ensure_sample_dataset, load_dataset
+from utils.query_service import QueryPlan, execute_plan, normalize_question, plan_query
+
+
+class FakePlanner:
+    """Stands in for the LLM: plans quarterly revenue questions and counts its calls."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def ainvoke(self, prompt):
+        self.calls.append(prompt)
+        question = prompt.rsplit("Question:", 1)[-1]
+        quarter, year = normalize_question(question)[1][:2]
+        return QueryPlan(metric="revenue", start=f"{year}Q{quarter}", end=f"{year}Q{quarter}",
+                         comparison="previous_year")
+
+
+@pytest.fixture
+def planner(monkeypatch):
+    planner = FakePlanner()
+    monkeypatch.setattr(query_service, "_get_planner", lambda: planner)
+    monkeypatch.setattr(query_service, "_plan_cache", {})
+    return planner
+
+
+def test_normalize_question_slots_years_quarters_and_counts():
+    assert normalize_question("What was revenue in Q3 2023, over the last 6 months?") == \
+        ("what was revenue in <quarter> <year> over the last <n> months", ["3", "2023", "6"])
+
+
+def test_reparameterized_questions_reuse_the_compiled_plan(planner):
+    plan, cached = plan_query("What was revenue in Q4 2023 versus last year?")
+    assert not cached and plan.start == "2023Q4"
+    plan, cached = plan_query("what was revenue in q2 2022 versus last year")
+    assert cached and plan.start == plan.end == "2022Q2" and plan.comparison == "previous_year"
+    assert len(planner.calls) == 1
+
+
+def test_executed_plan_matches_pandas():
+    ensure_sample_dataset()
+    ledger = load_dataset(DEFAULT_ENTITY)
+    result = execute_plan(QueryPlan(metric="revenue", start="2023Q2", end="2023Q2", comparison="previous_year"))
+    current = ledger.loc["2023-04-01":"2023-06-30", "revenue"].sum()
+    prior = ledger.loc["2022-04-01":"2022-06-30", "revenue"].sum()
+    assert result["value"] == pytest.approx(current)
+    assert result["change"] == pytest.approx((current / prior - 1) * 100)
+
+    grouped = execute_plan(QueryPlan(metric="margin", start="2023", end="2023", group_by="quarter"))
+    sums = ledger.loc["2023", ["profit", "revenue"]].groupby(ledger.loc["2023"].index.quarter).sum()
+    assert grouped["table"]["period"].tolist() == ["2023Q1", "2023Q2", "2023Q3", "2023Q4"]
+    assert grouped["table"]["value"].tolist() == pytest.approx((sums["profit"] / sums["revenue"] * 100).tolist())
@@ -0,0 +1,41 @@
+"""
+Report store: pre-rendering, reuse and pruning.
+"""
+
+import os
+import time
+
+from utils import report_service
+from utils.report_service import _object_path, export_document, prerender_reports, prune_report_store, store_document
+
+
+COMBINATIONS = [
+    {"template": "quarterly_report", "sections": ["financial_metrics"], "options": (), "fmt": "xlsx"},
+    {"template": "quarterly_report", "sections": ["risk_assessment"], "options": (), "fmt": "xlsx"},
+    {"template": "quarterly_report", "entities": ["../../etc"], "fmt": "xlsx"},
+]
+
+
+def test_prerender_fans_out_then_serves_from_the_store():
+    progress = []
+    counts = prerender_reports(COMBINATIONS, lambda done, total, message: progress.append((done, total)))
+    assert counts == {"generated": 2, "cached": 0, "failed": 1}
+    assert progress[-1] == (3, 3)
+
+    assert prerender_reports(COMBINATIONS[:2]) == {"generated": 0, "cached": 2, "failed": 0}
+    assert export_document(**COMBINATIONS[0])["cached"]
+
+
+def test_prune_keeps_documents_stored_after_it_started():
+    old = store_document("0" * 64, b"old document", {"sample": 0})
+    new = store_document("1" * 64, b"new document", {"sample": 0})
+    os.remove(report_service._ref_path("0" * 64))
+    os.remove(report_service._ref_path("1" * 64))
+    past = time.time() - 60
+    os.utime(_object_path(old), (past, past))
+    os.utime(_object_path(new), (time.time() + 60,) * 2)
+
+    prune_report_store()
+    assert not os.path.exists(_object_path(old))
+    # Unreferenced, but possibly written by a pre-render whose ref is not published yet
+    assert os.path.exists(_object_path(new))
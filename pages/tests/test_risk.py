@@ -0,0 +1,39 @@
+"""
+Stress test matrices: impact binning and the per-version cache.
+"""
+
+import threading
+
+import numpy as np
+
+from utils import risk_service
+from utils.risk_service import IMPACT_LEVELS, RISK_CATEGORIES, STRESS_SCENARIOS, compute_risk_matrices, run_stress_tests
+
+
+def test_losses_land_in_their_own_scenario_and_level():
+    # A hedge that gains under stress, a small loss and a critical loss, all in one category
+    exposure = np.array([-50.0, 3.0, 500.0])
+    category = np.zeros(3, dtype=np.int64)
+    probability, severity = np.full(3, 0.5), np.ones(3)
+    multipliers = np.ones((2, len(RISK_CATEGORIES)))
+    matrices = compute_risk_matrices(exposure, probability, severity, category, multipliers, multipliers, 1000.0)
+
+    assert matrices.shape == (2, len(IMPACT_LEVELS), len(RISK_CATEGORIES))
+    for matrix in matrices:
+        # The gain nets against the lowest level instead of spilling into the next scenario
+        assert matrix[IMPACT_LEVELS.index("Minimal"), 0] == 0.5 * (-50.0 + 3.0)
+        assert matrix[IMPACT_LEVELS.index("Critical"), 0] == 0.5 * 500.0
+        assert np.count_nonzero(matrix) == 2
+
+
+def test_concurrent_stress_tests_share_one_cache():
+    risk_service._matrix_cache.clear()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(run_stress_tests())) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 6
+    for name in STRESS_SCENARIOS:
+        assert all(result[name] is results[0][name] for result in results)
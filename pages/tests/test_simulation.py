@@ -0,0 +1,35 @@
+"""
+Monte Carlo simulation: reproducibility, streamed partials and scenarios.
+"""
+
+import numpy as np
+
+from utils import simulation_service
+from utils.data_service import ensure_sample_dataset
+from utils.simulation_service import SIMULATION_METRICS, run_simulation
+
+
+def test_pooled_run_is_reproducible_and_streams_partials(monkeypatch):
+    ensure_sample_dataset()
+    monkeypatch.setattr(simulation_service, "SIMULATION_CHUNK_PATHS", 200)
+    updates = []
+    first = run_simulation(paths=800, horizon=70, progress=lambda done, total, partial: updates.append((done, total, partial)))
+    second = run_simulation(paths=800, horizon=70)
+
+    assert [(done, total) for done, total, _ in updates] == [(1, 4), (2, 4), (3, 4), (4, 4)]
+    # Partial bands cover the finished chunks only; the last update carries no partial
+    assert [partial["paths"] for _, _, partial in updates[:-1]] == [200, 400, 600] and updates[-1][2] is None
+    assert first["paths"] == 800 and list(first["days"]) == [7 * n for n in range(1, 11)]
+    for metric in SIMULATION_METRICS:
+        np.testing.assert_array_equal(first[metric], second[metric])
+        # Percentile bands are ordered at every point
+        assert (np.diff(first[metric], axis=0) >= 0).all()
+
+
+def test_recession_lowers_revenue():
+    ensure_sample_dataset()
+    baseline = run_simulation(scenario="baseline", paths=500, horizon=182)
+    recession = run_simulation(scenario="recession", paths=500, horizon=182)
+    median = baseline["percentiles"].index(50)
+    assert recession["revenue"][median, -1] < baseline["revenue"][median, -1]
+    assert recession["scenario"] == "recession"
@@ -0,0 +1,72 @@
+"""
+Guards on the read-only SQL tool, and keeping its query out of the chat stream.
+"""
+
+import pytest
+
+from utils.sql_service import SQLQueryError, run_sql
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM ledger",
+    "DROP VIEW ledger",
+    "CREATE TABLE t AS SELECT 1",
+    "COPY (SELECT 1) TO 'out.csv'",
+    "ATTACH 'other.db'",
+    "SET memory_limit = '10GB'",
+    "SELECT 1; SELECT 2",
+    "SELEC 1",
+])
+def test_rejects_anything_but_one_select(sql):
+    with pytest.raises(SQLQueryError):
+        run_sql(sql)
+
+
+def test_rejects_files_outside_the_data_directory():
+    with pytest.raises(SQLQueryError):
+        run_sql("SELECT * FROM read_csv('/etc/passwd')")
+
+
+def test_select_is_capped_and_cached():
+    result = run_sql("SELECT date, revenue FROM ledger ORDER BY date", max_rows=5)
+    assert result["columns"] == ["date", "revenue"]
+    assert len(result["rows"]) == 5 and result["truncated"]
+
+    again = run_sql("  SELECT date, revenue\n  FROM ledger ORDER BY date; ", max_rows=5)
+    assert again["cached"] and again["rows"] == result["rows"]
+
+
+def test_aggregate_over_ledger():
+    result = run_sql("SELECT entity, count(*) AS days FROM ledger GROUP BY entity ORDER BY entity")
+    assert result["columns"] == ["entity", "days"]
+    assert all(days > 0 for _, days in result["rows"])
+
+
+def test_agent_streams_only_the_reply(monkeypatch):
+    import asyncio
+    from types import SimpleNamespace
+    from utils import agent_service
+
+    def token(text, node, tags=()):
+        return {"event": "on_chat_model_stream", "data": {"chunk": SimpleNamespace(content=text)},
+                "metadata": {"langgraph_node": node}, "tags": list(tags)}
+
+    events = [
+        token("SELECT SUM(revenue) FROM ledger", "sql_retrieve", [agent_service.INTERNAL_TAG]),
+        token("relevant part", "generate", [agent_service.INTERNAL_TAG]),
+        token("Revenue was ", "generate"),
+        {"event": "on_tool_end", "data": {}, "metadata": {"langgraph_node": "retrieve"}, "tags": []},
+        token("1.2M.", "generate"),
+    ]
+
+    class FakeGraph:
+        async def astream_events(self, *args, **kwargs):
+            for event in events:
+                yield event
+
+    monkeypatch.setattr(agent_service, "get_agent_executor", lambda: FakeGraph())
+
+    async def collect():
+        return [chunk async for chunk in agent_service.handle_agent_message("session", "What was revenue?")]
+
+    assert asyncio.run(collect()) == ["Revenue was ", "1.2M."]
@@ -0,0 +1,85 @@
+"""
+Server-Sent Event framing: coalescing, ordering, heartbeats and endings.
+"""
+
+import json
+import time
+import asyncio
+import threading
+
+from utils.stream_service import StreamEvent, asse_stream, format_sse, sse_stream
+
+
+def parse(frames):
+    """(event, id, data) per frame, checking each frame is well formed."""
+    events = []
+    for frame in frames:
+        assert frame.endswith("\n\n") and frame.count("\n") in (3, 4)
+        fields = dict(line.split(": ", 1) for line in frame.strip("\n").split("\n"))
+        events.append((fields["event"], int(fields["id"]) if "id" in fields else None, json.loads(fields["data"])))
+    return events
+
+
+def test_data_stays_on_one_line():
+    frame = format_sse("token", {"text": "line one\n\ndata: spoofed"}, 3)
+    assert parse([frame]) == [("token", 3, {"text": "line one\n\ndata: spoofed"})]
+
+
+def test_fast_tokens_coalesce_into_one_event():
+    events = parse(sse_stream(iter(["Rev", "enue ", "grew\n", "12%"]), flush_interval=5))
+    assert events == [("token", 1, {"text": "Revenue grew\n12%"}), ("done", None, {"events": 1, "chars": 16})]
+
+
+def test_buffer_limit_and_stream_events_flush_in_order():
+    source = ["a" * 6, "b" * 6, StreamEvent("queued", {"position": 2}), "c"]
+    events = parse(sse_stream(iter(source), flush_interval=5, max_buffer_chars=10))
+    assert events == [
+        ("token", 1, {"text": "aaaaaabbbbbb"}),
+        ("queued", None, {"position": 2}),
+        ("token", 2, {"text": "c"}),
+        ("done", None, {"events": 2, "chars": 13}),
+    ]
+
+
+def test_silence_sends_heartbeats_then_the_error():
+    def slow():
+        yield "partial"
+        time.sleep(0.25)
+        raise RuntimeError("model unavailable")
+
+    events = parse(sse_stream(slow(), flush_interval=0.01, heartbeat_interval=0.05))
+    kinds = [kind for kind, _, _ in events]
+    assert kinds[0] == "token" and kinds[-1] == "error" and "done" not in kinds
+    assert kinds.count("heartbeat") >= 2
+    assert "model unavailable" in events[-1][2]["message"]
+
+
+def test_closing_the_stream_stops_the_producer():
+    stopped = threading.Event()
+
+    def endless():
+        try:
+            while True:
+                yield "x"
+                time.sleep(0.01)
+        finally:
+            stopped.set()
+
+    stream = sse_stream(endless(), flush_interval=0)
+    next(stream)
+    stream.close()  # Client disconnected
+    assert stopped.wait(5)
+
+
+def test_async_stream_frames_async_and_sync_sources_alike():
+    async def tokens():
+        for token in ["Net ", "profit ", "rose"]:
+            await asyncio.sleep(0)
+            yield token
+
+    async def collect(source):
+        return [frame async for frame in asse_stream(source, flush_interval=5)]
+
+    expected = [("token", 1, {"text": "Net profit rose"}), ("done", None, {"events": 1, "chars": 15})]
+    assert parse(asyncio.run(collect(tokens()))) == expected
+    assert parse(asyncio.run(collect(iter(["Net ", "profit ", "rose"])))) == expected
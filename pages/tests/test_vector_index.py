@@ -0,0 +1,103 @@
+"""
+Quantized vector index: search, filters, deletes and cross-instance reads.
+"""
+
+import os
+import zlib
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from utils import vector_index_service
+from utils.vector_index_service import QuantizedVectorStore
+
+
+class WordEmbeddings(Embeddings):
+    """Deterministic bag-of-words vectors, so related texts score higher."""
+
+    dim = 64
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split():
+            vector[zlib.crc32(word.encode()) % self.dim] += 1
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+TEXTS = ["quarterly revenue grew", "operating expenses fell", "net profit margin widened",
+         "market index declined", "liquidity risk is low", "supplier concentration risk"]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = QuantizedVectorStore(str(tmp_path / "index"), WordEmbeddings())
+    store.add_texts(TEXTS, [{"source": f"doc{i % 2}.txt", "page": i} for i in range(len(TEXTS))])
+    return store
+
+
+def test_search_ranks_the_matching_text_first(store):
+    results = store.similarity_search_with_score("quarterly revenue grew", k=3)
+    assert results[0][0].page_content == "quarterly revenue grew"
+    assert results[0][1] == pytest.approx(1.0, abs=1e-5)
+    assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+
+
+def test_filters_and_deletes_apply_to_search_and_get(store):
+    hits = store.similarity_search("risk", k=4, filter={"source": "doc1.txt"})
+    assert hits and all(doc.metadata["source"] == "doc1.txt" for doc in hits)
+    assert store.get(where={"$and": [{"source": "doc0.txt"}, {"page": {"$gte": 2}}]})["documents"] == \
+        ["net profit margin widened", "liquidity risk is low"]
+
+    target = store.similarity_search("liquidity risk is low", k=1)[0]
+    assert store.delete([target.id])
+    assert "liquidity risk is low" not in [doc.page_content for doc in store.similarity_search("liquidity risk", k=6)]
+    assert store.get(ids=[target.id])["ids"] == []
+    assert store.stats()["deleted"] == 1
+
+
+def test_other_instances_see_published_writes(store):
+    reader = QuantizedVectorStore(store.directory, WordEmbeddings())
+    assert reader.stats()["vectors"] == len(TEXTS)
+    store.add_texts(["cash flow from operations"])
+    assert reader.similarity_search("cash flow from operations", k=1)[0].page_content == "cash flow from operations"
+
+
+def test_interrupted_append_is_dropped(store):
+    # A writer that died after appending rows but before publishing index.json
+    with open(os.path.join(store.directory, "codes.i8"), "ab") as f:
+        f.write(b"\x01" * WordEmbeddings.dim * 3)
+    store.add_texts(["dividend policy unchanged"])
+    assert store.stats()["vectors"] == len(TEXTS) + 1
+    assert os.path.getsize(os.path.join(store.directory, "codes.i8")) == (len(TEXTS) + 1) * WordEmbeddings.dim
+    assert store.similarity_search("dividend policy unchanged", k=1)[0].page_content == "dividend policy unchanged"
+
+
+def test_ivf_search_matches_exact_search(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_index_service, "INDEX_TRAIN_MIN_VECTORS", 256)
+    rng = np.random.default_rng(0)
+    # Clustered, like embeddings of documents on a handful of topics
+    topics = rng.normal(size=(12, 32))
+    vectors = (topics[rng.integers(0, 12, 600)] + 0.3 * rng.normal(size=(600, 32))).astype(np.float32)
+    store = QuantizedVectorStore(str(tmp_path / "ivf"), WordEmbeddings(), nprobe=16)
+    store.add_vectors(vectors, [str(i) for i in range(len(vectors))])
+    nlist = store.stats()["nlist"]
+    assert nlist > 0
+
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = (topics[rng.integers(0, 12, 20)] + 0.3 * rng.normal(size=(20, 32))).astype(np.float32)
+    exhaustive = QuantizedVectorStore(store.directory, WordEmbeddings(), nprobe=nlist)
+    hits = 0
+    for query in queries:
+        exact = np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:5].tolist()
+        found = [int(doc.page_content) for doc in store.similarity_search_by_vector(query.tolist(), k=5)]
+        hits += len(set(found) & set(exact))
+        # Probing every list leaves only int8 scoring, which the exact re-rank corrects
+        assert [int(doc.page_content) for doc in exhaustive.similarity_search_by_vector(query.tolist(), k=5)] == exact
+    assert hits / (len(queries) * 5) >= 0.9
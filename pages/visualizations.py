@@ -1,4 +1,5 @@
 from dash import html, dcc, Input, Output, State, callback
+from dash.exceptions import PreventUpdate
 import dash_mantine_components as dmc
 from dash_iconify import DashIconify
 import plotly.graph_objects as go
@@ -6,7 +7,15 @@ import plotly.express as px
 import pandas as pd
 import numpy as np
 import dash
-import networkx as nx
+
+from utils.data_service import load_dataset
+from utils.figure_service import compact_figure
+from utils.forecast_service import get_forecast
+from utils.graph_service import get_knowledge_graph
+from utils.risk_service import (
+    RISK_CATEGORIES, IMPACT_LEVELS, RISK_LIMIT_SHARE, STRESS_SCENARIOS, get_risk_matrix
+)
+from utils.simulation_service import SIMULATION_SCENARIOS, SIMULATION_HORIZON_DAYS, run_simulation
 
 # Register this module as a page with Dash Pages
 dash.register_page(__name__, path='/visualizations')
@@ -29,20 +38,53 @@ def create_sample_data():
 df = create_sample_data()
 
 # Time series analysis with financial visualization best practices
-def create_time_series_chart():
+TIME_RANGE_DAYS = {'3m': 90, '6m': 182, '12m': 365}
+FORECAST_COLORS = {'revenue': '20, 125, 100', 'expenses': '191, 38, 0'}
+
+
+def filter_time_range(data, time_range):
+    """Trailing rows for a time-range option ('ytd' starts at the latest year, 'all' keeps everything)."""
+    if data.empty or time_range == 'all':
+        return data
+    if time_range == 'ytd':
+        return data[data.index >= pd.Timestamp(year=data.index.max().year, month=1, day=1)]
+    return data[data.index > data.index.max() - pd.Timedelta(days=TIME_RANGE_DAYS.get(time_range, 365))]
+
+
+def create_time_series_chart(time_range='12m'):
+    ledger = filter_time_range(load_dataset(), time_range)
+    forecast = get_forecast()
     time_series_fig = go.Figure()
     time_series_fig.add_trace(go.Scatter(
-        x=df.index,
-        y=df['revenue'],
+        x=ledger.index,
+        y=ledger['revenue'],
         name='Revenue',
         line=dict(color='#147D64')  # muted green from design doc
     ))
     time_series_fig.add_trace(go.Scatter(
-        x=df.index,
-        y=df['expenses'],
+        x=ledger.index,
+        y=ledger['expenses'],
         name='Expenses',
         line=dict(color='#BF2600')  # muted red from design doc
     ))
+    # Forecast overlays: 95% band and point forecast continuing each series
+    for metric in ('revenue', 'expenses') if not forecast.empty else ():
+        rgb = FORECAST_COLORS[metric]
+        time_series_fig.add_trace(go.Scatter(
+            x=forecast.index.append(forecast.index[::-1]),
+            y=np.concatenate([forecast[f'{metric}_upper_95'], forecast[f'{metric}_lower_95'][::-1]]),
+            fill='toself',
+            fillcolor=f'rgba({rgb}, 0.12)',
+            line=dict(width=0),
+            hoverinfo='skip',
+            showlegend=False
+        ))
+        time_series_fig.add_trace(go.Scatter(
+            x=forecast.index,
+            y=forecast[metric],
+            name=f'{metric.title()} Forecast',
+            line=dict(color=f'rgb({rgb})', dash='dash')
+        ))
     time_series_fig.update_layout(
         title=None,
         height=420,
@@ -62,7 +104,7 @@ def create_time_series_chart():
             tickprefix='$'
         )
     )
-    return time_series_fig
+    return compact_figure(time_series_fig)
 
 # Comparative analysis
 def create_comparative_chart():
@@ -104,27 +146,22 @@ def create_comparative_chart():
             tickprefix='$'
         )
     )
-    return comparative_fig
+    return compact_figure(comparative_fig)
 
 # Risk assessment heat map
-def create_risk_heatmap():
-    # More realistic risk data for finance
-    categories = ['Market', 'Credit', 'Operational', 'Liquidity', 'Regulatory']
-    impact_levels = ['Critical', 'High', 'Medium', 'Low', 'Minimal']
-    
-    # Example risk data (higher value = higher risk)
-    risk_data = [
-        [0.9, 0.7, 0.6, 0.4, 0.8],  # Critical impact
-        [0.8, 0.6, 0.5, 0.3, 0.7],  # High impact
-        [0.6, 0.4, 0.5, 0.2, 0.5],  # Medium impact
-        [0.3, 0.2, 0.3, 0.1, 0.4],  # Low impact
-        [0.1, 0.1, 0.2, 0.1, 0.2],  # Minimal impact
-    ]
+def create_risk_heatmap(scenario="baseline"):
+    # Expected losses per impact level and risk category for the selected stress scenario
+    matrix, capital = get_risk_matrix(scenario)
+    limit = capital * RISK_LIMIT_SHARE
     
     risk_fig = go.Figure(data=go.Heatmap(
-        z=risk_data,
-        x=categories,
-        y=impact_levels,
+        z=np.clip(matrix / limit, 0, 1),
+        x=RISK_CATEGORIES,
+        y=IMPACT_LEVELS,
+        zmin=0,
+        zmax=1,
+        customdata=matrix,
+        hovertemplate="%{x} / %{y}<br>Expected loss: $%{customdata:,.0f}<extra></extra>",
         colorscale=[
             [0, '#147D64'],    # Low risk (muted green)
             [0.5, '#FFB703'],  # Medium risk (amber)
@@ -159,80 +196,63 @@ def create_risk_heatmap():
     return risk_fig
 
 # Network graph to demonstrate GraphRAG relationships
-def create_relationship_graph():
-    # Create a directed graph
-    G = nx.DiGraph()
-    
-    # Add financial entities
-    entities = [
-        'Our Company', 'Supplier A', 'Supplier B', 'Customer X', 
-        'Customer Y', 'Bank', 'Competitor A', 'Distributor'
-    ]
-    
-    # Add nodes
-    for entity in entities:
-        G.add_node(entity)
-    
-    # Add relationships
-    edges = [
-        ('Our Company', 'Supplier A', 'Sources from'),
-        ('Our Company', 'Supplier B', 'Sources from'),
-        ('Customer X', 'Our Company', 'Buys from'),
-        ('Customer Y', 'Our Company', 'Buys from'),
-        ('Bank', 'Our Company', 'Finances'),
-        ('Our Company', 'Distributor', 'Ships through'),
-        ('Distributor', 'Customer X', 'Delivers to'),
-        ('Distributor', 'Customer Y', 'Delivers to'),
-        ('Supplier A', 'Competitor A', 'Also supplies'),
-        ('Competitor A', 'Customer X', 'Also sells to')
-    ]
-    
-    for source, target, relation in edges:
-        G.add_edge(source, target, relationship=relation)
-    
-    # Create positions
-    pos = nx.spring_layout(G, seed=42)
+NODE_COLORS = {
+    'company': '#0A3D62',
+    'supplier': '#147D64',
+    'customer': '#FF8800',
+}
+DEFAULT_GRAPH_FOCUS = 'Our Company'
+GRAPH_FOCUS_HOPS = 2
+GRAPH_MAX_NODES = 200
+GRAPH_SIZE_OPTIONS = [200, 1000, 5000]
+# Above this many nodes the graph is drawn with WebGL and without labels
+GRAPH_WEBGL_THRESHOLD = 500
+
+
+def create_relationship_graph(focus=DEFAULT_GRAPH_FOCUS, hops=GRAPH_FOCUS_HOPS, max_nodes=GRAPH_MAX_NODES):
+    """Render the neighborhood of `focus` from the knowledge graph using its cached layout."""
+    graph = get_knowledge_graph()
+    focus_id = graph.find(focus) if focus else None
+    if focus_id is None:
+        focus_id = graph.find(DEFAULT_GRAPH_FOCUS)
+    nodes = graph.neighborhood([focus_id if focus_id is not None else 0], hops=hops, max_nodes=max_nodes)
+    sources, targets, _ = graph.subgraph_edges(nodes)
+    pos = np.asarray(graph.positions)
+    large = len(nodes) > GRAPH_WEBGL_THRESHOLD
+    scatter = go.Scattergl if large else go.Scatter
     
-    # Create edges
-    edge_trace = []
-    for edge in G.edges():
-        x0, y0 = pos[edge[0]]
-        x1, y1 = pos[edge[1]]
-        
-        edge_trace.append(
-            go.Scatter(
-                x=[x0, x1], y=[y0, y1],
-                line=dict(width=1, color='#4C5862'),
-                mode='lines',
-                hoverinfo='none'
-            )
-        )
+    # Create edges as a single trace, each segment followed by a NaN break
+    gap = np.full(len(sources), np.nan)
+    edge_trace = scatter(
+        x=np.column_stack([pos[sources, 0], pos[targets, 0], gap]).ravel(),
+        y=np.column_stack([pos[sources, 1], pos[targets, 1], gap]).ravel(),
+        line=dict(width=0.5 if large else 1, color='#4C5862'),
+        mode='lines',
+        connectgaps=False,
+        hoverinfo='none'
+    )
     
     # Create nodes
-    node_trace = go.Scatter(
-        x=[pos[node][0] for node in G.nodes()],
-        y=[pos[node][1] for node in G.nodes()],
-        mode='markers+text',
+    names = [str(graph.names[node]) for node in nodes]
+    types = [graph.node_type(node) for node in nodes]
+    node_trace = scatter(
+        x=pos[nodes, 0],
+        y=pos[nodes, 1],
+        mode='markers' if large else 'markers+text',
         marker=dict(
             showscale=False,
-            colorscale='YlGnBu',
-            size=15,
-            color=[
-                '#0A3D62' if node == 'Our Company' 
-                else '#147D64' if 'Supplier' in node 
-                else '#FF8800' if 'Customer' in node
-                else '#4C5862'
-                for node in G.nodes()
-            ],
-            line=dict(width=2, color='white')
+            size=[20 if node == focus_id else 6 if large else 15 for node in nodes],
+            color=[NODE_COLORS.get(node_type, '#4C5862') for node_type in types],
+            line=dict(width=1 if large else 2, color='white')
         ),
-        text=list(G.nodes()),
+        text=None if large else names,
+        hovertext=[f"{name} ({node_type})" for name, node_type in zip(names, types)],
         textposition='top center',
         hoverinfo='text'
     )
     
     # Create the figure
-    fig = go.Figure(data=edge_trace + [node_trace])
+    fig = go.Figure(data=[edge_trace, node_trace])
     fig.update_layout(
         title=None,
         showlegend=False,
@@ -248,148 +268,287 @@ def create_relationship_graph():
     
     return fig
 
-# Define the page layout
-layout = dmc.Container([
-    # Header with context
-    dmc.Stack([
-        dmc.Title("Financial Visualizations", order=1, c="#0A3D62", style={"fontSize": "28px"}),
-        dmc.Text("Interactive charts for financial analysis and insights", c="#333F48", size="md"),
-    ], gap="xs", mb="md"),
+# Monte Carlo fan chart
+SIMULATION_METRIC_LABELS = {
+    'cash_flow': 'Cumulative Cash Flow',
+    'revenue': 'Daily Revenue',
+    'expenses': 'Daily Expenses',
+}
+SIMULATION_PATH_OPTIONS = [10_000, 50_000, 100_000]
+
+
+def create_fan_chart(summary=None, metric='cash_flow'):
+    """Percentile fan chart (5-95 and 25-75 bands around the median) for a simulation summary."""
+    fan_fig = go.Figure()
+    if summary is not None:
+        days = summary['days']
+        bands = summary[metric]
+        for lower, upper, color in ((0, 4, 'rgba(10, 61, 98, 0.15)'), (1, 3, 'rgba(10, 61, 98, 0.3)')):
+            fan_fig.add_trace(go.Scatter(
+                x=np.concatenate([days, days[::-1]]),
+                y=np.concatenate([bands[upper], bands[lower][::-1]]),
+                fill='toself',
+                fillcolor=color,
+                line=dict(width=0),
+                hoverinfo='skip',
+                name=f"P{summary['percentiles'][lower]}-P{summary['percentiles'][upper]}"
+            ))
+        fan_fig.add_trace(go.Scatter(
+            x=days,
+            y=bands[2],
+            name='Median',
+            line=dict(color='#0A3D62')
+        ))
+    fan_fig.update_layout(
+        title=None,
+        height=420,
+        template='plotly_white',
+        margin=dict(l=10, r=10, t=20, b=10),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        font=dict(family="IBM Plex Sans, sans-serif"),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        xaxis=dict(
+            title='Days Ahead',
+            gridcolor='#E0E0E0'
+        ),
+        yaxis=dict(
+            title=SIMULATION_METRIC_LABELS[metric],
+            gridcolor='#E0E0E0',
+            tickprefix='$'
+        )
+    )
+    return fan_fig
+
+# Define the page layout, built per page load from the current data
+def layout(**kwargs):
+    return dmc.Container([
+        # Header with context
+        dmc.Stack([
+            dmc.Title("Financial Visualizations", order=1, c="#0A3D62", style={"fontSize": "28px"}),
+            dmc.Text("Interactive charts for financial analysis and insights", c="#333F48", size="md"),
+        ], gap="xs", mb="md"),
     
-    # Visualization Controls
-    dmc.Paper([
-        dmc.Group([
+        # Visualization Controls
+        dmc.Paper([
             dmc.Group([
-                DashIconify(icon="carbon:chart-area", width=24, color="#0A3D62"),
-                dmc.Title("Visualization Controls", order=5, c="#333F48")
-            ], gap="xs"),
-            dmc.Group([
-                dmc.Select(
-                    label="Time Range",
-                    placeholder="Select time range",
-                    id="time-range-select",
-                    value="12m",
-                    data=[
-                        {"value": "3m", "label": "Last 3 Months"},
-                        {"value": "6m", "label": "Last 6 Months"},
-                        {"value": "12m", "label": "Last 12 Months"},
-                        {"value": "ytd", "label": "Year to Date"},
-                        {"value": "all", "label": "All Time"}
-                    ],
-                    style={"width": 200}
-                ),
-                dmc.Select(
-                    label="Chart Type",
-                    placeholder="Select chart type",
-                    id="chart-type-select",
-                    value="all",
-                    data=[
-                        {"value": "all", "label": "All Charts"},
-                        {"value": "time", "label": "Time Series"},
-                        {"value": "comparison", "label": "Comparatives"},
-                        {"value": "risk", "label": "Risk Analysis"},
-                        {"value": "relationship", "label": "Relationships"}
-                    ],
-                    style={"width": 200}
-                ),
-                dmc.Button(
-                    "Update Visualizations",
-                    id="update-viz-button",
-                    leftSection=DashIconify(icon="carbon:update-now"),
-                    color="#0A3D62",
-                    radius="md"
-                )
-            ], gap="md")
-        ], justify="space-between", align="flex-end")
-    ], p="md", shadow="sm", radius="md", withBorder=True, mb="md"),
+                dmc.Group([
+                    DashIconify(icon="carbon:chart-area", width=24, color="#0A3D62"),
+                    dmc.Title("Visualization Controls", order=5, c="#333F48")
+                ], gap="xs"),
+                dmc.Group([
+                    dmc.Select(
+                        label="Time Range",
+                        placeholder="Select time range",
+                        id="time-range-select",
+                        value="12m",
+                        data=[
+                            {"value": "3m", "label": "Last 3 Months"},
+                            {"value": "6m", "label": "Last 6 Months"},
+                            {"value": "12m", "label": "Last 12 Months"},
+                            {"value": "ytd", "label": "Year to Date"},
+                            {"value": "all", "label": "All Time"}
+                        ],
+                        style={"width": 200}
+                    ),
+                    dmc.Select(
+                        label="Chart Type",
+                        placeholder="Select chart type",
+                        id="chart-type-select",
+                        value="all",
+                        data=[
+                            {"value": "all", "label": "All Charts"},
+                            {"value": "time", "label": "Time Series"},
+                            {"value": "comparison", "label": "Comparatives"},
+                            {"value": "risk", "label": "Risk Analysis"},
+                            {"value": "relationship", "label": "Relationships"}
+                        ],
+                        style={"width": 200}
+                    ),
+                    dmc.Button(
+                        "Update Visualizations",
+                        id="update-viz-button",
+                        leftSection=DashIconify(icon="carbon:update-now"),
+                        color="#0A3D62",
+                        radius="md"
+                    )
+                ], gap="md")
+            ], justify="space-between", align="flex-end")
+        ], p="md", shadow="sm", radius="md", withBorder=True, mb="md"),
     
-    # Main Visualizations Grid
-    dmc.SimpleGrid(
-        cols=2,
-        spacing="md",
-        children=[
-            # Time Series Chart
-            dmc.Paper([
-                dmc.Stack([
-                    dmc.Group([
-                        dmc.Title("Revenue & Expenses Over Time", order=5, c="#333F48"),
-                        dmc.ActionIcon(
-                            DashIconify(icon="carbon:overflow-menu-horizontal"),
-                            color="gray",
-                            variant="subtle",
-                            size="md"
+        # Main Visualizations Grid
+        dmc.SimpleGrid(
+            cols=2,
+            spacing="md",
+            children=[
+                # Time Series Chart
+                dmc.Paper([
+                    dmc.Stack([
+                        dmc.Group([
+                            dmc.Title("Revenue & Expenses Over Time", order=5, c="#333F48"),
+                            dmc.ActionIcon(
+                                DashIconify(icon="carbon:overflow-menu-horizontal"),
+                                color="gray",
+                                variant="subtle",
+                                size="md"
+                            )
+                        ], justify="space-between"),
+                        dcc.Graph(
+                            id="time-series-chart",
+                            figure=create_time_series_chart(),
+                            config={"displayModeBar": False}
                         )
-                    ], justify="space-between"),
-                    dcc.Graph(
-                        id="time-series-chart",
-                        figure=create_time_series_chart(),
-                        config={"displayModeBar": False}
-                    )
-                ], gap="xs")
-            ], p="md", shadow="sm", radius="md", withBorder=True, mb="lg"),
+                    ], gap="xs")
+                ], p="md", shadow="sm", radius="md", withBorder=True, mb="lg"),
             
-            # Comparative Analysis Chart
-            dmc.Paper([
-                dmc.Stack([
-                    dmc.Group([
-                        dmc.Title("Competitive Comparison", order=5, c="#333F48"),
-                        dmc.ActionIcon(
-                            DashIconify(icon="carbon:overflow-menu-horizontal"),
-                            color="gray", 
-                            variant="subtle",
-                            size="md"
+                # Comparative Analysis Chart
+                dmc.Paper([
+                    dmc.Stack([
+                        dmc.Group([
+                            dmc.Title("Competitive Comparison", order=5, c="#333F48"),
+                            dmc.ActionIcon(
+                                DashIconify(icon="carbon:overflow-menu-horizontal"),
+                                color="gray", 
+                                variant="subtle",
+                                size="md"
+                            )
+                        ], justify="space-between"),
+                        dcc.Graph(
+                            id="comparative-chart",
+                            figure=create_comparative_chart(),
+                            config={"displayModeBar": False}
                         )
-                    ], justify="space-between"),
-                    dcc.Graph(
-                        id="comparative-chart",
-                        figure=create_comparative_chart(),
-                        config={"displayModeBar": False}
-                    )
-                ], gap="xs")
-            ], p="md", shadow="sm", radius="md", withBorder=True, mb="lg"),
+                    ], gap="xs")
+                ], p="md", shadow="sm", radius="md", withBorder=True, mb="lg"),
             
-            # Risk Assessment Heatmap
-            dmc.Paper([
-                dmc.Stack([
-                    dmc.Group([
-                        dmc.Title("Risk Assessment Heatmap", order=5, c="#333F48"),
-                        dmc.ActionIcon(
-                            DashIconify(icon="carbon:overflow-menu-horizontal"),
-                            color="gray",
-                            variant="subtle",
-                            size="md"
+                # Risk Assessment Heatmap
+                dmc.Paper([
+                    dmc.Stack([
+                        dmc.Group([
+                            dmc.Title("Risk Assessment Heatmap", order=5, c="#333F48"),
+                            dmc.Select(
+                                id="risk-scenario-select",
+                                data=[
+                                    {"value": name, "label": name.replace("_", " ").title()}
+                                    for name in STRESS_SCENARIOS
+                                ],
+                                value="baseline",
+                                size="xs",
+                                w=170,
+                                style={"marginLeft": "auto"}
+                            ),
+                            dmc.ActionIcon(
+                                DashIconify(icon="carbon:overflow-menu-horizontal"),
+                                color="gray",
+                                variant="subtle",
+                                size="md"
+                            )
+                        ], justify="space-between"),
+                        dcc.Graph(
+                            id="risk-heatmap",
+                            figure=create_risk_heatmap(),
+                            config={"displayModeBar": False}
                         )
-                    ], justify="space-between"),
-                    dcc.Graph(
-                        id="risk-heatmap",
-                        figure=create_risk_heatmap(),
-                        config={"displayModeBar": False}
-                    )
-                ], gap="xs")
-            ], p="md", shadow="sm", radius="md", withBorder=True, mb="lg"),
+                    ], gap="xs")
+                ], p="md", shadow="sm", radius="md", withBorder=True, mb="lg"),
             
-            # Financial Relationship Graph
-            dmc.Paper([
-                dmc.Stack([
+                # Financial Relationship Graph
+                dmc.Paper([
+                    dmc.Stack([
+                        dmc.Group([
+                            dmc.Title("Financial Relationship Graph", order=5, c="#333F48"),
+                            dmc.Select(
+                                id="graph-size-select",
+                                data=[{"value": str(n), "label": f"{n} nodes"} for n in GRAPH_SIZE_OPTIONS],
+                                value=str(GRAPH_MAX_NODES),
+                                size="xs",
+                                w=120,
+                                style={"marginLeft": "auto"}
+                            ),
+                            dmc.TextInput(
+                                id="graph-focus-input",
+                                placeholder="Focus entity",
+                                value=DEFAULT_GRAPH_FOCUS,
+                                debounce=True,
+                                size="xs",
+                                leftSection=DashIconify(icon="carbon:search")
+                            ),
+                            dmc.ActionIcon(
+                                DashIconify(icon="carbon:overflow-menu-horizontal"),
+                                color="gray",
+                                variant="subtle",
+                                size="md"
+                            )
+                        ], justify="space-between"),
+                        dcc.Graph(
+                            id="relationship-graph",
+                            figure=create_relationship_graph(),
+                            config={"displayModeBar": False}
+                        )
+                    ], gap="xs")
+                ], p="md", shadow="sm", radius="md", withBorder=True, mb="lg")
+            ]
+        ),
+    
+        # Monte Carlo Scenario Simulation
+        dmc.Paper([
+            dmc.Stack([
+                dmc.Group([
+                    dmc.Title("Scenario Simulation", order=5, c="#333F48"),
                     dmc.Group([
-                        dmc.Title("Financial Relationship Graph", order=5, c="#333F48"),
-                        dmc.ActionIcon(
-                            DashIconify(icon="carbon:overflow-menu-horizontal"),
+                        dmc.Select(
+                            id="simulation-scenario-select",
+                            data=[
+                                {"value": name, "label": name.replace("_", " ").title()}
+                                for name in SIMULATION_SCENARIOS
+                            ],
+                            value="baseline",
+                            size="xs",
+                            w=150
+                        ),
+                        dmc.Select(
+                            id="simulation-metric-select",
+                            data=[{"value": k, "label": v} for k, v in SIMULATION_METRIC_LABELS.items()],
+                            value="cash_flow",
+                            size="xs",
+                            w=180
+                        ),
+                        dmc.Select(
+                            id="simulation-paths-select",
+                            data=[{"value": str(n), "label": f"{n:,} paths"} for n in SIMULATION_PATH_OPTIONS],
+                            value=str(SIMULATION_PATH_OPTIONS[0]),
+                            size="xs",
+                            w=130
+                        ),
+                        dmc.Button(
+                            "Run Simulation",
+                            id="run-simulation-button",
+                            leftSection=DashIconify(icon="carbon:play"),
+                            color="#0A3D62",
+                            size="xs",
+                            radius="md"
+                        ),
+                        dmc.Button(
+                            "Cancel",
+                            id="cancel-simulation-button",
+                            variant="outline",
                             color="gray",
-                            variant="subtle",
-                            size="md"
+                            size="xs",
+                            radius="md",
+                            disabled=True
                         )
-                    ], justify="space-between"),
-                    dcc.Graph(
-                        id="relationship-graph",
-                        figure=create_relationship_graph(),
-                        config={"displayModeBar": False}
-                    )
-                ], gap="xs")
-            ], p="md", shadow="sm", radius="md", withBorder=True, mb="lg")
-        ]
-    )
-], fluid=True, px="md", py="lg", style={"backgroundColor": "#f8f9fa"})
+                    ], gap="xs")
+                ], justify="space-between"),
+                dmc.Progress(id="simulation-progress", value=0, size="xs", color="#0A3D62"),
+                dcc.Graph(
+                    id="simulation-fan-chart",
+                    figure=create_fan_chart(),
+                    config={"displayModeBar": False}
+                ),
+                dmc.Text(id="simulation-summary", size="sm", c="dimmed")
+            ], gap="xs")
+        ], p="md", shadow="sm", radius="md", withBorder=True, mb="lg")
+    ], fluid=True, px="md", py="lg", style={"backgroundColor": "#f8f9fa"})
 
 # Callback functions defined directly in the page file
 @callback(
@@ -397,14 +556,74 @@ layout = dmc.Container([
      Output("comparative-chart", "figure")],
     [Input("update-viz-button", "n_clicks")],
     [State("time-range-select", "value"),
-     State("chart-type-select", "value")]
+     State("chart-type-select", "value")],
+    # The layout is built per page load with these figures already drawn
+    prevent_initial_call=True
 )
 def update_charts(n_clicks, time_range, chart_type):
-    # Default return if no clicks yet
-    if n_clicks is None:
-        return create_time_series_chart(), create_comparative_chart()
+    # The time series (with its forecast) follows the time range; the comparison
+    # is still demonstration data
+    return create_time_series_chart(time_range or '12m'), create_comparative_chart() 
+
+
+@callback(
+    Output("relationship-graph", "figure"),
+    [Input("graph-focus-input", "value"),
+     Input("graph-size-select", "value")],
+    prevent_initial_call=True
+)
+def update_relationship_graph(focus, max_nodes):
+    # Deeper expansion for larger views; the node cap bounds the result either way
+    max_nodes = int(max_nodes or GRAPH_MAX_NODES)
+    hops = GRAPH_FOCUS_HOPS if max_nodes <= GRAPH_MAX_NODES else GRAPH_FOCUS_HOPS + 2
+    return create_relationship_graph(focus or DEFAULT_GRAPH_FOCUS, hops=hops, max_nodes=max_nodes)
+
+
+@callback(
+    Output("risk-heatmap", "figure"),
+    [Input("risk-scenario-select", "value"),
+     Input("update-viz-button", "n_clicks")],
+    prevent_initial_call=True
+)
+def update_risk_heatmap(scenario, n_clicks):
+    return create_risk_heatmap(scenario or "baseline")
+
+
+# Runs as a background callback: chunks are simulated on the job process pool
+# and the fan chart is redrawn from the paths finished so far as they arrive.
+@callback(
+    [Output("simulation-fan-chart", "figure"),
+     Output("simulation-summary", "children")],
+    Input("run-simulation-button", "n_clicks"),
+    [State("simulation-scenario-select", "value"),
+     State("simulation-metric-select", "value"),
+     State("simulation-paths-select", "value")],
+    background=True,
+    running=[
+        (Output("run-simulation-button", "loading"), True, False),
+        (Output("cancel-simulation-button", "disabled"), False, True),
+    ],
+    progress=[Output("simulation-fan-chart", "figure"),
+              Output("simulation-progress", "value")],
+    cancel=[Input("cancel-simulation-button", "n_clicks"),
+            Input("url", "pathname")],
+    prevent_initial_call=True,
+)
+def run_scenario_simulation(set_progress, n_clicks, scenario, metric, paths):
+    if not n_clicks:
+        raise PreventUpdate
+    metric = metric or 'cash_flow'
+    partial_figure = [create_fan_chart(metric=metric)]
     
-    # Just return the same charts for demonstration
-    # In a real implementation, we would filter data based on time_range,
-    # change the chart_type, and show only the selected metrics
-    return create_time_series_chart(), create_comparative_chart() 
\ No newline at end of file
+    def report(done, total, partial):
+        if partial is not None:
+            partial_figure[0] = create_fan_chart(partial, metric)
+        set_progress((partial_figure[0], done / total * 100))
+    
+    set_progress((partial_figure[0], 0))
+    summary = run_simulation(scenario=scenario or "baseline", paths=int(paths), progress=report)
+    return (
+        create_fan_chart(summary, metric),
+        f"{summary['paths']:,} paths over {SIMULATION_HORIZON_DAYS} days: "
+        f"{summary['probability_negative_cash']:.1%} chance of negative cumulative cash flow"
+    )
@@ -0,0 +1,226 @@
+"""
+Admission Service module for LLM request admission control.
+Bounds how many LLM streams run at once, globally and per backend, and
+how many each session may have in flight. Requests over the limit wait
+in a bounded FIFO queue, reporting their position while they wait, and
+are rejected immediately with a Retry-After estimate once the queue is
+full, so a burst from one team queues here instead of inside Ollama.
+Limits apply per worker process.
+"""
+
+import os
+import math
+import time
+import asyncio
+import logging
+import threading
+from collections import Counter, deque
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .async_service import iterate_async
+from .stream_service import StreamEvent
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+# Configuration from environment variables with defaults
+ADMISSION_MAX_CONCURRENT = int(os.environ.get("FINGEN_LLM_MAX_CONCURRENT", "8"))
+ADMISSION_MAX_PER_BACKEND = int(os.environ.get("FINGEN_LLM_MAX_PER_BACKEND", "4"))
+ADMISSION_MAX_PER_SESSION = int(os.environ.get("FINGEN_LLM_MAX_PER_SESSION", "1"))
+ADMISSION_MAX_QUEUE = int(os.environ.get("FINGEN_LLM_MAX_QUEUE", "32"))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("FINGEN_LLM_QUEUE_TIMEOUT", "60"))
+# Seconds between queue position updates sent to a waiting client
+ADMISSION_POSITION_INTERVAL = float(os.environ.get("FINGEN_LLM_POSITION_INTERVAL", "1"))
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be queued; carries a Retry-After estimate in seconds."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A request's place in the admission queue, woken when it is admitted."""
+
+    def __init__(self, session_id: Optional[str], backend: str):
+        self.session_id = session_id
+        self.backend = backend
+        self.admitted = False
+        self.admitted_at: Optional[float] = None
+        self._event = threading.Event()
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def _wake(self) -> None:
+        self._event.set()
+        for loop, future in self._waiters:
+            loop.call_soon_threadsafe(lambda f=future: f.done() or f.set_result(True))
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until admitted or the timeout passes; True if admitted."""
+        return self._event.wait(timeout)
+
+    async def wait_async(self, timeout: Optional[float] = None) -> bool:
+        """Await admission without holding a thread; True if admitted."""
+        if self._event.is_set():
+            return True
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._waiters.append((loop, future))
+        if self._event.is_set():
+            return True
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._waiters.remove((loop, future))
+        return self._event.is_set()
+
+
+class AdmissionController:
+    """Global, per-backend and per-session concurrency limits with a bounded FIFO wait queue."""
+
+    def __init__(self, max_concurrent: int = ADMISSION_MAX_CONCURRENT,
+                 max_per_backend: int = ADMISSION_MAX_PER_BACKEND,
+                 max_per_session: int = ADMISSION_MAX_PER_SESSION,
+                 max_queue: int = ADMISSION_MAX_QUEUE):
+        self.max_concurrent = max_concurrent
+        self.max_per_backend = max_per_backend
+        self.max_per_session = max_per_session
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._queue: deque = deque()
+        self._active = 0
+        self._backend_active: Counter = Counter()
+        self._session_in_flight: Counter = Counter()
+        # Exponentially weighted mean time a request holds its slot, for Retry-After estimates
+        self._service_seconds = 10.0
+
+    def retry_after(self) -> int:
+        """Seconds a rejected client should wait before retrying, from the queue length and recent service times."""
+        waves = (len(self._queue) + 1) / max(self.max_concurrent, 1)
+        return int(min(max(math.ceil(self._service_seconds * waves), 1), 300))
+
+    def _dispatch(self) -> None:
+        """Admit queued tickets in order while capacity remains; a full backend does not block others."""
+        for ticket in list(self._queue):
+            if self._active >= self.max_concurrent:
+                break
+            if self._backend_active[ticket.backend] >= self.max_per_backend:
+                continue
+            self._queue.remove(ticket)
+            self._active += 1
+            self._backend_active[ticket.backend] += 1
+            ticket.admitted, ticket.admitted_at = True, time.monotonic()
+            ticket._wake()
+
+    def enqueue(self, session_id: Optional[str], backend: str) -> Ticket:
+        """
+        Queue a request, admitting it immediately when there is capacity.
+        Requests without a session ID are only subject to the global and
+        backend limits: a client address would put everyone behind one
+        proxy or NAT into a single session.
+
+        Raises:
+            AdmissionRejected: If the session is at its in-flight limit or the queue is full
+        """
+        with self._lock:
+            if session_id is not None and self._session_in_flight[session_id] >= self.max_per_session:
+                raise AdmissionRejected("A previous request from this session is still running.", self.retry_after())
+            if len(self._queue) >= self.max_queue:
+                logger.warning(f"Admission queue full ({len(self._queue)} waiting); rejecting request")
+                raise AdmissionRejected("The assistant is at capacity.", self.retry_after())
+            ticket = Ticket(session_id, backend)
+            if session_id is not None:
+                self._session_in_flight[session_id] += 1
+            self._queue.append(ticket)
+            self._dispatch()
+            return ticket
+
+    def position(self, ticket: Ticket) -> int:
+        """1-based position of a waiting ticket, 0 once admitted."""
+        with self._lock:
+            try:
+                return self._queue.index(ticket) + 1
+            except ValueError:
+                return 0
+
+    def release(self, ticket: Ticket) -> None:
+        """Free a ticket's slot, or drop it from the queue if it was never admitted."""
+        with self._lock:
+            if ticket.admitted:
+                ticket.admitted = False
+                self._active -= 1
+                self._backend_active[ticket.backend] -= 1
+                held = time.monotonic() - ticket.admitted_at
+                self._service_seconds = 0.8 * self._service_seconds + 0.2 * held
+            elif ticket in self._queue:
+                self._queue.remove(ticket)
+            else:
+                return
+            if ticket.session_id is not None:
+                self._session_in_flight[ticket.session_id] -= 1
+                if self._session_in_flight[ticket.session_id] <= 0:
+                    del self._session_in_flight[ticket.session_id]
+            self._dispatch()
+
+    def stats(self) -> dict:
+        """Current load, for logging and health checks."""
+        with self._lock:
+            return {"active": self._active, "queued": len(self._queue), "backends": dict(self._backend_active)}
+
+
+# Singleton controller per worker process
+_controller: Optional[AdmissionController] = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """Get this worker's admission controller."""
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController()
+    return _controller
+
+
+def admitted_stream(ticket: Ticket, source: Union[Iterable[str], AsyncIterable[str]]) -> Iterator[Any]:
+    """
+    Wait for admission, reporting queue positions as `queued` stream events,
+    then stream the source; the slot is released when the stream ends or is closed.
+    """
+    controller = get_admission_controller()
+    try:
+        deadline = time.monotonic() + ADMISSION_QUEUE_TIMEOUT
+        last_position = None
+        while not ticket.wait(0 if last_position is None else ADMISSION_POSITION_INTERVAL):
+            position = controller.position(ticket)
+            if position != last_position:
+                yield StreamEvent("queued", {"position": position})
+                last_position = position
+            if time.monotonic() > deadline:
+                raise AdmissionRejected("Timed out waiting for a free slot.", controller.retry_after())
+        yield from (iterate_async(source) if hasattr(source, "__aiter__") else source)
+    finally:
+        controller.release(ticket)
+
+
+async def aadmitted_stream(ticket: Ticket, source: AsyncIterable[str]) -> AsyncIterator[Any]:
+    """Async counterpart of `admitted_stream`; waiting holds no thread."""
+    controller = get_admission_controller()
+    try:
+        deadline = time.monotonic() + ADMISSION_QUEUE_TIMEOUT
+        last_position = None
+        while not await ticket.wait_async(0 if last_position is None else ADMISSION_POSITION_INTERVAL):
+            position = controller.position(ticket)
+            if position != last_position:
+                yield StreamEvent("queued", {"position": position})
+                last_position = position
+            if time.monotonic() > deadline:
+                raise AdmissionRejected("Timed out waiting for a free slot.", controller.retry_after())
+        async for chunk in source:
+            yield chunk
+    finally:
+        controller.release(ticket)
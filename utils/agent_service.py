@@ -5,6 +5,7 @@ with persistent memory and advanced workflows.
 """
 
 import os
+import re
 import logging
 import datetime
 from typing import List, Dict, Any, Generator, Optional, Union, Literal
@@ -21,10 +22,10 @@ from langgraph.checkpoint.memory import MemorySaver
 
 # Local imports
 from .llm_service import get_llm_client
-from .rag_service import get_vector_store, initialize_documents
-
-# Try importing from langchain_community as a fallback
-from langchain_community.utilities.sql_database import SQLDatabase # Example placeholder import
+from .rag_service import EMBEDDING_MODEL_NAME, get_embedding_function, get_vector_store, initialize_documents
+from .graph_service import get_entity_relations
+from .sql_service import SQLQueryError, describe_tables, format_result, run_sql
+from .coalesce_service import coalesced_call, flight_key
 
 # Get logger *before* potential import errors that use it
 logger = logging.getLogger(__name__)
@@ -34,6 +35,27 @@ LONG_TERM_MEMORY_CUTOFF_DAYS = int(os.environ.get("FINGEN_MEMORY_CUTOFF_DAYS", "
 MAX_LONG_TERM_MEMORIES_IN_STATE = int(os.environ.get("FINGEN_MAX_MEMORIES_IN_STATE", "5"))
 MEMORY_PRUNING_THRESHOLD = int(os.environ.get("FINGEN_MEMORY_PRUNING_THRESHOLD", "10")) # When to trigger prune node
 
+# Questions that ask for an aggregate of a ledger measure also get an SQL query over the ledger;
+# both patterns must match, so ordinary mentions of revenue or totals cost no extra LLM call
+NUMERIC_PATTERN = re.compile(
+    r"\b(how much|total|sum of|average|mean|median|maximum|minimum|highest|lowest|"
+    r"(per|by|each) (day|week|month|quarter|year)|monthly|quarterly|"
+    r"year[- ]over[- ]year|month[- ]over[- ]month|ytd|yoy|qoq)\b",
+    re.IGNORECASE,
+)
+LEDGER_MEASURE_PATTERN = re.compile(r"\b(revenues?|expenses?|profits?|market index)\b", re.IGNORECASE)
+# Tags LLM calls that are working steps (SQL writing, context checks), not part of the reply
+INTERNAL_TAG = "internal"
+
+SQL_PROMPT = """Write one DuckDB SQL query that answers the question from this table:
+
+{schema}
+
+Aggregate in SQL (SUM, AVG, GROUP BY, date_trunc) so the result is a small table, never raw daily rows.
+Return only the SQL, without explanation.
+
+Question: {question}"""
+
 # --- Agent State Definition ---
 
 class EnhancedMessageState(BaseModel):
@@ -45,6 +67,8 @@ class EnhancedMessageState(BaseModel):
     """
     short_term: List[BaseMessage] = Field(default_factory=list)
     long_term: List[str] = Field(default_factory=list) # Stores retrieved page_content strings
+    graph_context: List[str] = Field(default_factory=list) # Knowledge-graph relations, also merged into long_term
+    sql_context: List[str] = Field(default_factory=list) # Ledger query results, also merged into long_term
     session_id: str
     # memory_type: Literal["volatile", "persistent"] = "persistent" # Deferring pruning trigger logic
 
@@ -102,20 +126,72 @@ def get_old_memories(session_id: str) -> Optional[List[str]]:
 
 # --- Graph Nodes ---
 
+def retrieve_graph_context(state: EnhancedMessageState) -> Dict[str, Any]:
+    """Node to retrieve multi-hop relationships from the knowledge graph.
+    Expands the entities mentioned in the query to their k-hop neighborhoods
+    and starts this turn's long-term context with the resulting relations.
+    """
+    logger.info(f"Node: retrieve_graph_context for session {state.session_id}")
+    last_message = state.short_term[-1]
+    if not isinstance(last_message, HumanMessage):
+        logger.warning("Last message is not HumanMessage, skipping graph retrieval.")
+        return {"long_term": [], "graph_context": []}
+
+    try:
+        relations = get_entity_relations(last_message.content)
+        logger.info(f"Retrieved {len(relations)} knowledge-graph relations.")
+    except Exception as e:
+        logger.exception(f"Error during graph retrieval: {e}")
+        relations = []
+    return {"long_term": relations, "graph_context": relations}
+
+def extract_sql(text: str) -> str:
+    """Pull the SQL statement out of an LLM reply, dropping reasoning and code fences."""
+    text = re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL)
+    fenced = re.search(r"```(?:sql)?\s*(.*?)```", text, flags=re.DOTALL | re.IGNORECASE)
+    return (fenced.group(1) if fenced else text).strip()
+
+def query_ledger(state: EnhancedMessageState) -> Dict[str, Any]:
+    """Node to answer aggregate questions with an SQL query over the ledger.
+    The LLM writes the query against the ledger schema; only the small
+    aggregated result, not raw rows, is added to this turn's context,
+    ahead of the memories that retrieval adds next.
+    """
+    logger.info(f"Node: query_ledger for session {state.session_id}")
+    last_message = state.short_term[-1]
+    if (not isinstance(last_message, HumanMessage) or not NUMERIC_PATTERN.search(last_message.content)
+            or not LEDGER_MEASURE_PATTERN.search(last_message.content)):
+        return {"sql_context": []}
+
+    try:
+        prompt = SQL_PROMPT.format(schema=describe_tables(), question=last_message.content)
+        sql = extract_sql(get_llm_client().with_config(tags=[INTERNAL_TAG]).invoke([HumanMessage(content=prompt)]).content)
+        result = run_sql(sql)
+        context = f"Ledger query:\n{sql}\nResult:\n{format_result(result)}"
+        logger.info(f"Ledger query returned {len(result['rows'])} rows{' (cached)' if result['cached'] else ''}.")
+    except SQLQueryError as e:
+        logger.warning(f"Ledger query failed: {e}")
+        return {"sql_context": []}
+    except Exception as e:
+        logger.exception(f"Error during ledger query: {e}")
+        return {"sql_context": []}
+    return {"long_term": state.graph_context + [context], "sql_context": [context]}
+
 def retrieve_context(state: EnhancedMessageState) -> Dict[str, Any]:
     """Node to retrieve relevant context from long-term memory (vector store).
     Performs hybrid search with temporal and session filtering.
+    Results are appended to any knowledge-graph relations and ledger query results already retrieved.
     """
     logger.info(f"Node: retrieve_context for session {state.session_id}")
     vector_store = get_vector_store()
     if not vector_store:
         logger.error("Cannot retrieve context: Vector store not available.")
-        return {"long_term": []}
+        return {"long_term": state.graph_context + state.sql_context}
         
     last_message = state.short_term[-1]
     if not isinstance(last_message, HumanMessage):
         logger.warning("Last message is not HumanMessage, skipping context retrieval.")
-        return {"long_term": []}
+        return {"long_term": state.graph_context + state.sql_context}
 
     query = last_message.content
     session_id = state.session_id
@@ -128,11 +204,16 @@ def retrieve_context(state: EnhancedMessageState) -> Dict[str, Any]:
         
         logger.debug(f"Retrieving context for query: '{query[:50]}...' with filter: {filter_criteria}")
         
-        # Perform similarity search
-        results: List[Document] = vector_store.similarity_search(
-            query=query,
+        # Perform similarity search. Identical questions in flight at the same
+        # moment share one query embedding, and one search per session filter.
+        embedding = coalesced_call(flight_key("embed", query, EMBEDDING_MODEL_NAME),
+                                   lambda: get_embedding_function().embed_query(query))
+        search_key = flight_key("search", query, EMBEDDING_MODEL_NAME,
+                                f"{session_id}:{MAX_LONG_TERM_MEMORIES_IN_STATE}")
+        results: List[Document] = coalesced_call(search_key, lambda: vector_store.similarity_search_by_vector(
+            embedding,
             k=MAX_LONG_TERM_MEMORIES_IN_STATE,
-            filter=filter_criteria 
+            filter=filter_criteria
             # Filter syntax might vary slightly, e.g., using `where` in newer versions
             # filter={ 
             #     "$and": [
@@ -140,15 +221,15 @@ def retrieve_context(state: EnhancedMessageState) -> Dict[str, Any]:
             #         # {"timestamp": {"$gte": cutoff_timestamp}} # Re-enable later
             #     ]
             # }
-        )
+        ))
         
         retrieved_content = [doc.page_content for doc in results]
         logger.info(f"Retrieved {len(retrieved_content)} long-term memories.")
-        return {"long_term": retrieved_content}
+        return {"long_term": state.graph_context + state.sql_context + retrieved_content}
         
     except Exception as e:
         logger.exception(f"Error during context retrieval: {e}")
-        return {"long_term": []} # Return empty list on error
+        return {"long_term": state.graph_context + state.sql_context} # Keep graph relations and query results on error
 
 def generate_verified_response(state: EnhancedMessageState) -> Dict[str, Any]:
     """Node to generate a response using the LLM.
@@ -170,7 +251,7 @@ def generate_verified_response(state: EnhancedMessageState) -> Dict[str, Any]:
                 f"\n\nUser Query:\n{query}\n\nRetrieved Context:\n{retrieved_context_str}"
             )
             logger.debug("Invoking LLM for context verification.")
-            verification_result = llm.invoke([HumanMessage(content=verification_prompt)])
+            verification_result = llm.with_config(tags=[INTERNAL_TAG]).invoke([HumanMessage(content=verification_prompt)])
             verified_context = verification_result.content
             if "No relevant context found." in verified_context:
                  logger.info("LLM verification found no relevant context.")
@@ -251,7 +332,8 @@ def should_prune_memory(state: EnhancedMessageState) -> Literal["prune", "end"]:
     # in the current state turn, not the total size of the vector store for the session.
     # A more robust check might involve querying the vector store count directly,
     # but that adds latency. Using the state count is a simpler proxy.
-    if len(state.long_term) >= MEMORY_PRUNING_THRESHOLD:
+    # Graph relations and query results are not stored memories, so they do not count towards pruning
+    if len(state.long_term) - len(state.graph_context) - len(state.sql_context) >= MEMORY_PRUNING_THRESHOLD:
         logger.info(f"Memory pruning condition met (>= {MEMORY_PRUNING_THRESHOLD} retrieved memories). Routing to prune.")
         return "prune"
     else:
@@ -273,12 +355,17 @@ def get_agent_executor():
         builder = StateGraph(EnhancedMessageState)
 
         # Add nodes
+        builder.add_node("graph_retrieve", retrieve_graph_context)
+        builder.add_node("sql_retrieve", query_ledger)
         builder.add_node("retrieve", retrieve_context)
         builder.add_node("generate", generate_verified_response)
         builder.add_node("prune", prune_memories)
 
         # Define edges
-        builder.set_entry_point("retrieve")
+        builder.set_entry_point("graph_retrieve")
+        # Graph relations and ledger query results are added to the retrieved memories, never used instead of them
+        builder.add_edge("graph_retrieve", "sql_retrieve")
+        builder.add_edge("sql_retrieve", "retrieve")
         builder.add_edge("retrieve", "generate")
         
         # Conditional edge after generation: either prune or end
@@ -327,8 +414,9 @@ async def handle_agent_message(session_id: str, message: str) -> Generator[str,
         async for event in app.astream_events(input_state, thread, version="v2"):
             kind = event["event"]
             # Handle different event types (on_chat_model_stream, on_tool_end, etc.)
-            # For now, just yield AIMessage chunks from the generation node
-            if kind == "on_chat_model_stream":
+            # Only the reply is streamed: tokens of the SQL and verification calls stay internal
+            if (kind == "on_chat_model_stream" and event["metadata"].get("langgraph_node") == "generate"
+                    and INTERNAL_TAG not in event.get("tags", [])):
                 content = event["data"]["chunk"].content
                 if content:
                     yield content
@@ -0,0 +1,254 @@
+"""
+Analysis Service module for incremental financial analysis.
+Keeps rolling statistics, quarterly aggregates (for QoQ and YoY deltas) and
+margin figures that are updated from appended ledger rows only, so a refresh
+costs time proportional to the new data rather than the full history.
+"""
+
+import os
+import pickle
+import logging
+import threading
+import uuid
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .data_service import (
+    DATA_DIR, DEFAULT_ENTITY, LEDGER_COLUMNS, SAMPLE_DATA,
+    load_dataset, get_dataset_version, ensure_sample_dataset,
+)
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+# Configuration from environment variables with defaults
+ROLLING_WINDOW_DAYS = int(os.environ.get("FINGEN_ROLLING_WINDOW_DAYS", "30"))
+ANALYSIS_STATE_DIR = os.environ.get("FINGEN_ANALYSIS_STATE_DIR", os.path.join(DATA_DIR, "analysis"))
+
+# Metrics aggregated per quarter; sums of squares give per-quarter volatility
+AGGREGATE_METRICS = ["revenue", "expenses", "profit"]
+
+
+def compute_margin(rows: pd.DataFrame) -> pd.Series:
+    """Profit margin in percent, vectorized over the given rows."""
+    return rows['profit'] / rows['revenue'] * 100
+
+
+class IncrementalAnalysis:
+    """Analysis aggregates for one entity, updated from appended rows only.
+
+    State is kept compact so it can be persisted and shared between web
+    workers and background jobs: the last `window` rows for rolling
+    statistics and one row of sums per quarter for period-over-period deltas.
+    """
+
+    def __init__(self, entity: str = DEFAULT_ENTITY, window: int = ROLLING_WINDOW_DAYS):
+        self.entity = entity
+        self.window = window
+        self.version = 0
+        self.row_count = 0
+        self.first_date: Optional[pd.Timestamp] = None
+        self.last_date: Optional[pd.Timestamp] = None
+        self.tail = pd.DataFrame(columns=LEDGER_COLUMNS, index=pd.DatetimeIndex([]), dtype=float)
+        self.quarters = pd.DataFrame(dtype=float)
+
+    def derive(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """
+        Compute derived series for rows that directly follow the current tail.
+
+        Returns:
+            pd.DataFrame: margin and rolling revenue mean/std, one row per input row
+        """
+        combined = pd.concat([self.tail, rows]) if len(self.tail) else rows
+        rolling = combined['revenue'].rolling(self.window, min_periods=1)
+        derived = pd.DataFrame({
+            'margin': compute_margin(combined),
+            'revenue_rolling_mean': rolling.mean(),
+            'revenue_rolling_std': rolling.std(),
+        })
+        return derived.iloc[len(combined) - len(rows):]
+
+    def update(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """
+        Fold appended rows into the aggregates.
+
+        Args:
+            rows (pd.DataFrame): New ledger rows, later than any seen before
+
+        Returns:
+            pd.DataFrame: Derived series for the new rows
+        """
+        if rows.empty:
+            return self.derive(rows)
+        derived = self.derive(rows)
+
+        metrics = rows[AGGREGATE_METRICS]
+        grouped = pd.concat([metrics, (metrics ** 2).add_suffix('_sq')], axis=1)
+        grouped['days'] = 1.0
+        grouped = grouped.groupby(rows.index.to_period('Q')).sum()
+        self.quarters = grouped if self.quarters.empty else self.quarters.add(grouped, fill_value=0)
+
+        new_tail = pd.concat([self.tail, rows[LEDGER_COLUMNS]]) if len(self.tail) else rows[LEDGER_COLUMNS]
+        self.tail = new_tail.iloc[-self.window:]
+        self.row_count += len(rows)
+        self.first_date = self.first_date if self.first_date is not None else rows.index.min()
+        self.last_date = rows.index.max()
+        return derived
+
+    def sync(self) -> pd.DataFrame:
+        """
+        Process the ledger partitions appended since the last sync.
+
+        Returns:
+            pd.DataFrame: Derived series for the newly processed rows
+        """
+        if SAMPLE_DATA:
+            ensure_sample_dataset(self.entity)
+        current_version = get_dataset_version(self.entity)
+        if current_version <= self.version:
+            return self.derive(self.tail.iloc[0:0])
+        rows = load_dataset(self.entity, since_version=self.version, until_version=current_version)
+        derived = self.update(rows)
+        self.version = current_version
+        logger.info(f"Analysis for '{self.entity}' synced {len(rows)} rows up to version {self.version}")
+        return derived
+
+    def quarterly_summary(self) -> pd.DataFrame:
+        """
+        Per-quarter daily averages with QoQ and YoY deltas in percent.
+        Averages rather than sums keep a partially elapsed quarter comparable.
+        """
+        if self.quarters.empty:
+            return pd.DataFrame()
+        quarters = self.quarters.sort_index()
+        days = quarters['days']
+        averages = quarters[AGGREGATE_METRICS].div(days, axis=0)
+        variance = quarters[[f'{m}_sq' for m in AGGREGATE_METRICS]].div(days, axis=0).to_numpy() - averages.to_numpy() ** 2
+        summary = averages.copy()
+        summary['days'] = days
+        summary['margin'] = quarters['profit'] / quarters['revenue'] * 100
+        summary['revenue_cv'] = np.sqrt(np.clip(variance[:, 0], 0, None)) / averages['revenue'] * 100
+        for metric in AGGREGATE_METRICS:
+            summary[f'{metric}_qoq'] = averages[metric].pct_change() * 100
+            summary[f'{metric}_yoy'] = averages[metric].pct_change(4) * 100
+        # pct_change(4) is only a YoY figure when the four preceding quarters are all present
+        contiguous = pd.Series(quarters.index.asi8, index=quarters.index).diff(4) == 4
+        for metric in AGGREGATE_METRICS:
+            summary.loc[~contiguous, f'{metric}_yoy'] = np.nan
+        return summary
+
+    def insights(self) -> List[Dict[str, str]]:
+        """
+        Build the key insight cards from the aggregates.
+
+        Returns:
+            List[Dict[str, str]]: Insights with title, description, impact and confidence
+        """
+        summary = self.quarterly_summary()
+        if len(summary) < 2:
+            return [{
+                "title": "Insufficient History",
+                "description": "At least two quarters of data are needed for period comparisons",
+                "impact": "neutral",
+                "confidence": "low"
+            }]
+        latest, previous = summary.iloc[-1], summary.iloc[-2]
+        quarter = str(summary.index[-1])
+        confidence = "high" if latest['days'] >= 60 else "medium"
+        insights = []
+
+        if not np.isnan(latest['revenue_yoy']):
+            growth, basis = latest['revenue_yoy'], "YoY"
+        else:
+            growth, basis = latest['revenue_qoq'], "QoQ"
+        insights.append({
+            "title": "Revenue Growth",
+            "description": f"Average daily revenue {'grew' if growth >= 0 else 'fell'} {abs(growth):.1f}% {basis} in {quarter}",
+            "impact": "positive" if growth >= 0 else "negative",
+            "confidence": confidence
+        })
+
+        expense_change, revenue_change = latest['expenses_qoq'], latest['revenue_qoq']
+        insights.append({
+            "title": "Expense Management",
+            "description": f"Operating expenses changed {expense_change:+.1f}% QoQ against revenue at {revenue_change:+.1f}%",
+            "impact": "positive" if expense_change <= revenue_change else "negative",
+            "confidence": confidence
+        })
+
+        margin_change = latest['margin'] - previous['margin']
+        insights.append({
+            "title": "Profit Margin",
+            "description": f"Profit margin is {latest['margin']:.1f}% in {quarter}, {margin_change:+.1f} pts vs the prior quarter",
+            "impact": "positive" if margin_change >= 0 else "negative",
+            "confidence": confidence
+        })
+
+        recent_std = self.tail['revenue'].std()
+        recent_cv = recent_std / self.tail['revenue'].mean() * 100 if len(self.tail) > 1 else np.nan
+        rising = recent_cv > previous['revenue_cv']
+        insights.append({
+            "title": "Risk Factors",
+            "description": f"{self.window}-day revenue volatility is {recent_cv:.1f}%, {'above' if rising else 'below'} last quarter's {previous['revenue_cv']:.1f}%",
+            "impact": "negative" if rising else "positive",
+            "confidence": "medium"
+        })
+        return insights
+
+
+def _state_path(entity: str) -> str:
+    return os.path.join(ANALYSIS_STATE_DIR, f"{entity}.pkl")
+
+
+# Engines cached per process, keyed by entity, with the state file mtime they were loaded at
+_engines: Dict[str, Any] = {}
+# One lock per entity, so concurrent callbacks and jobs sync and persist an engine in turn
+_engine_locks: Dict[str, threading.Lock] = {}
+_engine_locks_lock = threading.Lock()
+
+
+def _engine_lock(entity: str) -> threading.Lock:
+    with _engine_locks_lock:
+        return _engine_locks.setdefault(entity, threading.Lock())
+
+
+def get_analysis_engine(entity: str = DEFAULT_ENTITY) -> IncrementalAnalysis:
+    """
+    Get the analysis engine for an entity, synced with the latest ledger.
+    State is persisted after each sync so other workers and background jobs
+    continue from it instead of reprocessing the history.
+
+    Args:
+        entity (str): Entity to analyse
+
+    Returns:
+        IncrementalAnalysis: Up-to-date engine
+    """
+    path = _state_path(entity)
+    with _engine_lock(entity):
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        cached = _engines.get(entity)
+        if cached is None or (mtime is not None and mtime != cached[1]):
+            engine = None
+            if mtime is not None:
+                try:
+                    with open(path, "rb") as f:
+                        engine = pickle.load(f)
+                except Exception as e:
+                    logger.warning(f"Discarding unreadable analysis state {path}: {e}")
+            cached = (engine or IncrementalAnalysis(entity), mtime)
+
+        engine, mtime = cached
+        previous_version = engine.version
+        engine.sync()
+        if engine.version != previous_version:
+            os.makedirs(ANALYSIS_STATE_DIR, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}-{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(engine, f)
+            os.replace(tmp_path, path)
+            mtime = os.path.getmtime(path)
+        _engines[entity] = (engine, mtime)
+    return engine
@@ -0,0 +1,225 @@
+"""
+Anomaly Service module for early-warning alerts on ledger series.
+Runs an online EWMA z-score detector over revenue, expenses and the market
+index of every entity. Each appended row costs O(1) per series, the state
+of all series is updated together as arrays, and alerts are kept in a
+compact, bounded log that the dashboard polls.
+"""
+
+import os
+import pickle
+import logging
+import threading
+import uuid
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .data_service import DATA_DIR, DEFAULT_ENTITY, SAMPLE_DATA, list_entities, load_dataset, get_dataset_version
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+# Configuration from environment variables with defaults
+ANOMALY_STATE_DIR = os.environ.get("FINGEN_ANOMALY_STATE_DIR", os.path.join(DATA_DIR, "anomaly"))
+ANOMALY_EWMA_SPAN = int(os.environ.get("FINGEN_ANOMALY_EWMA_SPAN", "30"))
+ANOMALY_Z_THRESHOLD = float(os.environ.get("FINGEN_ANOMALY_Z_THRESHOLD", "3.5"))
+ANOMALY_CRITICAL_Z = float(os.environ.get("FINGEN_ANOMALY_CRITICAL_Z", "5.0"))
+ANOMALY_WARMUP_POINTS = int(os.environ.get("FINGEN_ANOMALY_WARMUP_POINTS", "30"))
+ANOMALY_ALERT_LOG_SIZE = int(os.environ.get("FINGEN_ANOMALY_ALERT_LOG_SIZE", "500"))
+
+ANOMALY_METRICS = ["revenue", "expenses", "market_index"]
+
+
+class StreamingDetector:
+    """Exponentially weighted mean/variance z-score detector for many series.
+
+    State is three arrays indexed by series, so a batch of rows is processed
+    with one vectorized update per time step regardless of the series count.
+    Updates from outlying points are winsorized at the alert threshold so a
+    single spike does not mask the ones that follow.
+    """
+
+    def __init__(self, span: int = ANOMALY_EWMA_SPAN, warmup: int = ANOMALY_WARMUP_POINTS,
+                 threshold: float = ANOMALY_Z_THRESHOLD):
+        self.alpha = 2.0 / (span + 1)
+        self.warmup = warmup
+        self.threshold = threshold
+        self.series_index: Dict[Tuple[str, str], int] = {}
+        self.mean = np.zeros(0)
+        self.var = np.zeros(0)
+        self.count = np.zeros(0, dtype=np.int64)
+
+    def index_of(self, keys: Sequence[Tuple[str, str]]) -> np.ndarray:
+        """Get the state indices of series, registering new ones."""
+        new = [key for key in keys if key not in self.series_index]
+        if new:
+            for key in new:
+                self.series_index[key] = len(self.series_index)
+            self.mean = np.concatenate([self.mean, np.zeros(len(new))])
+            self.var = np.concatenate([self.var, np.zeros(len(new))])
+            self.count = np.concatenate([self.count, np.zeros(len(new), dtype=np.int64)])
+        return np.array([self.series_index[key] for key in keys], dtype=np.int64)
+
+    def update(self, keys: Sequence[Tuple[str, str]], values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score new observations and fold them into the state.
+
+        Args:
+            keys (Sequence[Tuple[str, str]]): (entity, metric) of each column
+            values (np.ndarray): Observations of shape (T, len(keys)); NaN is skipped
+
+        Returns:
+            Tuple of (z-scores, expected values), both of shape (T, len(keys));
+            z-scores are NaN until a series has seen `warmup` points
+        """
+        idx = self.index_of(keys)
+        mean, var, count = self.mean[idx], self.var[idx], self.count[idx]
+        scores = np.full(values.shape, np.nan)
+        expected = np.full(values.shape, np.nan)
+        for t, x in enumerate(values):
+            present = ~np.isnan(x)
+            std = np.sqrt(var)
+            diff = np.where(present, x - mean, 0.0)
+            ready = present & (count >= self.warmup) & (std > 0)
+            scores[t] = np.where(ready, diff / np.where(std > 0, std, 1), np.nan)
+            expected[t] = mean
+            # Outliers move the state by at most `threshold` sigmas
+            diff = np.where(ready, np.clip(diff, -self.threshold * std, self.threshold * std), diff)
+            increment = self.alpha * diff
+            first = present & (count == 0)
+            update = present & (count > 0)
+            # The first observation of a series seeds its mean
+            mean = np.where(first, mean + diff, np.where(update, mean + increment, mean))
+            var = np.where(update, (1 - self.alpha) * (var + diff * increment), var)
+            count = count + present
+        self.mean[idx], self.var[idx], self.count[idx] = mean, var, count
+        return scores, expected
+
+
+class AnomalyMonitor:
+    """Detector state, processed dataset versions and the alert log, persisted together."""
+
+    def __init__(self):
+        self.detector = StreamingDetector()
+        self.versions: Dict[str, int] = {}
+        self.alerts: deque = deque(maxlen=ANOMALY_ALERT_LOG_SIZE)
+        self.next_alert_id = 1
+
+    def process(self, entity: str, rows: pd.DataFrame) -> List[Dict[str, Any]]:
+        """
+        Score appended rows of one entity and log alerts for outliers.
+
+        Returns:
+            List[Dict[str, Any]]: New alerts
+        """
+        if rows.empty:
+            return []
+        keys = [(entity, metric) for metric in ANOMALY_METRICS]
+        scores, expected = self.detector.update(keys, rows[ANOMALY_METRICS].to_numpy(float))
+        new_alerts = []
+        for t, m in zip(*np.nonzero(np.abs(np.nan_to_num(scores)) >= self.detector.threshold)):
+            z = float(scores[t, m])
+            alert = {
+                "id": self.next_alert_id,
+                "entity": entity,
+                "metric": ANOMALY_METRICS[m],
+                "date": rows.index[t].strftime("%Y-%m-%d"),
+                "value": float(rows.iat[t, rows.columns.get_loc(ANOMALY_METRICS[m])]),
+                "expected": float(expected[t, m]),
+                "zscore": z,
+                "direction": "spike" if z > 0 else "drop",
+                "severity": "critical" if abs(z) >= ANOMALY_CRITICAL_Z else "warning",
+            }
+            self.next_alert_id += 1
+            self.alerts.append(alert)
+            new_alerts.append(alert)
+        return new_alerts
+
+    def sync(self, entities: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Process the ledger partitions appended since the last sync.
+
+        Args:
+            entities (Optional[List[str]]): Entities to watch; all ledgers when omitted
+
+        Returns:
+            List[Dict[str, Any]]: New alerts
+        """
+        entities = entities or list_entities() or ([DEFAULT_ENTITY] if SAMPLE_DATA else [])
+        new_alerts = []
+        for entity in entities:
+            version = get_dataset_version(entity)
+            seen = self.versions.get(entity, 0)
+            if version <= seen:
+                continue
+            new_alerts.extend(self.process(entity, load_dataset(entity, since_version=seen, until_version=version)))
+            self.versions[entity] = version
+        if new_alerts:
+            logger.info(f"Anomaly detection raised {len(new_alerts)} alerts")
+        return new_alerts
+
+
+_state_path = os.path.join(ANOMALY_STATE_DIR, "monitor.pkl")
+# Monitor cached per process with the state file mtime it was loaded at
+_monitor: Optional[Tuple[AnomalyMonitor, Optional[float]]] = None
+# Held while syncing and persisting, so concurrent callbacks and jobs take turns
+_monitor_lock = threading.Lock()
+
+
+def get_anomaly_monitor(sync: bool = True) -> AnomalyMonitor:
+    """
+    Get the anomaly monitor, synced with the latest ledgers.
+    State is persisted after each sync that processed new rows, so web
+    workers share one detector state and alert log.
+
+    Args:
+        sync (bool): Process newly appended rows before returning
+
+    Returns:
+        AnomalyMonitor: The monitor
+    """
+    global _monitor
+    with _monitor_lock:
+        mtime = os.path.getmtime(_state_path) if os.path.exists(_state_path) else None
+        if _monitor is None or (mtime is not None and mtime != _monitor[1]):
+            monitor = None
+            if mtime is not None:
+                try:
+                    with open(_state_path, "rb") as f:
+                        monitor = pickle.load(f)
+                except Exception as e:
+                    logger.warning(f"Discarding unreadable anomaly state {_state_path}: {e}")
+            _monitor = (monitor or AnomalyMonitor(), mtime)
+
+        monitor, mtime = _monitor
+        previous_versions = dict(monitor.versions)
+        if sync:
+            monitor.sync()
+        if monitor.versions != previous_versions:
+            os.makedirs(ANOMALY_STATE_DIR, exist_ok=True)
+            tmp_path = f"{_state_path}.{os.getpid()}-{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(monitor, f)
+            os.replace(tmp_path, _state_path)
+            mtime = os.path.getmtime(_state_path)
+        _monitor = (monitor, mtime)
+    return monitor
+
+
+def get_alerts(since_id: int = 0, limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Get logged alerts, newest first.
+
+    Args:
+        since_id (int): Only return alerts with a larger ID
+        limit (int): Maximum number of alerts
+
+    Returns:
+        List[Dict[str, Any]]: Alerts with id, entity, metric, date, value,
+        expected, zscore, direction and severity
+    """
+    alerts = [alert for alert in reversed(get_anomaly_monitor().alerts) if alert["id"] > since_id]
+    return alerts[:limit]
@@ -0,0 +1,83 @@
+"""
+Async Service module for the per-worker event loop.
+LLM, embedding and vector-store I/O run as coroutines on a single event
+loop per worker process: the server's own loop under the ASGI entry point
+(asgi.py), or a daemon thread's loop under the WSGI development server.
+Sync code such as Dash callbacks and WSGI routes submits coroutines to
+that loop instead of starting a new loop per request.
+"""
+
+import os
+import asyncio
+import logging
+import threading
+from typing import Any, AsyncIterator, Awaitable, Iterator, Optional, TypeVar
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Singleton loop, owned by the ASGI server or by a daemon thread in this process
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_pid: Optional[int] = None
+_loop_lock = threading.Lock()
+
+
+def set_event_loop(loop: asyncio.AbstractEventLoop) -> None:
+    """Adopt the ASGI server's running loop as this worker's shared loop."""
+    global _loop, _loop_pid
+    with _loop_lock:
+        _loop, _loop_pid = loop, os.getpid()
+    logger.info(f"Using the ASGI server event loop in worker {_loop_pid}")
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Get this worker's shared event loop, starting one on a daemon thread
+    when no ASGI server has provided it.
+
+    Returns:
+        asyncio.AbstractEventLoop: The running shared loop
+    """
+    global _loop, _loop_pid
+    with _loop_lock:
+        # A forked worker inherits the reference but not the thread running the loop
+        if _loop is None or _loop.is_closed() or _loop_pid != os.getpid():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="fingen-event-loop", daemon=True).start()
+            _loop, _loop_pid = loop, os.getpid()
+            logger.info(f"Started shared event loop thread in worker {_loop_pid}")
+    return _loop
+
+
+def run_async(coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+    """
+    Run a coroutine on the shared loop from sync code and wait for its result.
+
+    Raises:
+        RuntimeError: If called from the shared loop itself, where waiting would deadlock
+    """
+    loop = get_event_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        raise RuntimeError("run_async() cannot wait on the shared loop from inside it; await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+
+def iterate_async(source: AsyncIterator[T]) -> Iterator[T]:
+    """Iterate an async iterator from sync code, advancing it on the shared loop."""
+    iterator = source.__aiter__()
+    try:
+        while True:
+            try:
+                yield run_async(iterator.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        aclose: Any = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            run_async(aclose())
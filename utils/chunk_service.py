@@ -0,0 +1,334 @@
+"""
+Chunk Service module for structure-aware splitting of filings.
+Text is segmented into sections (statement titles, Items, Notes and
+other headings), tables and paragraphs; chunks are packed from whole
+blocks within a section up to a token budget, so a table or a note is
+never cut mid-way unless it alone exceeds the budget (tables are then
+split by rows, repeating their header). Each chunk carries its section
+title instead of character overlap. Boilerplate repeated across filings,
+such as legal disclaimers, is dropped by MinHash similarity over word
+shingles, and every run reports chunk and token statistics.
+"""
+
+import os
+import re
+import math
+import hashlib
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+# Configuration from environment variables with defaults
+CHUNK_MAX_TOKENS = int(os.environ.get("FINGEN_CHUNK_MAX_TOKENS", "512"))
+# Chunks smaller than this are merged with their neighbour when both fit the budget
+CHUNK_MIN_TOKENS = int(os.environ.get("FINGEN_CHUNK_MIN_TOKENS", "96"))
+SHINGLE_WORDS = int(os.environ.get("FINGEN_CHUNK_SHINGLE_WORDS", "5"))
+# Estimated shingle Jaccard similarity above which a chunk counts as a duplicate
+DUPLICATE_THRESHOLD = float(os.environ.get("FINGEN_CHUNK_DUPLICATE_THRESHOLD", "0.8"))
+
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16  # 4 rows per band: pairs at the threshold collide in some band with near certainty
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+_NUMBER_CELL = re.compile(r"^\(?[$€£]?-?\d[\d,.]*\)?%?$|^[—–-]$")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z(\"'])")
+_HEADING_PATTERN = re.compile(
+    r"^(#{1,6}\s+\S"
+    r"|(item|part)\s+[0-9ivx]+[a-z]?\b"
+    r"|note\s+\d+\b"
+    r"|notes?\s+to\s+(the\s+)?(condensed\s+)?(consolidated\s+)?financial\s+statements"
+    r"|(condensed\s+)?(consolidated\s+)?(balance\s+sheets?|statements?\s+of\s+(operations|income|earnings|"
+    r"comprehensive\s+(income|loss)|cash\s+flows|financial\s+position|(stockholders|shareholders)['’]?\s+equity|changes\s+in\s+equity))"
+    r"|management['’]s\s+discussion\s+and\s+analysis)",
+    re.IGNORECASE,
+)
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count (words and punctuation marks), without loading a tokenizer."""
+    return len(_TOKEN_PATTERN.findall(text))
+
+
+def _is_heading(line: str) -> bool:
+    stripped = line.strip()
+    if not stripped or len(stripped) > 120:
+        return False
+    if _HEADING_PATTERN.match(stripped):
+        # "Item 7" or "Note 5" opening a sentence is prose, not a title
+        return len(stripped.split()) <= 16
+    # Short all-caps lines such as "RISK FACTORS"
+    letters = [c for c in stripped if c.isalpha()]
+    return len(letters) >= 4 and stripped.upper() == stripped and len(stripped.split()) <= 12
+
+
+def _is_table_row(line: str) -> bool:
+    if line.count("|") >= 2 or "\t" in line:
+        return True
+    cells = [cell for cell in re.split(r"\s{2,}", line.strip()) if cell]
+    return len(cells) >= 2 and sum(bool(_NUMBER_CELL.match(cell)) for cell in cells) >= 2
+
+
+def split_blocks(text: str) -> List[Tuple[str, str]]:
+    """
+    Segment text into ('heading' | 'table' | 'text', content) blocks.
+    Consecutive table rows form one table block; paragraphs end at blank lines.
+    """
+    blocks: List[Tuple[str, str]] = []
+    current_kind, current_lines = None, []
+
+    def flush():
+        nonlocal current_kind, current_lines
+        if current_lines:
+            blocks.append((current_kind, "\n".join(current_lines)))
+        current_kind, current_lines = None, []
+
+    after_blank = False
+    for line in text.splitlines():
+        if not line.strip():
+            if current_kind != "table":
+                flush()
+            after_blank = True
+            continue
+        label = current_kind == "table" and not after_blank and len(line.split()) <= 8
+        after_blank = False
+        if _is_table_row(line):
+            kind = "table"
+        elif label and not _HEADING_PATTERN.match(line.strip()):
+            # Short lines inside a table are row labels such as "Current assets:"
+            kind = "table"
+        elif _is_heading(line):
+            flush()
+            blocks.append(("heading", line.strip().lstrip("#").strip()))
+            continue
+        else:
+            kind = "text"
+        if kind != current_kind:
+            flush()
+            current_kind = kind
+        current_lines.append(line.rstrip() if kind == "table" else line.strip())
+    flush()
+    return blocks
+
+
+def _split_oversized(kind: str, content: str, budget: int) -> List[str]:
+    """Split one block that exceeds the budget: tables by rows (header repeated), text by sentences."""
+    # Aim for equal pieces rather than full pieces and a small remainder
+    tokens = count_tokens(content)
+    budget = min(math.ceil(tokens / math.ceil(tokens / budget)) + 16, budget)
+    if kind == "table":
+        rows = content.splitlines()
+        header, pieces, current = rows[0], [], [rows[0]]
+        for row in rows[1:]:
+            if len(current) > 1 and count_tokens("\n".join(current + [row])) > budget:
+                pieces.append("\n".join(current))
+                current = [header]
+            current.append(row)
+        pieces.append("\n".join(current))
+        return pieces
+
+    pieces, current = [], ""
+    for sentence in _SENTENCE_END.split(content):
+        while count_tokens(sentence) > budget:
+            # A single run-on sentence: cut by words
+            words = sentence.split()
+            cut = max(budget * 3 // 4, 1)
+            pieces.append(" ".join(words[:cut]))
+            sentence = " ".join(words[cut:])
+        candidate = f"{current} {sentence}".strip()
+        if current and count_tokens(candidate) > budget:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_text(text: str, max_tokens: int = CHUNK_MAX_TOKENS,
+               min_tokens: int = CHUNK_MIN_TOKENS) -> List[Dict[str, Any]]:
+    """
+    Split one document into structure-aligned chunks.
+
+    Returns:
+        List[Dict[str, Any]]: 'text', 'section', 'kind' ('table', 'text' or
+        'mixed') and 'tokens' per chunk, in document order
+    """
+    # (section title, [(kind, content)]) in document order
+    sections: List[Tuple[str, List[Tuple[str, str]]]] = [("", [])]
+    for kind, content in split_blocks(text):
+        if kind == "heading":
+            if sections[-1][0] and not sections[-1][1]:
+                # Stacked headings ("CONSOLIDATED BALANCE SHEETS" then "ASSETS") form one title
+                sections[-1] = (f"{sections[-1][0]} - {content}", [])
+            else:
+                sections.append((content, []))
+        else:
+            sections[-1][1].append((kind, content))
+
+    chunks: List[Dict[str, Any]] = []
+    for title, blocks in sections:
+        if not blocks:
+            continue
+        budget = max(max_tokens - count_tokens(title), max_tokens // 2)
+        current: List[Tuple[str, str]] = []
+        current_tokens = 0
+
+        def emit():
+            nonlocal current, current_tokens
+            if current:
+                kinds = {kind for kind, _ in current}
+                body = "\n\n".join(content for _, content in current)
+                chunk = f"{title}\n\n{body}" if title else body
+                chunks.append({"text": chunk, "section": title, "kind": kinds.pop() if len(kinds) == 1 else "mixed",
+                               "tokens": count_tokens(chunk)})
+            current, current_tokens = [], 0
+
+        for kind, content in blocks:
+            tokens = count_tokens(content)
+            if tokens > budget:
+                emit()
+                for piece in _split_oversized(kind, content, budget):
+                    current = [(kind, piece)]
+                    emit()
+                continue
+            if current_tokens + tokens > budget:
+                emit()
+            current.append((kind, content))
+            current_tokens += tokens
+        emit()
+
+    # Merge small neighbours (short notes, one-line sections) into denser chunks
+    merged: List[Dict[str, Any]] = []
+    for chunk in chunks:
+        previous = merged[-1] if merged else None
+        small = chunk["tokens"] < min_tokens or previous is not None and previous["tokens"] < min_tokens \
+            and previous["section"] == chunk["section"]
+        if small and previous is not None and previous["tokens"] + chunk["tokens"] <= max_tokens:
+            previous["text"] = f"{previous['text']}\n\n{chunk['text']}"
+            previous["tokens"] += chunk["tokens"]
+            previous["section"] = previous["section"] or chunk["section"]
+            if previous["kind"] != chunk["kind"]:
+                previous["kind"] = "mixed"
+        else:
+            merged.append(chunk)
+    return merged
+
+
+class ShingleDeduplicator:
+    """
+    Near-duplicate detection over word shingles with MinHash signatures and
+    LSH banding. Signatures can be saved and reloaded, so boilerplate is
+    recognised across ingestion runs, and forgotten per source file.
+    """
+
+    def __init__(self, threshold: float = DUPLICATE_THRESHOLD, shingle_words: int = SHINGLE_WORDS):
+        self.threshold = threshold
+        self.shingle_words = shingle_words
+        rng = np.random.default_rng(20240601)  # Fixed, so saved signatures stay comparable
+        self._a = rng.integers(1, 2 ** 63, MINHASH_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, MINHASH_PERMUTATIONS, dtype=np.uint64)
+        self._signatures: List[np.ndarray] = []
+        self._sources: List[str] = []
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = {}
+
+    def signature(self, text: str) -> np.ndarray:
+        words = " ".join(text.split()).casefold().split(" ")
+        k = self.shingle_words
+        shingles = {" ".join(words[i:i + k]) for i in range(max(len(words) - k + 1, 1))}
+        hashes = np.fromiter((int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+                              for s in shingles), dtype=np.uint64, count=len(shingles))
+        with np.errstate(over="ignore"):
+            return (np.outer(hashes, self._a) + self._b).min(axis=0)
+
+    def _bands(self, signature: np.ndarray) -> Iterable[Tuple[int, bytes]]:
+        rows = MINHASH_PERMUTATIONS // LSH_BANDS
+        for band in range(LSH_BANDS):
+            yield band, signature[band * rows:(band + 1) * rows].tobytes()
+
+    def _add(self, signature: np.ndarray, source: str) -> None:
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        self._sources.append(source)
+        for band in self._bands(signature):
+            self._buckets.setdefault(band, []).append(index)
+
+    def is_duplicate(self, text: str, source: str = "") -> bool:
+        """True if a near-identical text was seen before; otherwise remember this one."""
+        signature = self.signature(text)
+        candidates = {index for band in self._bands(signature) for index in self._buckets.get(band, ())}
+        for index in candidates:
+            if self._sources[index] is not None and np.mean(self._signatures[index] == signature) >= self.threshold:
+                return True
+        self._add(signature, source)
+        return False
+
+    def forget(self, sources: Iterable[str]) -> None:
+        """Stop matching against chunks from these sources (changed or removed files)."""
+        sources = set(sources)
+        for index, source in enumerate(self._sources):
+            if source in sources:
+                self._sources[index] = None
+
+    def save(self, path: str) -> None:
+        kept = [i for i, source in enumerate(self._sources) if source is not None]
+        signatures = np.array([self._signatures[i] for i in kept], dtype=np.uint64).reshape(-1, MINHASH_PERMUTATIONS)
+        np.savez(path, signatures=signatures, sources=np.array([self._sources[i] for i in kept], dtype=str))
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "ShingleDeduplicator":
+        """Load saved signatures, or start empty if there are none."""
+        deduplicator = cls(**kwargs)
+        if os.path.exists(path):
+            with np.load(path) as saved:
+                for signature, source in zip(saved["signatures"], saved["sources"]):
+                    deduplicator._add(signature, str(source))
+        return deduplicator
+
+
+def chunk_documents(documents: Sequence[Document], deduplicator: Optional[ShingleDeduplicator] = None,
+                    max_tokens: int = CHUNK_MAX_TOKENS,
+                    min_tokens: int = CHUNK_MIN_TOKENS) -> Tuple[List[Document], Dict[str, Any]]:
+    """
+    Chunk documents along their structure and drop duplicate boilerplate.
+
+    Args:
+        documents: Documents to split; metadata is copied to every chunk
+        deduplicator: Shared across calls (and runs) to drop chunks seen before; a fresh one if omitted
+        max_tokens (int): Token budget per chunk
+        min_tokens (int): Chunks below this are merged with a neighbour when possible
+
+    Returns:
+        Tuple[List[Document], Dict[str, Any]]: The chunks, and statistics:
+        'documents', 'chunks', 'tokens', 'mean_tokens', 'max_tokens', 'tables',
+        'duplicates' and 'duplicate_tokens'
+    """
+    deduplicator = deduplicator or ShingleDeduplicator()
+    chunks: List[Document] = []
+    stats = {"documents": len(documents), "chunks": 0, "tokens": 0, "mean_tokens": 0.0, "max_tokens": 0,
+             "tables": 0, "duplicates": 0, "duplicate_tokens": 0}
+    for document in documents:
+        source = str(document.metadata.get("source", ""))
+        for chunk in chunk_text(document.page_content, max_tokens, min_tokens):
+            if deduplicator.is_duplicate(chunk["text"], source):
+                stats["duplicates"] += 1
+                stats["duplicate_tokens"] += chunk["tokens"]
+                continue
+            metadata = dict(document.metadata, section=chunk["section"], chunk_kind=chunk["kind"],
+                            chunk_tokens=chunk["tokens"])
+            chunks.append(Document(page_content=chunk["text"], metadata=metadata))
+            stats["tokens"] += chunk["tokens"]
+            stats["max_tokens"] = max(stats["max_tokens"], chunk["tokens"])
+            stats["tables"] += chunk["kind"] == "table"
+    stats["chunks"] = len(chunks)
+    stats["mean_tokens"] = round(stats["tokens"] / len(chunks), 1) if chunks else 0.0
+    logger.info(f"Chunked {stats['documents']} documents into {stats['chunks']} chunks "
+                f"({stats['tokens']} tokens, mean {stats['mean_tokens']}, max {stats['max_tokens']}, "
+                f"{stats['tables']} tables); dropped {stats['duplicates']} duplicate chunks "
+                f"({stats['duplicate_tokens']} tokens)")
+    return chunks, stats
@@ -0,0 +1,134 @@
+"""
+Coalesce Service module for single-flight LLM and retrieval calls.
+Identical requests that arrive while one is already in flight share it:
+the first caller starts the upstream call or stream, later callers
+subscribe to it, and a stream's chunks are fanned out to every
+subscriber (late joiners first replay what was already produced). A
+burst of N identical questions therefore costs one generation.
+Flights end with the upstream call; results are not cached afterwards.
+"""
+
+import hashlib
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import AsyncIterator, Callable, Dict, List, Optional, TypeVar
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def flight_key(kind: str, prompt: str, model: str, context: str = "") -> str:
+    """
+    Key identical requests by normalized prompt, model and a hash of their context.
+    Normalization only collapses whitespace and case, which do not change the question.
+    """
+    normalized = " ".join(prompt.split()).casefold()
+    context_hash = hashlib.sha256(context.encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{kind}\x00{model}\x00{context_hash}\x00{normalized}".encode("utf-8")).hexdigest()
+
+
+# --- Calls (any thread) ---
+
+_calls: Dict[str, Future] = {}
+_calls_lock = threading.Lock()
+
+
+def coalesced_call(key: str, func: Callable[[], T]) -> T:
+    """
+    Run `func` once for all concurrent callers with the same key.
+    Followers block until the leader's call finishes and share its result or exception.
+    """
+    with _calls_lock:
+        future = _calls.get(key)
+        leader = future is None
+        if leader:
+            future = _calls[key] = Future()
+    if not leader:
+        logger.debug(f"Joined in-flight call {key[:12]}")
+        return future.result()
+    try:
+        result = func()
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _calls_lock:
+            _calls.pop(key, None)
+
+
+# --- Streams (shared event loop) ---
+
+class _StreamFlight:
+    """One upstream stream and the chunks it has produced so far."""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def notify(self) -> None:
+        # Wake current waiters; later waits use a fresh event
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+# Flights are only touched from the event loop they run on, so they need no lock
+_streams: Dict[str, _StreamFlight] = {}
+
+
+async def _drive(key: str, flight: _StreamFlight, source: AsyncIterator[str]) -> None:
+    try:
+        async for chunk in source:
+            flight.chunks.append(chunk)
+            flight.notify()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        flight.error = e
+    finally:
+        flight.done = True
+        flight.notify()
+        if _streams.get(key) is flight:
+            del _streams[key]
+
+
+async def coalesced_stream(key: str, factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+    """
+    Subscribe to the in-flight stream for a key, starting it with `factory()`
+    when there is none. The upstream stream runs as its own task, so it
+    outlives any one subscriber; it is cancelled when the last one leaves.
+    """
+    flight = _streams.get(key)
+    if flight is None:
+        flight = _streams[key] = _StreamFlight()
+        flight.task = asyncio.ensure_future(_drive(key, flight, factory()))
+    elif flight.subscribers:
+        logger.info(f"Joined in-flight stream {key[:12]} ({flight.subscribers} other subscribers)")
+    flight.subscribers += 1
+    try:
+        position = 0
+        while True:
+            if position < len(flight.chunks):
+                position += 1
+                yield flight.chunks[position - 1]
+            elif flight.done:
+                if flight.error is not None:
+                    raise flight.error
+                return
+            else:
+                await flight.changed.wait()
+    finally:
+        flight.subscribers -= 1
+        if flight.subscribers == 0 and not flight.done:
+            flight.task.cancel()
+            if _streams.get(key) is flight:
+                del _streams[key]
@@ -0,0 +1,302 @@
+"""
+Data Service module for the shared financial dataset.
+Stores each entity's daily ledger as append-only Parquet partitions, so
+consumers can read just the rows added after a dataset version they have
+already processed instead of reloading the full history. Runs of small
+partitions are compacted into one file with a row group per version, so
+the file count stays bounded while versions stay individually readable.
+"""
+
+import os
+import re
+import time
+import zlib
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+# Configuration from environment variables with defaults
+DATA_DIR = os.environ.get("FINGEN_DATA_DIR", "./data")
+DEFAULT_ENTITY = os.environ.get("FINGEN_DEFAULT_ENTITY", "consolidated")
+# Seed empty ledgers with generated data and let refreshes simulate a daily feed
+SAMPLE_DATA = os.environ.get("FINGEN_SAMPLE_DATA", "True").lower() == "true"
+SAMPLE_START_DATE = os.environ.get("FINGEN_SAMPLE_START_DATE", "2022-01-01")
+SAMPLE_END_DATE = os.environ.get("FINGEN_SAMPLE_END_DATE", "2023-12-31")
+APPEND_LOCK_TIMEOUT = float(os.environ.get("FINGEN_APPEND_LOCK_TIMEOUT", "30"))
+# Compact once a ledger has more files than this; partitions under the row target are merged
+LEDGER_MAX_FILES = int(os.environ.get("FINGEN_LEDGER_MAX_FILES", "32"))
+COMPACT_TARGET_ROWS = int(os.environ.get("FINGEN_COMPACT_TARGET_ROWS", "100000"))
+
+LEDGER_COLUMNS = ["revenue", "expenses", "profit", "market_index"]
+# part-000007.parquet holds version 7; part-000003-000007.parquet holds versions 3-7, one row group each
+_PARTITION_PATTERN = re.compile(r"^part-(\d{6})(?:-(\d{6}))?\.parquet$")
+# Entity names become directory names, so they may not start with a dot
+_ENTITY_PATTERN = re.compile(r"^[A-Za-z0-9_][A-Za-z0-9_.-]{0,127}$")
+
+
+def create_sample_data(start: str = SAMPLE_START_DATE, end: str = SAMPLE_END_DATE,
+                       entity: str = DEFAULT_ENTITY) -> pd.DataFrame:
+    """
+    Generate a deterministic daily ledger for an entity.
+    The random stream is seeded by entity and start date, so generating a
+    continuation of an existing range is reproducible.
+
+    Args:
+        start (str): First date (inclusive)
+        end (str): Last date (inclusive)
+        entity (str): Entity name, used to vary the generated figures
+
+    Returns:
+        pd.DataFrame: Ledger indexed by date with LEDGER_COLUMNS
+    """
+    dates = pd.date_range(start=start, end=end, freq='D')
+    rng = np.random.default_rng([zlib.crc32(entity.encode("utf-8")), dates[0].toordinal() if len(dates) else 0])
+    scale = 1.0 if entity == DEFAULT_ENTITY else 0.2 + (zlib.crc32(entity.encode("utf-8")) % 100) / 50
+    data = {
+        'revenue': rng.normal(1000, 100, len(dates)) * scale,
+        'expenses': rng.normal(800, 80, len(dates)) * scale,
+        'profit': rng.normal(200, 20, len(dates)) * scale,
+        'market_index': rng.normal(100, 10, len(dates)),
+    }
+    return pd.DataFrame(data, index=dates)
+
+
+def is_valid_entity(entity: str) -> bool:
+    """Whether a name can be used as an entity: letters, digits, '_', '.' and '-', not starting with '.'."""
+    return isinstance(entity, str) and bool(_ENTITY_PATTERN.match(entity))
+
+
+def _ledger_dir(entity: str) -> str:
+    # Rejected rather than rewritten, so no input can map onto another entity's ledger or outside DATA_DIR
+    if not is_valid_entity(entity):
+        raise ValueError(f"Invalid entity name: {entity!r}")
+    return os.path.join(DATA_DIR, "ledger", entity)
+
+
+def _list_files(entity: str) -> List[Tuple[int, int, str]]:
+    """
+    Partition files as (first version, last version, path), oldest first.
+    A compacted file supersedes the single-version files it covers, which
+    only coexist with it between the compaction's rename and its cleanup.
+    """
+    ledger_dir = _ledger_dir(entity)
+    if not os.path.isdir(ledger_dir):
+        return []
+    files = []
+    for name in os.listdir(ledger_dir):
+        match = _PARTITION_PATTERN.match(name)
+        if match:
+            first = int(match.group(1))
+            files.append((first, int(match.group(2) or first), os.path.join(ledger_dir, name)))
+    # Widest range first for each starting version, then drop anything already covered
+    files.sort(key=lambda f: (f[0], -f[1]))
+    covered, result = 0, []
+    for first, last, path in files:
+        if last > covered:
+            result.append((first, last, path))
+            covered = last
+    return result
+
+
+def _partition_path(entity: str, version: int) -> str:
+    return os.path.join(_ledger_dir(entity), f"part-{version:06d}.parquet")
+
+
+def _read_versions(path: str, first: int, since_version: int, until_version: Optional[int]) -> Optional[pd.DataFrame]:
+    """Rows of a partition file for the versions in (since_version, until_version]."""
+    parquet = pq.ParquetFile(path)
+    groups = [i for i in range(parquet.num_row_groups)
+              if first + i > since_version and (until_version is None or first + i <= until_version)]
+    if not groups:
+        return None
+    if len(groups) == parquet.num_row_groups:
+        return parquet.read().to_pandas()
+    return parquet.read_row_groups(groups).to_pandas()
+
+
+def list_entities() -> List[str]:
+    """Return the entities that have a ledger on disk."""
+    ledger_root = os.path.join(DATA_DIR, "ledger")
+    if not os.path.isdir(ledger_root):
+        return []
+    return sorted(name for name in os.listdir(ledger_root)
+                  if is_valid_entity(name) and os.path.isdir(os.path.join(ledger_root, name)))
+
+
+def get_dataset_version(entity: str = DEFAULT_ENTITY) -> int:
+    """
+    Get the current version of an entity's ledger.
+    The version is the number of the newest partition and grows by one on
+    every append, so it is a cheap cache key for anything derived from the data.
+
+    Returns:
+        int: Dataset version, 0 if the ledger is empty
+    """
+    files = _list_files(entity)
+    return files[-1][1] if files else 0
+
+
+def _acquire_lock(entity: str) -> Tuple[int, str]:
+    os.makedirs(_ledger_dir(entity), exist_ok=True)
+    lock_path = os.path.join(_ledger_dir(entity), ".append.lock")
+    deadline = time.monotonic() + APPEND_LOCK_TIMEOUT
+    while True:
+        try:
+            return os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY), lock_path
+        except FileExistsError:
+            if time.monotonic() > deadline:
+                # The previous holder died mid-append; break its lock
+                logger.warning(f"Breaking stale append lock on ledger '{entity}'")
+                try:
+                    os.remove(lock_path)
+                except FileNotFoundError:
+                    pass  # Released, or broken by another waiter, meanwhile
+                deadline = time.monotonic() + APPEND_LOCK_TIMEOUT
+            time.sleep(0.01)
+
+
+def _compact(entity: str) -> None:
+    """
+    Merge the newest run of small partition files into one file with a row
+    group per version. Called with the append lock held. The merged file is
+    published before the files it replaces are removed, so readers never
+    miss a version; `_list_files` ignores the superseded files meanwhile.
+    """
+    files = _list_files(entity)
+    if len(files) <= LEDGER_MAX_FILES:
+        return
+    run, rows = [], 0
+    for first, last, path in reversed(files):
+        count = pq.ParquetFile(path).metadata.num_rows
+        if rows + count > COMPACT_TARGET_ROWS:
+            break
+        run.insert(0, (first, last, path))
+        rows += count
+    if len(run) < 2:
+        return
+    target = os.path.join(_ledger_dir(entity), f"part-{run[0][0]:06d}-{run[-1][1]:06d}.parquet")
+    tmp_path = f"{target}.tmp"
+    writer = None
+    try:
+        for _, _, path in run:
+            parquet = pq.ParquetFile(path)
+            for group in range(parquet.num_row_groups):
+                table = parquet.read_row_group(group)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_path, table.schema)
+                # One row group per version keeps versions individually readable
+                writer.write_table(table.cast(writer.schema), row_group_size=max(table.num_rows, 1))
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp_path, target)
+    for _, _, path in run:
+        os.remove(path)
+    logger.info(f"Compacted {len(run)} partitions of ledger '{entity}' into {os.path.basename(target)}")
+
+
+def append_rows(rows: pd.DataFrame, entity: str = DEFAULT_ENTITY,
+                expected_version: Optional[int] = None) -> int:
+    """
+    Append rows to an entity's ledger as a new partition.
+    Appends hold a per-ledger lock file and publish the partition with an
+    atomic rename, so readers in other processes only ever see complete
+    partitions with no gaps in the version sequence.
+
+    Args:
+        rows (pd.DataFrame): Rows indexed by date with LEDGER_COLUMNS
+        entity (str): Entity whose ledger receives the rows
+        expected_version (Optional[int]): Only append if the ledger is still at
+            this version; otherwise leave it untouched
+
+    Returns:
+        int: The new dataset version
+    """
+    if rows.empty:
+        return get_dataset_version(entity)
+    fd, lock_path = _acquire_lock(entity)
+    try:
+        current_version = get_dataset_version(entity)
+        if expected_version is not None and current_version != expected_version:
+            return current_version
+        version = current_version + 1
+        path = _partition_path(entity, version)
+        tmp_path = f"{path}.tmp"
+        rows[LEDGER_COLUMNS].to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+        _compact(entity)
+    finally:
+        os.close(fd)
+        os.remove(lock_path)
+    logger.info(f"Appended {len(rows)} rows to ledger '{entity}' (version {version})")
+    return version
+
+
+def load_dataset(entity: str = DEFAULT_ENTITY, since_version: int = 0,
+                 until_version: Optional[int] = None) -> pd.DataFrame:
+    """
+    Load ledger rows from the partitions in (since_version, until_version].
+
+    Args:
+        entity (str): Entity to load
+        since_version (int): Exclusive lower bound; 0 loads from the beginning
+        until_version (Optional[int]): Inclusive upper bound; None loads to the end
+
+    Returns:
+        pd.DataFrame: Rows indexed by date, empty if there is nothing new
+    """
+    if SAMPLE_DATA:
+        ensure_sample_dataset(entity)
+    for attempt in range(3):
+        try:
+            frames = [
+                _read_versions(path, first, since_version, until_version)
+                for first, last, path in _list_files(entity)
+                if last > since_version and (until_version is None or first <= until_version)
+            ]
+            break
+        except FileNotFoundError:
+            # A compaction removed a file between listing and reading; list again
+            if attempt == 2:
+                raise
+    frames = [frame for frame in frames if frame is not None]
+    if not frames:
+        return pd.DataFrame(columns=LEDGER_COLUMNS, index=pd.DatetimeIndex([]), dtype=float)
+    return pd.concat(frames).sort_index()
+
+
+def ensure_sample_dataset(entity: str = DEFAULT_ENTITY) -> None:
+    """Seed an empty ledger with generated sample data."""
+    if not _list_files(entity):
+        append_rows(create_sample_data(entity=entity), entity, expected_version=0)
+
+
+def append_sample_rows(days: int = 1, entity: str = DEFAULT_ENTITY,
+                       expected_version: Optional[int] = None) -> int:
+    """
+    Simulate the daily feed by appending generated rows after the last date.
+
+    Args:
+        days (int): Number of days to append
+        entity (str): Entity whose ledger receives the rows
+        expected_version (Optional[int]): The version the caller read; if another
+            writer appended since, nothing is appended, so concurrent refreshes
+            do not add the same days twice
+
+    Returns:
+        int: The dataset version after the call
+    """
+    ensure_sample_dataset(entity)
+    version = get_dataset_version(entity) if expected_version is None else expected_version
+    last_partition = load_dataset(entity, since_version=version - 1, until_version=version)
+    if last_partition.empty:
+        return get_dataset_version(entity)
+    start = last_partition.index.max() + pd.Timedelta(days=1)
+    rows = create_sample_data(start=start, end=start + pd.Timedelta(days=days - 1), entity=entity)
+    return append_rows(rows, entity, expected_version=version)
@@ -0,0 +1,155 @@
+"""
+Figure Service module for compact, fast-to-encode Plotly figures.
+Dash encodes callback outputs with Plotly's JSON encoder: numeric NumPy
+arrays already go out as base64 typed arrays, but datetime values are
+converted one by one to ISO strings, which dominates the time and size
+of large time series. `compact_figure` moves date coordinates to typed
+arrays of epoch milliseconds on date axes (or to `x0`/`dx` when evenly
+spaced), the JSON engine is pinned to orjson when it is installed, and
+`register_response_compression` gzips large responses for clients that
+accept it.
+"""
+
+import os
+import gzip
+import logging
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+# Configuration from environment variables with defaults
+FIGURE_JSON_ENGINE = os.environ.get("FINGEN_FIGURE_JSON_ENGINE", "orjson")
+COMPACT_FIGURES = os.environ.get("FINGEN_COMPACT_FIGURES", "True").lower() == "true"
+COMPRESS_RESPONSES = os.environ.get("FINGEN_COMPRESS_RESPONSES", "True").lower() == "true"
+COMPRESS_MIN_BYTES = int(os.environ.get("FINGEN_COMPRESS_MIN_BYTES", "2048"))
+COMPRESS_LEVEL = int(os.environ.get("FINGEN_COMPRESS_LEVEL", "5"))
+
+# Response types worth compressing; images and archives are already compressed
+COMPRESSIBLE_TYPES = ("application/json", "text/html", "text/css", "text/plain",
+                      "application/javascript", "text/javascript")
+
+
+def configure_json_engine() -> str:
+    """
+    Pin Plotly's JSON engine (which Dash uses for every callback response)
+    to FINGEN_FIGURE_JSON_ENGINE, falling back to the standard library
+    encoder when orjson is not installed.
+
+    Returns:
+        str: The engine in use
+    """
+    import plotly.io.json as plotly_json
+
+    engine = FIGURE_JSON_ENGINE
+    if engine == "orjson":
+        try:
+            import orjson  # noqa: F401
+        except ImportError:
+            logger.warning("orjson is not installed; figures are encoded with the standard json module")
+            engine = "json"
+    plotly_json.config.default_engine = engine
+    return engine
+
+
+def _datetimes(values: Any) -> Optional[pd.DatetimeIndex]:
+    """Values as a timezone-naive DatetimeIndex (wall time), or None if they are not dates."""
+    if not isinstance(values, (np.ndarray, pd.Index, pd.Series)) or len(values) == 0:
+        return None
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        # Timezone-aware values arrive as object arrays of Timestamps
+        if values.dtype != object or not isinstance(values[0], pd.Timestamp):
+            return None
+        try:
+            values = pd.DatetimeIndex(values)
+        except (TypeError, ValueError):
+            return None
+    dates = pd.DatetimeIndex(values)
+    return dates.tz_localize(None) if dates.tz is not None else dates
+
+
+def date_values(values: Any) -> np.ndarray:
+    """
+    Dates as float64 epoch milliseconds (NaT as NaN), the numeric form Plotly
+    date axes accept. Use it for data sent to figures built by `compact_figure`,
+    such as `extendData` updates.
+    """
+    dates = pd.DatetimeIndex(values)
+    if dates.tz is not None:
+        dates = dates.tz_localize(None)
+    millis = dates.asi8.astype(np.float64) / 1e6
+    millis[dates.isna()] = np.nan
+    return millis
+
+
+def compact_figure(fig: go.Figure, spacing: bool = True) -> go.Figure:
+    """
+    Replace datetime coordinates in a figure's traces with typed arrays.
+
+    Date coordinates become float64 epoch milliseconds on an explicit date
+    axis, so they are encoded as one base64 block instead of a string per
+    point. With `spacing`, evenly spaced x dates are dropped altogether in
+    favour of `x0`/`dx`; leave it off for traces that are later extended.
+
+    Args:
+        fig (go.Figure): Figure to update in place
+        spacing (bool): Allow evenly spaced x dates to become `x0`/`dx`
+
+    Returns:
+        go.Figure: The same figure
+    """
+    if not COMPACT_FIGURES:
+        return fig
+    for trace in fig.data:
+        for axis in ("x", "y"):
+            if axis not in trace:
+                continue
+            dates = _datetimes(trace[axis])
+            if dates is None:
+                continue
+            millis = date_values(dates)
+            steps = np.diff(millis)
+            if (axis == "x" and spacing and len(millis) > 2 and "x0" in trace and not np.isnan(millis).any()
+                    and steps[0] > 0 and np.all(steps == steps[0])):
+                trace.update(x=None, x0=dates[0].isoformat(), dx=float(steps[0]))
+            else:
+                trace[axis] = millis
+            # Numbers on an axis are only read as dates when the axis type says so
+            anchor = trace[f"{axis}axis"] or axis
+            fig.layout[anchor.replace(axis, f"{axis}axis", 1)].type = "date"
+    return fig
+
+
+def register_response_compression(server) -> None:
+    """
+    Gzip large Flask responses for clients that accept it. Streamed responses
+    (Server-Sent Events, file downloads) are left alone.
+
+    Args:
+        server: The Flask server, e.g. `app.server`
+    """
+    if not COMPRESS_RESPONSES:
+        return
+    from flask import request
+
+    @server.after_request
+    def compress_response(response):
+        if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+                or response.status_code >= 300 or "Content-Encoding" in response.headers
+                or response.mimetype not in COMPRESSIBLE_TYPES
+                or "gzip" not in request.headers.get("Accept-Encoding", "").lower()):
+            return response
+        body = response.get_data()
+        if len(body) < COMPRESS_MIN_BYTES:
+            return response
+        response.set_data(gzip.compress(body, compresslevel=COMPRESS_LEVEL, mtime=0))
+        response.headers["Content-Encoding"] = "gzip"
+        response.headers["Content-Length"] = str(len(response.get_data()))
+        response.vary.add("Accept-Encoding")
+        return response
+
+    logger.info(f"Compressing responses over {COMPRESS_MIN_BYTES} bytes (gzip level {COMPRESS_LEVEL})")
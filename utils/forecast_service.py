@@ -0,0 +1,306 @@
+"""
+Forecast Service module for projecting ledger series.
+Fits additive Holt-Winters exponential smoothing models (level, damped
+trend and weekly seasonality) per entity and metric. Fitted states are persisted with
+the dataset version they cover, so appended rows only advance the existing
+state, and a batch refresh refits many entities in parallel on the job
+process pool, searching near the previous parameters.
+"""
+
+import os
+import pickle
+import uuid
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .data_service import (
+    DATA_DIR, DEFAULT_ENTITY, SAMPLE_DATA,
+    list_entities, load_dataset, get_dataset_version, ensure_sample_dataset,
+)
+from .job_service import JOB_MAX_WORKERS, pool_map
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+# Configuration from environment variables with defaults
+FORECAST_STATE_DIR = os.environ.get("FINGEN_FORECAST_STATE_DIR", os.path.join(DATA_DIR, "forecast"))
+FORECAST_HORIZON_DAYS = int(os.environ.get("FINGEN_FORECAST_HORIZON_DAYS", "90"))
+FORECAST_FIT_WINDOW_DAYS = int(os.environ.get("FINGEN_FORECAST_FIT_WINDOW_DAYS", "365"))
+SEASON_LENGTH = int(os.environ.get("FINGEN_FORECAST_SEASON_LENGTH", "7"))
+# Damped trend: each day ahead keeps this share of the previous day's trend
+TREND_DAMPING = float(os.environ.get("FINGEN_FORECAST_TREND_DAMPING", "0.98"))
+
+FORECAST_METRICS = ["revenue", "expenses", "profit"]
+# Band z-scores by coverage
+BAND_Z = {80: 1.2816, 95: 1.9600}
+
+# Parameter grid for a fit from scratch; refits search multiplicatively around the previous fit
+_ALPHAS = np.array([0.02, 0.05, 0.1, 0.2, 0.3, 0.5])
+_BETAS = np.array([0.0, 0.005, 0.02, 0.05])
+_GAMMAS = np.array([0.0, 0.02, 0.05, 0.1, 0.2])
+_REFIT_STEPS = np.array([0.5, 1.0, 2.0])
+
+
+def _smooth(values: np.ndarray, alpha: np.ndarray, beta: np.ndarray, gamma: np.ndarray,
+            level: np.ndarray, trend: np.ndarray, season: np.ndarray, phase: int) -> Tuple[np.ndarray, ...]:
+    """
+    Run the Holt-Winters recursion over `values` for G parameter sets at once.
+
+    Args:
+        values (np.ndarray): Observations, shape (T,)
+        alpha, beta, gamma, level, trend (np.ndarray): Shape (G,)
+        season (np.ndarray): Seasonal components, shape (G, SEASON_LENGTH); updated in place
+        phase (int): Seasonal position of the first observation
+
+    Returns:
+        Tuple of (level, trend, season, sum of squared one-step errors)
+    """
+    sse = np.zeros_like(level)
+    for t, value in enumerate(values):
+        i = (phase + t) % SEASON_LENGTH
+        s = season[:, i]
+        damped = TREND_DAMPING * trend
+        error = value - (level + damped + s)
+        sse += error ** 2
+        new_level = alpha * (value - s) + (1 - alpha) * (level + damped)
+        trend = beta * (new_level - level) + (1 - beta) * damped
+        season[:, i] = gamma * (value - new_level) + (1 - gamma) * s
+        level = new_level
+    return level, trend, season, sse
+
+
+def _initial_state(values: np.ndarray, phase: int) -> Tuple[float, float, np.ndarray]:
+    """Level, trend and seasonal components (indexed by seasonal position) from the first two seasons."""
+    m = SEASON_LENGTH
+    first = values[:m].mean()
+    second = values[m:2 * m].mean() if len(values) >= 2 * m else first
+    return first, (second - first) / m, np.roll(values[:m] - first, phase)
+
+
+def fit_series(values: np.ndarray, phase: int = 0,
+               previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Fit smoothing parameters by grid search on one-step-ahead squared error,
+    evaluating every candidate in a single vectorized pass.
+
+    Args:
+        values (np.ndarray): Daily observations
+        phase (int): Seasonal position of the first observation
+        previous (Optional[Dict[str, Any]]): Earlier fit; when given, only
+            parameters near it are searched
+
+    Returns:
+        Dict[str, Any]: Fitted state: 'alpha', 'beta', 'gamma', 'level',
+        'trend', 'season', 'phase' (position of the next observation),
+        'sigma2' (one-step error variance) and 'n'
+    """
+    if previous is None:
+        alpha, beta, gamma = (a.ravel() for a in np.meshgrid(_ALPHAS, _BETAS, _GAMMAS, indexing="ij"))
+    else:
+        steps = [a.ravel() for a in np.meshgrid(_REFIT_STEPS, _REFIT_STEPS, _REFIT_STEPS, indexing="ij")]
+        alpha = np.clip(previous["alpha"] * steps[0], 0.01, 0.9)
+        beta = np.clip(np.maximum(previous["beta"], 0.001) * steps[1], 0.0, 0.3)
+        gamma = np.clip(np.maximum(previous["gamma"], 0.005) * steps[2], 0.0, 0.5)
+    size = len(alpha)
+    level0, trend0, season0 = _initial_state(values, phase)
+    level, trend, season, sse = _smooth(
+        values, alpha, beta, gamma,
+        np.full(size, level0), np.full(size, trend0), np.tile(season0, (size, 1)), phase
+    )
+    best = int(np.argmin(sse))
+    return {
+        "alpha": float(alpha[best]), "beta": float(beta[best]), "gamma": float(gamma[best]),
+        "level": float(level[best]), "trend": float(trend[best]), "season": season[best].copy(),
+        "phase": (phase + len(values)) % SEASON_LENGTH,
+        "sigma2": float(sse[best] / max(len(values), 1)), "n": len(values),
+    }
+
+
+def update_series(state: Dict[str, Any], values: np.ndarray) -> Dict[str, Any]:
+    """Advance a fitted state over new observations with its current parameters."""
+    if len(values) == 0:
+        return state
+    level, trend, season, sse = _smooth(
+        values, np.array([state["alpha"]]), np.array([state["beta"]]), np.array([state["gamma"]]),
+        np.array([state["level"]]), np.array([state["trend"]]), state["season"][None, :].copy(), state["phase"]
+    )
+    n = state["n"] + len(values)
+    return {
+        **state,
+        "level": float(level[0]), "trend": float(trend[0]), "season": season[0],
+        "phase": (state["phase"] + len(values)) % SEASON_LENGTH,
+        # Running mean of squared one-step errors
+        "sigma2": (state["sigma2"] * state["n"] + float(sse[0])) / n, "n": n,
+    }
+
+
+def forecast_series(state: Dict[str, Any], horizon: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Point forecasts and their standard errors for the next `horizon` days.
+    The variance uses the Holt linear-trend approximation, ignoring the
+    small seasonal contribution.
+    """
+    h = np.arange(1, horizon + 1)
+    season = state["season"][(state["phase"] + h - 1) % SEASON_LENGTH]
+    damped_steps = np.cumsum(TREND_DAMPING ** h)
+    mean = state["level"] + damped_steps * state["trend"] + season
+    alpha, beta = state["alpha"], state["beta"]
+    variance = state["sigma2"] * (1 + (h - 1) * alpha ** 2 * (1 + h * beta + h * (2 * h - 1) * beta ** 2 / 6))
+    return mean, np.sqrt(variance)
+
+
+class ForecastModel:
+    """Fitted smoothing states for one entity's metrics, kept in step with its ledger."""
+
+    def __init__(self, entity: str = DEFAULT_ENTITY):
+        self.entity = entity
+        self.version = 0
+        self.last_date: Optional[pd.Timestamp] = None
+        self.states: Dict[str, Dict[str, Any]] = {}
+
+    def fit(self, rows: pd.DataFrame) -> None:
+        """Fit every metric on the trailing fit window, warm-starting from existing parameters."""
+        rows = rows.iloc[-FORECAST_FIT_WINDOW_DAYS:]
+        # Anchor the seasonal phase to the weekday so it survives refits on different windows
+        phase = int(rows.index[0].dayofweek) % SEASON_LENGTH if SEASON_LENGTH == 7 else 0
+        for metric in FORECAST_METRICS:
+            self.states[metric] = fit_series(rows[metric].to_numpy(float), phase, self.states.get(metric))
+        self.last_date = rows.index.max()
+
+    def update(self, rows: pd.DataFrame) -> None:
+        """Advance the fitted states over appended rows."""
+        if rows.empty:
+            return
+        for metric in FORECAST_METRICS:
+            self.states[metric] = update_series(self.states[metric], rows[metric].to_numpy(float))
+        self.last_date = rows.index.max()
+
+    def sync(self, refit: bool = False) -> bool:
+        """
+        Bring the model up to the latest dataset version.
+        The first sync fits from scratch; later syncs only process appended
+        partitions unless `refit` is requested.
+
+        Returns:
+            bool: True if the model changed
+        """
+        if SAMPLE_DATA:
+            ensure_sample_dataset(self.entity)
+        current_version = get_dataset_version(self.entity)
+        if current_version <= self.version and not refit:
+            return False
+        if not self.states or refit:
+            rows = load_dataset(self.entity, until_version=current_version)
+            if len(rows) < 2 * SEASON_LENGTH:
+                return False
+            self.fit(rows)
+        else:
+            self.update(load_dataset(self.entity, since_version=self.version, until_version=current_version))
+        self.version = current_version
+        return True
+
+    def forecast(self, horizon: int = FORECAST_HORIZON_DAYS) -> pd.DataFrame:
+        """
+        Forecast every metric with 80% and 95% bands.
+
+        Returns:
+            pd.DataFrame: Indexed by date, with a '<metric>' column per metric
+            and '<metric>_lower_<coverage>' / '<metric>_upper_<coverage>' bands
+        """
+        index = pd.date_range(self.last_date + pd.Timedelta(days=1), periods=horizon, freq="D")
+        columns: Dict[str, np.ndarray] = {}
+        for metric, state in self.states.items():
+            mean, stderr = forecast_series(state, horizon)
+            columns[metric] = mean
+            for coverage, z in BAND_Z.items():
+                columns[f"{metric}_lower_{coverage}"] = mean - z * stderr
+                columns[f"{metric}_upper_{coverage}"] = mean + z * stderr
+        return pd.DataFrame(columns, index=index)
+
+
+def _state_path(entity: str) -> str:
+    return os.path.join(FORECAST_STATE_DIR, f"{entity}.pkl")
+
+
+def _load_model(entity: str) -> ForecastModel:
+    path = _state_path(entity)
+    if os.path.exists(path):
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Discarding unreadable forecast state {path}: {e}")
+    return ForecastModel(entity)
+
+
+def _save_model(model: ForecastModel) -> None:
+    os.makedirs(FORECAST_STATE_DIR, exist_ok=True)
+    path = _state_path(model.entity)
+    tmp_path = f"{path}.{os.getpid()}-{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(model, f)
+    os.replace(tmp_path, path)
+
+
+def get_forecast(entity: str = DEFAULT_ENTITY, horizon: int = FORECAST_HORIZON_DAYS) -> pd.DataFrame:
+    """
+    Get an entity's forecast, fitting or advancing its model if the
+    dataset changed since the stored fit.
+
+    Args:
+        entity (str): Entity to forecast
+        horizon (int): Days to forecast
+
+    Returns:
+        pd.DataFrame: See `ForecastModel.forecast`; empty if there is too little data
+    """
+    model = _load_model(entity)
+    if model.sync():
+        _save_model(model)
+    if not model.states:
+        return pd.DataFrame()
+    return model.forecast(horizon)
+
+
+def _refresh_entity(entity: str) -> Optional[str]:
+    """Pool worker: refit one entity's model near its previous parameters, returning an error if any."""
+    try:
+        model = _load_model(entity)
+        if model.sync(refit=True):
+            _save_model(model)
+    except Exception as e:
+        return str(e)
+    return None
+
+
+def refresh_forecasts(entities: Optional[List[str]] = None,
+                      progress: Optional[Callable[[int, int, str], None]] = None) -> Dict[str, Any]:
+    """
+    Refit forecast models for many entities in one batch on the job process pool.
+    Suitable as a nightly job: pass it to `submit_job`, whose progress
+    reporter matches the `progress` argument. The job runs on a thread
+    of the server process, so the entities are still spread over the pool.
+
+    Args:
+        entities (Optional[List[str]]): Entities to refresh; all ledgers when omitted
+        progress (Optional[Callable]): Called as progress(done, total, message)
+
+    Returns:
+        Dict[str, Any]: 'refreshed' entity count and 'failed' entity names
+    """
+    entities = entities or list_entities() or [DEFAULT_ENTITY]
+    total = len(entities)
+    chunksize = max(1, total // (JOB_MAX_WORKERS * 4))
+    failed: List[str] = []
+    results = pool_map(_refresh_entity, entities, chunksize=chunksize)
+    for done, (entity, error) in enumerate(zip(entities, results), start=1):
+        if error is not None:
+            failed.append(entity)
+            logger.warning(f"Forecast refresh failed for '{entity}': {error}")
+        if progress and (done % chunksize == 0 or done == total):
+            progress(done, total, f"Refreshed {done} of {total} forecasts")
+    logger.info(f"Refreshed forecasts for {total - len(failed)} of {total} entities")
+    return {"refreshed": total - len(failed), "failed": failed}
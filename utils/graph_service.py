@@ -0,0 +1,624 @@
+"""
+Graph Service module for the financial knowledge graph.
+Stores companies, suppliers, customers, banks and their relationships as
+compact CSR adjacency arrays (outgoing and incoming) that are memory-mapped
+from disk, answers indexed k-hop neighborhood queries, and keeps
+pre-computed layout coordinates so subgraphs render without a layout pass.
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import logging
+import threading
+import uuid
+import functools
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .data_service import DATA_DIR
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+# Configuration from environment variables with defaults
+GRAPH_DIR = os.environ.get("FINGEN_GRAPH_DIR", os.path.join(DATA_DIR, "graph"))
+LAYOUT_ITERATIONS = int(os.environ.get("FINGEN_GRAPH_LAYOUT_ITERATIONS", "50"))
+# Iterations when warm-starting from cached positions after nodes are added
+LAYOUT_WARM_ITERATIONS = int(os.environ.get("FINGEN_GRAPH_LAYOUT_WARM_ITERATIONS", "15"))
+# Repulsion grid resolution cap; each iteration costs num_nodes * LAYOUT_MAX_GRID ** 2
+LAYOUT_MAX_GRID = int(os.environ.get("FINGEN_GRAPH_LAYOUT_MAX_GRID", "16"))
+GRAPH_RETRIEVAL_HOPS = int(os.environ.get("FINGEN_GRAPH_RETRIEVAL_HOPS", "2"))
+GRAPH_RETRIEVAL_FAN_OUT = int(os.environ.get("FINGEN_GRAPH_RETRIEVAL_FAN_OUT", "10"))
+GRAPH_RETRIEVAL_MAX_RELATIONS = int(os.environ.get("FINGEN_GRAPH_RETRIEVAL_MAX_RELATIONS", "40"))
+GRAPH_RETRIEVAL_EDGE_TYPES = [t for t in os.environ.get("FINGEN_GRAPH_RETRIEVAL_EDGE_TYPES", "").split(",") if t]
+GRAPH_RELATION_CACHE_SIZE = int(os.environ.get("FINGEN_GRAPH_RELATION_CACHE_SIZE", "1024"))
+
+NODE_TYPES = ["company", "supplier", "customer", "bank", "competitor", "distributor"]
+
+# Seed graph used when no graph has been built yet
+SAMPLE_NODES = [
+    ("Our Company", "company"), ("Supplier A", "supplier"), ("Supplier B", "supplier"),
+    ("Customer X", "customer"), ("Customer Y", "customer"), ("Bank", "bank"),
+    ("Competitor A", "competitor"), ("Distributor", "distributor"),
+]
+SAMPLE_EDGES = [
+    ('Our Company', 'Supplier A', 'Sources from'),
+    ('Our Company', 'Supplier B', 'Sources from'),
+    ('Customer X', 'Our Company', 'Buys from'),
+    ('Customer Y', 'Our Company', 'Buys from'),
+    ('Bank', 'Our Company', 'Finances'),
+    ('Our Company', 'Distributor', 'Ships through'),
+    ('Distributor', 'Customer X', 'Delivers to'),
+    ('Distributor', 'Customer Y', 'Delivers to'),
+    ('Supplier A', 'Competitor A', 'Also supplies'),
+    ('Competitor A', 'Customer X', 'Also sells to'),
+]
+
+_ARRAY_NAMES = ("names", "node_types", "out_indptr", "out_indices", "out_types", "in_indptr", "in_indices", "in_types")
+# File in the graph directory naming the version directory that is currently published
+_POINTER_FILE = "CURRENT"
+
+# Graph loaded in this process, with the version directory it was loaded from
+_knowledge_graph: Optional[Tuple["KnowledgeGraph", str]] = None
+_knowledge_graph_lock = threading.Lock()
+
+
+def _graph_version_dir(path: str) -> Optional[str]:
+    """Directory holding the published version of the graph saved at `path`, or None if there is none."""
+    try:
+        with open(os.path.join(path, _POINTER_FILE), "r", encoding="utf-8") as f:
+            return os.path.join(path, f.read().strip())
+    except FileNotFoundError:
+        # Graphs saved before versioning keep their arrays directly in `path`
+        return path if os.path.exists(os.path.join(path, "meta.json")) else None
+
+
+def _normalize_name(text: str) -> List[str]:
+    """Lowercase word tokens used to match entity names in free text."""
+    return re.findall(r"[\w&]+(?:['.-][\w&]+)*", text.lower())
+
+
+def _to_csr(num_nodes: int, keys: np.ndarray, values: np.ndarray, types: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Sort edges by `keys` into CSR arrays: indptr, neighbour indices and edge types."""
+    order = np.argsort(keys, kind="stable")
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=num_nodes), out=indptr[1:])
+    return indptr, values[order].astype(np.int32), types[order].astype(np.int16)
+
+
+def _gather(indptr: np.ndarray, indices: np.ndarray, types: np.ndarray, nodes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Collect the CSR rows of many nodes at once without a Python loop."""
+    starts, ends = indptr[nodes], indptr[nodes + 1]
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if total == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+    return np.repeat(nodes, lengths), np.asarray(indices[offsets]), np.asarray(types[offsets])
+
+
+class KnowledgeGraph:
+    """Directed, typed relationship graph held in CSR arrays.
+
+    Outgoing and incoming adjacency are both stored so neighborhoods can be
+    expanded in either direction. Arrays may be memory-mapped, so opening a
+    large graph costs little more than reading its name index.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], edge_types: List[str], positions: Optional[np.ndarray] = None):
+        for name in _ARRAY_NAMES:
+            setattr(self, name, arrays[name])
+        self.edge_types = edge_types
+        self.positions = positions
+        self.num_nodes = len(self.names)
+        self.num_edges = len(self.out_indices)
+        self._name_index: Dict[str, int] = {}
+        self._max_name_tokens = 1
+        for i, name in enumerate(self.names):
+            tokens = _normalize_name(str(name))
+            self._name_index.setdefault(" ".join(tokens), i)
+            self._max_name_tokens = max(self._max_name_tokens, len(tokens))
+
+    @classmethod
+    def from_edges(cls, nodes: Sequence[Tuple[str, str]], edges: Sequence[Tuple[str, str, str]]) -> "KnowledgeGraph":
+        """
+        Build a graph from (name, node_type) nodes and (source, target, relation) edges.
+        Nodes referenced only by edges are added with the 'company' type.
+        """
+        index: Dict[str, int] = {}
+        names, node_types = [], []
+        for name, node_type in nodes:
+            if name not in index:
+                index[name] = len(names)
+                names.append(name)
+                node_types.append(NODE_TYPES.index(node_type) if node_type in NODE_TYPES else 0)
+        edge_types: Dict[str, int] = {}
+        sources, targets, types = [], [], []
+        for source, target, relation in edges:
+            for name in (source, target):
+                if name not in index:
+                    index[name] = len(names)
+                    names.append(name)
+                    node_types.append(0)
+            sources.append(index[source])
+            targets.append(index[target])
+            types.append(edge_types.setdefault(relation, len(edge_types)))
+
+        num_nodes = len(names)
+        sources, targets, types = (np.asarray(a, dtype=np.int64) for a in (sources, targets, types))
+        out_indptr, out_indices, out_types = _to_csr(num_nodes, sources, targets, types)
+        in_indptr, in_indices, in_types = _to_csr(num_nodes, targets, sources, types)
+        arrays = {
+            "names": np.asarray(names, dtype=str),
+            "node_types": np.asarray(node_types, dtype=np.int8),
+            "out_indptr": out_indptr, "out_indices": out_indices, "out_types": out_types,
+            "in_indptr": in_indptr, "in_indices": in_indices, "in_types": in_types,
+        }
+        return cls(arrays, list(edge_types))
+
+    @classmethod
+    def load(cls, path: str = GRAPH_DIR, mmap: bool = True) -> "KnowledgeGraph":
+        """Open a graph saved with `save`, memory-mapping its arrays."""
+        path = _graph_version_dir(path) or path
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        mode = "r" if mmap else None
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode) for name in _ARRAY_NAMES}
+        positions_path = os.path.join(path, "positions.npy")
+        positions = np.load(positions_path, mmap_mode=mode) if os.path.exists(positions_path) else None
+        return cls(arrays, meta["edge_types"], positions)
+
+    def save(self, path: str = GRAPH_DIR) -> None:
+        """
+        Write the graph (and its layout, if computed) as one .npy file per array.
+        Each save writes a new version directory and then switches the pointer
+        file to it, so readers always find a complete graph. The previous
+        version is kept for readers that resolved it just before the switch;
+        older ones are removed when no longer memory-mapped.
+        """
+        version = f"v{time.time_ns():020d}-{os.getpid()}"
+        version_path = os.path.join(path, version)
+        os.makedirs(version_path)
+        for name in _ARRAY_NAMES:
+            np.save(os.path.join(version_path, f"{name}.npy"), np.asarray(getattr(self, name)))
+        if self.positions is not None:
+            np.save(os.path.join(version_path, "positions.npy"), np.asarray(self.positions))
+        with open(os.path.join(version_path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"edge_types": self.edge_types, "num_nodes": self.num_nodes, "num_edges": self.num_edges}, f)
+        pointer_tmp = os.path.join(path, f"{_POINTER_FILE}.{os.getpid()}-{uuid.uuid4().hex}.tmp")
+        with open(pointer_tmp, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(pointer_tmp, os.path.join(path, _POINTER_FILE))
+        versions = sorted(entry for entry in os.listdir(path) if entry.startswith("v") and entry != version)
+        for old in versions[:-1]:
+            # Fails harmlessly on platforms that refuse to delete mapped files; retried on the next save
+            shutil.rmtree(os.path.join(path, old), ignore_errors=True)
+        for name in _ARRAY_NAMES + ("positions", "meta") if versions else ():
+            # Arrays of a graph saved before versioning, kept like a previous version for one save
+            for legacy in (os.path.join(path, f"{name}.npy"), os.path.join(path, f"{name}.json")):
+                try:
+                    os.remove(legacy)
+                except OSError:
+                    pass
+        logger.info(f"Saved knowledge graph with {self.num_nodes} nodes and {self.num_edges} edges to {path}")
+
+    def to_nodes(self) -> List[Tuple[str, str]]:
+        """List (name, node_type) pairs, the inverse of `from_edges`' nodes argument."""
+        return [(str(name), NODE_TYPES[int(t)]) for name, t in zip(self.names, self.node_types)]
+
+    def to_edges(self) -> List[Tuple[str, str, str]]:
+        """List (source, target, relation) triples, the inverse of `from_edges`' edges argument."""
+        sources = np.repeat(np.arange(self.num_nodes), np.diff(np.asarray(self.out_indptr)))
+        return [
+            (str(self.names[s]), str(self.names[t]), self.edge_types[e])
+            for s, t, e in zip(sources, self.out_indices, self.out_types)
+        ]
+
+    def find(self, name: str) -> Optional[int]:
+        """Look up a node ID by name (case-insensitive)."""
+        return self._name_index.get(" ".join(_normalize_name(name)))
+
+    def find_mentions(self, text: str) -> List[int]:
+        """
+        Find the entities named in free text, preferring the longest match
+        at each position. Costs a dictionary lookup per word n-gram, so it
+        does not depend on the size of the graph.
+
+        Returns:
+            List[int]: Node IDs in order of first mention
+        """
+        tokens = _normalize_name(text)
+        found: List[int] = []
+        i = 0
+        while i < len(tokens):
+            for size in range(min(self._max_name_tokens, len(tokens) - i), 0, -1):
+                node = self._name_index.get(" ".join(tokens[i:i + size]))
+                if node is not None:
+                    if node not in found:
+                        found.append(node)
+                    i += size
+                    break
+            else:
+                i += 1
+        return found
+
+    def node_type(self, node: int) -> str:
+        return NODE_TYPES[int(self.node_types[node])]
+
+    def _edge_type_ids(self, edge_types: Optional[Iterable[str]]) -> Optional[np.ndarray]:
+        if edge_types is None:
+            return None
+        return np.asarray([self.edge_types.index(t) for t in edge_types if t in self.edge_types], dtype=np.int64)
+
+    def edges_from(self, nodes: np.ndarray, direction: str = "both",
+                   edge_types: Optional[Iterable[str]] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Get the edges incident to a set of nodes.
+
+        Args:
+            nodes (np.ndarray): Node IDs
+            direction (str): 'out', 'in' or 'both'
+            edge_types (Optional[Iterable[str]]): Only return edges of these relation types
+
+        Returns:
+            Tuple of (sources, targets, edge type IDs) arrays
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        parts = []
+        if direction in ("out", "both"):
+            src, dst, types = _gather(self.out_indptr, self.out_indices, self.out_types, nodes)
+            parts.append((src, dst, types))
+        if direction in ("in", "both"):
+            dst, src, types = _gather(self.in_indptr, self.in_indices, self.in_types, nodes)
+            parts.append((src, dst, types))
+        sources = np.concatenate([p[0] for p in parts])
+        targets = np.concatenate([p[1] for p in parts])
+        types = np.concatenate([p[2] for p in parts])
+        type_ids = self._edge_type_ids(edge_types)
+        if type_ids is not None:
+            keep = np.isin(types, type_ids)
+            sources, targets, types = sources[keep], targets[keep], types[keep]
+        return sources, targets, types
+
+    def neighborhood(self, seeds: Sequence[int], hops: int = 1, direction: str = "both",
+                     edge_types: Optional[Iterable[str]] = None, max_nodes: Optional[int] = None) -> np.ndarray:
+        """
+        Expand seed nodes to their k-hop neighborhood, one vectorized CSR
+        gather per hop.
+
+        Args:
+            seeds (Sequence[int]): Starting node IDs
+            hops (int): Number of hops to expand
+            direction (str): 'out', 'in' or 'both'
+            edge_types (Optional[Iterable[str]]): Only follow these relation types
+            max_nodes (Optional[int]): Stop adding nodes once this many are collected
+
+        Returns:
+            np.ndarray: Node IDs, seeds first, then in order of discovery
+        """
+        visited = np.zeros(self.num_nodes, dtype=bool)
+        frontier = np.unique(np.asarray(seeds, dtype=np.int64))
+        visited[frontier] = True
+        collected = [frontier]
+        count = len(frontier)
+        for _ in range(hops):
+            if len(frontier) == 0 or (max_nodes is not None and count >= max_nodes):
+                break
+            sources, targets, _ = self.edges_from(frontier, direction, edge_types)
+            neighbours = np.where(np.isin(sources, frontier), targets, sources)
+            # Keep first-seen order while dropping duplicates and visited nodes
+            neighbours, first = np.unique(neighbours, return_index=True)
+            neighbours = neighbours[np.argsort(first)]
+            neighbours = neighbours[~visited[neighbours]]
+            if max_nodes is not None:
+                neighbours = neighbours[:max_nodes - count]
+            visited[neighbours] = True
+            collected.append(neighbours)
+            count += len(neighbours)
+            frontier = neighbours
+        return np.concatenate(collected)
+
+    def traverse(self, seeds: Sequence[int], hops: int = 1, direction: str = "both",
+                 edge_types: Optional[Iterable[str]] = None,
+                 fan_out: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Walk outward from seed nodes and collect the edges that reach new nodes.
+
+        Args:
+            seeds (Sequence[int]): Starting node IDs
+            hops (int): Number of hops to expand
+            direction (str): 'out', 'in' or 'both'
+            edge_types (Optional[Iterable[str]]): Only follow these relation types
+            fan_out (Optional[int]): Follow at most this many new edges per node and hop,
+                which bounds the cost of expanding through hub entities
+
+        Returns:
+            Tuple of (sources, targets, edge type IDs, hop) arrays
+        """
+        visited = np.zeros(self.num_nodes, dtype=bool)
+        frontier = np.unique(np.asarray(seeds, dtype=np.int64))
+        visited[frontier] = True
+        type_ids = self._edge_type_ids(edge_types)
+        walked = []
+        for hop in range(1, hops + 1):
+            if len(frontier) == 0:
+                break
+            # (anchor, neighbour, type, source, target) for each direction
+            parts = []
+            if direction in ("out", "both"):
+                anchor, neighbour, types = _gather(self.out_indptr, self.out_indices, self.out_types, frontier)
+                parts.append((anchor, neighbour, types, anchor, neighbour))
+            if direction in ("in", "both"):
+                anchor, neighbour, types = _gather(self.in_indptr, self.in_indices, self.in_types, frontier)
+                parts.append((anchor, neighbour, types, neighbour, anchor))
+            anchor, neighbour, types, sources, targets = (np.concatenate(column) for column in zip(*parts))
+            keep = ~visited[neighbour]
+            if type_ids is not None:
+                keep &= np.isin(types, type_ids)
+            anchor, neighbour, types, sources, targets = (a[keep] for a in (anchor, neighbour, types, sources, targets))
+            if fan_out is not None and len(anchor):
+                order = np.argsort(anchor, kind="stable")
+                ranked = anchor[order]
+                rank = np.arange(len(ranked)) - np.searchsorted(ranked, ranked, side="left")
+                order = np.sort(order[rank < fan_out])
+                anchor, neighbour, types, sources, targets = (a[order] for a in (anchor, neighbour, types, sources, targets))
+            walked.append((sources, targets, types, np.full(len(sources), hop)))
+            frontier = np.unique(neighbour)
+            visited[frontier] = True
+        if not walked:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, empty, empty
+        return tuple(np.concatenate(column) for column in zip(*walked))
+
+    def subgraph_edges(self, nodes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Get the edges whose endpoints are both in `nodes`."""
+        nodes = np.asarray(nodes, dtype=np.int64)
+        member = np.zeros(self.num_nodes, dtype=bool)
+        member[nodes] = True
+        sources, targets, types = _gather(self.out_indptr, self.out_indices, self.out_types, nodes)
+        keep = member[targets]
+        return sources[keep], targets[keep], types[keep]
+
+
+def compute_layout(graph: KnowledgeGraph, iterations: int = LAYOUT_ITERATIONS, seed: int = 42,
+                   initial: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Compute 2D positions with a vectorized force-directed layout.
+    Attraction runs along every edge; repulsion is approximated by the mass
+    and centroid of grid cells (a one-level Barnes-Hut), which keeps each
+    iteration roughly linear in the number of nodes and edges.
+
+    Args:
+        graph (KnowledgeGraph): Graph to lay out
+        iterations (int): Number of layout iterations
+        seed (int): Seed for the initial positions
+        initial (Optional[np.ndarray]): Warm-start positions of shape (num_nodes, 2),
+            NaN for nodes without one. New nodes start next to their placed
+            neighbours and the layout is only refined, so existing nodes barely move.
+
+    Returns:
+        np.ndarray: float32 array of shape (num_nodes, 2) within [-1, 1]
+    """
+    n = graph.num_nodes
+    rng = np.random.default_rng(seed)
+    pos = rng.uniform(-1, 1, size=(n, 2))
+    if n <= 1:
+        return pos.astype(np.float32) * 0
+    src = np.repeat(np.arange(n), np.diff(np.asarray(graph.out_indptr)))
+    dst = np.asarray(graph.out_indices, dtype=np.int64)
+    k = 1.0 / np.sqrt(n)
+    grid = int(np.clip(np.sqrt(n) / 2, 1, LAYOUT_MAX_GRID))
+    temperature = 0.1
+    if initial is not None:
+        pos = _warm_start(pos, np.asarray(initial, dtype=float), src, dst, k, rng)
+        temperature = 0.02
+    for _ in range(iterations):
+        displacement = np.zeros_like(pos)
+
+        # Repulsion from grid cell centroids, weighted by cell mass
+        lo, hi = pos.min(axis=0), pos.max(axis=0)
+        cell_xy = np.clip(((pos - lo) / np.maximum(hi - lo, 1e-9) * grid).astype(np.int64), 0, grid - 1)
+        cell = cell_xy[:, 0] * grid + cell_xy[:, 1]
+        mass = np.bincount(cell, minlength=grid * grid).astype(float)
+        occupied = mass > 0
+        centroids = np.stack([
+            np.bincount(cell, weights=pos[:, 0], minlength=grid * grid),
+            np.bincount(cell, weights=pos[:, 1], minlength=grid * grid),
+        ], axis=1)[occupied] / mass[occupied, None]
+        mass = mass[occupied]
+        chunk = max(1, 2_000_000 // max(len(mass), 1))
+        for start in range(0, n, chunk):
+            delta = pos[start:start + chunk, None, :] - centroids[None, :, :]
+            dist_sq = np.maximum((delta ** 2).sum(axis=2), 1e-4)
+            displacement[start:start + chunk] += (delta * (mass * k * k / dist_sq)[:, :, None]).sum(axis=1)
+
+        # Attraction along edges
+        if len(dst):
+            delta = pos[src] - pos[dst]
+            dist = np.maximum(np.linalg.norm(delta, axis=1), 1e-9)
+            force = delta * (dist / k)[:, None]
+            for axis in range(2):
+                displacement[:, axis] += np.bincount(dst, weights=force[:, axis], minlength=n)
+                displacement[:, axis] -= np.bincount(src, weights=force[:, axis], minlength=n)
+
+        length = np.maximum(np.linalg.norm(displacement, axis=1), 1e-9)
+        pos += displacement / length[:, None] * np.minimum(length, temperature)[:, None]
+        temperature *= 0.95
+
+    pos -= pos.mean(axis=0)
+    pos /= max(np.abs(pos).max(), 1e-9)
+    return pos.astype(np.float32)
+
+
+def _warm_start(pos: np.ndarray, initial: np.ndarray, src: np.ndarray, dst: np.ndarray,
+                k: float, rng: np.random.Generator) -> np.ndarray:
+    """Seed positions from a previous layout, placing new nodes at the centroid of placed neighbours."""
+    placed = ~np.isnan(initial).any(axis=1)
+    if not placed.any():
+        return pos
+    pos = np.where(placed[:, None], initial, pos)
+    # Unplaced nodes take the mean of neighbours placed so far, repeated so chains of new nodes fill in
+    for _ in range(3):
+        missing = ~placed
+        if not missing.any():
+            break
+        a = np.concatenate([src, dst])
+        b = np.concatenate([dst, src])
+        link = missing[a] & placed[b]
+        count = np.bincount(a[link], minlength=len(pos))
+        reached = count > 0
+        for axis in range(2):
+            total = np.bincount(a[link], weights=pos[b[link], axis], minlength=len(pos))
+            pos[reached, axis] = total[reached] / count[reached] + rng.normal(0, k, reached.sum())
+        placed = placed | reached
+    return pos
+
+
+def get_knowledge_graph() -> KnowledgeGraph:
+    """
+    Get or load the knowledge graph from GRAPH_DIR.
+    Seeds and saves the sample graph when none has been built, and computes
+    the cached layout if the stored graph has none. The published version
+    is checked on every call, so a graph saved by another process or job
+    replaces the one loaded here.
+
+    Returns:
+        KnowledgeGraph: The loaded graph
+    """
+    return _current_graph()[0]
+
+
+def _current_graph() -> Tuple[KnowledgeGraph, str]:
+    """The published graph and its version directory, reloaded when the pointer has moved."""
+    global _knowledge_graph
+    with _knowledge_graph_lock:
+        version_dir = _graph_version_dir(GRAPH_DIR)
+        if version_dir is None:
+            logger.info(f"No knowledge graph found at {GRAPH_DIR}, building the sample graph")
+            build_knowledge_graph(SAMPLE_NODES, SAMPLE_EDGES)
+            version_dir = _graph_version_dir(GRAPH_DIR)
+        if _knowledge_graph is not None and _knowledge_graph[1] == version_dir:
+            return _knowledge_graph
+        graph = KnowledgeGraph.load(version_dir)
+        if graph.positions is None or len(graph.positions) != graph.num_nodes:
+            graph.positions = compute_layout(graph)
+            positions_path = os.path.join(version_dir, "positions.npy")
+            tmp_path = f"{positions_path}.{os.getpid()}-{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, graph.positions)
+            os.replace(tmp_path, positions_path)
+        _knowledge_graph = (graph, version_dir)
+        logger.info(f"Loaded knowledge graph with {graph.num_nodes} nodes and {graph.num_edges} edges")
+        return _knowledge_graph
+
+
+def build_knowledge_graph(nodes: Sequence[Tuple[str, str]], edges: Sequence[Tuple[str, str, str]],
+                          path: str = GRAPH_DIR) -> KnowledgeGraph:
+    """
+    Build a graph, compute its layout and persist both.
+
+    Args:
+        nodes: (name, node_type) pairs, node_type being one of NODE_TYPES
+        edges: (source, target, relation) triples
+        path (str): Directory to save the graph in
+
+    Returns:
+        KnowledgeGraph: The built graph
+    """
+    graph = KnowledgeGraph.from_edges(nodes, edges)
+    previous = KnowledgeGraph.load(path) if _graph_version_dir(path) is not None else None
+    if previous is not None and previous.positions is not None:
+        # Warm-start from the cached layout so a growing graph keeps its shape
+        initial = np.full((graph.num_nodes, 2), np.nan)
+        lookup = (previous.find(str(name)) for name in graph.names)
+        ids = np.array([-1 if node is None else node for node in lookup], dtype=np.int64)
+        known = ids >= 0
+        initial[known] = np.asarray(previous.positions)[ids[known]]
+        graph.positions = compute_layout(graph, iterations=LAYOUT_WARM_ITERATIONS, initial=initial)
+    else:
+        graph.positions = compute_layout(graph)
+    graph.save(path)
+    if path == GRAPH_DIR:
+        # Relations cached for older versions can no longer be hit
+        _cached_relations.cache_clear()
+    return graph
+
+
+def extend_knowledge_graph(nodes: Sequence[Tuple[str, str]], edges: Sequence[Tuple[str, str, str]],
+                           path: str = GRAPH_DIR) -> KnowledgeGraph:
+    """
+    Add nodes and edges to the stored graph.
+    The layout is warm-started from the cached positions, so only the new
+    nodes need to settle.
+
+    Args:
+        nodes: New (name, node_type) pairs
+        edges: New (source, target, relation) triples
+        path (str): Directory of the graph to extend
+
+    Returns:
+        KnowledgeGraph: The extended graph
+    """
+    current = KnowledgeGraph.load(path, mmap=False) if _graph_version_dir(path) is not None else None
+    if current is None:
+        return build_knowledge_graph(nodes, edges, path)
+    return build_knowledge_graph(current.to_nodes() + list(nodes), current.to_edges() + list(edges), path)
+
+
+class _GraphChanged(Exception):
+    """A newer graph was published while relations were being looked up."""
+
+
+@functools.lru_cache(maxsize=GRAPH_RELATION_CACHE_SIZE)
+def _cached_relations(version: str, seeds: Tuple[int, ...], hops: int, edge_types: Optional[Tuple[str, ...]],
+                      fan_out: Optional[int], limit: int) -> Tuple[str, ...]:
+    graph, loaded = _current_graph()
+    if loaded != version:
+        raise _GraphChanged
+    sources, targets, types, hop = graph.traverse(seeds, hops=hops, edge_types=edge_types, fan_out=fan_out)
+    relations = []
+    for source, target, edge_type, distance in zip(sources[:limit], targets[:limit], types[:limit], hop[:limit]):
+        relations.append(
+            f"{graph.names[source]} ({graph.node_type(source)}) --[{graph.edge_types[edge_type]}]--> "
+            f"{graph.names[target]} ({graph.node_type(target)}) [{distance}-hop]"
+        )
+    return tuple(relations)
+
+
+def get_entity_relations(text: str, hops: int = GRAPH_RETRIEVAL_HOPS,
+                         edge_types: Optional[Sequence[str]] = None,
+                         fan_out: Optional[int] = GRAPH_RETRIEVAL_FAN_OUT,
+                         limit: int = GRAPH_RETRIEVAL_MAX_RELATIONS) -> List[str]:
+    """
+    Describe the k-hop relationships of the entities mentioned in a text.
+    Results are memoized per entity set, so repeated questions about hot
+    entities cost a single dictionary lookup.
+
+    Args:
+        text (str): Free text, typically the user's question
+        hops (int): Number of hops to expand from the mentioned entities
+        edge_types (Optional[Sequence[str]]): Relation types to follow; defaults to
+            GRAPH_RETRIEVAL_EDGE_TYPES, or all types when that is empty
+        fan_out (Optional[int]): Maximum new edges followed per entity and hop
+        limit (int): Maximum number of relations returned, nearest hops first
+
+    Returns:
+        List[str]: One line per relation, empty if no known entity is mentioned
+    """
+    edge_types = edge_types or GRAPH_RETRIEVAL_EDGE_TYPES
+    while True:
+        graph, version = _current_graph()
+        seeds = graph.find_mentions(text)
+        if not seeds:
+            return []
+        try:
+            # Keyed by version: node IDs and relations differ between versions
+            return list(_cached_relations(version, tuple(sorted(seeds)), hops,
+                                          tuple(edge_types) if edge_types else None, fan_out, limit))
+        except _GraphChanged:
+            continue  # Republished between the lookups; resolve the mentions again
@@ -0,0 +1,432 @@
+"""
+Ingest Service module for parsing filings into documents and tables.
+Loaders are registered per file extension and run on the job process
+pool, one file per task, so a large batch of filings is parsed on every
+core. Prose (text, PDF pages, HTML body text, long XBRL text blocks)
+becomes documents for embedding; XBRL facts and CSV rows are written to
+Parquet tables instead of being embedded. Parse results are cached by
+the SHA-256 of the file content, so unchanged files are never re-parsed.
+The Parquet files are keyed by source path: a changed file replaces its
+own facts and table, and `remove_tables` drops those of deleted files.
+
+Custom loaders are registered with `@register_loader(".ext")` at import
+time of a module, so that pool workers see them too.
+"""
+
+import os
+import re
+import hashlib
+import logging
+import uuid
+import xml.etree.ElementTree as ET
+from html.parser import HTMLParser
+from pathlib import Path
+from concurrent.futures import as_completed
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from .data_service import DATA_DIR
+from .job_service import JOB_MAX_WORKERS, get_job_cache, get_process_pool, in_pool_worker
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+# Configuration from environment variables with defaults
+FILINGS_DIR = os.environ.get("FINGEN_FILINGS_DIR", os.path.join(DATA_DIR, "filings"))
+FACTS_DIR = os.path.join(FILINGS_DIR, "facts")
+TABLES_DIR = os.path.join(FILINGS_DIR, "tables")
+# Below this many files to parse, the pool's startup costs more than it saves
+INGEST_MIN_PARALLEL_FILES = int(os.environ.get("FINGEN_INGEST_MIN_PARALLEL_FILES", "4"))
+# XBRL text facts at least this long are prose (text blocks) rather than table values
+INGEST_TEXT_BLOCK_CHARS = int(os.environ.get("FINGEN_INGEST_TEXT_BLOCK_CHARS", "500"))
+
+# Bump when loader output changes, so cached parses are not reused
+PARSER_VERSION = 1
+
+FACT_COLUMNS = ["source", "entity", "concept", "context", "period_start", "period_end",
+                "dimensions", "unit", "decimals", "value", "text"]
+
+Loader = Callable[[str], Dict[str, Any]]
+_LOADERS: Dict[str, Loader] = {}
+
+
+def register_loader(*extensions: str) -> Callable[[Loader], Loader]:
+    """
+    Register a loader for file extensions (e.g. ".pdf").
+
+    A loader takes a path and returns a dict with any of 'documents'
+    (list of (text, metadata) tuples; metadata values must be scalars),
+    'facts' (list of fact records, see FACT_COLUMNS) and 'table' (a DataFrame).
+    """
+    def decorator(loader: Loader) -> Loader:
+        for extension in extensions:
+            _LOADERS[extension.lower()] = loader
+        return loader
+    return decorator
+
+
+def supported_extensions() -> List[str]:
+    return sorted(_LOADERS)
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def parse_file(path: str) -> Dict[str, Any]:
+    """
+    Parse one file with the loader registered for its extension.
+    Runs in pool workers; failures are returned as 'error' rather than raised,
+    so one bad filing does not abort a batch.
+    """
+    loader = _LOADERS.get(Path(path).suffix.lower())
+    if loader is None:
+        return {"error": f"No loader registered for {path}"}
+    try:
+        parsed = loader(path)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    parsed.setdefault("documents", [])
+    parsed.setdefault("facts", [])
+    parsed.setdefault("table", None)
+    return parsed
+
+
+# --- Loaders ---
+
+@register_loader(".txt", ".md")
+def load_text(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return {"documents": [(f.read(), {})]}
+
+
+@register_loader(".pdf")
+def load_pdf(path: str) -> Dict[str, Any]:
+    from pypdf import PdfReader  # Optional dependency, only needed for PDF filings
+    reader = PdfReader(path)
+    documents = []
+    for number, page in enumerate(reader.pages, start=1):
+        text = page.extract_text() or ""
+        if text.strip():
+            documents.append((text, {"page": number}))
+    return {"documents": documents}
+
+
+@register_loader(".csv")
+def load_csv(path: str) -> Dict[str, Any]:
+    # Tabular data goes to a table as-is; embedding rows as prose loses their structure
+    return {"table": pd.read_csv(path)}
+
+
+def _local(tag: str) -> str:
+    """Tag name without namespace URI or prefix."""
+    return tag.rsplit("}", 1)[-1].rsplit(":", 1)[-1].lower()
+
+
+def _fact(source: str, contexts: Dict[str, Dict[str, Any]], concept: str, context_ref: str,
+          unit: Optional[str], decimals: Optional[str], value: Optional[float], text: Optional[str]) -> Dict[str, Any]:
+    context = contexts.get(context_ref, {})
+    return {
+        "source": source, "entity": context.get("entity"), "concept": concept, "context": context_ref,
+        "period_start": context.get("start"), "period_end": context.get("end"),
+        "dimensions": ";".join(context.get("dimensions", [])) or None,
+        "unit": unit, "decimals": decimals, "value": value, "text": text,
+    }
+
+
+def _split_text_facts(facts: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Tuple[str, Dict[str, Any]]]]:
+    """Move long text facts (text blocks) out of the table and into documents."""
+    kept, documents = [], []
+    for fact in facts:
+        if fact["value"] is None and fact["text"] and len(fact["text"]) >= INGEST_TEXT_BLOCK_CHARS:
+            documents.append((fact["text"], {"concept": fact["concept"], "context": fact["context"]}))
+        else:
+            kept.append(fact)
+    return kept, documents
+
+
+_TAG_PATTERN = re.compile(r"<[^>]+>")
+
+
+@register_loader(".xml", ".xbrl")
+def load_xbrl(path: str) -> Dict[str, Any]:
+    """XBRL instance documents: contexts and top-level facts, with namespace prefixes kept on concepts."""
+    prefixes: Dict[str, str] = {}
+    root = None
+    for event, item in ET.iterparse(path, events=("start-ns", "start")):
+        if event == "start-ns":
+            prefixes.setdefault(item[1], item[0])
+        elif root is None:
+            root = item
+    if root is None or _local(root.tag) != "xbrl":
+        raise ValueError("Not an XBRL instance document")
+
+    contexts: Dict[str, Dict[str, Any]] = {}
+    for element in root:
+        if _local(element.tag) != "context":
+            continue
+        context: Dict[str, Any] = {"dimensions": []}
+        for child in element.iter():
+            name = _local(child.tag)
+            if name == "identifier":
+                context["entity"] = (child.text or "").strip()
+            elif name == "startdate":
+                context["start"] = (child.text or "").strip()
+            elif name in ("enddate", "instant"):
+                context["end"] = (child.text or "").strip()
+            elif name in ("explicitmember", "typedmember"):
+                member = (child.text or "").strip() or "".join(child.itertext()).strip()
+                context["dimensions"].append(f"{child.get('dimension')}={member}")
+        contexts[element.get("id")] = context
+
+    facts = []
+    for element in root:
+        context_ref = element.get("contextRef")
+        if context_ref is None:
+            continue
+        uri, _, local = element.tag[1:].partition("}") if element.tag.startswith("{") else ("", "", element.tag)
+        concept = f"{prefixes[uri]}:{local}" if prefixes.get(uri) else local
+        content = (element.text or "").strip()
+        unit = element.get("unitRef")
+        value = text = None
+        if unit is not None:
+            try:
+                value = float(content)
+            except ValueError:
+                text = content
+        else:
+            text = " ".join(_TAG_PATTERN.sub(" ", content).split())
+        facts.append(_fact(path, contexts, concept, context_ref, unit, element.get("decimals"), value, text))
+
+    facts, documents = _split_text_facts(facts)
+    return {"documents": documents, "facts": facts}
+
+
+class _FilingHTMLParser(HTMLParser):
+    """Collects visible body text and, for inline XBRL filings, contexts and tagged facts."""
+
+    SKIPPED = {"script", "style", "head", "title", "ix:header"}
+    BLOCKS = {"p", "div", "br", "tr", "li", "h1", "h2", "h3", "h4", "h5", "h6", "table", "section"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.text: List[str] = []
+        self.skip_depth = 0
+        self.contexts: Dict[str, Dict[str, Any]] = {}
+        self.context: Optional[Dict[str, Any]] = None
+        self.context_field: Optional[str] = None
+        self.open_facts: List[Dict[str, Any]] = []
+        self.facts: List[Dict[str, Any]] = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in self.SKIPPED:
+            self.skip_depth += 1
+        elif tag in self.BLOCKS:
+            self.text.append("\n")
+        name = _local(tag)
+        if name == "context":
+            self.context = {"dimensions": []}
+            self.contexts[attrs.get("id")] = self.context
+        elif self.context is not None and name in ("identifier", "startdate", "enddate", "instant", "explicitmember"):
+            self.context_field = name
+            if name == "explicitmember":
+                self.context["dimensions"].append(f"{attrs.get('dimension')}=")
+        elif tag in ("ix:nonfraction", "ix:nonnumeric"):
+            self.open_facts.append({"tag": tag, "attrs": attrs, "content": []})
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED:
+            self.skip_depth = max(self.skip_depth - 1, 0)
+        elif tag in self.BLOCKS:
+            self.text.append("\n")
+        name = _local(tag)
+        if name == "context":
+            self.context = None
+        elif name == self.context_field:
+            self.context_field = None
+        elif tag in ("ix:nonfraction", "ix:nonnumeric") and self.open_facts:
+            self.facts.append(self.open_facts.pop())
+
+    def handle_data(self, data):
+        if self.context is not None and self.context_field:
+            value = data.strip()
+            if self.context_field == "identifier":
+                self.context["entity"] = value
+            elif self.context_field == "startdate":
+                self.context["start"] = value
+            elif self.context_field in ("enddate", "instant"):
+                self.context["end"] = value
+            else:
+                self.context["dimensions"][-1] += value
+        for fact in self.open_facts:
+            fact["content"].append(data)
+        if not self.skip_depth:
+            self.text.append(data)
+
+
+def _inline_value(content: str, attrs: Dict[str, str]) -> Optional[float]:
+    """Numeric value of an ix:nonFraction, applying its format, scale and sign."""
+    content = content.strip()
+    number_format = (attrs.get("format") or "").lower().replace("-", "")
+    if "zero" in number_format or content in ("-", "—", "–"):
+        return 0.0
+    number = re.sub(r"[^\d.,]", "", content)
+    if "commadecimal" in number_format:
+        number = number.replace(".", "").replace(",", ".")
+    else:
+        number = number.replace(",", "")
+    try:
+        value = float(number) * 10 ** int(attrs.get("scale") or 0)
+    except ValueError:
+        return None
+    return -value if attrs.get("sign") == "-" else value
+
+
+@register_loader(".html", ".htm", ".xhtml")
+def load_html(path: str) -> Dict[str, Any]:
+    """HTML filings: body text as a document; inline XBRL facts, if any, as table rows."""
+    parser = _FilingHTMLParser()
+    with open(path, encoding="utf-8", errors="replace") as f:
+        parser.feed(f.read())
+    parser.close()
+
+    facts = []
+    for fact in parser.facts:
+        attrs, content = fact["attrs"], "".join(fact["content"])
+        if fact["tag"] == "ix:nonfraction":
+            value, text = _inline_value(content, attrs), None
+        else:
+            value, text = None, " ".join(content.split())
+        facts.append(_fact(path, parser.contexts, attrs.get("name"), attrs.get("contextref"),
+                           attrs.get("unitref"), attrs.get("decimals"), value, text))
+    facts, _ = _split_text_facts(facts)  # Text blocks are already part of the body text
+
+    lines = (" ".join(line.split()) for line in "".join(parser.text).splitlines())
+    text = "\n".join(line for line in lines if line)
+    return {"documents": [(text, {})] if text else [], "facts": facts}
+
+
+# --- Batch ingestion ---
+
+def _cache_key(digest: str) -> str:
+    return f"ingest:{PARSER_VERSION}:{digest}"
+
+
+def _table_paths(path: str) -> Tuple[str, str]:
+    """The facts and table Parquet files of a source file, keyed by its path."""
+    key = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(FACTS_DIR, f"{key}.parquet"), os.path.join(TABLES_DIR, f"{Path(path).stem}-{key}.parquet")
+
+
+def _write_parquet(frame: pd.DataFrame, target: str) -> None:
+    # Written aside and renamed, so SQL queries never scan a partial file
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = f"{target}.{os.getpid()}-{uuid.uuid4().hex}.tmp"
+    try:
+        frame.to_parquet(tmp_path, index=False)
+    except (TypeError, ValueError):
+        # Mixed-type columns: keep the values as text rather than dropping the file
+        frame.astype(str).to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, target)
+
+
+def _write_tables(path: str, parsed: Dict[str, Any]) -> None:
+    """Replace a file's facts and table in Parquet; outputs the new parse no longer has are removed."""
+    facts_path, table_path = _table_paths(path)
+    if parsed["facts"]:
+        facts = pd.DataFrame(parsed["facts"], columns=FACT_COLUMNS)
+        facts["source"] = path  # Cached parses may come from an identical file under another name
+        for column in ("period_start", "period_end"):
+            facts[column] = pd.to_datetime(facts[column], errors="coerce")
+        _write_parquet(facts, facts_path)
+    elif os.path.exists(facts_path):
+        os.remove(facts_path)
+    if parsed["table"] is not None:
+        _write_parquet(parsed["table"], table_path)
+    elif os.path.exists(table_path):
+        os.remove(table_path)
+
+
+def remove_tables(paths: Iterable[str]) -> None:
+    """Delete the facts and tables written for files that were removed."""
+    for path in paths:
+        for target in _table_paths(path):
+            if os.path.exists(target):
+                os.remove(target)
+                logger.info(f"Removed {target} of deleted file {path}")
+
+
+def discover_files(root: str) -> List[str]:
+    """Files under a directory that have a registered loader, in a stable order."""
+    return sorted(str(p) for p in Path(root).rglob("*")
+                  if p.is_file() and p.suffix.lower() in _LOADERS)
+
+
+def ingest_files(paths: Iterable[str], progress: Optional[Callable[..., None]] = None,
+                 known: Optional[Dict[str, str]] = None) -> List[Tuple[str, str, Dict[str, Any]]]:
+    """
+    Parse files, reusing cached results for content already parsed and
+    fanning the rest out over the process pool. This is the parallel entry
+    point for every caller: `initialize_documents`, and jobs, which run on
+    threads of the server process. Only a call made inside a pool worker,
+    or with fewer than INGEST_MIN_PARALLEL_FILES files to parse, parses in
+    the calling process. Facts and tables are written to FILINGS_DIR as a
+    side effect, replacing those of the previous version of each file.
+
+    Args:
+        paths: Files to ingest
+        progress: Optional callable (done, total, message), e.g. a job's JobProgress
+        known: Content hash per path already ingested; their tables are not rewritten
+
+    Returns:
+        List[Tuple[str, str, Dict[str, Any]]]: (path, content hash, parsed) per
+        file that parsed successfully, in input order
+    """
+    paths = list(paths)
+    known = known or {}
+    cache = get_job_cache()
+    digests = {path: file_hash(path) for path in paths}
+    results: Dict[str, Dict[str, Any]] = {}
+    pending = []
+    for path in paths:
+        parsed = cache.get(_cache_key(digests[path]))
+        if parsed is None:
+            pending.append(path)
+        else:
+            results[path] = parsed
+    logger.info(f"Ingesting {len(paths)} files: {len(paths) - len(pending)} cached, {len(pending)} to parse")
+
+    def finish(path: str, parsed: Dict[str, Any]) -> None:
+        if "error" in parsed:
+            logger.warning(f"Could not parse {path}: {parsed['error']}")
+        else:
+            cache.set(_cache_key(digests[path]), parsed)
+            results[path] = parsed
+        if progress is not None:
+            progress(len(results), len(paths), f"Parsed {Path(path).name}")
+
+    if len(pending) < INGEST_MIN_PARALLEL_FILES or in_pool_worker():
+        for path in pending:
+            finish(path, parse_file(path))
+    else:
+        pool = get_process_pool()
+        futures = {pool.submit(parse_file, path): path for path in pending}
+        logger.info(f"Parsing {len(pending)} files on {JOB_MAX_WORKERS} workers")
+        for future in as_completed(futures):
+            finish(futures[future], future.result())
+
+    for path in paths:
+        # A file that no longer parses loses the tables of its previous version
+        parsed = results.get(path, {"facts": [], "table": None})
+        facts_path, table_path = _table_paths(path)
+        if (known.get(path) != digests[path] or (parsed["facts"] and not os.path.exists(facts_path))
+                or (parsed["table"] is not None and not os.path.exists(table_path))):
+            _write_tables(path, parsed)
+    return [(path, digests[path], results[path]) for path in paths if path in results]
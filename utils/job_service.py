@@ -0,0 +1,240 @@
+"""
+Job Service module for running long analyses outside the web request worker.
+Provides the disk-backed background callback manager used by Dash
+(`background=True` callbacks with progress reporting and cancellation) and a
+job queue for heavy work that is not tied to a callback, such as bulk
+document ingestion. Jobs run on a few threads of the submitting process
+and fan their work out over the process pool with `pool_map`, so one job
+uses every core without a pool ever starting another pool.
+"""
+
+import os
+import uuid
+import logging
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Future
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import diskcache
+from dash import DiskcacheManager
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+# Configuration from environment variables with defaults
+JOB_CACHE_DIR = os.environ.get("FINGEN_JOB_CACHE_DIR", "./cache/jobs")
+JOB_EXPIRE_SECONDS = int(os.environ.get("FINGEN_JOB_EXPIRE_SECONDS", "3600"))
+JOB_MAX_WORKERS = int(os.environ.get("FINGEN_JOB_MAX_WORKERS", str(os.cpu_count() or 2)))
+# Jobs running at once per process; each fans out over the JOB_MAX_WORKERS pool
+JOB_MAX_RUNNING = int(os.environ.get("FINGEN_JOB_MAX_RUNNING", "2"))
+
+# Singleton instances
+_job_cache = None
+_job_cache_pid = None
+_background_callback_manager = None
+_process_pool = None
+_process_pool_pid = None
+_job_runner = None
+_job_runner_pid = None
+# True in processes started by the job pool
+_in_pool_worker = False
+_futures: Dict[str, Future] = {}
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job when cancellation has been requested."""
+
+
+class JobProgress:
+    """Progress reporter handed to every job submitted through `submit_job`.
+
+    Writes progress to the shared disk cache so any web worker can poll it,
+    and doubles as the cooperative cancellation point: reporting progress on a
+    cancelled job raises `JobCancelled`.
+    """
+
+    def __init__(self, job_id: str, cache: diskcache.Cache):
+        self.job_id = job_id
+        self._cache = cache
+
+    @property
+    def cancelled(self) -> bool:
+        return bool(self._cache.get(_cancel_key(self.job_id)))
+
+    def __call__(self, done: int, total: int, message: str = "") -> None:
+        """Record `done` out of `total` steps, raising if the job was cancelled."""
+        if self.cancelled:
+            raise JobCancelled(self.job_id)
+        _update_status(self._cache, self.job_id, progress=[done, total], message=message)
+
+
+def _status_key(job_id: str) -> str:
+    return f"job:{job_id}:status"
+
+
+def _cancel_key(job_id: str) -> str:
+    return f"job:{job_id}:cancel"
+
+
+def _update_status(cache: diskcache.Cache, job_id: str, **fields) -> None:
+    status = cache.get(_status_key(job_id)) or {}
+    status.update(fields)
+    cache.set(_status_key(job_id), status, expire=JOB_EXPIRE_SECONDS)
+
+
+def get_job_cache() -> diskcache.Cache:
+    """
+    Get or initialize the disk cache shared by background callbacks and jobs.
+
+    Returns:
+        diskcache.Cache: Cache stored under JOB_CACHE_DIR
+    """
+    global _job_cache, _job_cache_pid
+    # Database connections must not be shared with forked worker processes
+    if _job_cache is None or _job_cache_pid != os.getpid():
+        os.makedirs(JOB_CACHE_DIR, exist_ok=True)
+        _job_cache = diskcache.Cache(JOB_CACHE_DIR)
+        _job_cache_pid = os.getpid()
+        logger.info(f"Initialized job cache at {JOB_CACHE_DIR}")
+    return _job_cache
+
+
+def get_background_callback_manager() -> DiskcacheManager:
+    """
+    Get or initialize the Dash background callback manager.
+    Callbacks declared with `background=True` run in a separate process,
+    keeping web workers free and avoiding request timeouts on long analyses.
+
+    Returns:
+        DiskcacheManager: Manager backed by the shared job cache
+    """
+    global _background_callback_manager
+    if _background_callback_manager is None:
+        _background_callback_manager = DiskcacheManager(get_job_cache(), expire=JOB_EXPIRE_SECONDS)
+        logger.info("Background callback manager initialized (diskcache)")
+    return _background_callback_manager
+
+
+def _init_pool_worker() -> None:
+    global _in_pool_worker
+    _in_pool_worker = True
+
+
+def in_pool_worker() -> bool:
+    """Whether the caller runs in a job pool worker, where starting another pool would multiply the processes."""
+    return _in_pool_worker
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Get or initialize the process pool that jobs and background callbacks fan out over."""
+    global _process_pool, _process_pool_pid
+    # A pool inherited through fork belongs to the parent; background callbacks that fan out get their own
+    if _process_pool is None or _process_pool_pid != os.getpid():
+        _process_pool = ProcessPoolExecutor(max_workers=JOB_MAX_WORKERS, initializer=_init_pool_worker)
+        _process_pool_pid = os.getpid()
+        logger.info(f"Initialized job process pool with {JOB_MAX_WORKERS} workers")
+    return _process_pool
+
+
+def pool_map(func: Callable, items: List[Any], chunksize: int = 1) -> Iterator[Any]:
+    """
+    Map `func` over `items` on the process pool. Called from a pool worker
+    (a task that itself fans out), it maps in that worker instead, since a
+    pool per worker would start JOB_MAX_WORKERS squared processes; fan out
+    at the outermost level, as jobs do.
+
+    Returns:
+        Iterator[Any]: Results in the order of `items`
+    """
+    if _in_pool_worker:
+        return map(func, items)
+    return get_process_pool().map(func, items, chunksize=chunksize)
+
+
+def _get_job_runner() -> ThreadPoolExecutor:
+    global _job_runner, _job_runner_pid
+    if _job_runner is None or _job_runner_pid != os.getpid():
+        _job_runner = ThreadPoolExecutor(max_workers=JOB_MAX_RUNNING, thread_name_prefix="fingen-job")
+        _job_runner_pid = os.getpid()
+    return _job_runner
+
+
+def _run_job(job_id: str, cache_dir: str, func: Callable, args: tuple, kwargs: dict) -> None:
+    """Job thread wrapper: runs `func` with a progress reporter and records the outcome."""
+    cache = diskcache.Cache(cache_dir)
+    try:
+        progress = JobProgress(job_id, cache)
+        if progress.cancelled:
+            raise JobCancelled(job_id)
+        _update_status(cache, job_id, state="running")
+        result = func(*args, progress=progress, **kwargs)
+        _update_status(cache, job_id, state="done", result=result)
+    except JobCancelled:
+        _update_status(cache, job_id, state="cancelled")
+    except Exception as e:
+        _update_status(cache, job_id, state="failed", error=str(e), traceback=traceback.format_exc())
+    finally:
+        cache.close()
+
+
+def submit_job(func: Callable[..., Any], *args, job_id: Optional[str] = None, **kwargs) -> str:
+    """
+    Queue a heavy job. At most JOB_MAX_RUNNING jobs run at once, each on a
+    thread of this process; CPU-bound work inside a job should go through
+    `pool_map` so it runs on every core rather than under this process's GIL.
+
+    `func` must accept a `progress` keyword argument (a `JobProgress`),
+    which it should call periodically. Its return value must be picklable
+    and is stored as the job result.
+
+    Args:
+        func: Function to run
+        *args: Positional arguments for `func`
+        job_id (str): Optional identifier; generated when omitted
+        **kwargs: Keyword arguments for `func`
+
+    Returns:
+        str: The job identifier, for use with `get_job_status` and `cancel_job`
+    """
+    job_id = job_id or uuid.uuid4().hex
+    cache = get_job_cache()
+    cache.delete(_cancel_key(job_id))
+    _update_status(cache, job_id, state="queued", progress=[0, 0], message="")
+    future = _get_job_runner().submit(_run_job, job_id, JOB_CACHE_DIR, func, args, kwargs)
+    _futures[job_id] = future
+    future.add_done_callback(lambda _: _futures.pop(job_id, None))
+    logger.info(f"Submitted job {job_id} ({getattr(func, '__name__', func)})")
+    return job_id
+
+
+def get_job_status(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Get the status of a queued job.
+
+    Returns:
+        Optional[Dict[str, Any]]: Dict with 'state' (queued, running, done,
+        failed, cancelled), 'progress' ([done, total]), 'message', and
+        'result' or 'error' once finished. None if the job is unknown.
+    """
+    return get_job_cache().get(_status_key(job_id))
+
+
+def cancel_job(job_id: str) -> bool:
+    """
+    Request cancellation of a job.
+    Queued jobs are dropped immediately; running jobs stop at their next
+    progress report.
+
+    Returns:
+        bool: True if the job was known and not yet finished
+    """
+    status = get_job_status(job_id)
+    if status is None or status.get("state") in ("done", "failed", "cancelled"):
+        return False
+    cache = get_job_cache()
+    cache.set(_cancel_key(job_id), True, expire=JOB_EXPIRE_SECONDS)
+    future = _futures.get(job_id)
+    if future is not None and future.cancel():
+        _update_status(cache, job_id, state="cancelled")
+    logger.info(f"Cancellation requested for job {job_id}")
+    return True
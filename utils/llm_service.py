@@ -6,7 +6,7 @@ Uses Langchain for better integration with other components.
 
 import os
 import logging
-from typing import Generator, Dict, Any, List, Optional
+from typing import AsyncGenerator, Generator, Dict, Any, List, Optional
 
 # Langchain imports
 from langchain_ollama import ChatOllama
@@ -14,6 +14,9 @@ from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnableConfig
 
+from .async_service import iterate_async
+from .coalesce_service import coalesced_stream, flight_key
+
 # Get logger
 logger = logging.getLogger(__name__)
 
@@ -53,7 +56,8 @@ def get_llm_client() -> ChatOllama:
 def stream_llm_response(prompt: str) -> Generator[str, None, None]:
     """
     Stream responses from the LLM based on the given prompt.
-    Uses Langchain for streaming.
+    Runs `astream_llm_response` on the worker's shared event loop, so
+    identical prompts from sync and async callers share one generation.
     
     Args:
         prompt (str): User prompt to send to the LLM
@@ -61,26 +65,46 @@ def stream_llm_response(prompt: str) -> Generator[str, None, None]:
     Yields:
         str: Content chunks from the LLM response
     """
+    yield from iterate_async(astream_llm_response(prompt))
+
+async def _astream_upstream(prompt: str) -> AsyncGenerator[str, None]:
+    """Stream one generation from Ollama, turning failures into an error message chunk."""
     try:
         llm = get_llm_client()
         messages = [HumanMessage(content=prompt)]
         
-        logger.info(f"Starting Langchain stream with model {OLLAMA_MODEL}")
+        logger.info(f"Starting async Langchain stream with model {OLLAMA_MODEL}")
         
-        # Stream the response
-        for chunk in llm.stream(messages):
+        async for chunk in llm.astream(messages):
             if hasattr(chunk, 'content'):
                 yield chunk.content
         
-        logger.info("Langchain stream finished successfully")
+        logger.info("Async Langchain stream finished successfully")
         
     except ConnectionError as e:
-        logger.error(f"Connection error during Langchain streaming: {e}")
+        logger.error(f"Connection error during async Langchain streaming: {e}")
         yield f"\n\n[Error: Could not connect to Ollama service. Please ensure it's running and accessible at {OLLAMA_BASE_URL}]\n"
     except Exception as e:
-        logger.exception(f"Unexpected error during Langchain streaming: {e}")
+        logger.exception(f"Unexpected error during async Langchain streaming: {e}")
         yield f"\n\n[Error generating response: {e}]\n"
 
+async def astream_llm_response(prompt: str) -> AsyncGenerator[str, None]:
+    """
+    Async counterpart of `stream_llm_response` for the ASGI server.
+    Streams on the running event loop, so concurrent sessions wait on I/O
+    rather than each holding a thread. Concurrent identical prompts are
+    coalesced: one upstream stream is fanned out to every caller.
+    
+    Args:
+        prompt (str): User prompt to send to the LLM
+        
+    Yields:
+        str: Content chunks from the LLM response
+    """
+    key = flight_key("chat", prompt, OLLAMA_MODEL)
+    async for chunk in coalesced_stream(key, lambda: _astream_upstream(prompt)):
+        yield chunk
+
 # For backward compatibility
 def get_ollama_client() -> ChatOllama:
     """
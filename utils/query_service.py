@@ -0,0 +1,375 @@
+"""
+Query Service module for answering natural-language questions about the ledger.
+An LLM compiles each question into a structured query plan (metric,
+aggregation, time range, grouping and comparison) that is executed with
+vectorized pandas over the shared ledger. Compiled plans are cached by the
+question's normalized shape, with years, quarters and counts as slots, so
+a repeated or re-parameterized question skips the LLM entirely.
+"""
+
+import os
+import re
+import time
+import logging
+from typing import Any, Dict, List, Literal, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel, Field
+
+from .data_service import DEFAULT_ENTITY, SAMPLE_DATA, ensure_sample_dataset, get_dataset_version, list_entities, load_dataset
+from .analysis_service import compute_margin
+from .job_service import get_job_cache
+from .llm_service import get_llm_client
+from .async_service import run_async
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+# Configuration from environment variables with defaults
+QUERY_PLAN_CACHE_SIZE = int(os.environ.get("FINGEN_QUERY_PLAN_CACHE_SIZE", "1024"))
+# Bump when the plan schema or planner prompt changes so stale plans are not reused
+QUERY_PLAN_VERSION = 1
+
+QUERY_METRICS = ["revenue", "expenses", "profit", "margin", "market_index"]
+METRIC_LABELS = {
+    "revenue": "revenue",
+    "expenses": "expenses",
+    "profit": "profit",
+    "margin": "profit margin",
+    "market_index": "market index",
+}
+AGGREGATION_LABELS = {"sum": "Total", "mean": "Average daily", "min": "Minimum daily", "max": "Maximum daily", "last": "Latest"}
+GROUP_FREQUENCIES = {"month": "M", "quarter": "Q", "year": "Y"}
+# Periods per year for each grouping, used to line groups up with the prior year
+GROUPS_PER_YEAR = {"month": 12, "quarter": 4, "year": 1}
+RELATIVE_UNITS = {"days": "D", "weeks": "W", "months": "M", "quarters": "Q", "years": "Y"}
+
+PLANNER_PROMPT = """You translate questions about a company's daily financial ledger into a query plan.
+The ledger has one row per day with the columns revenue, expenses, profit and market_index;
+margin is profit as a percentage of revenue. Known entities: {entities}.
+
+Rules:
+- Use start/end only for dates named in the question, as a year (2023), quarter (2023Q4),
+  month (2023-05) or day (2023-05-17); both bounds are inclusive.
+- Use last_n and last_unit for relative ranges such as "last 6 months" or "this year" (1 years).
+- Leave the time range empty when the question does not restrict it.
+- "growth", "trend" or "over time" questions group by month unless another period is named.
+- comparison is previous_year for year-over-year questions and previous_period for
+  "vs the prior period" questions.
+
+Question: {question}"""
+
+
+class QueryPlan(BaseModel):
+    """Structured form of a question about the ledger."""
+    metric: Literal["revenue", "expenses", "profit", "margin", "market_index"] = Field(
+        description="Ledger metric the question is about")
+    aggregation: Literal["sum", "mean", "min", "max", "last"] = Field(
+        default="sum", description="How daily values are combined; margin is always a ratio of sums")
+    start: Optional[str] = Field(default=None, description="First period of an explicit range, e.g. 2023, 2023Q4, 2023-05")
+    end: Optional[str] = Field(default=None, description="Last period of an explicit range")
+    last_n: Optional[int] = Field(default=None, description="Length of a relative range ending at the latest data")
+    last_unit: Optional[Literal["days", "weeks", "months", "quarters", "years"]] = Field(
+        default=None, description="Unit of last_n")
+    group_by: Literal["none", "month", "quarter", "year"] = Field(default="none", description="Grouping of the result")
+    comparison: Literal["none", "previous_period", "previous_year"] = Field(
+        default="none", description="Period the result is compared against")
+    entity: Optional[str] = Field(default=None, description="Entity the question names, if any")
+
+
+# Years, quarters and plain counts are the slots of a question's shape
+_LITERAL_PATTERN = re.compile(r"\b(?:((?:19|20)\d{2})|q([1-4])|(\d+))\b")
+_YEAR_IN_PLAN = re.compile(r"(?<!\d)((?:19|20)\d{2})(?!\d)")
+_QUARTER_IN_PLAN = re.compile(r"Q([1-4])")
+
+# Compiled plans cached per process by question shape; the job cache shares them between workers
+_plan_cache: Dict[str, List[Dict[str, Any]]] = {}
+# Ledger with derived columns cached per (entity, dataset version)
+_frame_cache: Dict[Tuple[str, int], pd.DataFrame] = {}
+_planner = None
+
+
+def normalize_question(question: str) -> Tuple[str, List[str]]:
+    """
+    Reduce a question to its shape and the literals that fill it.
+
+    Returns:
+        Tuple of (shape, literals): the lowercased question with punctuation
+        dropped and each year, quarter or count replaced by a typed slot,
+        and the literal values in order
+    """
+    text = re.sub(r"[^\w\s-]", " ", question.lower())
+    text = " ".join(text.split())
+    literals = []
+
+    def slot(match: re.Match) -> str:
+        year, quarter, number = match.groups()
+        literals.append(year or quarter or number)
+        return "<year>" if year else "<quarter>" if quarter else "<n>"
+
+    return _LITERAL_PATTERN.sub(slot, text), literals
+
+
+def compile_plan(plan: QueryPlan, literals: List[str]) -> Dict[str, Any]:
+    """
+    Turn a plan into a template whose literal values reference question slots.
+    Literals the plan does not use, or that occur more than once, stay fixed
+    and must match exactly for the template to be reused.
+
+    Returns:
+        Dict[str, Any]: 'plan' (fields with {i} placeholders) and 'fixed' ({slot index: literal})
+    """
+    fields = plan.model_dump()
+    unique = {value: i for i, value in enumerate(literals) if literals.count(value) == 1}
+    used = set()
+
+    def year_slot(match: re.Match) -> str:
+        if match.group(1) in unique:
+            used.add(unique[match.group(1)])
+            return f"{{{unique[match.group(1)]}}}"
+        return match.group(0)
+
+    def quarter_slot(match: re.Match) -> str:
+        if match.group(1) in unique:
+            used.add(unique[match.group(1)])
+            return f"Q{{{unique[match.group(1)]}}}"
+        return match.group(0)
+
+    for name in ("start", "end"):
+        if fields[name]:
+            fields[name] = _QUARTER_IN_PLAN.sub(quarter_slot, _YEAR_IN_PLAN.sub(year_slot, fields[name]))
+    if fields["last_n"] is not None and str(fields["last_n"]) in unique:
+        used.add(unique[str(fields["last_n"])])
+        fields["last_n"] = f"{{{unique[str(fields['last_n'])]}}}"
+    fixed = {str(i): value for i, value in enumerate(literals) if i not in used}
+    return {"plan": fields, "fixed": fixed}
+
+
+def bind_plan(compiled: Dict[str, Any], literals: List[str]) -> Optional[QueryPlan]:
+    """Fill a compiled plan's slots with a question's literals; None if its fixed literals differ."""
+    if any(int(i) >= len(literals) or literals[int(i)] != value for i, value in compiled["fixed"].items()):
+        return None
+    fields = dict(compiled["plan"])
+    for name in ("start", "end", "last_n"):
+        if isinstance(fields[name], str):
+            fields[name] = fields[name].format(*literals)
+    return QueryPlan(**fields)
+
+
+def _plan_key(shape: str) -> str:
+    return f"query-plan:v{QUERY_PLAN_VERSION}:{shape}"
+
+
+def _lookup_plan(shape: str, literals: List[str]) -> Optional[QueryPlan]:
+    """Find a cached plan for a question shape, in this process or the shared job cache."""
+    key = _plan_key(shape)
+    if key not in _plan_cache:
+        shared = get_job_cache().get(key)
+        if shared is None:
+            return None
+        _plan_cache[key] = shared
+    for compiled in _plan_cache[key]:
+        plan = bind_plan(compiled, literals)
+        if plan is not None:
+            return plan
+    return None
+
+
+def _store_plan(shape: str, compiled: Dict[str, Any]) -> None:
+    key = _plan_key(shape)
+    entries = [c for c in _plan_cache.get(key, []) if c["fixed"] != compiled["fixed"]] + [compiled]
+    if key not in _plan_cache and len(_plan_cache) >= QUERY_PLAN_CACHE_SIZE:
+        _plan_cache.pop(next(iter(_plan_cache)))
+    _plan_cache[key] = entries
+    get_job_cache().set(key, entries)
+
+
+def _get_planner():
+    """Structured-output planner on the shared LLM client, without sampling randomness."""
+    global _planner
+    if _planner is None:
+        _planner = get_llm_client().model_copy(update={"temperature": 0}).with_structured_output(QueryPlan)
+    return _planner
+
+
+def plan_query(question: str) -> Tuple[QueryPlan, bool]:
+    """
+    Get the query plan for a question, compiling it with the LLM on a cache miss.
+
+    Returns:
+        Tuple of (plan, cached): cached is True when no LLM call was made
+    """
+    shape, literals = normalize_question(question)
+    plan = _lookup_plan(shape, literals)
+    if plan is not None:
+        return plan, True
+
+    entities = list_entities() or [DEFAULT_ENTITY]
+    # Awaited on the worker's shared event loop rather than blocking on a sync HTTP client
+    plan = run_async(_get_planner().ainvoke(PLANNER_PROMPT.format(entities=", ".join(entities), question=question)))
+    if not isinstance(plan, QueryPlan):
+        raise ValueError(f"Could not plan the question: {question}")
+    _store_plan(shape, compile_plan(plan, literals))
+    logger.info(f"Compiled query plan for '{shape}': {plan.model_dump(exclude_defaults=True)}")
+    return plan, False
+
+
+def _ledger_frame(entity: str) -> pd.DataFrame:
+    """Full ledger with the margin column, cached per dataset version."""
+    if SAMPLE_DATA:
+        ensure_sample_dataset(entity)
+    version = get_dataset_version(entity)
+    key = (entity, version)
+    if key not in _frame_cache:
+        frame = load_dataset(entity, until_version=version)
+        frame["margin"] = compute_margin(frame)
+        _frame_cache.clear()
+        _frame_cache[key] = frame
+    return _frame_cache[key]
+
+
+def resolve_range(plan: QueryPlan, frame: pd.DataFrame) -> Tuple[pd.Timestamp, pd.Timestamp]:
+    """Resolve a plan's time range to inclusive start and end dates within the ledger."""
+    first, last = frame.index.min(), frame.index.max()
+    if plan.last_n:
+        unit = RELATIVE_UNITS[plan.last_unit or "days"]
+        periods = pd.period_range(end=last.to_period(unit), periods=plan.last_n, freq=unit)
+        return max(periods[0].start_time, first), last
+    start = pd.Period(plan.start).start_time if plan.start else first
+    end = pd.Period(plan.end).end_time.normalize() if plan.end else last
+    return start, end
+
+
+def _aggregate(rows: pd.DataFrame, plan: QueryPlan) -> Any:
+    """Aggregate rows to a scalar, or to a Series per period when the plan groups."""
+    freq = GROUP_FREQUENCIES.get(plan.group_by)
+    if plan.metric == "margin":
+        sums = rows[["profit", "revenue"]]
+        sums = sums.groupby(rows.index.to_period(freq)).sum() if freq else sums.sum()
+        return sums["profit"] / sums["revenue"] * 100
+    values = rows[plan.metric]
+    if freq:
+        return values.groupby(rows.index.to_period(freq)).agg(plan.aggregation)
+    if plan.aggregation == "last":
+        return values.iloc[-1] if len(values) else np.nan
+    return values.agg(plan.aggregation)
+
+
+def _change(plan: QueryPlan, value: Any, comparison: Any) -> Any:
+    """Percent change, or the difference in points for margins."""
+    if plan.metric == "margin":
+        return value - comparison
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(comparison != 0, (np.asarray(value) / comparison - 1) * 100, np.nan)
+
+
+def execute_plan(plan: QueryPlan, entity: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Execute a query plan over an entity's ledger.
+
+    Args:
+        plan (QueryPlan): Plan to execute
+        entity (Optional[str]): Entity to query; the plan's entity or DEFAULT_ENTITY when omitted
+
+    Returns:
+        Dict[str, Any]: 'entity', 'start', 'end', 'value' and, with a comparison,
+        'comparison_value' and 'change' (percent, or points for margins); grouped
+        plans also return 'table', a DataFrame with period, value and (with a
+        comparison) comparison and change
+    """
+    if entity is None:
+        # Only follow entities that have a ledger, so a misread name cannot seed a new one
+        entity = plan.entity if plan.entity in list_entities() else DEFAULT_ENTITY
+    frame = _ledger_frame(entity)
+    if frame.empty:
+        raise ValueError(f"No ledger data for '{entity}'")
+    start, end = resolve_range(plan, frame)
+    rows = frame.loc[start:end]
+    if rows.empty:
+        raise ValueError(f"No ledger data between {start:%Y-%m-%d} and {end:%Y-%m-%d}")
+
+    result: Dict[str, Any] = {"entity": entity, "start": start, "end": end}
+    current = _aggregate(rows, plan)
+
+    prior = None
+    if plan.comparison == "previous_year":
+        prior = _aggregate(frame.loc[start - pd.DateOffset(years=1):end - pd.DateOffset(years=1)], plan)
+    elif plan.comparison == "previous_period":
+        length = end - start + pd.Timedelta(days=1)
+        prior = _aggregate(frame.loc[start - length:start - pd.Timedelta(days=1)], plan)
+
+    if isinstance(current, pd.Series):
+        table = pd.DataFrame({"period": current.index.astype(str), "value": current.to_numpy()})
+        if prior is not None:
+            # Shift prior groups onto the groups they are compared with
+            shift = GROUPS_PER_YEAR[plan.group_by] if plan.comparison == "previous_year" else len(current)
+            aligned = pd.Series(prior.to_numpy(), index=prior.index + shift).reindex(current.index)
+            table["comparison"] = aligned.to_numpy()
+            table["change"] = _change(plan, table["value"], table["comparison"])
+        result["table"] = table
+        result["value"] = float(current.iloc[-1])
+        if prior is not None:
+            result["comparison_value"] = float(table["comparison"].iloc[-1])
+    else:
+        result["value"] = float(current)
+        if prior is not None:
+            result["comparison_value"] = float(prior)
+    if "comparison_value" in result:
+        result["change"] = float(_change(plan, result["value"], result["comparison_value"]))
+    return result
+
+
+def format_value(metric: str, value: float) -> str:
+    """Format a metric value for display."""
+    if value is None or np.isnan(value):
+        return "n/a"
+    if metric == "margin":
+        return f"{value:.1f}%"
+    if metric == "market_index":
+        return f"{value:,.1f}"
+    return f"${value:,.0f}"
+
+
+def describe_result(plan: QueryPlan, result: Dict[str, Any]) -> str:
+    """One-sentence answer for an executed plan."""
+    label = METRIC_LABELS[plan.metric]
+    if plan.metric == "margin":
+        subject = "Profit margin"
+    else:
+        subject = f"{AGGREGATION_LABELS[plan.aggregation]} {label}"
+    if "table" in result:
+        subject += f" for {result['table']['period'].iloc[-1]}"
+    else:
+        subject += f" from {result['start']:%Y-%m-%d} to {result['end']:%Y-%m-%d}"
+    answer = f"{subject}: {format_value(plan.metric, result['value'])}"
+    if "change" in result and not np.isnan(result["change"]):
+        basis = "the previous year" if plan.comparison == "previous_year" else "the previous period"
+        unit = " pts" if plan.metric == "margin" else "%"
+        answer += f" ({result['change']:+.1f}{unit} vs {basis})"
+    return answer
+
+
+def answer_query(question: str, entity: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Answer a natural-language question about the ledger.
+
+    Args:
+        question (str): The user's question
+        entity (Optional[str]): Entity to query; overrides the entity named in the question
+
+    Returns:
+        Dict[str, Any]: Output of `execute_plan` plus 'plan', 'cached'
+        (no LLM call was needed), 'answer' and 'elapsed_ms'
+    """
+    started = time.perf_counter()
+    plan, cached = plan_query(question)
+    result = execute_plan(plan, entity)
+    result.update({
+        "plan": plan,
+        "cached": cached,
+        "answer": describe_result(plan, result),
+        "elapsed_ms": (time.perf_counter() - started) * 1000,
+    })
+    logger.info(f"Answered query in {result['elapsed_ms']:.1f}ms ({'cached plan' if cached else 'compiled'})")
+    return result
@@ -5,12 +5,12 @@ and generation of responses based on retrieved context.
 """
 
 import os
+import json
 import logging
 from pathlib import Path
-from typing import List, Dict, Any, Generator, Optional, Union
+from typing import Callable, List, Dict, Any, Generator, Optional, Union
 
 # Langchain imports - using specific packages to prevent deprecation
-from langchain_community.document_loaders import DirectoryLoader, TextLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import Chroma
 # Use OllamaEmbeddings for nomic model, or HuggingFaceEmbeddings if using a different local model
@@ -19,21 +19,36 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
 
 # Import our llm_service for LLM access
 from .llm_service import get_llm_client
+from .ingest_service import discover_files, ingest_files, remove_tables
+from .chunk_service import ShingleDeduplicator, chunk_documents
+from .vector_index_service import QuantizedVectorStore
 
 # Get logger
 logger = logging.getLogger(__name__)
 
 # Configuration from environment variables with defaults
 DOCS_DIR = os.environ.get("FINGEN_DOCS_DIR", "./docs")
-VECTOR_STORE_DIR = os.environ.get("FINGEN_VECTOR_STORE_DIR", "./chroma_db")
-CHUNK_SIZE = int(os.environ.get("FINGEN_CHUNK_SIZE", "1000"))
-CHUNK_OVERLAP = int(os.environ.get("FINGEN_CHUNK_OVERLAP", "200"))
+# "chroma", or "quantized" for the in-process int8 IVF index (see vector_index_service)
+VECTOR_BACKEND = os.environ.get("FINGEN_VECTOR_BACKEND", "chroma").lower()
+VECTOR_STORE_DIR = os.environ.get("FINGEN_VECTOR_STORE_DIR",
+                                  "./vector_index" if VECTOR_BACKEND == "quantized" else "./chroma_db")
+# "structured" splits along sections and tables (see chunk_service); "recursive" uses fixed-size character chunks
+CHUNKER = os.environ.get("FINGEN_CHUNKER", "structured").lower()
+CHUNK_SIZE = int(os.environ.get("FINGEN_CHUNK_SIZE", "1000"))  # Recursive chunker only
+CHUNK_OVERLAP = int(os.environ.get("FINGEN_CHUNK_OVERLAP", "200"))  # Recursive chunker only
 EMBEDDING_MODEL_NAME = os.environ.get("FINGEN_EMBEDDING_MODEL", "nomic-embed-text")
 OLLAMA_BASE_URL = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434") # Needed for OllamaEmbeddings
 VECTOR_DB_COLLECTION_NAME = "fingen_docs"
+# Chroma HNSW distance: "cosine", "l2" or "ip"
+VECTOR_DB_SPACE = os.environ.get("FINGEN_VECTOR_DB_SPACE", "cosine")
+# Source file -> content hash of what is embedded, stored next to the collection
+MANIFEST_FILE = "ingested.json"
+# Shingle signatures of embedded chunks, for boilerplate deduplication across runs
+SIGNATURES_FILE = "chunk_signatures.npz"
 
 # Singleton instances
 _vector_store = None
@@ -58,14 +73,15 @@ def get_embedding_function():
             raise RuntimeError(f"Could not initialize embedding model {EMBEDDING_MODEL_NAME}: {e}") from e
     return _embedding_function
 
-def get_vector_store() -> Optional[Chroma]:
+def get_vector_store() -> Optional[VectorStore]:
     """
-    Get or initialize the Chroma vector store.
+    Get or initialize the vector store selected by FINGEN_VECTOR_BACKEND.
     Uses pre-configured embedding function and persistence path.
-    Configures collection metadata for cosine similarity search.
+    Chroma uses the VECTOR_DB_SPACE distance (cosine by default); the quantized
+    backend memory-maps its index from VECTOR_STORE_DIR.
     
     Returns:
-        Optional[Chroma]: The initialized Chroma vector store instance.
+        Optional[VectorStore]: The initialized vector store instance.
     """
     global _vector_store
     if _vector_store is None:
@@ -77,24 +93,49 @@ def get_vector_store() -> Optional[Chroma]:
             return None
         try:
             embedding_func = get_embedding_function()
-            _vector_store = Chroma(
-                collection_name=VECTOR_DB_COLLECTION_NAME,
-                embedding_function=embedding_func,
-                persist_directory=VECTOR_STORE_DIR,
-                collection_metadata={"hnsw:space": "cosine"} # Optimize for cosine similarity
-            )
-            logger.info(f"Initialized Chroma vector store from {VECTOR_STORE_DIR} with collection '{VECTOR_DB_COLLECTION_NAME}'")
+            if VECTOR_BACKEND == "quantized":
+                _vector_store = QuantizedVectorStore(VECTOR_STORE_DIR, embedding_func)
+                logger.info(f"Opened quantized vector index at {VECTOR_STORE_DIR}: {_vector_store.stats()}")
+            else:
+                _vector_store = Chroma(
+                    collection_name=VECTOR_DB_COLLECTION_NAME,
+                    embedding_function=embedding_func,
+                    persist_directory=VECTOR_STORE_DIR,
+                    collection_metadata={"hnsw:space": VECTOR_DB_SPACE}
+                )
+                logger.info(f"Initialized Chroma vector store from {VECTOR_STORE_DIR} with collection '{VECTOR_DB_COLLECTION_NAME}'")
         except Exception as e:
-            logger.exception(f"Failed to initialize Chroma vector store from {VECTOR_STORE_DIR}: {e}")
+            logger.exception(f"Failed to initialize {VECTOR_BACKEND} vector store from {VECTOR_STORE_DIR}: {e}")
             _vector_store = None # Ensure it's None if init fails
             
     return _vector_store
 
-def initialize_documents() -> bool:
+def _load_manifest() -> Dict[str, str]:
+    """Content hash embedded for each source file, kept inside the vector store directory."""
+    try:
+        with open(os.path.join(VECTOR_STORE_DIR, MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_manifest(manifest: Dict[str, str]) -> None:
+    with open(os.path.join(VECTOR_STORE_DIR, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+def initialize_documents(progress: Optional[Callable[..., None]] = None) -> bool:
     """
     Load documents from the DOCS_DIR, split them, embed them,
-    and store them in the Chroma vector store.
+    and store them in the vector store.
     Will create the vector store if it doesn't exist.
+    Files are parsed in parallel through the ingest service (PDF, HTML,
+    XBRL, CSV, text); only new or changed files are embedded, and the
+    chunks of a changed file replace its old ones. Chunks follow section
+    and table boundaries, and boilerplate seen before is not re-embedded.
+    Can run as a queued job: `submit_job(initialize_documents)`; parsing
+    fans out over the process pool either way (see `ingest_files`).
+    
+    Args:
+        progress: Optional callable (done, total, message), e.g. a job's JobProgress
     
     Returns:
         bool: True if successful, False otherwise
@@ -106,31 +147,76 @@ def initialize_documents() -> bool:
             return False
 
         logger.info(f"Initializing documents from directory: {DOCS_DIR}")
-        # Simple loader for text files - expand with UnstructuredFileLoader for more types
-        loader = DirectoryLoader(DOCS_DIR, glob="**/*.txt", loader_cls=TextLoader, show_progress=True)
-        docs = loader.load()
-        
-        if not docs:
+        paths = discover_files(DOCS_DIR)
+        if not paths:
             logger.warning(f"No documents found in {DOCS_DIR}. Vector store not initialized.")
             return False
 
-        logger.info(f"Loaded {len(docs)} documents.")
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
-        splits = text_splitter.split_documents(docs)
-        logger.info(f"Split documents into {len(splits)} chunks.")
+        manifest = _load_manifest() if os.path.exists(VECTOR_STORE_DIR) else {}
+        docs: List[Document] = []
+        changed: Dict[str, str] = {}
+        for path, digest, parsed in ingest_files(paths, progress=progress, known=manifest):
+            if manifest.get(path) == digest:
+                continue
+            changed[path] = digest
+            for text, metadata in parsed["documents"]:
+                docs.append(Document(page_content=text, metadata=dict(metadata, source=path, source_hash=digest)))
+
+        discovered = set(paths)
+        removed = [path for path in manifest if path not in discovered]
+        remove_tables(removed)
+        if not changed and not removed:
+            logger.info("All documents are already embedded; nothing to do.")
+            return get_vector_store() is not None
+
+        logger.info(f"Loaded {len(docs)} documents from {len(changed)} new or changed files.")
+        deduplicator = None
+        if CHUNKER == "recursive":
+            text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+            splits = text_splitter.split_documents(docs)
+            logger.info(f"Split documents into {len(splits)} chunks.")
+        else:
+            # Boilerplate already embedded from other filings is recognised through the saved signatures
+            signatures_path = os.path.join(VECTOR_STORE_DIR, SIGNATURES_FILE)
+            deduplicator = ShingleDeduplicator.load(signatures_path) if manifest else ShingleDeduplicator()
+            deduplicator.forget(list(changed) + removed)
+            splits, stats = chunk_documents(docs, deduplicator)
+            if progress is not None:
+                progress(len(paths), len(paths), f"{stats['chunks']} chunks, {stats['tokens']} tokens, "
+                                                 f"{stats['duplicates']} duplicates dropped")
 
         embedding_func = get_embedding_function()
-        logger.info(f"Creating new Chroma vector store at {VECTOR_STORE_DIR}...")
-        
-        # Use Chroma.from_documents to create and persist in one step
-        _vector_store = Chroma.from_documents(
-            documents=splits,
-            embedding=embedding_func,
-            collection_name=VECTOR_DB_COLLECTION_NAME,
-            persist_directory=VECTOR_STORE_DIR,
-            collection_metadata={"hnsw:space": "cosine"}
-        )
-        logger.info(f"Successfully initialized and persisted vector store with {len(splits)} document chunks.")
+        vector_store = get_vector_store() if manifest else None
+        if vector_store is None and not splits:
+            logger.info("No prose to embed; structured files were written to tables only.")
+            return True
+        if vector_store is not None:
+            # Drop chunks of files that changed or were removed since they were embedded
+            for path in [p for p in changed if p in manifest] + removed:
+                stale = vector_store.get(where={"source": path})["ids"]
+                if stale:
+                    vector_store.delete(ids=stale)
+                manifest.pop(path, None)
+            if splits:
+                vector_store.add_documents(splits)
+        elif VECTOR_BACKEND == "quantized":
+            logger.info(f"Creating new quantized vector index at {VECTOR_STORE_DIR}...")
+            _vector_store = QuantizedVectorStore.from_documents(splits, embedding_func, directory=VECTOR_STORE_DIR)
+        else:
+            logger.info(f"Creating new Chroma vector store at {VECTOR_STORE_DIR}...")
+            # Use Chroma.from_documents to create and persist in one step
+            _vector_store = Chroma.from_documents(
+                documents=splits,
+                embedding=embedding_func,
+                collection_name=VECTOR_DB_COLLECTION_NAME,
+                persist_directory=VECTOR_STORE_DIR,
+                collection_metadata={"hnsw:space": VECTOR_DB_SPACE}
+            )
+        manifest.update(changed)
+        _save_manifest(manifest)
+        if deduplicator is not None:
+            deduplicator.save(os.path.join(VECTOR_STORE_DIR, SIGNATURES_FILE))
+        logger.info(f"Successfully initialized and persisted vector store with {len(splits)} new document chunks.")
         return True
 
     except Exception as e:
@@ -0,0 +1,631 @@
+"""
+Report Service module for rendering financial reports.
+Renders the selected content sections for each entity in parallel on the
+job process pool, caches every section (data, figure and image) by its
+parameters, and assembles the results into PDF or XLSX documents.
+"""
+
+import io
+import os
+import json
+import hashlib
+import functools
+import logging
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import diskcache
+
+from .data_service import DEFAULT_ENTITY, SAMPLE_DATA, load_dataset, get_dataset_version, ensure_sample_dataset, list_entities
+from .analysis_service import IncrementalAnalysis
+from .job_service import JOB_MAX_WORKERS, pool_map
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+# Configuration from environment variables with defaults
+REPORT_CACHE_DIR = os.environ.get("FINGEN_REPORT_CACHE_DIR", "./cache/reports")
+REPORT_CACHE_EXPIRE_SECONDS = int(os.environ.get("FINGEN_REPORT_CACHE_EXPIRE_SECONDS", str(7 * 24 * 3600)))
+REPORT_STORE_DIR = os.environ.get("FINGEN_REPORT_STORE_DIR", "./cache/report_store")
+REPORT_STREAM_CHUNK_SIZE = 64 * 1024
+
+# Sections rendered when a template is used without an explicit selection
+TEMPLATE_SECTIONS = {
+    "executive_summary": ["financial_metrics", "recommendations"],
+    "quarterly_report": ["financial_metrics", "market_position", "risk_assessment"],
+    "annual_report": ["financial_metrics", "market_position", "risk_assessment", "forecast", "recommendations"],
+    "market_analysis": ["market_position", "forecast"],
+    "risk_report": ["risk_assessment", "recommendations"],
+}
+SECTION_TITLES = {
+    "executive_summary": "Executive Summary",
+    "financial_metrics": "Financial Metrics",
+    "market_position": "Market Position",
+    "risk_assessment": "Risk Assessment",
+    "forecast": "Forecast",
+    "recommendations": "Recommendations",
+}
+REPORT_OPTIONS = ("exec_summary", "charts", "detailed", "recommendations")
+
+# Singleton instances
+_report_cache = None
+_report_cache_pid = None
+_image_export_available = None
+
+
+def get_report_cache() -> diskcache.Cache:
+    """Get or initialize the disk cache holding rendered sections."""
+    global _report_cache, _report_cache_pid
+    # Database connections must not be shared with forked worker processes
+    if _report_cache is None or _report_cache_pid != os.getpid():
+        os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+        _report_cache = diskcache.Cache(REPORT_CACHE_DIR)
+        _report_cache_pid = os.getpid()
+    return _report_cache
+
+
+def _figure_image(fig: go.Figure) -> Optional[bytes]:
+    """Render a figure to PNG, or None when no image export engine is installed."""
+    global _image_export_available
+    if _image_export_available is False:
+        return None
+    try:
+        image = fig.to_image(format="png", width=900, height=400, scale=1)
+        _image_export_available = True
+        return image
+    except Exception as e:
+        if _image_export_available is None:
+            logger.warning(f"Figure image export unavailable, reports will omit chart images: {e}")
+        _image_export_available = False
+        return None
+
+
+def _base_layout(fig: go.Figure, title: str) -> go.Figure:
+    fig.update_layout(
+        title=title,
+        template='plotly_white',
+        height=400,
+        margin=dict(l=40, r=20, t=50, b=40),
+        font=dict(family="IBM Plex Sans, sans-serif"),
+    )
+    return fig
+
+
+# --- Section renderers ---
+# Each returns the section's summary text, its table and, when charts are
+# requested, a figure. They run inside pool workers, so they must be module-level.
+
+def _section_executive_summary(entity: str, df: pd.DataFrame, engine: IncrementalAnalysis, detailed: bool) -> Dict[str, Any]:
+    insights = engine.insights()
+    text = [f"{i['title']}: {i['description']} (impact: {i['impact']}, confidence: {i['confidence']})" for i in insights]
+    return {"text": text, "table": pd.DataFrame(insights), "figure": None}
+
+
+def _section_financial_metrics(entity: str, df: pd.DataFrame, engine: IncrementalAnalysis, detailed: bool) -> Dict[str, Any]:
+    summary = engine.quarterly_summary()
+    columns = ['revenue', 'expenses', 'profit', 'margin', 'revenue_qoq', 'revenue_yoy']
+    table = summary[columns] if detailed else summary[columns].tail(4)
+    table = table.round(2)
+    table.index = table.index.astype(str)
+    latest = summary.iloc[-1]
+    text = [
+        f"Average daily revenue of {latest['revenue']:,.0f} and profit of {latest['profit']:,.0f} in {summary.index[-1]}.",
+        f"Profit margin stands at {latest['margin']:.1f}%.",
+    ]
+    fig = go.Figure([
+        go.Bar(x=table.index, y=table['revenue'], name='Revenue', marker_color='#147D64'),
+        go.Bar(x=table.index, y=table['expenses'], name='Expenses', marker_color='#BF2600'),
+    ])
+    return {"text": text, "table": table.rename_axis("quarter").reset_index(), "figure": _base_layout(fig, "Average Daily Revenue vs Expenses")}
+
+
+def _section_market_position(entity: str, df: pd.DataFrame, engine: IncrementalAnalysis, detailed: bool) -> Dict[str, Any]:
+    monthly = df[['revenue', 'market_index']].resample('MS').mean()
+    indexed = monthly / monthly.iloc[0] * 100
+    correlation = df['revenue'].corr(df['market_index'])
+    relative = indexed['revenue'].iloc[-1] - indexed['market_index'].iloc[-1]
+    text = [
+        f"Revenue is {'outperforming' if relative >= 0 else 'underperforming'} the market index by {abs(relative):.1f} points since {monthly.index[0]:%b %Y}.",
+        f"Daily correlation between revenue and the market index is {correlation:.2f}.",
+    ]
+    table = indexed.round(2) if detailed else indexed.tail(12).round(2)
+    table.index = table.index.strftime('%Y-%m')
+    fig = go.Figure([
+        go.Scatter(x=indexed.index, y=indexed['revenue'], name='Revenue (indexed)', line=dict(color='#147D64')),
+        go.Scatter(x=indexed.index, y=indexed['market_index'], name='Market Index (indexed)', line=dict(color='#0A3D62')),
+    ])
+    return {"text": text, "table": table.rename_axis("month").reset_index(), "figure": _base_layout(fig, "Relative Performance (Base = 100)")}
+
+
+def _section_risk_assessment(entity: str, df: pd.DataFrame, engine: IncrementalAnalysis, detailed: bool) -> Dict[str, Any]:
+    rolling_cv = df['revenue'].rolling(engine.window).std() / df['revenue'].rolling(engine.window).mean() * 100
+    cumulative_profit = df['profit'].cumsum()
+    drawdown = (cumulative_profit - cumulative_profit.cummax()).min()
+    table = pd.DataFrame({
+        "metric": ["Revenue volatility (%)", "Worst daily revenue", "Loss-making days", "Expense ratio (%)", "Max profit drawdown"],
+        "value": [
+            round(float(rolling_cv.iloc[-1]), 2),
+            round(float(df['revenue'].min()), 2),
+            int((df['profit'] < 0).sum()),
+            round(float(df['expenses'].sum() / df['revenue'].sum() * 100), 2),
+            round(float(drawdown), 2),
+        ],
+    })
+    text = [
+        f"{engine.window}-day revenue volatility is {rolling_cv.iloc[-1]:.1f}% against a period average of {rolling_cv.mean():.1f}%.",
+        f"Expenses consume {table['value'][3]:.1f}% of revenue.",
+    ]
+    fig = go.Figure(go.Scatter(x=rolling_cv.index, y=rolling_cv, name='Revenue CV %', line=dict(color='#BF2600')))
+    return {"text": text, "table": table, "figure": _base_layout(fig, f"{engine.window}-Day Revenue Volatility")}
+
+
+def _section_forecast(entity: str, df: pd.DataFrame, engine: IncrementalAnalysis, detailed: bool) -> Dict[str, Any]:
+    # Daily averages keep a partially elapsed month comparable
+    monthly = df['revenue'].resample('MS').mean()
+    x = np.arange(len(monthly))
+    slope, intercept = np.polyfit(x, monthly.to_numpy(), 1)
+    horizon = 3
+    future_index = pd.date_range(monthly.index[-1] + pd.offsets.MonthBegin(1), periods=horizon, freq='MS')
+    projection = pd.Series(intercept + slope * np.arange(len(monthly), len(monthly) + horizon), index=future_index)
+    text = [
+        f"Linear trend projects average daily revenue of {projection.iloc[-1]:,.0f} by {future_index[-1]:%b %Y}.",
+        f"The trend changes average daily revenue by {slope:+,.1f} per month.",
+    ]
+    table = projection.round(2).rename("projected_revenue")
+    table.index = table.index.strftime('%Y-%m')
+    fig = go.Figure([
+        go.Scatter(x=monthly.index, y=monthly, name='Actual', line=dict(color='#147D64')),
+        go.Scatter(x=projection.index, y=projection, name='Projection', line=dict(color='#0A3D62', dash='dash')),
+    ])
+    return {"text": text, "table": table.rename_axis("month").reset_index(), "figure": _base_layout(fig, "Average Daily Revenue Projection")}
+
+
+def _section_recommendations(entity: str, df: pd.DataFrame, engine: IncrementalAnalysis, detailed: bool) -> Dict[str, Any]:
+    actions = {
+        "Revenue Growth": "Review pricing and pipeline coverage to restore revenue growth.",
+        "Expense Management": "Tighten discretionary spend; expenses are outpacing revenue.",
+        "Profit Margin": "Investigate cost of sales drivers behind the margin decline.",
+        "Risk Factors": "Increase liquidity buffers while revenue volatility is elevated.",
+    }
+    negatives = [i for i in engine.insights() if i["impact"] == "negative"]
+    text = [actions.get(i["title"], i["description"]) for i in negatives] or ["No corrective actions required; maintain the current plan."]
+    table = pd.DataFrame({"priority": range(1, len(text) + 1), "recommendation": text})
+    return {"text": text, "table": table, "figure": None}
+
+
+SECTION_RENDERERS = {
+    "executive_summary": _section_executive_summary,
+    "financial_metrics": _section_financial_metrics,
+    "market_position": _section_market_position,
+    "risk_assessment": _section_risk_assessment,
+    "forecast": _section_forecast,
+    "recommendations": _section_recommendations,
+}
+
+
+def _section_cache_key(entity: str, section: str, version: int, charts: bool, detailed: bool) -> str:
+    params = json.dumps([entity, section, version, charts, detailed])
+    return "section:" + hashlib.sha256(params.encode("utf-8")).hexdigest()
+
+
+@functools.lru_cache(maxsize=8)
+def _load_entity(entity: str, version: int):
+    """Load an entity's ledger and aggregates once per worker for all of its sections."""
+    df = load_dataset(entity, until_version=version)
+    engine = IncrementalAnalysis(entity)
+    engine.update(df)
+    return df, engine
+
+
+def render_section(entity: str, section: str, version: int, charts: bool = True, detailed: bool = False) -> Dict[str, Any]:
+    """
+    Render one report section for one entity, computing its data, figure and
+    image at most once per parameter set.
+
+    Args:
+        entity (str): Entity whose ledger is reported on
+        section (str): Key in SECTION_RENDERERS
+        version (int): Dataset version of the entity's ledger
+        charts (bool): Whether to build the figure and its image
+        detailed (bool): Whether to include the full history in tables
+
+    Returns:
+        Dict[str, Any]: Section with entity, section, title, text, table
+        (DataFrame), figure (JSON dict or None) and image (PNG bytes or None)
+    """
+    cache = get_report_cache()
+    key = _section_cache_key(entity, section, version, charts, detailed)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    df, engine = _load_entity(entity, version)
+    rendered = SECTION_RENDERERS[section](entity, df, engine, detailed)
+    fig = rendered["figure"] if charts else None
+    result = {
+        "entity": entity,
+        "section": section,
+        "title": SECTION_TITLES[section],
+        "text": rendered["text"],
+        "table": rendered["table"],
+        "figure": fig.to_plotly_json() if fig is not None else None,
+        "image": _figure_image(fig) if fig is not None else None,
+    }
+    cache.set(key, result, expire=REPORT_CACHE_EXPIRE_SECONDS)
+    return result
+
+
+def _render_section_task(task: tuple) -> Dict[str, Any]:
+    return render_section(*task)
+
+
+def resolve_sections(template: Optional[str], sections: Optional[Sequence[str]], options: Sequence[str]) -> List[str]:
+    """Order the sections to render from the template, the explicit selection and the options."""
+    selected = list(sections) if sections else list(TEMPLATE_SECTIONS.get(template, []))
+    if "recommendations" in options and "recommendations" not in selected:
+        selected.append("recommendations")
+    if "exec_summary" in options:
+        selected.insert(0, "executive_summary")
+    return [s for s in dict.fromkeys(selected) if s in SECTION_RENDERERS]
+
+
+def check_entities(entities: Optional[Sequence[str]]) -> List[str]:
+    """
+    Entities to report on, defaulting to DEFAULT_ENTITY.
+
+    Raises:
+        ValueError: If an entity has no ledger (only DEFAULT_ENTITY is seeded on demand)
+    """
+    entities = list(entities) if entities else [DEFAULT_ENTITY]
+    unknown = sorted(set(entities) - set(list_entities()) - {DEFAULT_ENTITY})
+    if unknown:
+        raise ValueError(f"Unknown entities: {', '.join(unknown)}")
+    return entities
+
+
+def render_report(template: Optional[str], sections: Optional[Sequence[str]] = None,
+                  entities: Optional[Sequence[str]] = None,
+                  options: Sequence[str] = ("exec_summary", "charts")) -> Dict[str, Any]:
+    """
+    Render a report for one or more entities.
+    Sections already in the cache are served directly; the rest are rendered
+    in parallel on the job process pool (sequentially when already running in a
+    pool worker, as `prerender_reports` tasks do).
+
+    Args:
+        template (Optional[str]): Report template key, used for the title and default sections
+        sections (Optional[Sequence[str]]): Content sections to include
+        entities (Optional[Sequence[str]]): Entities to report on, defaults to DEFAULT_ENTITY
+        options (Sequence[str]): Any of REPORT_OPTIONS
+
+    Returns:
+        Dict[str, Any]: Report with 'title', 'template', 'entities', 'sections'
+        (names) and 'results' (rendered sections, grouped by entity in order)
+
+    Raises:
+        ValueError: If an entity is unknown
+    """
+    entities = check_entities(entities)
+    section_names = resolve_sections(template, sections, options)
+    charts, detailed = "charts" in options, "detailed" in options
+    if SAMPLE_DATA:
+        # Seed sample ledgers before workers read them concurrently
+        for entity in entities:
+            ensure_sample_dataset(entity)
+    versions = {entity: get_dataset_version(entity) for entity in entities}
+    tasks = [
+        (entity, section, versions[entity], charts, detailed)
+        for entity in entities for section in section_names
+    ]
+
+    cache = get_report_cache()
+    results: List[Optional[Dict[str, Any]]] = [cache.get(_section_cache_key(*task)) for task in tasks]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if len(missing) == 1:
+        results[missing[0]] = render_section(*tasks[missing[0]])
+    elif missing:
+        chunksize = max(1, len(missing) // (JOB_MAX_WORKERS * 4))
+        for i, result in zip(missing, pool_map(_render_section_task, [tasks[i] for i in missing], chunksize=chunksize)):
+            results[i] = result
+    logger.info(f"Rendered report with {len(tasks)} sections ({len(missing)} computed, {len(tasks) - len(missing)} cached)")
+
+    title = template.replace("_", " ").title() if template else "Financial Report"
+    return {"title": title, "template": template, "entities": entities, "sections": section_names, "results": results}
+
+
+# --- Document assembly ---
+
+def build_pdf(report: Dict[str, Any]) -> bytes:
+    """
+    Assemble a rendered report into a PDF document.
+
+    Raises:
+        RuntimeError: If reportlab is not installed
+    """
+    try:
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.lib.units import cm
+        from reportlab.platypus import Image, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+    except ImportError as e:
+        raise RuntimeError("PDF export requires the 'reportlab' package") from e
+
+    styles = getSampleStyleSheet()
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, title=report["title"])
+    story = [Paragraph(report["title"], styles["Title"])]
+    current_entity = None
+    for result in report["results"]:
+        if result["entity"] != current_entity:
+            if current_entity is not None:
+                story.append(PageBreak())
+            current_entity = result["entity"]
+            story.append(Paragraph(current_entity.title(), styles["Heading1"]))
+        story.append(Paragraph(result["title"], styles["Heading2"]))
+        story.extend(Paragraph(line, styles["BodyText"]) for line in result["text"])
+        if result["image"]:
+            story.append(Image(io.BytesIO(result["image"]), width=16 * cm, height=7 * cm))
+        table = result["table"]
+        if table is not None and not table.empty:
+            rows = [list(table.columns)] + table.astype(str).values.tolist()
+            pdf_table = Table(rows, repeatRows=1)
+            pdf_table.setStyle(TableStyle([
+                ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#0A3D62")),
+                ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+                ("FONTSIZE", (0, 0), (-1, -1), 8),
+                ("GRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#E0E0E0")),
+            ]))
+            story.append(pdf_table)
+        story.append(Spacer(1, 0.5 * cm))
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def build_xlsx(report: Dict[str, Any]) -> bytes:
+    """
+    Assemble a rendered report into an XLSX workbook with a summary sheet
+    and one sheet per entity and section.
+
+    Raises:
+        RuntimeError: If openpyxl is not installed
+    """
+    try:
+        from openpyxl.drawing.image import Image
+        from openpyxl.utils import get_column_letter
+    except ImportError as e:
+        raise RuntimeError("XLSX export requires the 'openpyxl' package") from e
+
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        summary = pd.DataFrame(
+            [(r["entity"], r["title"], line) for r in report["results"] for line in r["text"]],
+            columns=["entity", "section", "summary"],
+        )
+        summary.to_excel(writer, sheet_name="Summary", index=False)
+        used_names = {"Summary"}
+        for result in report["results"]:
+            base = f"{result['entity'][:14]}-{result['section'][:14]}"
+            sheet_name, n = base, 1
+            while sheet_name in used_names:
+                n += 1
+                sheet_name = f"{base[:28]}-{n}"
+            used_names.add(sheet_name)
+            table = result["table"] if result["table"] is not None else pd.DataFrame()
+            table.to_excel(writer, sheet_name=sheet_name, index=False)
+            if result["image"]:
+                worksheet = writer.sheets[sheet_name]
+                worksheet.add_image(Image(io.BytesIO(result["image"])), f"{get_column_letter(len(table.columns) + 2)}2")
+    return buffer.getvalue()
+
+
+EXPORT_FORMATS = {
+    "pdf": (build_pdf, "application/pdf"),
+    "xlsx": (build_xlsx, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+
+def stream_document(data: bytes) -> Iterator[bytes]:
+    """
+    Yield an assembled document in chunks for a streaming response.
+    The document is already whole in memory (PDF and XLSX writers finish
+    the file before it can be read); chunking only bounds the size of
+    each write to the client.
+    """
+    for start in range(0, len(data), REPORT_STREAM_CHUNK_SIZE):
+        yield data[start:start + REPORT_STREAM_CHUNK_SIZE]
+
+
+# --- Content-addressed report store ---
+# Documents are stored once under the SHA-256 of their bytes (objects/), and
+# looked up through refs named after the hash of the normalized request,
+# which includes each entity's dataset version. A data refresh therefore
+# changes every affected ref key, and stale refs are pruned by version.
+
+def _ref_key(template: Optional[str], sections: Optional[Sequence[str]], entities: Sequence[str],
+             options: Sequence[str], fmt: str, versions: Dict[str, int]) -> str:
+    request = {
+        "template": template,
+        "sections": resolve_sections(template, sections, options),
+        "entities": [[entity, versions[entity]] for entity in entities],
+        "charts": "charts" in options,
+        "detailed": "detailed" in options,
+        "format": fmt,
+    }
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _ref_path(ref_key: str) -> str:
+    return os.path.join(REPORT_STORE_DIR, "refs", ref_key[:2], f"{ref_key}.json")
+
+
+def _object_path(content_hash: str) -> str:
+    return os.path.join(REPORT_STORE_DIR, "objects", content_hash[:2], content_hash)
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Unique per writer: threads of one process may store the same document at once
+    tmp_path = f"{path}.{os.getpid()}-{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def get_stored_document(ref_key: str) -> Optional[bytes]:
+    """Return a stored document for a request key, or None if it has not been generated."""
+    try:
+        with open(_ref_path(ref_key), "r", encoding="utf-8") as f:
+            ref = json.load(f)
+        with open(_object_path(ref["content_hash"]), "rb") as f:
+            return f.read()
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def store_document(ref_key: str, data: bytes, versions: Dict[str, int]) -> str:
+    """
+    Store a generated document and point the request key at it.
+
+    Returns:
+        str: The document's content hash
+    """
+    content_hash = hashlib.sha256(data).hexdigest()
+    try:
+        # Touched so a concurrent prune sees it as new and keeps it until the ref is published
+        os.utime(_object_path(content_hash))
+    except FileNotFoundError:
+        _atomic_write(_object_path(content_hash), data)
+    ref = {"content_hash": content_hash, "versions": versions, "created": time.time()}
+    _atomic_write(_ref_path(ref_key), json.dumps(ref).encode("utf-8"))
+    return content_hash
+
+
+def export_document(template: Optional[str], sections: Optional[Sequence[str]] = None,
+                    entities: Optional[Sequence[str]] = None,
+                    options: Sequence[str] = ("exec_summary", "charts"), fmt: str = "pdf") -> Dict[str, Any]:
+    """
+    Get an assembled report document, from the store when it has already
+    been generated for the current dataset versions.
+
+    Args:
+        template, sections, entities, options: As for `render_report`
+        fmt (str): Key in EXPORT_FORMATS
+
+    Returns:
+        Dict[str, Any]: 'title', 'data' (document bytes), 'mimetype' and 'cached'
+
+    Raises:
+        RuntimeError: If the export library for the format is not installed
+        ValueError: If an entity is unknown
+    """
+    entities = check_entities(entities)
+    if SAMPLE_DATA:
+        for entity in entities:
+            ensure_sample_dataset(entity)
+    versions = {entity: get_dataset_version(entity) for entity in entities}
+    build_document, mimetype = EXPORT_FORMATS[fmt]
+    title = template.replace("_", " ").title() if template else "Financial Report"
+    ref_key = _ref_key(template, sections, entities, options, fmt, versions)
+
+    data = get_stored_document(ref_key)
+    if data is not None:
+        return {"title": title, "data": data, "mimetype": mimetype, "cached": True}
+    data = build_document(render_report(template, sections, entities, options))
+    store_document(ref_key, data, versions)
+    return {"title": title, "data": data, "mimetype": mimetype, "cached": False}
+
+
+def prune_report_store() -> int:
+    """
+    Remove refs generated for outdated dataset versions and any documents
+    no longer referenced. Documents stored after the prune started are
+    kept, as their refs may not be published yet.
+
+    Returns:
+        int: Number of refs removed
+    """
+    started = time.time()
+    refs_dir = os.path.join(REPORT_STORE_DIR, "refs")
+    objects_dir = os.path.join(REPORT_STORE_DIR, "objects")
+    current_versions: Dict[str, int] = {}
+    live_objects = set()
+    removed = 0
+    for root, _, files in os.walk(refs_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    ref = json.load(f)
+            except (OSError, ValueError):
+                continue
+            stale = False
+            for entity, version in ref["versions"].items():
+                if entity not in current_versions:
+                    current_versions[entity] = get_dataset_version(entity)
+                stale = stale or version != current_versions[entity]
+            if stale:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass  # Pruned concurrently
+            else:
+                live_objects.add(ref["content_hash"])
+    for root, _, files in os.walk(objects_dir):
+        for name in files:
+            if name in live_objects or name.endswith(".tmp"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                if os.path.getmtime(path) < started:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+    if removed:
+        logger.info(f"Pruned {removed} outdated reports from the report store")
+    return removed
+
+
+def _prerender_task(combination: Dict[str, Any]) -> str:
+    try:
+        return "cached" if export_document(**combination)["cached"] else "generated"
+    except Exception as e:
+        logger.warning(f"Pre-rendering {combination} failed: {e}")
+        return "failed"
+
+
+def prerender_reports(combinations: Sequence[Dict[str, Any]], progress=None) -> Dict[str, int]:
+    """
+    Generate and store a list of report combinations, one per process pool
+    task (each renders its sections in its own worker).
+    Runs as a queued job, so it reports progress and can be cancelled.
+
+    Args:
+        combinations: Dicts of keyword arguments for `export_document`
+        progress: JobProgress supplied by the job queue
+
+    Returns:
+        Dict[str, int]: Counts of 'generated', 'cached' and 'failed' documents
+    """
+    combinations = list(combinations)
+    if SAMPLE_DATA:
+        # Seed sample ledgers before workers read them concurrently
+        for combination in combinations:
+            try:
+                entities = check_entities(combination.get("entities"))
+            except ValueError:
+                continue  # Counted as failed by its task
+            for entity in entities:
+                ensure_sample_dataset(entity)
+    counts = {"generated": 0, "cached": 0, "failed": 0}
+    for done, (combination, outcome) in enumerate(zip(combinations, pool_map(_prerender_task, combinations)), start=1):
+        counts[outcome] += 1
+        if progress is not None:
+            progress(done, len(combinations), f"Rendered {combination.get('template')} ({combination.get('fmt')})")
+    prune_report_store()
+    return counts
\ No newline at end of file
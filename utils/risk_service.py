@@ -0,0 +1,222 @@
+"""
+Risk Service module for exposure matrices and stress testing.
+Aggregates position exposures into category-by-impact expected-loss
+matrices with NumPy broadcasting, and evaluates any number of stress
+scenarios as one batched computation. Results are cached per entity,
+dataset version and scenario.
+"""
+
+import os
+import zlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .data_service import DATA_DIR, DEFAULT_ENTITY, SAMPLE_DATA, get_dataset_version
+from .analysis_service import get_analysis_engine
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+# Configuration from environment variables with defaults
+RISK_DIR = os.environ.get("FINGEN_RISK_DIR", os.path.join(DATA_DIR, "risk"))
+# Expected loss per matrix cell, as a share of annual profit, shown as the top of the risk scale
+RISK_LIMIT_SHARE = float(os.environ.get("FINGEN_RISK_LIMIT_SHARE", "0.01"))
+SAMPLE_RISK_POSITIONS = int(os.environ.get("FINGEN_SAMPLE_RISK_POSITIONS", "500"))
+RISK_CACHE_SIZE = int(os.environ.get("FINGEN_RISK_CACHE_SIZE", "256"))
+
+RISK_CATEGORIES = ['Market', 'Credit', 'Operational', 'Liquidity', 'Regulatory']
+IMPACT_LEVELS = ['Critical', 'High', 'Medium', 'Low', 'Minimal']
+# Loss as a share of annual profit at which each impact level starts, in IMPACT_LEVELS order
+IMPACT_THRESHOLDS = np.array([0.10, 0.05, 0.02, 0.005, 0.0])
+POSITION_COLUMNS = ["name", "category", "exposure", "probability", "severity"]
+
+# Stress scenarios as {category: (probability multiplier, severity multiplier)}
+STRESS_SCENARIOS: Dict[str, Dict[str, Tuple[float, float]]] = {
+    "baseline": {},
+    "market_crash": {"Market": (2.5, 1.8), "Liquidity": (1.8, 1.4), "Credit": (1.3, 1.2)},
+    "credit_crunch": {"Credit": (3.0, 1.5), "Liquidity": (2.0, 1.3)},
+    "rate_shock": {"Market": (1.5, 1.3), "Credit": (1.5, 1.2), "Liquidity": (1.4, 1.2)},
+    "operational_outage": {"Operational": (3.0, 2.0)},
+    "regulatory_change": {"Regulatory": (2.5, 1.5)},
+}
+
+# Matrices cached per (entity, dataset version, scenario), least recently used evicted first
+_matrix_cache: "OrderedDict[Tuple[str, int, str], np.ndarray]" = OrderedDict()
+# Inputs cached per (entity, dataset version)
+_inputs_cache: Dict[Tuple[str, int], Dict[str, np.ndarray]] = {}
+# Guards both caches; reentrant because run_stress_tests fills the inputs cache while holding it
+_cache_lock = threading.RLock()
+
+
+def create_sample_positions(entity: str = DEFAULT_ENTITY, annual_revenue: float = 365_000.0,
+                            count: int = SAMPLE_RISK_POSITIONS) -> pd.DataFrame:
+    """
+    Generate a deterministic book of risk positions for an entity.
+
+    Args:
+        entity (str): Entity name, seeds the generator
+        annual_revenue (float): Scale for position exposures
+        count (int): Number of positions
+
+    Returns:
+        pd.DataFrame: Positions with POSITION_COLUMNS
+    """
+    rng = np.random.default_rng(zlib.crc32(entity.encode("utf-8")))
+    category = rng.integers(0, len(RISK_CATEGORIES), count)
+    return pd.DataFrame({
+        "name": [f"{RISK_CATEGORIES[c]} position {i + 1}" for i, c in enumerate(category)],
+        "category": [RISK_CATEGORIES[c] for c in category],
+        "exposure": rng.lognormal(0, 1, count) * annual_revenue / count * 0.5,
+        "probability": rng.beta(1.5, 20, count),
+        "severity": rng.beta(2, 5, count),
+    })
+
+
+def load_positions(entity: str = DEFAULT_ENTITY, annual_revenue: float = 365_000.0) -> pd.DataFrame:
+    """
+    Load an entity's risk positions from RISK_DIR/<entity>.parquet,
+    falling back to generated positions when SAMPLE_DATA is enabled.
+
+    Returns:
+        pd.DataFrame: Positions with POSITION_COLUMNS
+    """
+    path = os.path.join(RISK_DIR, f"{entity}.parquet")
+    if os.path.exists(path):
+        return pd.read_parquet(path, columns=POSITION_COLUMNS)
+    if SAMPLE_DATA:
+        return create_sample_positions(entity, annual_revenue)
+    return pd.DataFrame(columns=POSITION_COLUMNS)
+
+
+def scenario_multipliers(scenarios: Sequence[Dict[str, Tuple[float, float]]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Turn scenario definitions into per-category multiplier arrays.
+
+    Returns:
+        Tuple of (probability, severity) multiplier arrays, each of shape
+        (len(scenarios), len(RISK_CATEGORIES))
+    """
+    probability = np.ones((len(scenarios), len(RISK_CATEGORIES)))
+    severity = np.ones((len(scenarios), len(RISK_CATEGORIES)))
+    for s, scenario in enumerate(scenarios):
+        for category, (p, v) in scenario.items():
+            c = RISK_CATEGORIES.index(category)
+            probability[s, c], severity[s, c] = p, v
+    return probability, severity
+
+
+def compute_risk_matrices(exposure: np.ndarray, probability: np.ndarray, severity: np.ndarray,
+                          category: np.ndarray, probability_multipliers: np.ndarray,
+                          severity_multipliers: np.ndarray, capital: float) -> np.ndarray:
+    """
+    Compute expected-loss matrices for a batch of scenarios.
+    Each position's stressed loss is binned into an impact level by its
+    share of capital, and probability-weighted losses are summed per
+    (scenario, impact level, category) cell with a single bincount.
+
+    Args:
+        exposure, probability, severity (np.ndarray): Per-position arrays of shape (P,)
+        category (np.ndarray): Category index per position, shape (P,)
+        probability_multipliers, severity_multipliers (np.ndarray): Shape (S, len(RISK_CATEGORIES))
+        capital (float): Loss-absorbing base the impact thresholds are relative to
+
+    Returns:
+        np.ndarray: Expected losses of shape (S, len(IMPACT_LEVELS), len(RISK_CATEGORIES))
+    """
+    num_scenarios = len(probability_multipliers)
+    num_levels, num_categories = len(IMPACT_LEVELS), len(RISK_CATEGORIES)
+    loss = exposure * severity * severity_multipliers[:, category]
+    likelihood = np.clip(probability * probability_multipliers[:, category], 0, 1)
+    level = num_levels - np.searchsorted(IMPACT_THRESHOLDS[::-1], loss / capital, side="right")
+    # Positions that gain under stress fall below every threshold: the lowest level, not past it
+    level = np.clip(level, 0, num_levels - 1)
+    cell = (np.arange(num_scenarios)[:, None] * num_levels + level) * num_categories + category
+    matrices = np.bincount(cell.ravel(), weights=(likelihood * loss).ravel(),
+                           minlength=num_scenarios * num_levels * num_categories)
+    return matrices.reshape(num_scenarios, num_levels, num_categories)
+
+
+def _risk_inputs(entity: str, version: int) -> Dict[str, np.ndarray]:
+    """Position arrays, capital and live probability multipliers for a dataset version."""
+    with _cache_lock:
+        key = (entity, version)
+        if key not in _inputs_cache:
+            engine = get_analysis_engine(entity)
+            recent = engine.quarters.sort_index().iloc[-4:]
+            # Annualize the trailing quarters' daily averages
+            annual_revenue = float(recent['revenue'].sum() / max(recent['days'].sum(), 1) * 365)
+            capital = float(recent['profit'].sum() / max(recent['days'].sum(), 1) * 365)
+            positions = load_positions(entity, annual_revenue)
+
+            # Recent market and cash-flow volatility raise market and liquidity event likelihood
+            live = np.ones(len(RISK_CATEGORIES))
+            tail = engine.tail
+            if len(tail) > 1:
+                market_cv = tail['market_index'].std() / tail['market_index'].mean()
+                profit_cv = tail['profit'].std() / abs(tail['profit'].mean())
+                live[RISK_CATEGORIES.index('Market')] = max(market_cv / 0.10, 0.5)
+                live[RISK_CATEGORIES.index('Liquidity')] = max(profit_cv / 0.10, 0.5)
+
+            _inputs_cache.clear()
+            _inputs_cache[key] = {
+                "exposure": positions['exposure'].to_numpy(float),
+                "probability": positions['probability'].to_numpy(float),
+                "severity": positions['severity'].to_numpy(float),
+                "category": positions['category'].map(RISK_CATEGORIES.index).to_numpy(np.int64),
+                "capital": max(capital, 1.0),
+                "live": live,
+            }
+        return _inputs_cache[key]
+
+
+def run_stress_tests(scenarios: Optional[List[str]] = None, entity: str = DEFAULT_ENTITY) -> Dict[str, np.ndarray]:
+    """
+    Get expected-loss matrices for named stress scenarios.
+    Scenarios not yet cached for the current dataset version are computed
+    together in one batched call.
+
+    Args:
+        scenarios (Optional[List[str]]): Names from STRESS_SCENARIOS; all when omitted
+        entity (str): Entity whose positions and ledger are used
+
+    Returns:
+        Dict[str, np.ndarray]: Matrix of shape (len(IMPACT_LEVELS), len(RISK_CATEGORIES)) per scenario
+    """
+    scenarios = scenarios or list(STRESS_SCENARIOS)
+    version = get_dataset_version(entity)
+    with _cache_lock:
+        missing = [s for s in scenarios if (entity, version, s) not in _matrix_cache]
+        if missing:
+            inputs = _risk_inputs(entity, version)
+            probability, severity = scenario_multipliers([STRESS_SCENARIOS[s] for s in missing])
+            matrices = compute_risk_matrices(
+                inputs["exposure"], inputs["probability"], inputs["severity"], inputs["category"],
+                probability * inputs["live"], severity, inputs["capital"]
+            )
+            for name, matrix in zip(missing, matrices):
+                _matrix_cache[(entity, version, name)] = matrix
+            logger.info(f"Computed {len(missing)} stress scenarios for '{entity}' at version {version}")
+
+        results = {}
+        for name in scenarios:
+            _matrix_cache.move_to_end((entity, version, name))
+            results[name] = _matrix_cache[(entity, version, name)]
+        while len(_matrix_cache) > RISK_CACHE_SIZE:
+            _matrix_cache.popitem(last=False)
+        return results
+
+
+def get_risk_matrix(scenario: str = "baseline", entity: str = DEFAULT_ENTITY) -> Tuple[np.ndarray, float]:
+    """
+    Get one scenario's expected-loss matrix and the capital it is relative to.
+
+    Returns:
+        Tuple of (matrix of shape (len(IMPACT_LEVELS), len(RISK_CATEGORIES)), capital)
+    """
+    matrix = run_stress_tests([scenario], entity)[scenario]
+    return matrix, _risk_inputs(entity, get_dataset_version(entity))["capital"]
@@ -0,0 +1,185 @@
+"""
+Scheduler Service module for work triggered by data refreshes.
+Runs a lightweight background thread that watches dataset versions and,
+after each refresh, queues pre-rendering of the common report template and
+section combinations so users are served from the report store instantly.
+The same thread queues the nightly batch refresh of forecast models.
+Every web worker starts the thread, but only the holder of a lock file in
+the job cache directory schedules; the others stand by to take over.
+"""
+
+import os
+import time
+import uuid
+import hashlib
+import datetime
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from .data_service import DEFAULT_ENTITY, get_dataset_version
+from .job_service import JOB_CACHE_DIR, submit_job, get_job_status, get_job_cache
+from .forecast_service import refresh_forecasts
+from .report_service import TEMPLATE_SECTIONS, EXPORT_FORMATS, prerender_reports
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+# Configuration from environment variables with defaults
+SCHEDULER_INTERVAL_SECONDS = float(os.environ.get("FINGEN_SCHEDULER_INTERVAL_SECONDS", "60"))
+PRERENDER_ENTITIES = [e for e in os.environ.get("FINGEN_PRERENDER_ENTITIES", DEFAULT_ENTITY).split(",") if e]
+PRERENDER_TEMPLATES = [t for t in os.environ.get("FINGEN_PRERENDER_TEMPLATES", ",".join(TEMPLATE_SECTIONS)).split(",") if t]
+PRERENDER_FORMATS = [f for f in os.environ.get("FINGEN_PRERENDER_FORMATS", ",".join(EXPORT_FORMATS)).split(",") if f]
+# Matches the report page's default checkbox state
+PRERENDER_OPTIONS = [o for o in os.environ.get("FINGEN_PRERENDER_OPTIONS", "exec_summary,charts").split(",") if o]
+# Local hour after which the nightly forecast refresh is queued (negative disables it)
+FORECAST_REFRESH_HOUR = int(os.environ.get("FINGEN_FORECAST_REFRESH_HOUR", "2"))
+SCHEDULER_LOCK_PATH = os.path.join(JOB_CACHE_DIR, "scheduler.lock")
+
+# Singleton instance
+_report_scheduler = None
+
+
+def get_prerender_combinations(entities: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    List the report combinations to pre-render: every configured template
+    with its default sections, for each entity on its own, in each format.
+
+    Returns:
+        List[Dict[str, Any]]: Keyword arguments for `export_document`
+    """
+    return [
+        {"template": template, "sections": None, "entities": [entity], "options": PRERENDER_OPTIONS, "fmt": fmt}
+        for entity in (entities or PRERENDER_ENTITIES)
+        for template in PRERENDER_TEMPLATES
+        for fmt in PRERENDER_FORMATS
+    ]
+
+
+class ReportScheduler(threading.Thread):
+    """Daemon thread that queues report pre-rendering whenever a watched dataset changes,
+    and the forecast refresh once a night."""
+
+    def __init__(self, interval: float = SCHEDULER_INTERVAL_SECONDS, entities: Optional[List[str]] = None):
+        super().__init__(name="fingen-report-scheduler", daemon=True)
+        self.interval = interval
+        self.entities = entities or PRERENDER_ENTITIES
+        self._versions: Dict[str, int] = {}
+        self._stop_event = threading.Event()
+        self._token = f"{os.getpid()}-{uuid.uuid4().hex}"
+        self.leader = False
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def run(self) -> None:
+        logger.info(f"Report scheduler started (every {self.interval}s for {len(self.entities)} entities)")
+        try:
+            while True:
+                try:
+                    if self.elect():
+                        self.tick()
+                        self.tick_forecasts()
+                except Exception as e:
+                    logger.exception(f"Report scheduler tick failed: {e}")
+                if self._stop_event.wait(self.interval):
+                    break
+        finally:
+            self.resign()
+
+    def elect(self) -> bool:
+        """
+        Hold the scheduler lock file, so that one process schedules.
+        The leader touches the lock every tick; a lock left untouched for
+        three intervals belongs to a process that died and is taken over.
+
+        Returns:
+            bool: Whether this scheduler is the leader
+        """
+        try:
+            with open(SCHEDULER_LOCK_PATH, encoding="utf-8") as f:
+                owner = f.read().strip()
+            if owner == self._token:
+                os.utime(SCHEDULER_LOCK_PATH)
+                return True
+            if time.time() - os.path.getmtime(SCHEDULER_LOCK_PATH) < 3 * self.interval:
+                self.leader = False
+                return False
+            logger.warning(f"Taking over the stale report scheduler lock of {owner or 'an unknown process'}")
+            os.remove(SCHEDULER_LOCK_PATH)
+        except FileNotFoundError:
+            pass
+        os.makedirs(os.path.dirname(SCHEDULER_LOCK_PATH), exist_ok=True)
+        try:
+            fd = os.open(SCHEDULER_LOCK_PATH, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            self.leader = False
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(self._token)
+        self.leader = True
+        logger.info(f"Report scheduler elected in process {os.getpid()}")
+        return True
+
+    def resign(self) -> None:
+        """Release the scheduler lock if this scheduler holds it."""
+        try:
+            with open(SCHEDULER_LOCK_PATH, encoding="utf-8") as f:
+                if f.read().strip() != self._token:
+                    return
+            os.remove(SCHEDULER_LOCK_PATH)
+        except FileNotFoundError:
+            pass
+        self.leader = False
+
+    def tick(self) -> Optional[str]:
+        """
+        Queue a pre-render job if any watched dataset changed since the last tick.
+
+        Returns:
+            Optional[str]: The job ID if a job was queued
+        """
+        versions = {entity: get_dataset_version(entity) for entity in self.entities}
+        if versions == self._versions:
+            return None
+        # One job per dataset state; other workers seeing the same refresh reuse it
+        job_id = "prerender-" + hashlib.sha256(repr(sorted(versions.items())).encode("utf-8")).hexdigest()[:16]
+        status = get_job_status(job_id)
+        if status is None or status.get("state") in ("failed", "cancelled"):
+            submit_job(prerender_reports, get_prerender_combinations(self.entities), job_id=job_id)
+            logger.info(f"Queued report pre-rendering for dataset versions {versions}")
+        self._versions = versions
+        return job_id
+
+    def tick_forecasts(self, now: Optional[datetime.datetime] = None) -> Optional[str]:
+        """
+        Queue the nightly forecast refresh if it has not run today.
+        A marker in the shared job cache makes sure only one process queues it.
+
+        Returns:
+            Optional[str]: The job ID if a job was queued
+        """
+        now = now or datetime.datetime.now()
+        if FORECAST_REFRESH_HOUR < 0 or now.hour < FORECAST_REFRESH_HOUR:
+            return None
+        job_id = f"forecast-refresh-{now.date().isoformat()}"
+        if not get_job_cache().add(f"scheduler:{job_id}", True, expire=2 * 24 * 3600):
+            return None
+        submit_job(refresh_forecasts, job_id=job_id)
+        logger.info(f"Queued nightly forecast refresh {job_id}")
+        return job_id
+
+
+def start_report_scheduler() -> ReportScheduler:
+    """
+    Start the report scheduler thread once per process. Only the elected
+    process queues jobs (see `ReportScheduler.elect`).
+
+    Returns:
+        ReportScheduler: The running scheduler
+    """
+    global _report_scheduler
+    if _report_scheduler is None or not _report_scheduler.is_alive():
+        _report_scheduler = ReportScheduler()
+        _report_scheduler.start()
+    return _report_scheduler
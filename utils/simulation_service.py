@@ -0,0 +1,225 @@
+"""
+Simulation Service module for Monte Carlo scenario and stress testing.
+Simulates revenue, expense and cumulative cash-flow paths calibrated on
+the shared ledger. Large runs are split into chunks that run on the job
+process pool and write straight into a shared-memory result buffer; each
+chunk draws from its own spawned seed, so results are reproducible
+whatever the number of workers.
+"""
+
+import os
+import logging
+from concurrent.futures import as_completed
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .data_service import DEFAULT_ENTITY, get_dataset_version, load_dataset
+from .job_service import get_process_pool
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+# Configuration from environment variables with defaults
+SIMULATION_PATHS = int(os.environ.get("FINGEN_SIMULATION_PATHS", "10000"))
+SIMULATION_HORIZON_DAYS = int(os.environ.get("FINGEN_SIMULATION_HORIZON_DAYS", "365"))
+SIMULATION_CHUNK_PATHS = int(os.environ.get("FINGEN_SIMULATION_CHUNK_PATHS", "10000"))
+SIMULATION_STEP_DAYS = int(os.environ.get("FINGEN_SIMULATION_STEP_DAYS", "7"))
+SIMULATION_SEED = int(os.environ.get("FINGEN_SIMULATION_SEED", "42"))
+SIMULATION_CALIBRATION_DAYS = int(os.environ.get("FINGEN_SIMULATION_CALIBRATION_DAYS", "365"))
+# Daily volatility of the underlying revenue and expense levels (a random walk in log space)
+SIMULATION_LEVEL_VOLATILITY = float(os.environ.get("FINGEN_SIMULATION_LEVEL_VOLATILITY", "0.01"))
+
+SIMULATION_METRICS = ["revenue", "expenses", "cash_flow"]
+PERCENTILES = [5, 25, 50, 75, 95]
+
+# Scenario adjustments: annual growth shifts and a volatility multiplier
+SIMULATION_SCENARIOS: Dict[str, Dict[str, float]] = {
+    "baseline": {},
+    "recession": {"revenue_growth": -0.25, "expenses_growth": -0.05, "volatility": 1.5},
+    "cost_inflation": {"expenses_growth": 0.15},
+    "expansion": {"revenue_growth": 0.20, "expenses_growth": 0.12, "volatility": 1.2},
+    "market_shock": {"revenue_growth": -0.10, "volatility": 2.5},
+}
+
+# Calibrated parameters cached per (entity, dataset version)
+_calibration_cache: Dict[Tuple[str, int], Dict[str, float]] = {}
+
+
+def calibrate(entity: str = DEFAULT_ENTITY) -> Dict[str, float]:
+    """
+    Estimate simulation parameters from the trailing ledger.
+
+    Returns:
+        Dict[str, float]: Starting levels, annual growth rates, daily
+        noise (as a coefficient of variation) and the revenue/expense
+        noise correlation
+    """
+    key = (entity, get_dataset_version(entity))
+    if key not in _calibration_cache:
+        rows = load_dataset(entity).iloc[-SIMULATION_CALIBRATION_DAYS:]
+        monthly = rows[["revenue", "expenses"]].resample("MS").mean()
+        months = np.arange(len(monthly))
+        params: Dict[str, float] = {}
+        for metric in ("revenue", "expenses"):
+            # Log-linear trend on monthly averages gives the growth rate
+            slope = np.polyfit(months, np.log(monthly[metric].to_numpy()), 1)[0] if len(monthly) > 1 else 0.0
+            params[f"{metric}_level"] = float(rows[metric].iloc[-30:].mean())
+            params[f"{metric}_growth"] = float(np.clip(slope * 12, -0.5, 0.5))
+            params[f"{metric}_noise"] = float(rows[metric].std() / rows[metric].mean())
+        params["correlation"] = float(np.nan_to_num(rows["revenue"].corr(rows["expenses"])))
+        _calibration_cache[key] = params
+    return _calibration_cache[key]
+
+
+def simulate_chunk(params: Dict[str, float], seed: np.random.SeedSequence, paths: int,
+                   horizon: int = SIMULATION_HORIZON_DAYS, step: int = SIMULATION_STEP_DAYS) -> np.ndarray:
+    """
+    Simulate one chunk of paths, vectorized over paths and days.
+
+    Revenue and expenses follow a log random walk level with drift times
+    correlated daily noise; cash flow is cumulative revenue minus expenses.
+
+    Args:
+        params (Dict[str, float]): Output of `calibrate`, adjusted for a scenario
+        seed (np.random.SeedSequence): Seed for this chunk
+        paths (int): Number of paths
+        horizon (int): Days to simulate
+        step (int): Days per output point; revenue and expenses are averaged per step
+
+    Returns:
+        np.ndarray: float32 array of shape (len(SIMULATION_METRICS), paths, horizon // step)
+    """
+    rng = np.random.default_rng(seed)
+    steps = horizon // step
+    days = steps * step
+    volatility = params.get("volatility", 1.0)
+    rho = params["correlation"]
+
+    # float32 draws halve memory traffic; precision is ample for percentile bands
+    level_shocks = rng.standard_normal((2, paths, days), dtype=np.float32) * np.float32(SIMULATION_LEVEL_VOLATILITY * volatility)
+    noise = rng.standard_normal((2, paths, days), dtype=np.float32)
+    # Correlate expense noise with revenue noise
+    noise[1] = rho * noise[0] + np.sqrt(max(1 - rho ** 2, 0)) * noise[1]
+
+    output = np.empty((len(SIMULATION_METRICS), paths, steps), dtype=np.float32)
+    daily = []
+    for i, metric in enumerate(("revenue", "expenses")):
+        drift = np.float32(np.log1p(params[f"{metric}_growth"]) / 365)
+        log_level = np.cumsum(level_shocks[i] + drift, axis=1)
+        values = np.float32(params[f"{metric}_level"]) * np.exp(log_level) * (1 + np.float32(params[f"{metric}_noise"] * volatility) * noise[i])
+        daily.append(values)
+        output[i] = values.reshape(paths, steps, step).mean(axis=2)
+    cash_flow = np.cumsum(daily[0] - daily[1], axis=1)
+    output[2] = cash_flow[:, step - 1::step]
+    return output
+
+
+def _simulate_into(buffer_name: str, shape: Tuple[int, int, int], start: int, paths: int,
+                   params: Dict[str, float], seed: np.random.SeedSequence, horizon: int, step: int) -> int:
+    """Pool worker: simulate a chunk and write it into the shared result buffer."""
+    buffer = shared_memory.SharedMemory(name=buffer_name)
+    try:
+        results = np.ndarray(shape, dtype=np.float32, buffer=buffer.buf)
+        results[:, start:start + paths] = simulate_chunk(params, seed, paths, horizon, step)
+        del results
+    finally:
+        buffer.close()
+    return start
+
+
+def summarize(results: np.ndarray, step: int = SIMULATION_STEP_DAYS) -> Dict[str, Any]:
+    """
+    Reduce simulated paths to percentile bands.
+
+    Args:
+        results (np.ndarray): Array of shape (len(SIMULATION_METRICS), paths, steps)
+
+    Returns:
+        Dict[str, Any]: 'days' (day offset of each point), 'percentiles',
+        one (len(PERCENTILES), steps) array per metric, 'paths' and
+        'probability_negative_cash' (share of paths ending with negative cumulative cash flow)
+    """
+    summary: Dict[str, Any] = {
+        "days": (np.arange(results.shape[2]) + 1) * step,
+        "percentiles": PERCENTILES,
+        "paths": results.shape[1],
+    }
+    bands = np.percentile(results, PERCENTILES, axis=1)
+    for i, metric in enumerate(SIMULATION_METRICS):
+        summary[metric] = bands[:, i]
+    summary["probability_negative_cash"] = float((results[2, :, -1] < 0).mean()) if results.shape[1] else 0.0
+    return summary
+
+
+def run_simulation(entity: str = DEFAULT_ENTITY, scenario: str = "baseline", paths: int = SIMULATION_PATHS,
+                   horizon: int = SIMULATION_HORIZON_DAYS, seed: int = SIMULATION_SEED,
+                   progress: Optional[Callable[[int, int, Optional[Dict[str, Any]]], None]] = None) -> Dict[str, Any]:
+    """
+    Run a Monte Carlo simulation for an entity under a scenario.
+    Chunks run in parallel on the job process pool; runs that fit in a
+    single chunk run in-process.
+
+    Args:
+        entity (str): Entity whose ledger calibrates the simulation
+        scenario (str): Name from SIMULATION_SCENARIOS
+        paths (int): Number of simulated paths
+        horizon (int): Days to simulate
+        seed (int): Root seed; the same seed gives the same result
+        progress (Optional[Callable]): Called as progress(done_chunks, total_chunks, partial_summary)
+            after each chunk, with percentiles over the chunks finished so far
+
+    Returns:
+        Dict[str, Any]: Output of `summarize`, plus 'scenario'
+    """
+    params = dict(calibrate(entity))
+    adjustments = SIMULATION_SCENARIOS[scenario]
+    for metric in ("revenue", "expenses"):
+        params[f"{metric}_growth"] += adjustments.get(f"{metric}_growth", 0.0)
+    params["volatility"] = adjustments.get("volatility", 1.0)
+
+    step = SIMULATION_STEP_DAYS
+    shape = (len(SIMULATION_METRICS), paths, horizon // step)
+    starts = list(range(0, paths, SIMULATION_CHUNK_PATHS))
+    sizes = [min(SIMULATION_CHUNK_PATHS, paths - start) for start in starts]
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+
+    if len(starts) == 1:
+        results = simulate_chunk(params, seeds[0], paths, horizon, step)
+        if progress:
+            progress(1, 1, None)
+        summary = summarize(results, step)
+    else:
+        buffer = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * 4)
+        try:
+            results = np.ndarray(shape, dtype=np.float32, buffer=buffer.buf)
+            futures = [
+                get_process_pool().submit(_simulate_into, buffer.name, shape, start, size, params, chunk_seed, horizon, step)
+                for start, size, chunk_seed in zip(starts, sizes, seeds)
+            ]
+            finished: List[int] = []
+            try:
+                for done, future in enumerate(as_completed(futures), start=1):
+                    start = future.result()
+                    finished.append(start)
+                    if progress and done < len(futures):
+                        # Percentiles over the finished chunks so far, for streaming
+                        index = np.concatenate([np.arange(s, s + sizes[starts.index(s)]) for s in sorted(finished)])
+                        progress(done, len(futures), summarize(results[:, index], step))
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+            summary = summarize(results, step)
+            if progress:
+                progress(len(futures), len(futures), None)
+        finally:
+            # The view must be released before the shared memory can be closed
+            results = None
+            buffer.close()
+            buffer.unlink()
+
+    summary["scenario"] = scenario
+    logger.info(f"Simulated {paths} paths over {horizon} days for '{entity}' ({scenario})")
+    return summary
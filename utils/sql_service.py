@@ -0,0 +1,213 @@
+"""
+SQL Service module for analytical queries over the ledgers.
+Runs read-only SQL on an embedded, in-process DuckDB database whose
+`ledger` view scans the Parquet partitions of every entity directly.
+Queries are bounded by a timeout and a row cap, and results are cached
+by normalized SQL and dataset version, so aggregate questions can be
+answered without loading raw rows into Python or into LLM prompts.
+"""
+
+import os
+import glob
+import time
+import datetime
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+from .data_service import DATA_DIR, DEFAULT_ENTITY, SAMPLE_DATA, ensure_sample_dataset, get_dataset_version, list_entities
+from .ingest_service import FACTS_DIR, FILINGS_DIR
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+# Configuration from environment variables with defaults
+SQL_TIMEOUT_SECONDS = float(os.environ.get("FINGEN_SQL_TIMEOUT_SECONDS", "10"))
+SQL_MAX_ROWS = int(os.environ.get("FINGEN_SQL_MAX_ROWS", "200"))
+SQL_MEMORY_LIMIT = os.environ.get("FINGEN_SQL_MEMORY_LIMIT", "1GB")
+SQL_CACHE_SIZE = int(os.environ.get("FINGEN_SQL_CACHE_SIZE", "256"))
+
+LEDGER_SCHEMA = """ledger(entity VARCHAR, date DATE, revenue DOUBLE, expenses DOUBLE, profit DOUBLE, market_index DOUBLE)
+-- one row per entity and day"""
+
+FACTS_SCHEMA = """filing_facts(source VARCHAR, entity VARCHAR, concept VARCHAR, context VARCHAR, period_start TIMESTAMP,
+             period_end TIMESTAMP, dimensions VARCHAR, unit VARCHAR, decimals VARCHAR, value DOUBLE, text VARCHAR)
+-- one row per XBRL fact from ingested filings; concept like 'us-gaap:Revenues', entity is the filer's CIK,
+-- dimensions is NULL for whole-company figures; period_start is NULL for instant (balance sheet) facts"""
+
+
+class SQLQueryError(Exception):
+    """Raised when a query is rejected, fails or times out."""
+
+
+# Results cached per (normalized SQL, dataset versions), least recently used evicted first
+_result_cache: "OrderedDict[Tuple[str, Tuple[Tuple[str, int], ...]], Dict[str, Any]]" = OrderedDict()
+_connection = None
+_facts_view = False
+_connection_lock = threading.Lock()
+_result_cache_lock = threading.Lock()
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace and drop trailing semicolons so equivalent queries share a cache entry."""
+    return " ".join(sql.strip().rstrip(";").split())
+
+
+def _ledger_glob() -> str:
+    return os.path.join(os.path.abspath(DATA_DIR), "ledger", "*", "part-*.parquet")
+
+
+def _index_column(path: str) -> str:
+    """Name of the date column pandas wrote for the ledger's index."""
+    import pyarrow.parquet as pq
+    metadata = pq.read_schema(path).pandas_metadata or {}
+    columns = [c for c in metadata.get("index_columns", []) if isinstance(c, str)]
+    return columns[0] if columns else "date"
+
+
+def _facts_glob() -> str:
+    return os.path.join(os.path.abspath(FACTS_DIR), "*.parquet")
+
+
+def get_connection():
+    """
+    Get the process-wide DuckDB database with the ledger view, and the
+    filing_facts view when filings have been ingested.
+    External file access is restricted to DATA_DIR once the views exist.
+
+    Raises:
+        SQLQueryError: If DuckDB is not installed or there is no ledger to query
+    """
+    global _connection, _facts_view
+    with _connection_lock:
+        if _connection is None:
+            try:
+                import duckdb
+            except ImportError as e:
+                raise SQLQueryError("SQL queries require the 'duckdb' package") from e
+            if SAMPLE_DATA:
+                ensure_sample_dataset(DEFAULT_ENTITY)
+            partitions = sorted(glob.glob(_ledger_glob()))
+            if not partitions:
+                raise SQLQueryError("There is no ledger data to query")
+
+            connection = duckdb.connect(":memory:", config={"memory_limit": SQL_MEMORY_LIMIT})
+            # The entity is the ledger directory name; the glob picks up new entities and partitions at query time
+            connection.execute(f"""
+                CREATE VIEW ledger AS
+                SELECT regexp_extract(filename, '[/\\\\]ledger[/\\\\]([^/\\\\]+)[/\\\\]part-', 1) AS entity,
+                       CAST("{_index_column(partitions[0])}" AS DATE) AS date,
+                       revenue, expenses, profit, market_index
+                FROM read_parquet('{_ledger_glob()}', filename = true)
+            """)
+            connection.execute(f"SET allowed_directories = ['{os.path.abspath(DATA_DIR)}', '{os.path.abspath(FILINGS_DIR)}']")
+            connection.execute("SET enable_external_access = false")
+            _connection = connection
+            logger.info("DuckDB ledger database initialized")
+        # Filings may be ingested after the database was opened
+        if not _facts_view and glob.glob(_facts_glob()):
+            _connection.execute(f"CREATE VIEW filing_facts AS SELECT * FROM read_parquet('{_facts_glob()}')")
+            _facts_view = True
+    return _connection
+
+
+def _facts_version() -> int:
+    # Fact files are replaced or removed when a filing changes, so their names and mtimes version the view
+    stamps = []
+    for path in glob.glob(_facts_glob()):
+        try:
+            stamps.append((path, os.stat(path).st_mtime_ns))
+        except FileNotFoundError:
+            pass  # Removed since the glob
+    return hash(tuple(sorted(stamps)))
+
+
+def _data_versions() -> Tuple[Tuple[str, int], ...]:
+    return tuple((entity, get_dataset_version(entity)) for entity in list_entities()) + (
+        ("filing_facts", _facts_version()),)
+
+
+def run_sql(sql: str, max_rows: int = SQL_MAX_ROWS, timeout: float = SQL_TIMEOUT_SECONDS) -> Dict[str, Any]:
+    """
+    Run one read-only SELECT statement over the ledger.
+
+    Args:
+        sql (str): The query; only a single SELECT (or WITH ... SELECT) is accepted
+        max_rows (int): Rows returned at most; 'truncated' is set when there were more
+        timeout (float): Seconds before the query is interrupted
+
+    Returns:
+        Dict[str, Any]: 'columns', 'rows' (list of tuples), 'truncated',
+        'cached' and 'elapsed_ms'
+
+    Raises:
+        SQLQueryError: If the statement is rejected, fails or times out
+    """
+    started = time.perf_counter()
+    normalized = normalize_sql(sql)
+    connection = get_connection()
+    import duckdb
+    key = (f"{max_rows}:{normalized}", _data_versions())
+    with _result_cache_lock:
+        cached = _result_cache.get(key)
+        if cached is not None:
+            _result_cache.move_to_end(key)
+    if cached is not None:
+        return dict(cached, cached=True, elapsed_ms=(time.perf_counter() - started) * 1000)
+
+    try:
+        statements = duckdb.extract_statements(normalized)
+    except duckdb.Error as e:
+        raise SQLQueryError(f"Invalid SQL: {e}") from e
+    if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+        raise SQLQueryError("Only a single SELECT statement is allowed")
+
+    cursor = connection.cursor()
+    timer = threading.Timer(timeout, cursor.interrupt)
+    timer.start()
+    try:
+        cursor.execute(normalized)
+        rows = cursor.fetchmany(max_rows + 1)
+        columns = [column[0] for column in cursor.description]
+    except duckdb.InterruptException as e:
+        raise SQLQueryError(f"Query exceeded the {timeout:g}s timeout") from e
+    except duckdb.Error as e:
+        raise SQLQueryError(str(e)) from e
+    finally:
+        timer.cancel()
+        cursor.close()
+
+    result = {"columns": columns, "rows": rows[:max_rows], "truncated": len(rows) > max_rows}
+    with _result_cache_lock:
+        _result_cache[key] = result
+        while len(_result_cache) > SQL_CACHE_SIZE:
+            _result_cache.popitem(last=False)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    logger.info(f"SQL query returned {len(result['rows'])} rows in {elapsed_ms:.1f}ms")
+    return dict(result, cached=False, elapsed_ms=elapsed_ms)
+
+
+def format_result(result: Dict[str, Any]) -> str:
+    """Render a query result as a compact text table for LLM context."""
+    def cell(value: Any) -> str:
+        if isinstance(value, float):
+            return f"{value:,.2f}"
+        if isinstance(value, datetime.datetime) and value.time() == datetime.time():
+            return value.date().isoformat()
+        return str(value)
+
+    lines = [" | ".join(result["columns"])]
+    lines.extend(" | ".join(cell(value) for value in row) for row in result["rows"])
+    if result["truncated"]:
+        lines.append(f"(truncated to {len(result['rows'])} rows)")
+    return "\n".join(lines)
+
+
+def describe_tables() -> str:
+    """Schema and entity names, for prompts that write SQL."""
+    entities = ", ".join(f"'{entity}'" for entity in list_entities()) or f"'{DEFAULT_ENTITY}'"
+    schema = f"{LEDGER_SCHEMA}\n-- entity values: {entities}"
+    if glob.glob(_facts_glob()):
+        schema += f"\n{FACTS_SCHEMA}"
+    return schema
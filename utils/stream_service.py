@@ -0,0 +1,212 @@
+"""
+Stream Service module for framing LLM token streams as Server-Sent Events.
+Tokens are pulled from the source (on a producer thread for WSGI routes,
+as a task on the event loop for ASGI routes) and coalesced into
+one `token` event per flush interval (or per buffer limit), so the browser
+receives a few dozen framed events per second instead of one write per
+token. Idle connections get `heartbeat` events to keep proxies from
+closing them, and the stream always ends with a `done` or `error` event.
+"""
+
+import os
+import json
+import time
+import queue
+import asyncio
+import logging
+import threading
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, NamedTuple, Optional, Union
+
+from .async_service import iterate_async
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+# Configuration from environment variables with defaults
+STREAM_FLUSH_INTERVAL = float(os.environ.get("FINGEN_STREAM_FLUSH_MS", "50")) / 1000
+STREAM_MAX_BUFFER_CHARS = int(os.environ.get("FINGEN_STREAM_MAX_BUFFER_CHARS", "2048"))
+STREAM_HEARTBEAT_SECONDS = float(os.environ.get("FINGEN_STREAM_HEARTBEAT_SECONDS", "15"))
+
+# Headers that keep proxies and browsers from buffering or caching the stream
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+_END = object()
+
+
+class StreamEvent(NamedTuple):
+    """A non-token event a source can yield between text chunks, sent as its own frame."""
+    event: str
+    data: Dict[str, Any]
+
+
+def format_sse(event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    """
+    Frame one Server-Sent Event. Data is JSON on a single line, so token
+    text with newlines never breaks the framing.
+    """
+    frame = f"event: {event}\n"
+    if event_id is not None:
+        frame += f"id: {event_id}\n"
+    return frame + f"data: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class _Coalescer:
+    """Buffering and framing state shared by the sync and async stream drivers."""
+
+    def __init__(self, flush_interval: float, heartbeat_interval: float, max_buffer_chars: int):
+        self.flush_interval = flush_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.max_buffer_chars = max_buffer_chars
+        self.buffer: List[str] = []
+        self.buffered_chars = 0
+        self.event_id = 0
+        self.chars = 0
+        self.first_buffered = self.last_sent = time.monotonic()
+        self.finished = False
+
+    def timeout(self) -> float:
+        """Seconds to wait for the next chunk before a flush or heartbeat is due."""
+        deadline = self.first_buffered + self.flush_interval if self.buffer else self.last_sent + self.heartbeat_interval
+        return max(deadline - time.monotonic(), 0)
+
+    def step(self, item: Any) -> List[str]:
+        """
+        Take the next item from the source (a chunk, a StreamEvent, an exception,
+        _END, or None when waiting timed out) and return the frames to send.
+        """
+        if isinstance(item, str) and item:
+            if not self.buffer:
+                self.first_buffered = time.monotonic()
+            self.buffer.append(item)
+            self.buffered_chars += len(item)
+
+        frames = []
+        self.finished = item is _END or isinstance(item, BaseException)
+        now = time.monotonic()
+        if self.buffer and (self.finished or isinstance(item, StreamEvent) or self.buffered_chars >= self.max_buffer_chars
+                            or now - self.first_buffered >= self.flush_interval):
+            self.event_id += 1
+            self.chars += self.buffered_chars
+            frames.append(format_sse("token", {"text": "".join(self.buffer)}, self.event_id))
+            self.buffer, self.buffered_chars = [], 0
+            self.last_sent = now
+        elif item is None and not self.buffer and now - self.last_sent >= self.heartbeat_interval:
+            frames.append(format_sse("heartbeat", {}))
+            self.last_sent = now
+
+        if isinstance(item, StreamEvent):
+            frames.append(format_sse(item.event, item.data))
+            self.last_sent = now
+        elif isinstance(item, BaseException):
+            frames.append(format_sse("error", {"message": f"Server error while generating the response: {item}"}))
+        elif item is _END:
+            frames.append(format_sse("done", {"events": self.event_id, "chars": self.chars}))
+        return frames
+
+
+def _pump(source: Union[Iterable[str], AsyncIterable[str]], chunks: queue.Queue, stop: threading.Event) -> None:
+    """Producer thread: move chunks from a sync or async source into the queue."""
+    iterator = iterate_async(source) if hasattr(source, "__aiter__") else iter(source)
+    try:
+        for chunk in iterator:
+            if stop.is_set():
+                break
+            chunks.put(chunk)
+    except Exception as e:
+        logger.exception(f"Error in streamed source: {e}")
+        chunks.put(e)
+    finally:
+        if hasattr(iterator, "close"):
+            iterator.close()
+    chunks.put(_END)
+
+
+def sse_stream(source: Union[Iterable[str], AsyncIterable[str]],
+               flush_interval: float = STREAM_FLUSH_INTERVAL,
+               heartbeat_interval: float = STREAM_HEARTBEAT_SECONDS,
+               max_buffer_chars: int = STREAM_MAX_BUFFER_CHARS) -> Iterator[str]:
+    """
+    Turn a stream of text chunks into coalesced Server-Sent Events, for WSGI routes.
+    Async sources are advanced on the worker's shared event loop.
+
+    Events are `token` ({"text": ...}, numbered with `id`), `heartbeat`,
+    any StreamEvent the source yields, `error` ({"message": ...}) and a
+    final `done` ({"events": n, "chars": n}).
+
+    Args:
+        source: Sync or async iterable of text chunks
+        flush_interval (float): Seconds buffered text may wait before it is sent
+        heartbeat_interval (float): Seconds of silence before a heartbeat is sent
+        max_buffer_chars (int): Buffered characters that trigger an immediate flush
+
+    Yields:
+        str: Framed events
+    """
+    chunks: queue.Queue = queue.Queue()
+    stop = threading.Event()
+    threading.Thread(target=_pump, args=(source, chunks, stop), daemon=True).start()
+    coalescer = _Coalescer(flush_interval, heartbeat_interval, max_buffer_chars)
+    try:
+        while not coalescer.finished:
+            try:
+                item = chunks.get(timeout=coalescer.timeout())
+            except queue.Empty:
+                item = None
+            yield from coalescer.step(item)
+    finally:
+        # The client went away or the stream ended; let the producer stop pulling tokens
+        stop.set()
+
+
+async def asse_stream(source: Union[Iterable[str], AsyncIterable[str]],
+                      flush_interval: float = STREAM_FLUSH_INTERVAL,
+                      heartbeat_interval: float = STREAM_HEARTBEAT_SECONDS,
+                      max_buffer_chars: int = STREAM_MAX_BUFFER_CHARS) -> AsyncIterator[str]:
+    """
+    Async counterpart of `sse_stream` for ASGI routes. Async sources are
+    consumed on the running loop without a thread per stream; sync sources
+    are drained on a producer thread.
+    """
+    chunks: asyncio.Queue = asyncio.Queue()
+    if hasattr(source, "__aiter__"):
+        async def produce():
+            try:
+                async for chunk in source:
+                    chunks.put_nowait(chunk)
+            except Exception as e:
+                logger.exception(f"Error in streamed source: {e}")
+                chunks.put_nowait(e)
+            chunks.put_nowait(_END)
+        producer = asyncio.ensure_future(produce())
+        stop = None
+    else:
+        loop = asyncio.get_running_loop()
+        bridge: queue.Queue = queue.Queue()
+        stop = threading.Event()
+        threading.Thread(target=_pump, args=(source, bridge, stop), daemon=True).start()
+
+        async def produce():
+            while True:
+                item = await loop.run_in_executor(None, bridge.get)
+                chunks.put_nowait(item)
+                if item is _END:
+                    return
+        producer = asyncio.ensure_future(produce())
+
+    coalescer = _Coalescer(flush_interval, heartbeat_interval, max_buffer_chars)
+    try:
+        while not coalescer.finished:
+            try:
+                item = await asyncio.wait_for(chunks.get(), coalescer.timeout())
+            except asyncio.TimeoutError:
+                item = None
+            for frame in coalescer.step(item):
+                yield frame
+    finally:
+        # The client went away or the stream ended; stop pulling tokens
+        producer.cancel()
+        if stop is not None:
+            stop.set()
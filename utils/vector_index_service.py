@@ -0,0 +1,405 @@
+"""
+Vector Index Service module: a quantized, memory-mapped vector store.
+An in-process alternative to Chroma (FINGEN_VECTOR_BACKEND=quantized).
+Vectors are stored normalized, as int8 codes with a per-vector scale, and
+grouped into IVF lists by a spherical k-means coarse quantizer, so a
+search scores only the lists nearest the query, in int8, and then
+re-ranks a shortlist exactly against the float32 vectors. Everything
+lives in flat files that are memory-mapped on open: startup reads no
+vectors, and the hot int8 codes take a quarter of the memory of floats
+while the float32 copy is only touched for the shortlist.
+
+Writers append under a lock file and publish by atomically replacing
+index.json, so readers in other processes see whole batches only.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+# Configuration from environment variables with defaults
+INDEX_NPROBE = int(os.environ.get("FINGEN_INDEX_NPROBE", "8"))
+# Shortlist re-ranked exactly, as a multiple of k
+INDEX_RERANK_FACTOR = int(os.environ.get("FINGEN_INDEX_RERANK_FACTOR", "8"))
+# Below this many vectors a full int8 scan is fast enough; IVF lists are trained once it is reached
+INDEX_TRAIN_MIN_VECTORS = int(os.environ.get("FINGEN_INDEX_TRAIN_MIN_VECTORS", "4096"))
+INDEX_LOCK_TIMEOUT = float(os.environ.get("FINGEN_INDEX_LOCK_TIMEOUT", "60"))
+
+INDEX_FORMAT_VERSION = 1
+_SCAN_BLOCK = 65536
+_KMEANS_ITERATIONS = 10
+_KMEANS_MAX_SAMPLE = 65536
+
+# File name -> (dtype, values per vector; 0 means one per dimension)
+_ROW_FILES = {
+    "codes.i8": (np.int8, 0),
+    "vectors.f32": (np.float32, 0),
+    "scales.f32": (np.float32, 1),
+    "lists.i32": (np.int32, 1),
+    "deleted.u8": (np.uint8, 1),
+    "offsets.i64": (np.int64, 1),
+}
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _matches(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a Chroma-style metadata filter ($eq, $ne, $gt, $gte, $lt, $lte, $in, $nin, $and, $or)."""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches(metadata, clause) for clause in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(_matches(metadata, clause) for clause in condition):
+                return False
+            continue
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, operand in condition.items():
+            try:
+                ok = {
+                    "$eq": lambda: value == operand,
+                    "$ne": lambda: value != operand,
+                    "$gt": lambda: value is not None and value > operand,
+                    "$gte": lambda: value is not None and value >= operand,
+                    "$lt": lambda: value is not None and value < operand,
+                    "$lte": lambda: value is not None and value <= operand,
+                    "$in": lambda: value in operand,
+                    "$nin": lambda: value not in operand,
+                }[op]()
+            except TypeError:
+                ok = False
+            if not ok:
+                return False
+    return True
+
+
+class _Snapshot:
+    """Read-only memory maps of one published version of the index."""
+
+    def __init__(self, directory: str, meta: Dict[str, Any]):
+        self.meta = meta
+        self.count = meta["count"]
+        self.dim = meta["dim"]
+        self.maps: Dict[str, np.ndarray] = {}
+        for name, (dtype, width) in _ROW_FILES.items():
+            shape = (self.count,) if width else (self.count, self.dim)
+            self.maps[name] = np.memmap(os.path.join(directory, name), dtype=dtype, mode="r", shape=shape) \
+                if self.count else np.zeros(shape, dtype=dtype)
+        self.centroids = np.load(os.path.join(directory, "centroids.npy")) if meta.get("nlist") else None
+        if self.centroids is not None:
+            # Inverted lists: vector ids grouped by list, with each list's bounds
+            self.order = np.argsort(self.maps["lists.i32"], kind="stable").astype(np.int32)
+            self.bounds = np.searchsorted(self.maps["lists.i32"][self.order], np.arange(len(self.centroids) + 1))
+
+
+class QuantizedVectorStore(VectorStore):
+    """
+    LangChain vector store over an int8 IVF index in a directory.
+    Scores are cosine similarities (higher is closer). Ids are assigned by
+    the index; ids passed to `add_texts` are ignored.
+    """
+
+    def __init__(self, directory: str, embedding_function: Embeddings,
+                 nprobe: int = INDEX_NPROBE, rerank_factor: int = INDEX_RERANK_FACTOR):
+        self.directory = directory
+        self._embedding = embedding_function
+        self.nprobe = nprobe
+        self.rerank_factor = rerank_factor
+        self._snapshot: Optional[_Snapshot] = None
+        self._snapshot_stamp = None
+        self._snapshot_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    # --- Storage ---
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _read_meta(self) -> Dict[str, Any]:
+        try:
+            with open(self._path("index.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"version": INDEX_FORMAT_VERSION, "count": 0, "dim": 0, "nlist": 0,
+                    "trained_count": 0, "docs_bytes": 0, "deleted": 0}
+
+    def _write_meta(self, meta: Dict[str, Any]) -> None:
+        tmp_path = self._path("index.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._path("index.json"))
+
+    def _load(self) -> _Snapshot:
+        """Current snapshot, re-mapped when another writer has published since the last call."""
+        try:
+            stamp = os.stat(self._path("index.json")).st_mtime_ns
+        except FileNotFoundError:
+            stamp = None
+        with self._snapshot_lock:
+            if self._snapshot is None or stamp != self._snapshot_stamp:
+                self._snapshot = _Snapshot(self.directory, self._read_meta())
+                self._snapshot_stamp = stamp
+            return self._snapshot
+
+    @contextmanager
+    def _write_lock(self):
+        """Exclusive writer lock across processes, like the ledger append lock."""
+        lock_path = self._path(".write.lock")
+        deadline = time.monotonic() + INDEX_LOCK_TIMEOUT
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                if time.monotonic() > deadline:
+                    logger.warning(f"Breaking stale write lock on vector index {self.directory}")
+                    try:
+                        os.remove(lock_path)
+                    except FileNotFoundError:
+                        pass  # Released, or broken by another waiter, meanwhile
+                    deadline = time.monotonic() + INDEX_LOCK_TIMEOUT
+                time.sleep(0.01)
+        try:
+            yield
+        finally:
+            os.close(fd)
+            os.remove(lock_path)
+
+    def _truncate(self, meta: Dict[str, Any]) -> None:
+        """Drop anything an interrupted writer appended past the published count."""
+        for name, (dtype, width) in _ROW_FILES.items():
+            path = self._path(name)
+            size = meta["count"] * (width or meta["dim"]) * np.dtype(dtype).itemsize
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+        if os.path.exists(self._path("docs.jsonl")) and os.path.getsize(self._path("docs.jsonl")) > meta["docs_bytes"]:
+            os.truncate(self._path("docs.jsonl"), meta["docs_bytes"])
+
+    def _assign(self, vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        lists = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), 4096):
+            lists[start:start + 4096] = np.argmax(vectors[start:start + 4096] @ centroids.T, axis=1)
+        return lists
+
+    def _train(self, meta: Dict[str, Any]) -> None:
+        """(Re)build the coarse quantizer with spherical k-means and reassign every vector."""
+        count, dim = meta["count"], meta["dim"]
+        vectors = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r", shape=(count, dim))
+        nlist = int(np.clip(4 * np.sqrt(count), 16, 4096))
+        rng = np.random.default_rng(count)
+        sample = np.asarray(vectors[np.sort(rng.choice(count, min(count, _KMEANS_MAX_SAMPLE), replace=False))])
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)]
+        for _ in range(_KMEANS_ITERATIONS):
+            assignment = self._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = ~np.bincount(assignment, minlength=nlist).astype(bool)
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = _normalize(sums)
+
+        lists = np.empty(count, dtype=np.int32)
+        for start in range(0, count, _SCAN_BLOCK):
+            lists[start:start + _SCAN_BLOCK] = self._assign(np.asarray(vectors[start:start + _SCAN_BLOCK]), centroids)
+        # Replace rather than rewrite in place: readers keep their mapping of the old files
+        lists.tofile(self._path("lists.i32.tmp"))
+        np.save(self._path("centroids.tmp.npy"), centroids.astype(np.float32))
+        os.replace(self._path("lists.i32.tmp"), self._path("lists.i32"))
+        os.replace(self._path("centroids.tmp.npy"), self._path("centroids.npy"))
+        meta.update(nlist=nlist, trained_count=count)
+        logger.info(f"Trained {nlist} IVF lists over {count} vectors in {self.directory}")
+
+    def add_vectors(self, vectors: np.ndarray, texts: Sequence[str],
+                    metadatas: Optional[Sequence[Dict[str, Any]]] = None) -> List[str]:
+        """Add precomputed embeddings with their texts; returns the assigned ids."""
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        metadatas = metadatas or [{} for _ in texts]
+        with self._write_lock():
+            meta = self._read_meta()
+            start, dim = meta["count"], meta["dim"] or vectors.shape[1]
+            if vectors.shape[1] != dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the index ({dim})")
+            meta["dim"] = dim
+            self._truncate(meta)
+
+            scales = (np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127).astype(np.float32)
+            codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+            if meta["nlist"]:
+                lists = self._assign(vectors, np.load(self._path("centroids.npy")))
+            else:
+                lists = np.full(len(vectors), -1, dtype=np.int32)
+
+            offsets = np.empty(len(texts), dtype=np.int64)
+            with open(self._path("docs.jsonl"), "ab") as f:
+                for i, (text, metadata) in enumerate(zip(texts, metadatas)):
+                    offsets[i] = f.tell()
+                    f.write(json.dumps({"text": text, "metadata": metadata}).encode("utf-8") + b"\n")
+                meta["docs_bytes"] = f.tell()
+            for name, rows in (("codes.i8", codes), ("vectors.f32", vectors), ("scales.f32", scales),
+                               ("lists.i32", lists), ("deleted.u8", np.zeros(len(vectors), dtype=np.uint8)),
+                               ("offsets.i64", offsets)):
+                with open(self._path(name), "ab") as f:
+                    f.write(np.ascontiguousarray(rows).tobytes())
+            meta["count"] = start + len(vectors)
+
+            if meta["count"] >= INDEX_TRAIN_MIN_VECTORS and meta["count"] >= 2 * meta["trained_count"]:
+                self._train(meta)
+            self._write_meta(meta)
+        return [str(i) for i in range(start, meta["count"])]
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        return self.add_vectors(np.asarray(self._embedding.embed_documents(texts), dtype=np.float32), texts, metadatas)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if not ids:
+            return False
+        with self._write_lock():
+            meta = self._read_meta()
+            rows = np.array([int(i) for i in ids if 0 <= int(i) < meta["count"]], dtype=np.int64)
+            if len(rows):
+                deleted = np.memmap(self._path("deleted.u8"), dtype=np.uint8, mode="r+", shape=(meta["count"],))
+                deleted[rows] = 1
+                deleted.flush()
+                meta["deleted"] = int(np.count_nonzero(deleted))
+                self._write_meta(meta)
+        return True
+
+    # --- Reads ---
+
+    def _documents(self, snapshot: _Snapshot, rows: Iterable[int]) -> List[Tuple[int, str, Dict[str, Any]]]:
+        documents = []
+        with open(self._path("docs.jsonl"), "rb") as f:
+            for row in rows:
+                f.seek(int(snapshot.maps["offsets.i64"][row]))
+                record = json.loads(f.readline())
+                documents.append((int(row), record["text"], record["metadata"]))
+        return documents
+
+    def _approximate_scores(self, snapshot: _Snapshot, query: np.ndarray,
+                            candidates: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """int8 scores for the candidate rows (all rows when None), deleted rows excluded."""
+        codes, scales, deleted = snapshot.maps["codes.i8"], snapshot.maps["scales.f32"], snapshot.maps["deleted.u8"]
+        if candidates is None:
+            candidates = np.arange(snapshot.count)
+            blocks = [slice(start, start + _SCAN_BLOCK) for start in range(0, snapshot.count, _SCAN_BLOCK)]
+            scores = np.concatenate([(codes[b].astype(np.float32) @ query) * scales[b] for b in blocks]) \
+                if blocks else np.zeros(0, dtype=np.float32)
+        else:
+            candidates = np.sort(candidates)  # Sequential page access
+            scores = (codes[candidates].astype(np.float32) @ query) * scales[candidates]
+        alive = deleted[candidates] == 0
+        return candidates[alive], scores[alive]
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4,
+                                               filter: Optional[Dict[str, Any]] = None,
+                                               **kwargs: Any) -> List[Tuple[Document, float]]:
+        snapshot = self._load()
+        if snapshot.count == 0:
+            return []
+        query = _normalize(np.asarray(embedding, dtype=np.float32)[None, :])[0]
+        candidates = None
+        if snapshot.centroids is not None:
+            probes = np.argsort(-(snapshot.centroids @ query))[:self.nprobe]
+            candidates = np.concatenate([snapshot.order[snapshot.bounds[p]:snapshot.bounds[p + 1]] for p in probes])
+        rows, scores = self._approximate_scores(snapshot, query, candidates)
+        if not len(rows):
+            return []
+
+        shortlist_size = max(k * self.rerank_factor, k)
+        ranked = rows[np.argsort(-scores, kind="stable")]
+        if filter:
+            # Walk the approximate ranking until enough rows pass the filter
+            shortlist = []
+            for start in range(0, len(ranked), shortlist_size):
+                for row, text, metadata in self._documents(snapshot, ranked[start:start + shortlist_size]):
+                    if _matches(metadata, filter):
+                        shortlist.append((row, text, metadata))
+                if len(shortlist) >= shortlist_size:
+                    break
+            shortlist = shortlist[:shortlist_size]
+        else:
+            shortlist = self._documents(snapshot, ranked[:shortlist_size])
+        if not shortlist:
+            return []
+
+        # Exact re-rank on the float32 vectors of the shortlist only
+        exact = snapshot.maps["vectors.f32"][np.array([row for row, _, _ in shortlist])] @ query
+        best = np.argsort(-exact, kind="stable")[:k]
+        return [(Document(page_content=shortlist[i][1], metadata=shortlist[i][2], id=str(shortlist[i][0])),
+                 float(exact[i])) for i in best]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4,
+                                    filter: Optional[Dict[str, Any]] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k, filter)
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None,
+                          **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        return lambda score: (score + 1) / 2
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, include: Optional[List[str]] = None, **kwargs: Any) -> Dict[str, List[Any]]:
+        """Chroma-style lookup by ids and/or metadata filter (a scan of the document file)."""
+        snapshot = self._load()
+        deleted = snapshot.maps["deleted.u8"]
+        if ids is not None:
+            rows = [int(i) for i in ids if 0 <= int(i) < snapshot.count and not deleted[int(i)]]
+        else:
+            rows = np.flatnonzero(deleted == 0)
+        result: Dict[str, List[Any]] = {"ids": [], "documents": [], "metadatas": []}
+        for row, text, metadata in self._documents(snapshot, rows):
+            if not _matches(metadata, where):
+                continue
+            result["ids"].append(str(row))
+            result["documents"].append(text)
+            result["metadatas"].append(metadata)
+            if limit is not None and len(result["ids"]) >= limit:
+                break
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Vector counts, IVF lists and on-disk bytes of the int8 codes and float32 vectors."""
+        snapshot = self._load()
+        return {"vectors": snapshot.count, "deleted": snapshot.meta.get("deleted", 0), "dim": snapshot.dim,
+                "nlist": snapshot.meta.get("nlist", 0), "int8_bytes": snapshot.count * snapshot.dim,
+                "float32_bytes": snapshot.count * snapshot.dim * 4}
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   directory: str = "./vector_index", **kwargs: Any) -> "QuantizedVectorStore":
+        store = cls(directory, embedding, **kwargs)
+        store.add_texts(texts, metadatas)
+        return store